@@ -0,0 +1,107 @@
+"""
+METRIC parsing throughput on a synthetic log: the mmap scanner on one
+process and on all CPUs, against the line-at-a-time reference parser,
+checking that all of them return the same points.
+
+    python benchmarks/bench_metric_parse.py              # 5 GB log
+    python benchmarks/bench_metric_parse.py --size 512M --reference
+
+The log is written once to --path (default: a temp dir) and reused while
+it has the requested size. Every 20th line is a METRIC line (JSON with and
+without a step, and key=value), the rest is ordinary output. The reference
+parser takes minutes per GB, so it only runs with --reference.
+"""
+from __future__ import annotations
+
+import argparse
+import os
+import random
+import tempfile
+import time
+from pathlib import Path
+
+from runpilot.config import parse_size
+from runpilot.log_store import open_text
+from runpilot.metric_parse import orjson, parse_metric_log
+from runpilot.metrics import iter_metric_points
+
+BLOCK_LINES = 20_000
+
+
+def _block(first: int, rng: random.Random) -> bytes:
+    lines = []
+    for i in range(first, first + BLOCK_LINES):
+        kind = i % 60
+        if kind == 0:
+            lines.append('METRIC {"step": %d, "loss": %.6f, "lr": 0.0003}' % (i // 20, rng.random()))
+        elif kind == 20:
+            lines.append('METRIC {"val_loss": %.6f, "val_acc": %.4f}' % (rng.random(), rng.random()))
+        elif kind == 40:
+            lines.append("METRIC grad_norm=%.5f" % (rng.random() * 10))
+        else:
+            lines.append(
+                "[%08d] epoch %d batch %d/%d images/s=%.1f gpu_mem=%dMiB"
+                % (i, i // 100_000, i % 1000, 1000, rng.random() * 900, 10_000 + i % 4096)
+            )
+    return ("\n".join(lines) + "\n").encode("utf-8")
+
+
+def _generate(path: Path, size: int) -> None:
+    rng = random.Random(1)
+    written = 0
+    first = 0
+    with path.open("wb") as f:
+        while written < size:
+            block = _block(first, rng)
+            f.write(block)
+            written += len(block)
+            first += BLOCK_LINES
+
+
+def _report(label: str, size: int, seconds: float, points: int) -> None:
+    print(f"{label:<32} {size / 2**20:>9,.0f} MiB in {seconds:7.2f}s  ({size / 2**20 / seconds:>7,.0f} MiB/s, {points:,} points)")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--size", default="5G", help="Log size (default 5G)")
+    parser.add_argument("--path", help="Log file to write/reuse")
+    parser.add_argument("--jobs", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--reference", action="store_true", help="Also time the line-at-a-time parser")
+    args = parser.parse_args()
+
+    size = parse_size(args.size)
+    path = Path(args.path or Path(tempfile.gettempdir()) / "runpilot-bench-metrics.log")
+    if not path.exists() or abs(path.stat().st_size - size) > 2**20:
+        started = time.perf_counter()
+        _generate(path, size)
+        print(f"wrote {path} ({path.stat().st_size / 2**20:,.0f} MiB) in {time.perf_counter() - started:.1f}s")
+    size = path.stat().st_size
+    print(f"JSON decoder: {'orjson' if orjson is not None else 'json'}")
+
+    started = time.perf_counter()
+    serial = parse_metric_log(path, jobs=1)
+    _report("scan, 1 process", size, time.perf_counter() - started, sum(map(len, serial.values())))
+
+    started = time.perf_counter()
+    parallel = parse_metric_log(path, jobs=args.jobs)
+    _report(f"scan, {args.jobs} processes", size, time.perf_counter() - started, sum(map(len, parallel.values())))
+
+    columns = {name: (list(s.steps), list(s.values)) for name, s in serial.items()}
+    assert {name: (list(s.steps), list(s.values)) for name, s in parallel.items()} == columns
+
+    if args.reference:
+        started = time.perf_counter()
+        reference = {}
+        with open_text(path) as f:
+            for name, step, value in iter_metric_points(f):
+                steps, values = reference.setdefault(name, ([], []))
+                steps.append(step)
+                values.append(value)
+        _report("reference, line by line", size, time.perf_counter() - started, sum(len(s) for s, _ in reference.values()))
+        assert reference == columns
+    print("results identical")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,62 @@
+"""
+Run id throughput: IDs generated and run directories created per second,
+from one thread, several threads and several processes.
+
+    python benchmarks/bench_run_ids.py
+"""
+from __future__ import annotations
+
+import multiprocessing
+import os
+import tempfile
+import threading
+import time
+
+from runpilot.storage import _generate_run_id, create_run_dir
+
+COUNT = 20_000
+WORKERS = 8
+
+
+def _create(count: int) -> None:
+    for _ in range(count):
+        create_run_dir("sweep")
+
+
+def _report(label: str, count: int, seconds: float) -> None:
+    print(f"{label:<40} {count:>7} in {seconds:6.3f}s  ({count / seconds:>10,.0f}/s)")
+
+
+def main() -> None:
+    os.environ["HOME"] = tempfile.mkdtemp(prefix="runpilot-bench-")
+
+    started = time.perf_counter()
+    ids = [_generate_run_id("sweep") for _ in range(COUNT)]
+    _report("generate ids, 1 thread", COUNT, time.perf_counter() - started)
+    assert len(set(ids)) == COUNT
+
+    started = time.perf_counter()
+    _create(COUNT)
+    _report("create run dirs, 1 thread", COUNT, time.perf_counter() - started)
+
+    per_worker = COUNT // WORKERS
+    threads = [threading.Thread(target=_create, args=(per_worker,)) for _ in range(WORKERS)]
+    started = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    _report(f"create run dirs, {WORKERS} threads", per_worker * WORKERS, time.perf_counter() - started)
+
+    ctx = multiprocessing.get_context("fork")
+    procs = [ctx.Process(target=_create, args=(per_worker,)) for _ in range(WORKERS)]
+    started = time.perf_counter()
+    for p in procs:
+        p.start()
+    for p in procs:
+        p.join()
+    _report(f"create run dirs, {WORKERS} processes", per_worker * WORKERS, time.perf_counter() - started)
+
+
+if __name__ == "__main__":
+    main()
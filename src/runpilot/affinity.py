@@ -0,0 +1,188 @@
+from __future__ import annotations
+
+import fcntl
+import json
+import os
+from contextlib import contextmanager
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional
+
+from .storage import get_root_dir
+
+ALLOCATIONS_FILENAME = "cpusets.json"
+_NODE_ROOT = Path("/sys/devices/system/node")
+
+
+@dataclass
+class CpuSet:
+    """CPUs and NUMA memory nodes reserved for one run."""
+
+    cpus: List[int]
+    mems: List[int]
+
+    @property
+    def cpus_str(self) -> str:
+        return format_cpulist(self.cpus)
+
+    @property
+    def mems_str(self) -> str:
+        return format_cpulist(self.mems)
+
+
+def parse_cpulist(text: str) -> List[int]:
+    """Parse a kernel cpulist such as "0-3,8,10-11"."""
+    cpus: List[int] = []
+    for part in text.strip().split(","):
+        if not part:
+            continue
+        if "-" in part:
+            lo, hi = part.split("-", 1)
+            cpus.extend(range(int(lo), int(hi) + 1))
+        else:
+            cpus.append(int(part))
+    return cpus
+
+
+def format_cpulist(cpus: List[int]) -> str:
+    """Inverse of parse_cpulist, collapsing consecutive ids into ranges."""
+    ranges: List[str] = []
+    values = sorted(set(cpus))
+    i = 0
+    while i < len(values):
+        j = i
+        while j + 1 < len(values) and values[j + 1] == values[j] + 1:
+            j += 1
+        ranges.append(str(values[i]) if i == j else f"{values[i]}-{values[j]}")
+        i = j + 1
+    return ",".join(ranges)
+
+
+def read_topology() -> Dict[int, List[int]]:
+    """
+    Return NUMA node -> usable CPU ids for this host.
+
+    Only CPUs in this process's affinity mask are considered, so RunPilot
+    respects any outer cgroup or taskset restriction. Hosts without NUMA
+    information are treated as a single node 0.
+    """
+    usable = set(os.sched_getaffinity(0))
+    topology: Dict[int, List[int]] = {}
+
+    if _NODE_ROOT.is_dir():
+        for node_dir in sorted(_NODE_ROOT.glob("node[0-9]*")):
+            try:
+                cpus = parse_cpulist((node_dir / "cpulist").read_text())
+            except (OSError, ValueError):
+                continue
+            cpus = [c for c in cpus if c in usable]
+            if cpus:
+                topology[int(node_dir.name[4:])] = cpus
+
+    if not topology:
+        topology[0] = sorted(usable)
+    return topology
+
+
+def _pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+@contextmanager
+def _locked_allocations() -> Iterator[Dict[str, Any]]:
+    """
+    Yield the host-wide allocation map under an exclusive lock.
+
+    Entries whose owning RunPilot process has died are dropped, so a crashed
+    run cannot leak its CPUs.
+    """
+    root = get_root_dir()
+    root.mkdir(parents=True, exist_ok=True)
+    path = root / ALLOCATIONS_FILENAME
+    with (root / (ALLOCATIONS_FILENAME + ".lock")).open("w") as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        try:
+            allocations: Dict[str, Any] = json.loads(path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            allocations = {}
+        allocations = {
+            run_id: entry
+            for run_id, entry in allocations.items()
+            if isinstance(entry, dict) and _pid_alive(int(entry.get("pid", 0)))
+        }
+
+        yield allocations
+
+        tmp_path = path.with_suffix(".tmp")
+        tmp_path.write_text(json.dumps(allocations, indent=2, sort_keys=True), encoding="utf-8")
+        os.replace(tmp_path, path)
+
+
+def _choose(free: Dict[int, List[int]], count: int) -> Optional[CpuSet]:
+    # Best fit: the fullest NUMA node that can still hold the whole request,
+    # which keeps large contiguous nodes available for large jobs.
+    fitting = [node for node, cpus in free.items() if len(cpus) >= count]
+    if fitting:
+        node = min(fitting, key=lambda n: (len(free[n]), n))
+        return CpuSet(cpus=free[node][:count], mems=[node])
+
+    # Otherwise span the emptiest nodes, touching as few as possible.
+    if sum(len(c) for c in free.values()) < count:
+        return None
+    cpus: List[int] = []
+    mems: List[int] = []
+    for node in sorted(free, key=lambda n: (-len(free[n]), n)):
+        take = free[node][: count - len(cpus)]
+        if take:
+            cpus.extend(take)
+            mems.append(node)
+        if len(cpus) == count:
+            break
+    return CpuSet(cpus=cpus, mems=sorted(mems))
+
+
+def allocate(run_id: str, count: int) -> Optional[CpuSet]:
+    """
+    Reserve `count` CPUs for a run, disjoint from every other live reservation.
+
+    Returns None if not enough CPUs are free; the caller should then run
+    the job unpinned rather than oversubscribe a pinned set.
+    """
+    topology = read_topology()
+    with _locked_allocations() as allocations:
+        taken = {cpu for entry in allocations.values() for cpu in entry.get("cpus", [])}
+        free = {node: [c for c in cpus if c not in taken] for node, cpus in topology.items()}
+        chosen = _choose(free, count)
+        if chosen is not None:
+            allocations[run_id] = {
+                "pid": os.getpid(),
+                "cpus": chosen.cpus,
+                "mems": chosen.mems,
+            }
+    return chosen
+
+
+def release(run_id: str) -> None:
+    with _locked_allocations() as allocations:
+        allocations.pop(run_id, None)
+
+
+@contextmanager
+def cpu_reservation(run_id: str, count: Optional[int]) -> Iterator[Optional[CpuSet]]:
+    """Allocate CPUs for the duration of a run; yields None when unpinned."""
+    if not count:
+        yield None
+        return
+
+    cpuset = allocate(run_id, count)
+    try:
+        yield cpuset
+    finally:
+        if cpuset is not None:
+            release(run_id)
@@ -2,6 +2,7 @@
 import os
 import tarfile
 import time
+from datetime import datetime, timezone
 from pathlib import Path
 from urllib.parse import urljoin
 
@@ -10,9 +11,14 @@ from rich.console import Console
 
 from .cloud_config import CloudConfig, load_cloud_config
 from .cloud_client import update_remote_run_status
-from .config import RunConfig
-from .runner import run_local_container
-from .storage import create_run_dir, write_run_metadata
+from .config import RunConfig, parse_build, parse_duration
+from .log_store import LOG_FILENAME, find_log
+from .metrics import metrics_payload
+from .retention import collect, policy_from_env, source_entries
+from .run_manager import write_log_metrics
+from .run_store import get_upload_queue, publish_run
+from .runner import final_status, run_local_container
+from .storage import create_run_dir, record_phase, update_run_metadata, write_run_metadata
 
 console = Console()
 
@@ -32,6 +38,13 @@ def start_agent(poll_interval: int = 5, once: bool = False):
     console.print(f"Target: {cfg.api_base_url}")
     console.print(f"Polling for 'queued' jobs every {poll_interval}s...")
 
+    # Finish uploads an earlier agent on this host was stopped before completing.
+    queue = get_upload_queue()
+    if queue is not None:
+        pending = queue.resume()
+        if pending:
+            console.print(f"Resuming {pending} queued upload(s) to {queue.backend.name} storage")
+
     while True:
         try:
             job_processed = _cycle(cfg)
@@ -56,7 +69,7 @@ def _cycle(cfg: CloudConfig) -> bool:
     """
     from .cloud_client import (
         upload_run_logs,
-        upload_run_metrics_file,
+        upload_run_metrics,
         upload_run_artifacts,
         request_instance_shutdown,
     )
@@ -76,6 +89,7 @@ def _cycle(cfg: CloudConfig) -> bool:
         return False
 
     # 2. Claimed
+    claimed_at = datetime.now(timezone.utc).isoformat()
     cloud_id = job["cloud_run_id"]
     console.print(f"\n[bold blue]🚀 Claimed Job: {cloud_id}[/bold blue]")
 
@@ -89,10 +103,16 @@ def _cycle(cfg: CloudConfig) -> bool:
     # Build RunConfig for local execution
     run_cfg = RunConfig(
         name=job_config.get("name", "remote-job"),
-        image=job.get("image") or job_config.get("image"),
+        image=job.get("image") or job_config.get("image") or "",
         entrypoint=job.get("entrypoint") or job_config.get("entrypoint"),
         env_vars=secrets,
         use_gpu=bool(job_config.get("use_gpu", False)) or bool(job_config.get("gpu", False)),
+        timeout=parse_duration(job_config.get("timeout")),
+        max_idle=parse_duration(job_config.get("max_idle")),
+        budget=job_config.get("budget"),
+        cost_per_hour=job_config.get("cost_per_hour"),
+        caches=[str(kind) for kind in job_config.get("caches") or []],
+        build=parse_build(job_config.get("build"), source="job config"),
     )
 
     console.print(f"   Task: {run_cfg.entrypoint}")
@@ -101,9 +121,15 @@ def _cycle(cfg: CloudConfig) -> bool:
     # 3. Prepare local workspace
     run_dir = create_run_dir(run_cfg.name)
     write_run_metadata(run_dir, run_cfg, status="running")
+    # queued_at -> claimed_at is the job's queue wait (runpilot stats).
+    update_run_metadata(
+        run_dir,
+        {"cloud_run_id": cloud_id, "queued_at": job.get("created_at"), "claimed_at": claimed_at},
+    )
 
     # 4. DOWNLOAD & EXTRACT ARTIFACTS (code bundle from S3 or mock)
     console.print("   ⬇ Requesting download URL...")
+    download_started = time.monotonic()
     api_url = f"{cfg.api_base_url}/v1/runs/{cloud_id}/artifacts/code/download-url"
 
     try:
@@ -125,34 +151,52 @@ def _cycle(cfg: CloudConfig) -> bool:
                 f.write(r.content)
 
             with tarfile.open(bundle_path, "r:gz") as tar:
+                entries = source_entries(m.name for m in tar.getmembers())
                 tar.extractall(path=run_dir)
             console.print(f"   ✔ Code extracted to {run_dir}")
+            # Lets gc drop the sources later while keeping logs and metrics.
+            update_run_metadata(
+                run_dir,
+                {"source": {"bundle": bundle_path.name, "entries": entries}},
+            )
         else:
             console.print("   ⚠ No code bundle found (using image default).")
 
     except Exception as e:
         console.print(f"   [red]Artifact error:[/red] {e}")
+    record_phase(run_dir, "download", time.monotonic() - download_started)
 
     # 5. Execute
     exit_code = run_local_container(run_cfg, run_dir, working_dir=run_dir)
 
+    local_status = final_status(run_dir, exit_code)
+    write_run_metadata(run_dir, run_cfg, status=local_status, exit_code=exit_code)
+
     status = "success" if exit_code == 0 else "failed"
-    console.print(f"[bold]Job finished: {status} (Exit: {exit_code})[/bold]")
+    console.print(f"[bold]Job finished: {local_status} (Exit: {exit_code})[/bold]")
 
     # 6. Upload logs
-    log_path = run_dir / "logs.txt"
-    if log_path.exists():
+    upload_started = time.monotonic()
+    log_path = run_dir / LOG_FILENAME
+    if find_log(run_dir) is not None:
         upload_run_logs(cfg, cloud_id, str(log_path))
 
-    # 7. Upload metrics if present
-    metrics_path = run_dir / "metrics.json"
-    if metrics_path.exists():
-        upload_run_metrics_file(cfg, cloud_id, str(metrics_path))
+    # 7. Upload metrics if present (METRIC lines parsed into metrics.json)
+    # Series are downsampled (RUNPILOT_METRIC_POINTS); full resolution stays local.
+    write_log_metrics(run_dir, exit_code)
+    payload = metrics_payload(run_dir)
+    if payload is not None:
+        try:
+            upload_run_metrics(cfg, cloud_id, payload)
+            console.print("[green]   ✔ Metrics uploaded.[/green]")
+        except Exception as e:
+            console.print(f"[red]Metrics upload failed:[/red] {e}")
 
     # 8. Upload any artifacts directory
     artifacts_dir = run_dir / "artifacts"
     if artifacts_dir.exists() and artifacts_dir.is_dir():
         upload_run_artifacts(cfg, cloud_id, artifacts_dir)
+    record_phase(run_dir, "upload", time.monotonic() - upload_started)
 
     # 9. Report status back to cloud (will set ended_at on server side)
     update_remote_run_status(cfg, cloud_id, status)
@@ -162,4 +206,21 @@ def _cycle(cfg: CloudConfig) -> bool:
         console.print("   📴 Requesting EC2 shutdown...")
         request_instance_shutdown(cfg, cloud_id)
 
+    # 11. Queue the run for the storage backend; uploads continue in the
+    # background while the agent polls for the next job.
+    publish_run(run_dir)
+
+    # 12. Apply the local retention policy, if one is configured
+    policy = policy_from_env()
+    if policy is not None:
+        try:
+            report = collect(policy)
+            if report.deleted or report.sources_dropped:
+                console.print(
+                    f"   🧹 gc: removed {len(report.deleted)} run(s), dropped sources of "
+                    f"{len(report.sources_dropped)}, freed {report.bytes_freed} bytes"
+                )
+        except Exception as e:
+            console.print(f"   [red]gc error:[/red] {e}")
+
     return True
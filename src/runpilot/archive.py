@@ -4,7 +4,11 @@ import tarfile
 from pathlib import Path
 from typing import Optional
 
+from .log_records import RECORDS_FILENAME
+from .log_store import LOG_FILENAME, file_size, find_file, open_binary, stored_forms
 from .paths import get_run_dir
+from .run_index import index_run_dir
+from .run_store import fetch_run
 
 
 class RunNotFoundError(FileNotFoundError):
@@ -22,8 +26,13 @@ def export_run(run_id: str, output_path: Optional[Path] = None) -> Path:
           logs.txt
           metrics.json (optional)
           outputs/     (optional)
+
+    Compacted logs are stored decompressed, so archives look the same
+    whether or not the run was compacted.
     """
     run_dir = get_run_dir(run_id)
+    if not run_dir.exists():
+        run_dir = fetch_run(run_id) or run_dir
     if not run_dir.exists():
         raise RunNotFoundError(f"Run directory not found for id: {run_id}")
 
@@ -35,9 +44,23 @@ def export_run(run_id: str, output_path: Optional[Path] = None) -> Path:
     output_path = output_path.resolve()
     output_path.parent.mkdir(parents=True, exist_ok=True)
 
+    compressed = {}
+    for name in (LOG_FILENAME, RECORDS_FILENAME):
+        found = find_file(run_dir / name)
+        if found is not None and found.name != name:
+            compressed[name] = found
+    skipped = {f"{run_dir.name}/{form}" for name in compressed for form in stored_forms(name)}
+
     with tarfile.open(output_path, "w:gz") as tf:
         # arcname ensures the root folder in the archive is exactly run_id
-        tf.add(run_dir, arcname=run_dir.name)
+        tf.add(run_dir, arcname=run_dir.name, filter=lambda info: None if info.name in skipped else info)
+        for name, found in compressed.items():
+            info = tarfile.TarInfo(f"{run_dir.name}/{name}")
+            info.size = file_size(found)
+            info.mtime = int(found.stat().st_mtime)
+            info.mode = 0o644
+            with open_binary(found) as f:
+                tf.addfile(info, f)
 
     return output_path
 
@@ -71,7 +94,9 @@ def import_run(archive_path: Path, overwrite: bool = False) -> str:
                     f"Run directory already exists for id {run_id}: {target_dir}"
                 )
 
-        # Extract into the runs root; archive already contains <run_id>/...
+        # Extract next to where the run belongs (the runs root or its date
+        # shard); the archive already contains <run_id>/...
         tf.extractall(path=runs_root)
 
+    index_run_dir(target_dir)
     return run_id
@@ -3,6 +3,7 @@ from __future__ import annotations
 import argparse
 import json
 import os
+from dataclasses import replace
 
 from .cloud_client import (
     login_via_api,
@@ -14,18 +15,23 @@ from .cloud_client import (
     submit_job,
 )
 from pathlib import Path
-from .config import load_config, resolve_config_path
-from .runner import run_local_container
+from .config import RunConfig, load_config, resolve_config_path
+from .run_manager import execute_run
 from .storage import (
     create_run_dir,
-    write_run_metadata,
     load_all_runs,
     load_run,
+    update_run_metadata,
 )
-from .metrics import parse_metrics_from_log, write_metrics
-from .cli_metrics import metrics_command
+from .cli_grep import grep_command
+from .cli_logs import logs_command
+from .cli_metrics import DISPLAY_POINTS, metrics_command
+from .cli_query import query_command
+from .cli_stats import stats_command
 from .archive import export_run, import_run, RunNotFoundError
 from .cloud_config import CloudConfig, load_cloud_config
+from .log_store import LOG_FILENAME, find_log
+from .metrics import DOWNSAMPLE_METHODS, metrics_payload, refresh_live_metrics
 from .paths import get_run_dir
 from .project import (
     LocalProjectBinding,
@@ -66,6 +72,35 @@ def build_parser() -> argparse.ArgumentParser:
         type=str,
         help="Path to the run config YAML file",
     )
+    run_parser.add_argument(
+        "--cache",
+        action="store_true",
+        help="Reuse a previous successful run with the same config, source and inputs",
+    )
+    run_parser.add_argument(
+        "--profile",
+        nargs="?",
+        const="auto",
+        choices=["auto", "cprofile", "py-spy"],
+        help="Profile a Python entrypoint (default: py-spy if installed, else cProfile)",
+    )
+
+    # run-pipeline
+    pipeline_parser = subparsers.add_parser(
+        "run-pipeline",
+        help="Run the pipeline defined in runpilot.yaml",
+    )
+    pipeline_parser.add_argument(
+        "--max-parallel",
+        type=int,
+        default=None,
+        help="Maximum number of steps to run at once (default: unlimited)",
+    )
+    pipeline_parser.add_argument(
+        "--cache",
+        action="store_true",
+        help="Skip steps whose fingerprint matches a previous successful run",
+    )
 
     # list
     list_parser = subparsers.add_parser(
@@ -77,6 +112,257 @@ def build_parser() -> argparse.ArgumentParser:
         action="store_true",
         help="Output runs as JSON instead of a table",
     )
+    list_parser.add_argument(
+        "--status",
+        help="Only list runs with this status (e.g. finished, failed)",
+    )
+    list_parser.add_argument(
+        "--name",
+        help="Only list runs whose name matches this glob (e.g. 'resnet*')",
+    )
+    list_parser.add_argument(
+        "--sort",
+        default="created_at",
+        choices=["created_at", "finished_at", "name", "status", "id", "exit_code"],
+        help="Column to sort by (default: created_at, newest first)",
+    )
+    list_parser.add_argument(
+        "--asc",
+        action="store_true",
+        help="Sort ascending instead of descending",
+    )
+    list_parser.add_argument(
+        "--limit",
+        type=int,
+        default=None,
+        help="Maximum number of runs to show",
+    )
+    list_parser.add_argument(
+        "--offset",
+        type=int,
+        default=0,
+        help="Skip this many runs (use with --limit to page)",
+    )
+
+    # query
+    query_parser = subparsers.add_parser(
+        "query",
+        help="Find runs with a filter/sort/limit expression",
+        description=(
+            "Example: runpilot query \"status = finished and name ~ 'resnet*' "
+            "and metrics.loss < 0.2 and created_at > -7d order by metrics.loss limit 10\""
+        ),
+    )
+    query_parser.add_argument(
+        "expr",
+        help="Query expression over run fields, tag, params.<name> and metrics.<name>",
+    )
+    query_format = query_parser.add_mutually_exclusive_group()
+    query_format.add_argument(
+        "--json",
+        action="store_true",
+        help="Output matching runs as JSON",
+    )
+    query_format.add_argument(
+        "--csv",
+        action="store_true",
+        help="Output matching runs as CSV",
+    )
+
+    # reindex
+    reindex_parser = subparsers.add_parser(
+        "reindex",
+        help="Rebuild the run index from the run directories on disk",
+    )
+    reindex_parser.add_argument(
+        "--check",
+        action="store_true",
+        help="Only report drift between the index and disk; change nothing",
+    )
+
+    # compact
+    compact_parser = subparsers.add_parser(
+        "compact",
+        help="Compress the logs of finished runs in a seekable format",
+    )
+    compact_parser.add_argument(
+        "run_id",
+        nargs="?",
+        help="Only compact this run (default: every finished run)",
+    )
+    compact_parser.add_argument(
+        "--codec",
+        choices=["gzip", "zstd"],
+        default="gzip",
+        help="Compression codec; zstd needs the zstandard package (default: gzip)",
+    )
+    compact_parser.add_argument(
+        "--min-size",
+        type=int,
+        default=0,
+        help="Skip runs whose logs are smaller than this many bytes",
+    )
+
+    # gc
+    gc_parser = subparsers.add_parser(
+        "gc",
+        help="Delete old runs and run sources according to a retention policy",
+    )
+    gc_parser.add_argument("--keep-last", type=int, metavar="N", help="Keep the N newest runs")
+    gc_parser.add_argument(
+        "--keep-days", type=float, metavar="DAYS", help="Keep runs created in the last DAYS days"
+    )
+    gc_parser.add_argument(
+        "--max-size",
+        metavar="SIZE",
+        help="Disk budget for the runs dir (e.g. 200G); oldest unprotected runs go first",
+    )
+    gc_parser.add_argument(
+        "--drop-sources",
+        action="store_true",
+        help="Remove agent code bundles and extracted sources from kept runs",
+    )
+    gc_parser.add_argument(
+        "--include-tagged",
+        action="store_true",
+        help="Allow tagged runs to be deleted (kept by default)",
+    )
+    gc_parser.add_argument(
+        "--dry-run",
+        action="store_true",
+        help="Report what would be removed without removing anything",
+    )
+
+    # grep
+    grep_parser = subparsers.add_parser(
+        "grep",
+        help="Search run logs (plain or compressed) in parallel",
+    )
+    grep_parser.add_argument(
+        "pattern",
+        help="Regular expression (Python syntax) matched against each log line",
+    )
+    grep_parser.add_argument(
+        "--status",
+        help="Only search runs with this status",
+    )
+    grep_parser.add_argument(
+        "--name",
+        help="Only search runs whose name matches this glob",
+    )
+    grep_parser.add_argument(
+        "--since",
+        help="Only runs created after this: ISO datetime or age (e.g. 2d)",
+    )
+    grep_parser.add_argument(
+        "--until",
+        help="Only runs created before this, in the same formats as --since",
+    )
+    grep_parser.add_argument(
+        "-i",
+        "--ignore-case",
+        action="store_true",
+        help="Match case-insensitively",
+    )
+    grep_parser.add_argument(
+        "-F",
+        "--fixed-strings",
+        action="store_true",
+        help="Treat the pattern as a literal string",
+    )
+    grep_parser.add_argument(
+        "-m",
+        "--max-count",
+        type=int,
+        metavar="N",
+        help="Stop after N matching lines in total (with -l, N runs)",
+    )
+    grep_parser.add_argument(
+        "-l",
+        "--files-with-matches",
+        action="store_true",
+        help="Only print the ids of runs with a match",
+    )
+    grep_parser.add_argument(
+        "-j",
+        "--jobs",
+        type=int,
+        help="Worker processes (default: one per CPU)",
+    )
+
+    # stats
+    stats_parser = subparsers.add_parser(
+        "stats",
+        help="Duration percentiles, queue wait, failure rates and phase times over runs",
+    )
+    stats_parser.add_argument(
+        "--by",
+        metavar="FIELDS",
+        help="Group by comma-separated fields: name, image, status, source",
+    )
+    stats_parser.add_argument(
+        "--bucket",
+        choices=["hour", "day", "week", "month"],
+        help="Also group by when runs were created (UTC)",
+    )
+    stats_parser.add_argument(
+        "--since",
+        help="Only runs created after this: ISO datetime or age (e.g. 30d)",
+    )
+    stats_parser.add_argument(
+        "--until",
+        help="Only runs created before this, in the same formats as --since",
+    )
+    stats_parser.add_argument(
+        "--name",
+        help="Only runs whose name matches this glob",
+    )
+    stats_parser.add_argument(
+        "--image",
+        help="Only runs whose image matches this glob",
+    )
+    stats_parser.add_argument(
+        "--local",
+        action="store_true",
+        help="Leave out mirrored cloud runs",
+    )
+    stats_parser.add_argument(
+        "--refresh",
+        action="store_true",
+        help="Mirror the latest cloud run list into the index first (needs login)",
+    )
+    stats_parser.add_argument(
+        "--json",
+        action="store_true",
+        help="Output the groups as JSON",
+    )
+
+    # migrate-layout
+    layout_parser = subparsers.add_parser(
+        "migrate-layout",
+        help="Move runs in place between the flat and date-sharded layouts",
+    )
+    layout_parser.add_argument(
+        "layout",
+        choices=["sharded", "flat"],
+        help="sharded: runs/<YYYYMMDD>/<run-id>; flat: runs/<run-id>",
+    )
+
+    # push
+    push_parser = subparsers.add_parser(
+        "push",
+        help="Upload runs to the storage backend (RUNPILOT_STORAGE_URL) and wait",
+    )
+    push_parser.add_argument(
+        "run_ids",
+        nargs="*",
+        help="Runs to upload (default: only finish uploads already queued)",
+    )
+    push_parser.add_argument(
+        "--all",
+        action="store_true",
+        help="Upload every local run",
+    )
 
     # show
     show_parser = subparsers.add_parser(
@@ -93,6 +379,57 @@ def build_parser() -> argparse.ArgumentParser:
         action="store_true",
         help="Output run metadata as JSON instead of a table",
     )
+    show_parser.add_argument(
+        "--timeline",
+        action="store_true",
+        help="Show the run's metadata events (status changes, updates) in order",
+    )
+
+    # logs
+    logs_parser = subparsers.add_parser(
+        "logs",
+        help="Show a run's logs, optionally limited to a time range",
+    )
+    logs_parser.add_argument(
+        "run_id",
+        help="Run identifier",
+    )
+    logs_parser.add_argument(
+        "--since",
+        help="Start time: ISO datetime, clock time (02:00), +offset from run start (+5m) or age (10m)",
+    )
+    logs_parser.add_argument(
+        "--until",
+        help="End time, in the same formats as --since",
+    )
+    logs_parser.add_argument(
+        "--stream",
+        choices=["stdout", "stderr"],
+        help="Only show one output stream",
+    )
+    logs_parser.add_argument(
+        "--tail",
+        type=int,
+        metavar="N",
+        help="Only show the last N lines (read from the end of the file)",
+    )
+    logs_parser.add_argument(
+        "-f",
+        "--follow",
+        action="store_true",
+        help="Keep printing new output until the run finishes",
+    )
+    logs_parser.add_argument(
+        "--range",
+        dest="byte_range",
+        metavar="START:END",
+        help="Only show bytes START to END (END exclusive; negative counts from the end)",
+    )
+    logs_parser.add_argument(
+        "--remote",
+        action="store_true",
+        help="Read the logs stored in RunPilot Cloud using HTTP Range requests",
+    )
 
     # metrics
     metrics_parser = subparsers.add_parser(
@@ -108,6 +445,30 @@ def build_parser() -> argparse.ArgumentParser:
         action="store_true",
         help="Print raw metrics.json as JSON",
     )
+    metrics_parser.add_argument(
+        "--series",
+        action="append",
+        metavar="NAME",
+        help="Print the stored points of a metric (repeatable)",
+    )
+    metrics_parser.add_argument(
+        "--steps",
+        metavar="START:STOP",
+        help="Only print points with START <= step < STOP (either side optional)",
+    )
+    metrics_parser.add_argument(
+        "--points",
+        type=int,
+        default=DISPLAY_POINTS,
+        metavar="N",
+        help=f"Downsample printed series to N points (default {DISPLAY_POINTS}; 0 prints every point)",
+    )
+    metrics_parser.add_argument(
+        "--method",
+        choices=DOWNSAMPLE_METHODS,
+        default="lttb",
+        help="Downsampling method: lttb keeps the curve's shape, minmax keeps each bucket's extremes",
+    )
 
     # export
     export_parser = subparsers.add_parser(
@@ -170,6 +531,13 @@ def build_parser() -> argparse.ArgumentParser:
         "run_id",
         help="Run identifier to sync",
     )
+    sync_parser.add_argument(
+        "--points",
+        type=int,
+        metavar="N",
+        help="Upload each metric series downsampled to N points "
+        "(default RUNPILOT_METRIC_POINTS or 2000; 0 uploads every point)",
+    )
 
     # whoami
     subparsers.add_parser(
@@ -229,19 +597,102 @@ def main(argv: list[str] | None = None) -> int:
     args = parser.parse_args(argv)
 
     if args.command == "run":
-        _handle_run_command(args.config_path)
+        _handle_run_command(args.config_path, use_cache=args.cache, profile=args.profile)
         return 0
 
+    if args.command == "run-pipeline":
+        return _handle_run_pipeline_command(
+            max_parallel=args.max_parallel,
+            use_cache=args.cache,
+        )
+
     if args.command == "list":
-        _handle_list_command(json_output=getattr(args, "json", False))
+        _handle_list_command(
+            json_output=getattr(args, "json", False),
+            status=args.status,
+            name=args.name,
+            sort=args.sort,
+            descending=not args.asc,
+            limit=args.limit,
+            offset=args.offset,
+        )
         return 0
 
+    if args.command == "query":
+        output = "json" if args.json else "csv" if args.csv else "table"
+        return query_command(args.expr, output=output)
+
+    if args.command == "reindex":
+        return _handle_reindex_command(check_only=args.check)
+
+    if args.command == "compact":
+        return _handle_compact_command(args.run_id, args.codec, args.min_size)
+
+    if args.command == "gc":
+        return _handle_gc_command(args)
+
+    if args.command == "grep":
+        return grep_command(
+            args.pattern,
+            status=args.status,
+            name=args.name,
+            since=args.since,
+            until=args.until,
+            ignore_case=args.ignore_case,
+            fixed=args.fixed_strings,
+            max_count=args.max_count,
+            files_only=args.files_with_matches,
+            jobs=args.jobs,
+        )
+
+    if args.command == "stats":
+        return stats_command(
+            group_by=args.by,
+            bucket=args.bucket,
+            since=args.since,
+            until=args.until,
+            name=args.name,
+            image=args.image,
+            local_only=args.local,
+            refresh=args.refresh,
+            json_output=args.json,
+        )
+
+    if args.command == "migrate-layout":
+        return _handle_migrate_layout_command(args.layout)
+
+    if args.command == "push":
+        return _handle_push_command(args.run_ids, push_all=args.all)
+
     if args.command == "show":
-        _handle_show_command(args.run_id, json_output=getattr(args, "json", False))
+        _handle_show_command(
+            args.run_id,
+            json_output=getattr(args, "json", False),
+            timeline=getattr(args, "timeline", False),
+        )
         return 0
 
+    if args.command == "logs":
+        return logs_command(
+            run_id=args.run_id,
+            since=args.since,
+            until=args.until,
+            stream=args.stream,
+            tail=args.tail,
+            follow=args.follow,
+            byte_range=args.byte_range,
+            remote=args.remote,
+        )
+
     if args.command == "metrics":
-        return metrics_command(run_id=args.run_id, json_output=args.json)
+        return metrics_command(
+            run_id=args.run_id,
+            json_output=args.json,
+            series=args.series,
+            steps=args.steps,
+            points=args.points,
+            method=args.method,
+        )
 
     if args.command == "export":
         return _handle_export_command(args.run_id, args.output)
@@ -257,7 +708,7 @@ def main(argv: list[str] | None = None) -> int:
         )
 
     if args.command == "sync":
-        return _handle_sync_command(args.run_id)
+        return _handle_sync_command(args.run_id, points=args.points)
 
     if args.command == "whoami":
         return _handle_whoami_command()
@@ -283,9 +734,15 @@ def main(argv: list[str] | None = None) -> int:
     return 1
 
 
-def _handle_run_command(config_ref: str) -> None:
+def _handle_run_command(
+    config_ref: str,
+    use_cache: bool = False,
+    profile: str | None = None,
+) -> None:
     config_path = resolve_config_path(config_ref)
     cfg = load_config(config_path)
+    if profile:
+        cfg = replace(cfg, profile=profile)
     print(
         f"[RunPilot] Loaded config for run '{cfg.name}' "
         f"with image '{cfg.image}' and entrypoint '{cfg.entrypoint}'"
@@ -294,41 +751,80 @@ def _handle_run_command(config_ref: str) -> None:
     run_dir = create_run_dir(cfg.name)
     print(f"[RunPilot] Created run directory at: {run_dir}")
 
-    write_run_metadata(run_dir, cfg, status="pending")
+    if use_cache:
+        from .run_cache import execute_with_cache
 
-    exit_code = run_local_container(cfg, run_dir)
+        exit_code = execute_with_cache(cfg, run_dir)
+        cache_info = load_run(run_dir.name).get("cache") or {}
+        if cache_info.get("hit"):
+            print(f"[RunPilot] Cache hit: reused run {cache_info.get('source_run')}")
+        else:
+            reasons = ", ".join(cache_info.get("invalidated_by") or [])
+            print(f"[RunPilot] Cache miss ({reasons})")
+    else:
+        exit_code = execute_run(cfg, run_dir)
 
-    final_status = "finished" if exit_code == 0 else "failed"
-    write_run_metadata(run_dir, cfg, status=final_status, exit_code=exit_code)
+    if (run_dir / "metrics.json").exists():
+        print(f"[RunPilot] Metrics written to {run_dir / 'metrics.json'}")
 
-    log_path = run_dir / "logs.txt"
-    parsed_metrics = parse_metrics_from_log(log_path)
+    profile_info = load_run(run_dir.name).get("profile") or {}
+    if profile_info.get("flamegraph"):
+        print(f"[RunPilot] Profile written to {profile_info['flamegraph']}")
 
-    summary: dict[str, float] = {}
-    final_metrics = parsed_metrics.get("final") if isinstance(parsed_metrics, dict) else None
-    if isinstance(final_metrics, dict):
-        for key, value in final_metrics.items():
-            try:
-                summary[key] = float(value)
-            except (TypeError, ValueError):
-                continue
+    print(f"[RunPilot] Run completed with exit code {exit_code}")
+    print(f"[RunPilot] Metadata written to {run_dir / 'run.json'}")
+
+
+def _handle_run_pipeline_command(
+    max_parallel: int | None = None,
+    use_cache: bool = False,
+) -> int:
+    from .pipeline import format_timing_report, load_pipeline, run_pipeline
 
     try:
-        summary["exit_code"] = float(exit_code)
-    except (TypeError, ValueError):
-        pass
+        steps = load_pipeline()
+    except (FileNotFoundError, ValueError) as exc:
+        print(f"[RunPilot] {exc}")
+        return 1
 
-    if summary:
-        run_id = run_dir.name
-        write_metrics(run_dir=run_dir, run_id=run_id, summary=summary)
-        print(f"[RunPilot] Metrics written to {run_dir / 'metrics.json'}")
+    print(f"[RunPilot] Running pipeline with {len(steps)} step(s)")
+    def execute_cached(cfg: RunConfig, run_dir: Path, work_dir: Path) -> int:
+        from .run_cache import execute_with_cache
 
-    print(f"[RunPilot] Run completed with exit code {exit_code}")
-    print(f"[RunPilot] Metadata written to {run_dir / 'run.json'}")
+        return execute_with_cache(cfg, run_dir, working_dir=work_dir)
+
+    result = run_pipeline(
+        steps, max_parallel=max_parallel, execute=execute_cached if use_cache else None
+    )
 
+    print()
+    print(format_timing_report(result))
 
-def _handle_list_command(json_output: bool = False) -> None:
-    runs = load_all_runs()
+    if not result.ok:
+        print("[RunPilot] Pipeline failed.")
+        return 1
+
+    print("[RunPilot] Pipeline completed successfully.")
+    return 0
+
+
+def _handle_list_command(
+    json_output: bool = False,
+    status: str | None = None,
+    name: str | None = None,
+    sort: str = "created_at",
+    descending: bool = True,
+    limit: int | None = None,
+    offset: int = 0,
+) -> None:
+    runs = load_all_runs(
+        status=status,
+        name=name,
+        sort=sort,
+        descending=descending,
+        limit=limit,
+        offset=offset,
+    )
 
     if json_output:
         print(json.dumps(runs, indent=2, sort_keys=True, default=str))
@@ -338,20 +834,171 @@ def _handle_list_command(json_output: bool = False) -> None:
         print("[RunPilot] No runs found.")
         return
 
-    header = f"{'ID':<32} {'STATUS':<10} {'EXIT':<5} {'CREATED_AT'}"
+    # IDs end in a unique suffix, so they are never truncated.
+    width = max(32, max(len(str(r.get("id", ""))) for r in runs))
+    header = f"{'ID':<{width}} {'STATUS':<10} {'EXIT':<5} {'CREATED_AT'}"
     print(header)
     print("-" * len(header))
 
     for r in runs:
-        run_id = str(r.get("id", ""))[:32]
+        run_id = str(r.get("id", ""))
         status = str(r.get("status", ""))
         exit_code = r.get("exit_code")
         created_at = str(r.get("created_at", ""))
         exit_str = "" if exit_code is None else str(exit_code)
-        print(f"{run_id:<32} {status:<10} {exit_str:<5} {created_at}")
+        print(f"{run_id:<{width}} {status:<10} {exit_str:<5} {created_at}")
+
 
+def _handle_reindex_command(check_only: bool = False) -> int:
+    from .run_index import reindex
+
+    report = reindex(check_only=check_only)
+    print(
+        f"[RunPilot] Index: {report.unchanged} unchanged, {len(report.added)} added, "
+        f"{len(report.updated)} updated, {len(report.removed)} removed"
+    )
+    groups = (
+        ("missing from index", report.added),
+        ("out of date", report.updated),
+        ("no longer on disk", report.removed),
+    )
+    for label, ids in groups:
+        for run_id in ids[:20]:
+            print(f"  {label:<18} {run_id}")
+        if len(ids) > 20:
+            print(f"  ... and {len(ids) - 20} more {label}")
+    if check_only and report.drift:
+        print("[RunPilot] Drift detected; run `runpilot reindex` to fix it.")
+        return 1
+    return 0
+
+
+def _handle_compact_command(run_id: str | None, codec: str, min_size: int = 0) -> int:
+    from .log_store import compact_run, compact_runs
 
-def _handle_show_command(run_id: str, json_output: bool = False) -> None:
+    try:
+        if run_id:
+            run_dir = get_run_dir(run_id)
+            if not run_dir.is_dir():
+                print(f"[RunPilot] Run directory not found for id: {run_id}")
+                return 1
+            results = compact_run(run_dir, codec)
+            if results is None:
+                print(f"[RunPilot] Run {run_id} is still active; skipped.")
+                return 0
+            totals = {
+                "runs": 1 if results else 0,
+                "skipped": 0,
+                "bytes_before": sum(r.bytes_before for r in results),
+                "bytes_after": sum(r.bytes_after for r in results),
+            }
+        else:
+            totals = compact_runs(codec, min_bytes=min_size)
+    except ValueError as exc:
+        print(f"[RunPilot] {exc}")
+        return 1
+
+    saved = totals["bytes_before"] - totals["bytes_after"]
+    print(
+        f"[RunPilot] Compacted {totals['runs']} run(s): {totals['bytes_before']} -> "
+        f"{totals['bytes_after']} bytes ({saved} bytes saved)"
+    )
+    if totals["skipped"]:
+        print(f"[RunPilot] Skipped {totals['skipped']} active run(s).")
+    return 0
+
+
+def _handle_gc_command(args: argparse.Namespace) -> int:
+    from .config import parse_size
+    from .retention import RetentionPolicy, collect, policy_from_env
+
+    try:
+        policy = RetentionPolicy(
+            keep_last=args.keep_last,
+            keep_days=args.keep_days,
+            keep_tagged=not args.include_tagged,
+            drop_sources=args.drop_sources,
+            max_bytes=parse_size(args.max_size),
+        )
+        if policy.empty:
+            # Fall back to the policy the agent uses.
+            policy = policy_from_env() or policy
+    except ValueError as exc:
+        print(f"[RunPilot] {exc}")
+        return 1
+    if policy.empty:
+        print("[RunPilot] No retention rule given (--keep-last, --keep-days, --max-size, --drop-sources).")
+        return 1
+
+    report = collect(policy, dry_run=args.dry_run)
+    verb = "Would remove" if args.dry_run else "Removed"
+    for item in report.deleted[:50]:
+        print(f"  delete  {item.run_id:<48} {item.bytes:>12} bytes ({item.reason})")
+    if len(report.deleted) > 50:
+        print(f"  ... and {len(report.deleted) - 50} more run(s)")
+    for item in report.sources_dropped[:50]:
+        print(f"  source  {item.run_id:<48} {item.bytes:>12} bytes")
+    if len(report.sources_dropped) > 50:
+        print(f"  ... and {len(report.sources_dropped) - 50} more source(s)")
+    print(
+        f"[RunPilot] {verb} {len(report.deleted)} run(s) and the sources of "
+        f"{len(report.sources_dropped)}, {report.bytes_freed} bytes; "
+        f"{report.kept} run(s) kept ({report.protected} tagged or active)"
+    )
+    return 0
+
+
+def _handle_migrate_layout_command(layout: str) -> int:
+    from .storage import migrate_runs_layout
+
+    report = migrate_runs_layout(layout)
+    print(
+        f"[RunPilot] Runs layout is now {layout}: {report['moved']} moved, "
+        f"{report['unchanged']} already in place"
+    )
+    for run_id in report["active"]:
+        print(f"  still active, not moved: {run_id}")
+    for run_id in report["conflicts"]:
+        print(f"  target exists, not moved: {run_id}")
+    if report["active"]:
+        print("[RunPilot] Run the migration again once the active runs finish.")
+    return 1 if report["conflicts"] else 0
+
+
+def _handle_push_command(run_ids: list[str], push_all: bool = False) -> int:
+    from .paths import iter_run_dirs, run_dir_in
+    from .run_store import get_upload_queue, publish_run
+    from .storage import get_runs_dir
+
+    queue = get_upload_queue()
+    if queue is None:
+        print("[RunPilot] No storage backend configured (set RUNPILOT_STORAGE_URL).")
+        return 1
+
+    runs_dir = get_runs_dir()
+    if push_all:
+        run_dirs = [Path(entry.path) for entry in iter_run_dirs(runs_dir)]
+    else:
+        run_dirs = [run_dir_in(runs_dir, run_id) for run_id in run_ids]
+    for run_dir in run_dirs:
+        if not run_dir.is_dir():
+            print(f"[RunPilot] Run directory not found for id: {run_dir.name}")
+            return 1
+        publish_run(run_dir)
+
+    queued = queue.resume()
+    print(f"[RunPilot] Uploading {queued} file(s) from {len(run_dirs)} run(s) and earlier queues...")
+    queue.flush()
+    for key, error in queue.errors:
+        print(f"  failed  {key}: {error}")
+    if queue.errors:
+        print(f"[RunPilot] {len(queue.errors)} upload(s) failed.")
+        return 1
+    print(f"[RunPilot] Uploaded to {queue.backend.name} storage.")
+    return 0
+
+
+def _handle_show_command(run_id: str, json_output: bool = False, timeline: bool = False) -> None:
     try:
         meta = load_run(run_id)
     except FileNotFoundError as exc:
@@ -361,6 +1008,10 @@ def _handle_show_command(run_id: str, json_output: bool = False) -> None:
         print(f"[RunPilot] Failed to load run metadata: {exc}")
         return
 
+    if timeline:
+        _print_timeline(Path(str(meta.get("run_dir", ""))), json_output)
+        return
+
     if json_output:
         print(json.dumps(meta, indent=2, sort_keys=True, default=str))
         return
@@ -375,8 +1026,94 @@ def _handle_show_command(run_id: str, json_output: bool = False) -> None:
     print(f"Entrypoint  : {meta.get('entrypoint')}")
     print(f"Run dir     : {meta.get('run_dir')}")
 
-    log_path = Path(str(meta.get("run_dir", ""))) / "logs.txt"
+    run_dir = Path(str(meta.get("run_dir", "")))
+    log_path = find_log(run_dir) or run_dir / LOG_FILENAME
     print(f"Logs path   : {log_path}")
+    compressed = meta.get("logs_compressed")
+    if isinstance(compressed, dict):
+        print(
+            f"Logs stored : {compressed.get('codec')}, {compressed.get('bytes_after')} of "
+            f"{compressed.get('bytes_before')} bytes"
+        )
+
+    build_info = meta.get("build")
+    if isinstance(build_info, dict):
+        state = "built" if build_info.get("built") else "reused existing image"
+        print(f"Build       : {build_info.get('tag')} ({state})")
+
+    phases = meta.get("phases")
+    if isinstance(phases, dict) and phases:
+        print("Phases      : " + ", ".join(f"{k} {float(v):.1f}s" for k, v in phases.items()))
+
+    profile_info = meta.get("profile")
+    if isinstance(profile_info, dict):
+        print(f"Profile     : {profile_info.get('tool')} ({profile_info.get('flamegraph')})")
+        hotspots = profile_info.get("hotspots") or []
+        for spot in hotspots[:5]:
+            if "self_seconds" in spot:
+                detail = f"{spot['self_seconds']:.3f}s self, {spot.get('calls')} calls"
+            else:
+                detail = f"{100 * float(spot.get('share', 0)):.1f}% of samples"
+            print(f"  {detail:<28} {spot.get('function')}")
+
+    cache_info = meta.get("cache")
+    if isinstance(cache_info, dict):
+        from .run_cache import cache_stats
+
+        if cache_info.get("hit"):
+            print(f"Cache       : hit (reused run {cache_info.get('source_run')})")
+        else:
+            reasons = ", ".join(cache_info.get("invalidated_by") or []) or "unknown"
+            print(f"Cache       : miss ({reasons})")
+        print(f"Fingerprint : {str(cache_info.get('fingerprint', ''))[:16]}")
+        components = cache_info.get("components") or {}
+        for key in sorted(components):
+            print(f"  {key:<10}: {str(components[key])[:16]}")
+        stats = cache_stats()
+        total = stats["hits"] + stats["misses"]
+        rate = (100.0 * stats["hits"] / total) if total else 0.0
+        print(
+            f"Cache stats : {stats['hits']} hit(s), {stats['misses']} miss(es) "
+            f"({rate:.0f}% hit rate, {stats['entries']} cached fingerprint(s))"
+        )
+
+    package_caches = meta.get("package_caches")
+    if isinstance(package_caches, dict) and package_caches:
+        from .package_cache import cache_report
+
+        print("Package caches:")
+        for kind in sorted(package_caches):
+            entry = package_caches[kind] or {}
+            print(
+                f"  {kind:<12}: {entry.get('bytes_served', 0)} bytes served, "
+                f"{entry.get('bytes_added', 0)} bytes added ({entry.get('volume')})"
+            )
+        report = cache_report()
+        print(
+            f"  all volumes : {report['volumes']} volume(s), {report['bytes']} bytes, "
+            f"{report['bytes_served']} bytes served in total"
+        )
+
+
+def _print_timeline(run_dir: Path, json_output: bool) -> None:
+    from .storage import read_events
+
+    events = read_events(run_dir)
+    if json_output:
+        print(json.dumps(events, indent=2, sort_keys=True, default=str))
+        return
+    if not events:
+        print("[RunPilot] No event journal for this run (recorded before journals existed).")
+        return
+    for event in events:
+        fields = event["fields"]
+        if event.get("event") == "status":
+            detail = f"status -> {fields.get('status')}"
+            if fields.get("exit_code") is not None:
+                detail += f" (exit code {fields['exit_code']})"
+        else:
+            detail = ", ".join(sorted(fields)) or "-"
+        print(f"{event.get('ts')}  {event.get('event', '?'):<8}  {detail}")
 
 
 def _handle_export_command(run_id: str, output_arg: str | None) -> int:
@@ -446,7 +1183,7 @@ def _handle_login_command(
     return 0
 
 
-def _handle_sync_command(run_id: str) -> int:
+def _handle_sync_command(run_id: str, points: int | None = None) -> int:
     cfg = load_cloud_config()
     if cfg is None:
         print("[RunPilot] No cloud configuration found.")
@@ -463,9 +1200,10 @@ def _handle_sync_command(run_id: str) -> int:
         print(f"[RunPilot] Run directory not found for id: {run_id}")
         return 1
 
+    refresh_live_metrics(run_dir)
     run_json = run_dir / "run.json"
     metrics_json = run_dir / "metrics.json"
-    logs_txt = run_dir / "logs.txt"
+    logs_txt = find_log(run_dir) or run_dir / LOG_FILENAME
     outputs_dir = run_dir / "outputs"
 
     print(f"[RunPilot] Preparing to sync run {run_id} to RunPilot Cloud")
@@ -524,28 +1262,17 @@ def _handle_sync_command(run_id: str) -> int:
         return 1
 
     print(f"[RunPilot] Created remote run with id {cloud_run_id}")
+    update_run_metadata(run_dir, {"cloud_run_id": cloud_run_id})
 
     if metrics_json.exists():
-        try:
-            metrics_data = json.loads(metrics_json.read_text())
-        except Exception as exc:
-            print(f"[RunPilot] Failed to read metrics.json: {exc}")
-            metrics_data = {}
-
-        if isinstance(metrics_data, dict):
-            summary = metrics_data.get("summary", metrics_data)
-            time_series = metrics_data.get("time_series", [])
-        else:
-            summary = {}
-            time_series = []
-
-        metrics_payload: dict[str, object] = {
-            "summary": summary or {},
-            "time_series": time_series or [],
-        }
+        # Full-resolution series stay local; the cloud gets a downsampled copy.
+        payload = metrics_payload(run_dir, points)
+        if payload is None:
+            print("[RunPilot] Failed to read metrics.json.")
+            payload = {"summary": {}, "time_series": []}
 
         try:
-            upload_run_metrics(cfg, cloud_run_id, metrics_payload)
+            upload_run_metrics(cfg, cloud_run_id, payload)
             print("[RunPilot] Uploaded metrics to Cloud.")
         except Exception as exc:
             print(f"[RunPilot] Failed to upload metrics: {exc}")
@@ -700,6 +1427,10 @@ def _handle_submit_command(config_ref: str, env_file: str | None) -> int:
         "entrypoint": getattr(run_cfg, "entrypoint", None),
         "use_gpu": use_gpu_flag,
         "compute": "gpu" if use_gpu_flag else "cpu",
+        "timeout": run_cfg.timeout,
+        "max_idle": run_cfg.max_idle,
+        "budget": run_cfg.budget,
+        "cost_per_hour": run_cfg.cost_per_hour,
     }
     # ------------------------------------------
 
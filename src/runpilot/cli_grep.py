@@ -0,0 +1,83 @@
+from __future__ import annotations
+
+import re
+import sys
+from datetime import datetime
+from typing import List, Optional, Tuple
+
+from .cli_logs import parse_time_bound
+from .log_search import search_runs
+
+
+def _select_runs(
+    status: Optional[str], name: Optional[str], since: Optional[str], until: Optional[str]
+) -> List[Tuple[str, str]]:
+    """(run_id, run_dir) of matching runs from the index, newest first."""
+    from .run_index import query_runs
+
+    since_ts = parse_time_bound(since, {}) if since else None
+    until_ts = parse_time_bound(until, {}) if until else None
+    selected = []
+    for run in query_runs(status=status, name=name):
+        if since_ts is not None or until_ts is not None:
+            try:
+                created = datetime.fromisoformat(str(run.get("created_at"))).timestamp()
+            except ValueError:
+                continue
+            if (since_ts is not None and created < since_ts) or (until_ts is not None and created > until_ts):
+                continue
+        if run.get("run_dir"):
+            selected.append((str(run["id"]), str(run["run_dir"])))
+    return selected
+
+
+def grep_command(
+    pattern: str,
+    status: Optional[str] = None,
+    name: Optional[str] = None,
+    since: Optional[str] = None,
+    until: Optional[str] = None,
+    ignore_case: bool = False,
+    fixed: bool = False,
+    max_count: Optional[int] = None,
+    files_only: bool = False,
+    jobs: Optional[int] = None,
+) -> int:
+    """
+    Entry point for `runpilot grep PATTERN`.
+    Prints run_id:line:text for each matching line (or just run ids with
+    files_only, where max_count counts runs). Returns 0 if anything matched, 1 if nothing did, 2 on error.
+    """
+    try:
+        runs = _select_runs(status, name, since, until)
+    except ValueError as exc:
+        print(f"[RunPilot] {exc}")
+        return 2
+
+    found = 0
+    try:
+        results = search_runs(
+            runs,
+            pattern,
+            ignore_case=ignore_case,
+            fixed=fixed,
+            max_count=max_count,
+            jobs=jobs,
+            max_per_run=1 if files_only else None,
+        )
+        for result in results:
+            if result.error:
+                print(f"[RunPilot] {result.run_id}: {result.error}", file=sys.stderr)
+            if files_only:
+                if result.matches:
+                    print(result.run_id)
+                    found += 1
+                continue
+            for match in result.matches:
+                print(f"{match.run_id}:{match.line_number}:{match.line}")
+            found += len(result.matches)
+            sys.stdout.flush()
+    except re.error as exc:
+        print(f"[RunPilot] Invalid pattern: {exc}")
+        return 2
+    return 0 if found else 1
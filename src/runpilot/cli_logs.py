@@ -0,0 +1,328 @@
+from __future__ import annotations
+
+import codecs
+import re
+import shutil
+import sys
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Any, Dict, Optional, Tuple
+
+from .config import parse_duration
+from .log_records import RUNPILOT, STDERR, STDOUT, has_records, iter_records
+from .log_store import LOG_FILENAME, file_size, find_log, open_binary, open_text, tail_offset
+from .paths import run_dir_in
+from .run_store import fetch_run
+from .storage import TERMINAL_STATUSES, get_runs_dir, read_run_metadata
+
+_CLOCK_RE = re.compile(r"^\d{1,2}:\d{2}(:\d{2}(\.\d+)?)?$")
+# Seconds between checks for new output with --follow.
+FOLLOW_INTERVAL = 0.5
+_CHUNK_SIZE = 1024 * 1024
+# Per-record marker printed by `runpilot logs`.
+_MARKERS = {STDOUT: "out", STDERR: "err", RUNPILOT: "sys"}
+# First window fetched for a remote --tail; doubled until it holds enough lines.
+_REMOTE_TAIL_WINDOW = 64 * 1024
+
+
+def parse_time_bound(value: str, meta: Dict[str, Any], now: Optional[float] = None) -> float:
+    """
+    Turn a --since/--until value into a unix timestamp.
+
+    Accepts an ISO datetime ("2025-11-19T02:00", local time unless it has
+    an offset), a clock time ("02:00", on the day the run started), an
+    offset from the run's start ("+5m") or a duration ago ("10m").
+    """
+    value = value.strip()
+    now = time.time() if now is None else now
+    started = _run_start(meta)
+
+    if value.startswith("+"):
+        if started is None:
+            raise ValueError("run has no created_at timestamp for a relative time")
+        return started.timestamp() + (parse_duration(value[1:]) or 0.0)
+
+    if _CLOCK_RE.match(value):
+        day = started if started is not None else datetime.now().astimezone()
+        parts = value.split(":")
+        seconds = float(parts[2]) if len(parts) == 3 else 0.0
+        moment = day.replace(hour=int(parts[0]), minute=int(parts[1]), second=0, microsecond=0)
+        moment += timedelta(seconds=seconds)
+        if started is not None and moment < started - timedelta(minutes=1):
+            moment += timedelta(days=1)  # run crossed midnight
+        return moment.timestamp()
+
+    try:
+        parsed = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    except ValueError:
+        return now - (parse_duration(value) or 0.0)
+    if parsed.tzinfo is None:
+        parsed = parsed.astimezone()
+    return parsed.timestamp()
+
+
+def _run_start(meta: Dict[str, Any]) -> Optional[datetime]:
+    created = meta.get("created_at")
+    if not created:
+        return None
+    try:
+        return datetime.fromisoformat(str(created)).astimezone()
+    except ValueError:
+        return None
+
+
+def _format_ts(ts: float) -> str:
+    return datetime.fromtimestamp(ts).astimezone().isoformat(timespec="milliseconds")
+
+
+def parse_byte_range(value: str) -> Tuple[Optional[int], Optional[int]]:
+    """
+    Parse --range START:END (bytes, END exclusive). Either side may be
+    empty, and negative values count from the end of the log, as in a
+    Python slice: "-4096:" is the last 4 KiB.
+    """
+    start_text, sep, end_text = value.partition(":")
+    if not sep:
+        raise ValueError(f"Invalid range {value!r} (expected START:END, e.g. 0:4096 or -4096:)")
+    try:
+        start = int(start_text) if start_text.strip() else None
+        end = int(end_text) if end_text.strip() else None
+    except ValueError:
+        raise ValueError(f"Invalid range {value!r}: offsets must be whole numbers of bytes")
+    return start, end
+
+
+def _resolve_range(start: Optional[int], end: Optional[int], size: int) -> Tuple[int, int]:
+    return slice(start, end).indices(size)[:2]
+
+
+def _last_lines_start(data: bytes, lines: int) -> Optional[int]:
+    """Offset of the last `lines` lines in data, or None if it holds fewer."""
+    if lines <= 0:
+        return len(data)
+    pos = len(data) - 1 if data.endswith(b"\n") else len(data)
+    for _ in range(lines):
+        pos = data.rfind(b"\n", 0, pos)
+        if pos < 0:
+            return None
+    return pos + 1
+
+
+class _Writer:
+    """Write log bytes to stdout, decoding UTF-8 split across chunks."""
+
+    def __init__(self) -> None:
+        self._decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+
+    def write(self, data: bytes) -> None:
+        text = self._decoder.decode(data)
+        if text:
+            sys.stdout.write(text)
+            sys.stdout.flush()
+
+
+def _copy_range(log_path: Path, start: int, end: int, out: _Writer) -> None:
+    with open_binary(log_path) as f:
+        f.seek(start)
+        remaining = end - start
+        while remaining > 0:
+            chunk = f.read(min(_CHUNK_SIZE, remaining))
+            if not chunk:
+                return
+            out.write(chunk)
+            remaining -= len(chunk)
+
+
+def _follow(run_dir: Path, offset: int, out: _Writer) -> None:
+    """Print output appended after `offset` until the run finishes (or Ctrl-C)."""
+    log_path = run_dir / LOG_FILENAME
+    try:
+        while True:
+            # Checked before reading, so output written just before the run
+            # finished is still printed.
+            finished = read_run_metadata(run_dir).get("status") in TERMINAL_STATUSES
+            if find_log(run_dir) is not None:
+                size = file_size(log_path)
+                if size > offset:
+                    _copy_range(log_path, offset, size, out)
+                    offset = size
+            if finished:
+                return
+            time.sleep(FOLLOW_INTERVAL)
+    except KeyboardInterrupt:
+        return
+
+
+def _local_bytes(
+    run_id: str,
+    run_dir: Path,
+    tail: Optional[int],
+    follow: bool,
+    byte_range: Optional[str],
+) -> int:
+    log_path = run_dir / LOG_FILENAME
+    out = _Writer()
+    if find_log(run_dir) is None:
+        if not follow:
+            print(f"[RunPilot] No logs found for run {run_id}.")
+            return 1
+        _follow(run_dir, 0, out)
+        return 0
+
+    size = file_size(log_path)
+    if byte_range is not None:
+        start, end = _resolve_range(*parse_byte_range(byte_range), size)
+    elif tail is not None:
+        start, end = tail_offset(log_path, tail), size
+    else:
+        start, end = 0, size
+    _copy_range(log_path, start, end, out)
+    if follow:
+        _follow(run_dir, end, out)
+    return 0
+
+
+def _remote_logs(
+    run_id: str,
+    tail: Optional[int],
+    follow: bool,
+    byte_range: Optional[str],
+) -> int:
+    from .cloud_client import fetch_run_logs, get_remote_run
+    from .cloud_config import load_cloud_config
+
+    cfg = load_cloud_config()
+    if cfg is None or not cfg.token:
+        print("[RunPilot] No cloud credentials found.")
+        print("[RunPilot] Run `runpilot login` first to configure RunPilot Cloud.")
+        return 1
+
+    # Local runs remember the cloud run they were executed or synced as.
+    local_dir = run_dir_in(get_runs_dir(), run_id)
+    cloud_id = str(read_run_metadata(local_dir).get("cloud_run_id") or run_id)
+    out = _Writer()
+
+    try:
+        if byte_range is not None:
+            start, end = parse_byte_range(byte_range)
+            if start is not None and start < 0 and end is None:
+                data, total = fetch_run_logs(cfg, cloud_id, end=-start)
+            elif (start or 0) >= 0 and (end is None or end >= 0):
+                data, total = fetch_run_logs(cfg, cloud_id, start=start or 0, end=end)
+            else:
+                # Offsets relative to the end need the size first.
+                _, total = fetch_run_logs(cfg, cloud_id, start=0, end=1)
+                first, last = _resolve_range(start, end, total or 0)
+                data, total = fetch_run_logs(cfg, cloud_id, start=first, end=last) if last > first else (b"", total)
+            out.write(data)
+            offset = (total or 0) if end is None else None
+        elif tail is not None:
+            window = _REMOTE_TAIL_WINDOW
+            while True:
+                data, total = fetch_run_logs(cfg, cloud_id, end=window)
+                start = _last_lines_start(data, tail)
+                if start is not None or total is None or len(data) >= total:
+                    break
+                window *= 2
+            out.write(data[start or 0 :])
+            offset = total
+        else:
+            data, total = fetch_run_logs(cfg, cloud_id, start=0)
+            out.write(data)
+            offset = total if total is not None else len(data)
+
+        if follow:
+            if offset is None:
+                _, offset = fetch_run_logs(cfg, cloud_id, start=0, end=1)
+            offset = offset or 0
+            try:
+                while True:
+                    # Checked before reading, as for local runs, so the
+                    # last output is printed before stopping.
+                    finished = get_remote_run(cfg, cloud_id).get("status") in TERMINAL_STATUSES
+                    data, _ = fetch_run_logs(cfg, cloud_id, start=offset)
+                    if data:
+                        out.write(data)
+                        offset += len(data)
+                    elif finished:
+                        break
+                    else:
+                        time.sleep(FOLLOW_INTERVAL)
+            except KeyboardInterrupt:
+                pass
+    except Exception as exc:
+        print(f"[RunPilot] Failed to fetch logs from Cloud: {exc}")
+        return 1
+    return 0
+
+
+def logs_command(
+    run_id: str,
+    since: Optional[str] = None,
+    until: Optional[str] = None,
+    stream: Optional[str] = None,
+    tail: Optional[int] = None,
+    follow: bool = False,
+    byte_range: Optional[str] = None,
+    remote: bool = False,
+) -> int:
+    """
+    Entry point for `runpilot logs <run-id>`.
+    Returns 0 on success, non zero on error.
+
+    --since/--until/--stream filter the timestamped records; --tail,
+    --follow and --range work on the merged logs.txt bytes, locally or
+    (with --remote) through HTTP Range requests to the Cloud.
+    """
+    byte_mode = tail is not None or follow or byte_range is not None
+    if (byte_mode or remote) and (since or until or stream):
+        print("[RunPilot] --since/--until/--stream cannot be combined with --tail, --follow, --range or --remote.")
+        return 1
+    if tail is not None and byte_range is not None:
+        print("[RunPilot] Use either --tail or --range, not both.")
+        return 1
+    try:
+        if byte_range is not None:
+            parse_byte_range(byte_range)
+    except ValueError as exc:
+        print(f"[RunPilot] {exc}")
+        return 1
+
+    if remote:
+        return _remote_logs(run_id, tail, follow, byte_range)
+
+    run_dir = run_dir_in(get_runs_dir(), run_id)
+    if not run_dir.is_dir():
+        run_dir = fetch_run(run_id) or run_dir
+    if not run_dir.is_dir():
+        print(f"[RunPilot] Run directory not found for id: {run_id}")
+        return 1
+
+    if byte_mode:
+        return _local_bytes(run_id, run_dir, tail, follow, byte_range)
+
+    if not has_records(run_dir):
+        if since or until or stream:
+            print(f"[RunPilot] Run {run_id} has no timestamped log records; time filters need them.")
+            return 1
+        if find_log(run_dir) is None:
+            print(f"[RunPilot] No logs found for run {run_id}.")
+            return 1
+        with open_text(run_dir / LOG_FILENAME, errors="replace") as f:
+            shutil.copyfileobj(f, sys.stdout)
+        return 0
+
+    meta = read_run_metadata(run_dir)
+    try:
+        since_ts = parse_time_bound(since, meta) if since else None
+        until_ts = parse_time_bound(until, meta) if until else None
+    except ValueError as exc:
+        print(f"[RunPilot] {exc}")
+        return 1
+
+    streams = {"stdout": {STDOUT}, "stderr": {STDERR}}.get(stream or "")
+    for record in iter_records(Path(run_dir), since=since_ts, until=until_ts, streams=streams):
+        marker = _MARKERS.get(record.stream, "out")
+        print(f"{_format_ts(record.timestamp)} {marker} {record.text}")
+    return 0
@@ -1,9 +1,13 @@
 from __future__ import annotations
 
-from typing import Any, Dict
+from typing import Any, Dict, List, Optional, Tuple
 
-from .metrics import read_metrics
+from .metrics import downsample_series, load_metric_series, read_metrics, refresh_live_metrics
 from .paths import get_run_dir
+from .run_store import fetch_run
+
+# Points printed per series unless --points asks for more (0 = all).
+DISPLAY_POINTS = 1000
 
 
 def print_summary_table(summary: Dict[str, Any]) -> None:
@@ -18,21 +22,85 @@ def print_summary_table(summary: Dict[str, Any]) -> None:
         print(f"  {key.ljust(key_width)}  {value}")
 
 
-def metrics_command(run_id: str, json_output: bool = False) -> int:
+def print_series_table(series_info: Dict[str, Any]) -> None:
+    metrics = series_info.get("metrics") or {}
+    if not metrics:
+        return
+    key_width = max(len(k) for k in metrics.keys())
+    print(f"Series ({series_info.get('file')}):")
+    for name, info in metrics.items():
+        print(
+            f"  {name.ljust(key_width)}  {info.get('points')} points, "
+            f"steps {info.get('first_step')}..{info.get('last_step')}"
+        )
+
+
+def parse_step_range(value: str) -> Tuple[Optional[int], Optional[int]]:
+    """Parse "START:STOP" (either side optional, STOP exclusive) into ints."""
+    start, sep, stop = value.partition(":")
+    if not sep:
+        raise ValueError(f"Invalid step range {value!r} (expected START:STOP)")
+    try:
+        return (int(start) if start.strip() else None, int(stop) if stop.strip() else None)
+    except ValueError:
+        raise ValueError(f"Invalid step range {value!r} (expected START:STOP)") from None
+
+
+def metrics_command(
+    run_id: str,
+    json_output: bool = False,
+    series: Optional[List[str]] = None,
+    steps: Optional[str] = None,
+    points: int = DISPLAY_POINTS,
+    method: str = "lttb",
+) -> int:
     """
     Entry point for `runpilot metrics <run-id>`.
+    With series (metric names) or steps, prints the stored points instead of
+    the summary, downsampled to points per series (0 prints all of them).
     Returns 0 on success, non zero on error.
     """
     run_dir = get_run_dir(run_id)
+    if not run_dir.exists():
+        run_dir = fetch_run(run_id) or run_dir
     if not run_dir.exists():
         print(f"Run directory not found for id: {run_id}")
         return 1
 
+    # Live runs: parse only the log lines written since the last refresh.
+    refresh_live_metrics(run_dir)
     data = read_metrics(run_dir)
     if data is None:
         print(f"No metrics.json found for run {run_id}.")
         return 1
 
+    if series or steps:
+        try:
+            start, stop = parse_step_range(steps) if steps else (None, None)
+        except ValueError as exc:
+            print(f"[RunPilot] {exc}")
+            return 1
+        loaded = load_metric_series(run_dir, series or None, start, stop)
+        missing = [name for name in series or [] if name not in loaded]
+        if missing:
+            print(f"[RunPilot] No series recorded for: {', '.join(missing)}")
+            return 1
+        try:
+            shown = {name: downsample_series(s, points, method) for name, s in loaded.items()}
+        except ValueError as exc:
+            print(f"[RunPilot] {exc}")
+            return 1
+        if json_output:
+            import json as _json
+            print(_json.dumps({name: s.points() for name, s in shown.items()}, indent=2, sort_keys=True))
+            return 0
+        for name, s in shown.items():
+            total = len(loaded[name])
+            print(f"{name}:" if len(s) == total else f"{name} ({len(s)} of {total} points, {method}):")
+            for step, value in zip(s.steps, s.values):
+                print(f"  {int(step)}  {float(value)}")
+        return 0
+
     if json_output:
         import json as _json
         print(_json.dumps(data, indent=2, sort_keys=True))
@@ -40,4 +108,5 @@ def metrics_command(run_id: str, json_output: bool = False) -> int:
 
     summary = data.get("summary") or {}
     print_summary_table(summary)
-    return 0
\ No newline at end of file
+    print_series_table(data.get("series") or {})
+    return 0
@@ -0,0 +1,65 @@
+from __future__ import annotations
+
+import csv
+import json
+import sys
+from typing import Any, Dict, List
+
+from .query import QueryError, field_value, run_query
+
+BASE_COLUMNS = ["id", "status", "name", "created_at"]
+
+
+def _columns(fields: List[str]) -> List[str]:
+    columns = list(BASE_COLUMNS)
+    for name in fields:
+        if name not in columns:
+            columns.append(name)
+    return columns
+
+
+def _cell(value: Any) -> str:
+    if value is None:
+        return ""
+    if isinstance(value, float):
+        return f"{value:.6g}"
+    return str(value)
+
+
+def query_command(expr: str, output: str = "table") -> int:
+    """
+    Entry point for `runpilot query '<expr>'`.
+    Returns 0 on success, non zero on error.
+    """
+    try:
+        runs, query = run_query(expr)
+    except QueryError as exc:
+        print(f"[RunPilot] Invalid query: {exc}")
+        return 1
+
+    if output == "json":
+        print(json.dumps(runs, indent=2, sort_keys=True, default=str))
+        return 0
+
+    columns = _columns(query.fields)
+    rows: List[Dict[str, str]] = [
+        {col: _cell(field_value(run, col)) for col in columns} for run in runs
+    ]
+
+    if output == "csv":
+        writer = csv.DictWriter(sys.stdout, fieldnames=columns, lineterminator="\n")
+        writer.writeheader()
+        writer.writerows(rows)
+        return 0
+
+    if not rows:
+        print("[RunPilot] No runs match.")
+        return 0
+
+    widths = {col: max(len(col), *(len(row[col]) for row in rows)) for col in columns}
+    header = " ".join(col.upper().ljust(widths[col]) for col in columns)
+    print(header)
+    print("-" * len(header))
+    for row in rows:
+        print(" ".join(row[col][: widths[col]].ljust(widths[col]) for col in columns))
+    return 0
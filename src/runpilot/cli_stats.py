@@ -0,0 +1,131 @@
+from __future__ import annotations
+
+import json
+from datetime import datetime, timezone
+from typing import List, Optional
+
+from .cli_logs import parse_time_bound
+from .stats import PHASES, compute_stats, load_samples
+
+
+def _fmt_seconds(value: Optional[float]) -> str:
+    if value is None:
+        return "-"
+    if value < 60:
+        return f"{value:.1f}s"
+    minutes, seconds = divmod(int(round(value)), 60)
+    if minutes < 60:
+        return f"{minutes}m{seconds:02d}s"
+    hours, minutes = divmod(minutes, 60)
+    return f"{hours}h{minutes:02d}m"
+
+
+def _print_table(header: List[str], rows: List[List[str]]) -> None:
+    widths = [max(len(col), *(len(row[i]) for row in rows)) for i, col in enumerate(header)]
+    line = " ".join(col.ljust(widths[i]) for i, col in enumerate(header))
+    print(line)
+    print("-" * len(line))
+    for row in rows:
+        print(" ".join(cell.ljust(widths[i]) for i, cell in enumerate(row)))
+
+
+def _refresh_remote() -> Optional[int]:
+    from .cloud_client import list_remote_runs
+    from .cloud_config import load_cloud_config
+    from .run_index import mirror_remote_runs
+
+    cfg = load_cloud_config()
+    if cfg is None or not cfg.token:
+        print("[RunPilot] No cloud credentials found; run `runpilot login` to include cloud runs.")
+        return None
+    try:
+        return mirror_remote_runs(list_remote_runs(cfg))
+    except Exception as exc:
+        print(f"[RunPilot] Failed to list remote runs: {exc}")
+        return None
+
+
+def stats_command(
+    group_by: Optional[str] = None,
+    bucket: Optional[str] = None,
+    since: Optional[str] = None,
+    until: Optional[str] = None,
+    name: Optional[str] = None,
+    image: Optional[str] = None,
+    local_only: bool = False,
+    refresh: bool = False,
+    json_output: bool = False,
+) -> int:
+    """
+    Entry point for `runpilot stats`.
+    Returns 0 on success, non zero on error.
+    """
+    fields = [f.strip() for f in group_by.split(",") if f.strip()] if group_by else []
+    try:
+        since_dt = datetime.fromtimestamp(parse_time_bound(since, {}), tz=timezone.utc) if since else None
+        until_dt = datetime.fromtimestamp(parse_time_bound(until, {}), tz=timezone.utc) if until else None
+    except ValueError as exc:
+        print(f"[RunPilot] {exc}")
+        return 1
+
+    if refresh and not local_only:
+        mirrored = _refresh_remote()
+        if mirrored is not None and not json_output:
+            print(f"[RunPilot] Mirrored {mirrored} cloud run(s).")
+
+    samples = load_samples(since_dt, until_dt, name=name, image=image, include_remote=not local_only)
+    try:
+        columns, groups = compute_stats(samples, fields, bucket)
+    except ValueError as exc:
+        print(f"[RunPilot] {exc}")
+        return 1
+
+    if json_output:
+        print(json.dumps([g.to_dict(columns) for g in groups], indent=2, sort_keys=True))
+        return 0
+    if not groups:
+        print("[RunPilot] No runs match.")
+        return 0
+
+    key_header = [c.upper() for c in columns] or ["ALL"]
+    rows = []
+    for group in groups:
+        summary = group.to_dict(columns)
+        durations, waits = summary["duration"], summary["queue_wait"]
+        rate = group.failure_rate
+        rows.append(
+            (list(group.key) or ["all runs"])
+            + [
+                str(group.runs),
+                str(group.failed),
+                "-" if rate is None else f"{rate:.1%}",
+                _fmt_seconds(durations["p50"]),
+                _fmt_seconds(durations["p90"]),
+                _fmt_seconds(durations["p99"]),
+                _fmt_seconds(durations["max"]),
+                _fmt_seconds(waits["p50"]),
+                _fmt_seconds(waits["p90"]),
+            ]
+        )
+    _print_table(
+        key_header + ["RUNS", "FAILED", "FAIL%", "P50", "P90", "P99", "MAX", "WAIT_P50", "WAIT_P90"],
+        rows,
+    )
+
+    phased = [g for g in groups if g.phases]
+    if phased:
+        names = [p for p in PHASES if any(p in g.phases for g in phased)]
+        names += sorted({p for g in phased for p in g.phases} - set(names))
+        print()
+        phase_rows = []
+        for group in phased:
+            total = sum(group.phases.values()) or 1.0
+            phase_rows.append(
+                (list(group.key) or ["all runs"])
+                + [
+                    f"{_fmt_seconds(group.phases.get(p, 0.0))} ({group.phases.get(p, 0.0) / total:.0%})"
+                    for p in names
+                ]
+            )
+        _print_table(key_header + [p.upper() for p in names], phase_rows)
+    return 0
@@ -4,15 +4,19 @@ import tarfile
 import io
 import secrets
 import pathlib
-from typing import Optional, Dict, Any, List, Union
+from typing import Optional, Dict, Any, List, Tuple, Union
 
 from rich.console import Console
 from .cloud_config import CloudConfig, save_cloud_config
+from .log_store import open_binary
 
 console = Console()
 
 PathLike = Union[str, pathlib.Path]
 
+# Seconds to wait for the Cloud when reading logs or run status.
+READ_TIMEOUT = 60
+
 
 # --- Internal Helpers ---
 
@@ -94,6 +98,14 @@ def list_projects(cfg: CloudConfig) -> List[Dict[str, Any]]:
 # --- Runs ---
 
 
+def get_remote_run(cfg: CloudConfig, cloud_run_id: str) -> Dict[str, Any]:
+    """Fetch one run (status and the other fields of list_remote_runs)."""
+    url = f"{cfg.api_base_url}/v1/runs/{cloud_run_id}"
+    resp = requests.get(url, headers=_get_headers(cfg.token), timeout=READ_TIMEOUT)
+    resp.raise_for_status()
+    return resp.json()
+
+
 def create_remote_run(cfg: CloudConfig, payload: Dict[str, Any]) -> str:
     url = f"{cfg.api_base_url}/v1/runs"
     try:
@@ -223,10 +235,12 @@ def update_remote_run_status(cfg: CloudConfig, cloud_run_id: str, status: str):
 def upload_run_logs(cfg: CloudConfig, cloud_run_id: str, log_path: str):
     """
     Upload logs.txt to the Cloud using PUT /v1/runs/{id}/logs (raw body).
+
+    Compacted logs are decompressed on the way; the Cloud always gets text.
     """
     url = f"{cfg.api_base_url}/v1/runs/{cloud_run_id}/logs"
     try:
-        with open(log_path, "rb") as f:
+        with open_binary(pathlib.Path(log_path)) as f:
             data = f.read()
         resp = requests.put(
             url,
@@ -238,6 +252,43 @@ def upload_run_logs(cfg: CloudConfig, cloud_run_id: str, log_path: str):
     except Exception as e:
         console.print(f"[red]Log upload failed:[/red] {e}")
 
+def fetch_run_logs(
+    cfg: CloudConfig,
+    cloud_run_id: str,
+    start: Optional[int] = None,
+    end: Optional[int] = None,
+) -> Tuple[bytes, Optional[int]]:
+    """
+    Fetch part of a run's logs with GET /v1/runs/{id}/logs and an HTTP Range.
+
+    start/end are byte offsets, end exclusive; start=None with end=n asks
+    for the last n bytes. Returns (bytes, total log size if known). A range
+    past the end of the log gives b"".
+    """
+    url = f"{cfg.api_base_url}/v1/runs/{cloud_run_id}/logs"
+    headers = {"Authorization": f"Bearer {cfg.token}"}
+    if start is None and end is not None:
+        headers["Range"] = f"bytes=-{end}"
+    elif start is not None:
+        headers["Range"] = f"bytes={start}-" + ("" if end is None else str(end - 1))
+
+    resp = requests.get(url, headers=headers, timeout=READ_TIMEOUT)
+    if resp.status_code == 416:
+        total = resp.headers.get("Content-Range", "").rpartition("/")[2]
+        return b"", int(total) if total.isdigit() else None
+    resp.raise_for_status()
+
+    body = resp.content
+    if resp.status_code == 206:
+        total = resp.headers.get("Content-Range", "").rpartition("/")[2]
+        return body, int(total) if total.isdigit() else None
+    # The server ignored the Range header and sent everything.
+    total_size = len(body)
+    if start is None and end is not None:
+        return body[-end:] if end else b"", total_size
+    return body[start or 0 : end], total_size
+
+
 def upload_run_metrics_file(cfg: CloudConfig, cloud_run_id: str, metrics_path: PathLike):
     """Upload metrics.json file to the Cloud using PUT /metrics."""
     url = f"{cfg.api_base_url}/v1/runs/{cloud_run_id}/metrics"
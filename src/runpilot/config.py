@@ -2,11 +2,22 @@ from __future__ import annotations
 
 from dataclasses import dataclass, field
 from pathlib import Path
-from typing import Any, Dict, Optional
+import re
+from typing import Any, Dict, List, Optional
 
 import yaml
 
 
+@dataclass
+class BuildConfig:
+    """Dockerfile build the runner performs before executing a job."""
+
+    context: str = "."
+    dockerfile: str = "Dockerfile"
+    args: Dict[str, str] = field(default_factory=dict)
+    target: Optional[str] = None
+
+
 @dataclass
 class RunConfig:
     """Minimal representation of a RunPilot config."""
@@ -18,6 +29,88 @@ class RunConfig:
     # --- NEW FIELD ---
     use_gpu: bool = False
     # -----------------
+    # Extra docker bind mounts ("host:container[:ro]"), e.g. set by pipelines
+    # so a step can see its own run dir and the outputs of its dependencies.
+    mounts: List[str] = field(default_factory=list)
+    # Limits enforced by the runner (seconds). budget is a spend ceiling in
+    # the same currency as cost_per_hour.
+    timeout: Optional[float] = None
+    max_idle: Optional[float] = None
+    budget: Optional[float] = None
+    cost_per_hour: Optional[float] = None
+    # Number of CPUs to pin the job to (disjoint from other pinned runs).
+    cpus: Optional[int] = None
+    # Modules preloaded by a warm forkserver for image-less Python jobs.
+    preload: List[str] = field(default_factory=list)
+    # Declared input datasets: name -> local path, file:// or http(s) URL.
+    inputs: Dict[str, str] = field(default_factory=dict)
+    # Persistent package cache volumes for docker runs ("pip", "huggingface",
+    # "torch"), shared by every run of the same image.
+    caches: List[str] = field(default_factory=list)
+    # Build the image from a Dockerfile instead of using a prebuilt `image`.
+    build: Optional[BuildConfig] = None
+    # Profile Python entrypoints: "auto", "cprofile" or "py-spy".
+    profile: Optional[str] = None
+    # Free-form labels and hyperparameters, recorded in run.json for queries.
+    tags: List[str] = field(default_factory=list)
+    params: Dict[str, Any] = field(default_factory=dict)
+
+
+_DURATION_RE = re.compile(r"(\d+(?:\.\d+)?)\s*([smhd])")
+_DURATION_UNITS = {"s": 1, "m": 60, "h": 3600, "d": 86400}
+
+
+def parse_duration(value: Any) -> Optional[float]:
+    """
+    Parse a duration such as 90, "90s", "30m", "2h" or "1h30m" into seconds.
+
+    Plain numbers are seconds. Returns None for None or empty values.
+    """
+    if value is None or value == "":
+        return None
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return float(value)
+
+    text = str(value).strip().lower()
+    try:
+        return float(text)
+    except ValueError:
+        pass
+
+    parts = _DURATION_RE.findall(text)
+    if not parts or _DURATION_RE.sub("", text).strip():
+        raise ValueError(f"Invalid duration: {value!r} (expected e.g. 90s, 30m, 2h)")
+    return float(sum(float(n) * _DURATION_UNITS[unit] for n, unit in parts))
+
+
+_SIZE_RE = re.compile(r"^(\d+(?:\.\d+)?)\s*([kmgt]?)i?b?$")
+_SIZE_UNITS = {"": 1, "k": 1024, "m": 1024**2, "g": 1024**3, "t": 1024**4}
+
+
+def parse_size(value: Any) -> Optional[int]:
+    """
+    Parse a size such as 1048576, "500M", "50G" or "1.5TiB" into bytes.
+
+    Units are binary (K = 1024). Returns None for None or empty values.
+    """
+    if value is None or value == "":
+        return None
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return int(value)
+    match = _SIZE_RE.match(str(value).strip().lower())
+    if match is None:
+        raise ValueError(f"Invalid size: {value!r} (expected e.g. 500M, 50G)")
+    return int(float(match.group(1)) * _SIZE_UNITS[match.group(2)])
+
+
+def _optional_float(data: Dict[str, Any], key: str) -> Optional[float]:
+    value = data.get(key)
+    if value is None:
+        return None
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        raise ValueError(f"Config key '{key}' must be a number, got {value!r}")
 
 
 def load_config(path: str | Path) -> RunConfig:
@@ -35,7 +128,8 @@ def load_config(path: str | Path) -> RunConfig:
     if not isinstance(data, dict):
         raise ValueError(f"Config file {path} must contain a YAML mapping at the top level.")
 
-    required_keys = ("name", "image", "entrypoint")
+    # A config with a build section gets its image from the build.
+    required_keys = ("name", "entrypoint") if data.get("build") else ("name", "image", "entrypoint")
     missing = [key for key in required_keys if key not in data]
 
     if missing:
@@ -44,13 +138,85 @@ def load_config(path: str | Path) -> RunConfig:
 
     return RunConfig(
         name=str(data["name"]),
-        image=str(data["image"]),
+        image=str(data.get("image") or ""),
         entrypoint=str(data["entrypoint"]),
         # --- READ GPU FLAG ---
-        use_gpu=bool(data.get("gpu", False))
+        use_gpu=bool(data.get("gpu", False)),
         # ---------------------
+        timeout=parse_duration(data.get("timeout")),
+        max_idle=parse_duration(data.get("max_idle")),
+        budget=_optional_float(data, "budget"),
+        cost_per_hour=_optional_float(data, "cost_per_hour"),
+        cpus=int(data["cpus"]) if data.get("cpus") else None,
+        preload=[str(m) for m in data.get("preload") or []],
+        inputs=_load_inputs(path, data.get("inputs")),
+        caches=_load_caches(path, data.get("caches")),
+        build=parse_build(data.get("build"), source=str(path)),
+        profile=_load_profile(data.get("profile")),
+        tags=[str(tag) for tag in data.get("tags") or []],
+        params=_load_params(path, data.get("params")),
     )
 
+def _load_inputs(path: Path, raw: Any) -> Dict[str, str]:
+    if raw is None:
+        return {}
+    if not isinstance(raw, dict):
+        raise ValueError(f"Config file {path}: 'inputs' must map names to sources")
+    return {str(name): str(source) for name, source in raw.items()}
+
+
+def _load_caches(path: Path, raw: Any) -> List[str]:
+    # `caches: true` enables every kind; a list picks some.
+    if raw is None or raw is False:
+        return []
+    if raw is True:
+        return ["pip", "huggingface", "torch"]
+    if isinstance(raw, str):
+        raw = [raw]
+    if not isinstance(raw, list):
+        raise ValueError(f"Config file {path}: 'caches' must be true or a list of cache kinds")
+    return [str(kind) for kind in raw]
+
+
+def _load_params(path: Path, raw: Any) -> Dict[str, Any]:
+    if raw is None:
+        return {}
+    if not isinstance(raw, dict):
+        raise ValueError(f"Config file {path}: 'params' must be a mapping")
+    return {str(key): value for key, value in raw.items()}
+
+
+def _load_profile(raw: Any) -> Optional[str]:
+    # `profile: true` picks the best available profiler.
+    if raw is None or raw is False:
+        return None
+    if raw is True:
+        return "auto"
+    return str(raw).lower()
+
+
+def parse_build(raw: Any, source: str = "config") -> Optional[BuildConfig]:
+    """
+    Parse a `build:` section: a context path, or a mapping with context,
+    dockerfile, args and target.
+    """
+    if not raw:
+        return None
+    if isinstance(raw, str):
+        return BuildConfig(context=raw)
+    if not isinstance(raw, dict):
+        raise ValueError(f"{source}: 'build' must be a context path or a mapping")
+    args = raw.get("args") or {}
+    if not isinstance(args, dict):
+        raise ValueError(f"{source}: 'build.args' must be a mapping")
+    return BuildConfig(
+        context=str(raw.get("context") or "."),
+        dockerfile=str(raw.get("dockerfile") or "Dockerfile"),
+        args={str(k): str(v) for k, v in args.items()},
+        target=str(raw["target"]) if raw.get("target") else None,
+    )
+
+
 def resolve_config_path(ref: str, cwd: Optional[Path] = None) -> Path:
     """
     Resolve a config reference to a concrete file path.
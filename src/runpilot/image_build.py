@@ -0,0 +1,203 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import re
+import subprocess
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Callable, List, Optional, Tuple
+
+from .config import BuildConfig
+
+TAG_REPOSITORY = "runpilot"
+
+
+@dataclass
+class BuildResult:
+    tag: str
+    built: bool  # False when a matching image already existed
+    seconds: float
+
+
+def _resolve(build: BuildConfig, base_dir: Path) -> tuple[Path, Path]:
+    context = Path(build.context).expanduser()
+    if not context.is_absolute():
+        context = base_dir / context
+    dockerfile = Path(build.dockerfile).expanduser()
+    if not dockerfile.is_absolute():
+        dockerfile = context / dockerfile
+    return context.resolve(), dockerfile.resolve()
+
+
+def _pattern_regex(pattern: str) -> str:
+    # Docker's matching: * and ? stay within one path element, ** spans any
+    # number of them, and a pattern matching a directory covers its contents.
+    out = []
+    i = 0
+    while i < len(pattern):
+        c = pattern[i]
+        if pattern.startswith("**", i):
+            i += 2
+            if pattern.startswith("/", i):
+                i += 1
+                out.append("(?:.*/)?")
+            else:
+                out.append(".*")
+            continue
+        if c == "*":
+            out.append("[^/]*")
+        elif c == "?":
+            out.append("[^/]")
+        elif c == "[":
+            end = pattern.find("]", i + 1)
+            if end < 0:
+                out.append(re.escape(c))
+            else:
+                body = pattern[i + 1 : end]
+                out.append("[" + ("^" + body[1:] if body.startswith("^") else body) + "]")
+                i = end
+        elif c == "\\" and i + 1 < len(pattern):
+            i += 1
+            out.append(re.escape(pattern[i]))
+        else:
+            out.append(re.escape(c))
+        i += 1
+    return "".join(out) + "(?:/.*)?"
+
+
+def dockerignore_filter(context: Path, dockerfile: Optional[Path] = None) -> Optional[Callable[[str, bool], bool]]:
+    """
+    Exclusion test (for run_cache.hash_tree) built from the .dockerignore
+    docker would apply to this build, or None if there is none.
+
+    Like BuildKit, <Dockerfile>.dockerignore next to the Dockerfile wins
+    over the context's .dockerignore. Later patterns override earlier ones
+    and "!" re-includes.
+    """
+    candidates = [context / ".dockerignore"]
+    if dockerfile is not None:
+        candidates.insert(0, dockerfile.with_name(dockerfile.name + ".dockerignore"))
+    for path in candidates:
+        try:
+            text = path.read_text(encoding="utf-8")
+            break
+        except OSError:
+            continue
+    else:
+        return None
+
+    rules: List[Tuple[bool, "re.Pattern[str]"]] = []
+    for line in text.splitlines():
+        line = line.strip()
+        if not line or line.startswith("#"):
+            continue
+        include = line.startswith("!")
+        pattern = os.path.normpath(line[1:].strip() if include else line).replace(os.sep, "/").lstrip("/")
+        if pattern in ("", "."):
+            continue
+        try:
+            rules.append((include, re.compile(_pattern_regex(pattern))))
+        except re.error:
+            continue
+    if not rules:
+        return None
+    has_exceptions = any(include for include, _ in rules)
+
+    def excluded(rel_path: str, is_dir: bool) -> bool:
+        result = False
+        for include, regex in rules:
+            if regex.fullmatch(rel_path):
+                result = not include
+        # With "!" rules a file below an excluded directory may still be
+        # sent, so such directories are walked and their files tested.
+        return result and not (is_dir and has_exceptions)
+
+    return excluded
+
+
+def image_tag(name: str, build: BuildConfig, base_dir: Path) -> str:
+    """
+    Content-addressed tag for a build: runpilot/<name>:<hash>.
+
+    The hash covers the Dockerfile, the context tree (minus what
+    .dockerignore leaves out of it), build args and target, so an unchanged
+    build maps to an existing tag and is skipped.
+    """
+    from .run_cache import hash_tree
+
+    context, dockerfile = _resolve(build, base_dir)
+    if not dockerfile.is_file():
+        raise FileNotFoundError(f"Dockerfile not found: {dockerfile}")
+    if not context.is_dir():
+        raise FileNotFoundError(f"Build context not found: {context}")
+
+    spec = {
+        "dockerfile": hashlib.sha256(dockerfile.read_bytes()).hexdigest(),
+        "context": hash_tree(context, dockerignore_filter(context, dockerfile)),
+        "args": build.args,
+        "target": build.target,
+    }
+    digest = hashlib.sha256(json.dumps(spec, sort_keys=True).encode("utf-8")).hexdigest()
+    return f"{image_repository(name)}:{digest[:16]}"
+
+
+def image_repository(name: str) -> str:
+    """Repository the images built for a config are tagged in: runpilot/<name>."""
+    # Docker repository names must be lowercase [a-z0-9._-].
+    safe = "".join(c if c.isalnum() or c in "._-" else "-" for c in name.lower())
+    return f"{TAG_REPOSITORY}/{safe.strip('-._') or 'run'}"
+
+
+def image_exists(tag: str) -> bool:
+    try:
+        result = subprocess.run(["docker", "image", "inspect", tag], capture_output=True)
+    except OSError:
+        return False
+    return result.returncode == 0
+
+
+def build_image(name: str, build: BuildConfig, base_dir: Path, log_path: Path) -> BuildResult:
+    """
+    Build the image for a config unless a matching tag already exists.
+
+    Builds run with BuildKit so `RUN --mount=type=cache` directories persist
+    between builds, and reuse layers from the previous build of the same
+    config (tagged :latest) via inline cache metadata.
+    """
+    started = time.monotonic()
+    tag = image_tag(name, build, base_dir)
+    if image_exists(tag):
+        return BuildResult(tag, False, time.monotonic() - started)
+
+    context, dockerfile = _resolve(build, base_dir)
+    latest = f"{image_repository(name)}:latest"
+    cmd: List[str] = [
+        "docker",
+        "build",
+        "-f",
+        str(dockerfile),
+        "-t",
+        tag,
+        "-t",
+        latest,
+        "--build-arg",
+        "BUILDKIT_INLINE_CACHE=1",
+        "--cache-from",
+        latest,
+    ]
+    for key, value in build.args.items():
+        cmd.extend(["--build-arg", f"{key}={value}"])
+    if build.target:
+        cmd.extend(["--target", build.target])
+    cmd.append(str(context))
+
+    env = dict(os.environ)
+    env["DOCKER_BUILDKIT"] = "1"
+    with log_path.open("w", encoding="utf-8") as f:
+        result = subprocess.run(cmd, stdout=f, stderr=subprocess.STDOUT, text=True, env=env)
+    if result.returncode != 0:
+        raise RuntimeError(f"docker build failed with code {result.returncode} (see {log_path})")
+    return BuildResult(tag, True, time.monotonic() - started)
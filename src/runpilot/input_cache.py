@@ -0,0 +1,274 @@
+from __future__ import annotations
+
+import fcntl
+import hashlib
+import json
+import os
+import shutil
+import stat
+import tempfile
+from contextlib import ExitStack, contextmanager
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Dict, Iterator, Optional
+from urllib.parse import unquote, urlparse
+
+import requests
+
+from .storage import get_root_dir
+
+INPUT_CACHE_DIR_NAME = "inputs"
+REFS_FILENAME = "refs.json"
+DEFAULT_MAX_BYTES = 100 * 1024**3
+_CHUNK = 1024 * 1024
+
+
+@dataclass
+class CachedInput:
+    name: str
+    source: str
+    digest: str
+    path: Path
+    size: int
+    fetched: bool  # False on a cache hit
+
+
+def get_input_cache_dir() -> Path:
+    cache_dir = get_root_dir() / INPUT_CACHE_DIR_NAME
+    for sub in ("objects", "locks", "tmp"):
+        (cache_dir / sub).mkdir(parents=True, exist_ok=True)
+    return cache_dir
+
+
+def max_cache_bytes() -> int:
+    """Size budget for the input cache, from RUNPILOT_INPUT_CACHE_MAX_BYTES."""
+    value = os.environ.get("RUNPILOT_INPUT_CACHE_MAX_BYTES")
+    try:
+        return int(value) if value else DEFAULT_MAX_BYTES
+    except ValueError:
+        return DEFAULT_MAX_BYTES
+
+
+@contextmanager
+def _flock(path: Path, mode: int = fcntl.LOCK_EX) -> Iterator[Any]:
+    with path.open("a") as f:
+        fcntl.flock(f, mode)
+        yield f
+
+
+@contextmanager
+def _locked_refs() -> Iterator[Dict[str, Any]]:
+    cache_dir = get_input_cache_dir()
+    path = cache_dir / REFS_FILENAME
+    with _flock(cache_dir / "locks" / "refs.lock"):
+        try:
+            refs: Dict[str, Any] = json.loads(path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            refs = {}
+        yield refs
+        tmp_path = path.with_suffix(".tmp")
+        tmp_path.write_text(json.dumps(refs, indent=2, sort_keys=True), encoding="utf-8")
+        os.replace(tmp_path, path)
+
+
+def local_source_path(source: str, base_dir: Path) -> Optional[Path]:
+    parsed = urlparse(source)
+    if parsed.scheme == "file":
+        return Path(unquote(parsed.path))
+    if parsed.scheme in ("http", "https"):
+        return None
+    path = Path(source).expanduser()
+    return path if path.is_absolute() else base_dir / path
+
+
+def _ref_key(source: str, local: Optional[Path]) -> str:
+    """
+    Identity of a source for the refs table.
+
+    URLs are assumed immutable. Local files are keyed by path, size and
+    mtime so an edited file is fetched again; directories by path and tree
+    hash, which is cheap to recompute thanks to memoised per-file digests.
+    """
+    from .run_cache import hash_tree
+
+    if local is None:
+        return source
+    if not local.exists():
+        raise FileNotFoundError(f"Input not found: {source}")
+    if local.is_dir():
+        return f"dir:{local.resolve()}:{hash_tree(local)}"
+    st = local.stat()
+    return f"file:{local.resolve()}:{st.st_size}:{st.st_mtime_ns}"
+
+
+def _make_read_only(path: Path) -> None:
+    if path.is_dir():
+        for dirpath, dirnames, filenames in os.walk(path):
+            for filename in filenames:
+                os.chmod(os.path.join(dirpath, filename), 0o444)
+        for dirpath, _, _ in os.walk(path, topdown=False):
+            os.chmod(dirpath, 0o555)
+    else:
+        os.chmod(path, 0o444)
+    os.chmod(path.parent, 0o555)
+
+
+def _tree_size(path: Path) -> int:
+    if path.is_file():
+        return path.stat().st_size
+    return sum(p.stat().st_size for p in path.rglob("*") if p.is_file())
+
+
+def _download(url: str, dest_dir: Path) -> tuple[Path, str]:
+    name = Path(urlparse(url).path).name or "data"
+    tmp = dest_dir / name
+    h = hashlib.sha256()
+    with requests.get(url, stream=True, timeout=60) as resp:
+        resp.raise_for_status()
+        with tmp.open("wb") as f:
+            for chunk in resp.iter_content(_CHUNK):
+                h.update(chunk)
+                f.write(chunk)
+    return tmp, h.hexdigest()
+
+
+def _stage(source: str, local: Optional[Path], staging: Path) -> tuple[Path, str]:
+    """Copy or download a source into staging, returning (path, digest)."""
+    from .run_cache import IGNORED_DIRS, IGNORED_SUFFIXES, hash_tree
+
+    if local is None:
+        return _download(source, staging)
+
+    digest = hash_tree(local)
+    target = staging / local.name
+    if local.is_dir():
+        ignore = shutil.ignore_patterns(*IGNORED_DIRS, *(f"*{s}" for s in IGNORED_SUFFIXES))
+        shutil.copytree(local, target, ignore=ignore)
+    else:
+        shutil.copy2(local, target)
+    return target, digest
+
+
+def _object_dir(digest: str) -> Path:
+    return get_input_cache_dir() / "objects" / digest
+
+
+def fetch_input(name: str, source: str, base_dir: Optional[Path] = None) -> CachedInput:
+    """
+    Return a cached, read-only copy of an input, fetching it at most once.
+
+    Concurrent callers for the same source (threads or processes) serialise
+    on a per-source lock, so only the first one copies or downloads and the
+    rest reuse its result.
+    """
+    base_dir = Path.cwd() if base_dir is None else Path(base_dir)
+    local = local_source_path(source, base_dir)
+    key = _ref_key(source, local)
+    lock_name = hashlib.sha1(key.encode("utf-8")).hexdigest() + ".lock"
+
+    with _flock(get_input_cache_dir() / "locks" / lock_name):
+        with _locked_refs() as refs:
+            ref = refs.get(key)
+            if ref and Path(ref["path"]).exists():
+                ref["last_used"] = datetime.now(timezone.utc).isoformat()
+                return CachedInput(name, source, ref["digest"], Path(ref["path"]), ref["size"], False)
+
+        cache_dir = get_input_cache_dir()
+        staging = Path(tempfile.mkdtemp(dir=cache_dir / "tmp"))
+        try:
+            staged, digest = _stage(source, local, staging)
+            object_dir = _object_dir(digest)
+            final = object_dir / staged.name
+            if not final.exists():
+                object_dir.mkdir(parents=True, exist_ok=True)
+                os.chmod(object_dir, 0o755)
+                os.replace(staged, final)
+                _make_read_only(final)
+        finally:
+            shutil.rmtree(staging, ignore_errors=True)
+
+        size = _tree_size(final)
+        with _locked_refs() as refs:
+            refs[key] = {
+                "source": source,
+                "digest": digest,
+                "path": str(final),
+                "size": size,
+                "last_used": datetime.now(timezone.utc).isoformat(),
+            }
+
+    return CachedInput(name, source, digest, final, size, True)
+
+
+def _remove_object(object_dir: Path) -> None:
+    for dirpath, _, _ in os.walk(object_dir):
+        os.chmod(dirpath, stat.S_IRWXU)
+    shutil.rmtree(object_dir, ignore_errors=True)
+
+
+def enforce_budget(max_bytes: Optional[int] = None) -> int:
+    """
+    Evict least recently used objects until the cache fits its budget.
+
+    Objects held by a running job (shared lock on their .inuse file) are
+    never evicted. Returns the number of bytes freed.
+    """
+    max_bytes = max_cache_bytes() if max_bytes is None else max_bytes
+    cache_dir = get_input_cache_dir()
+    freed = 0
+
+    with _locked_refs() as refs:
+        by_digest: Dict[str, Dict[str, Any]] = {}
+        for key, ref in refs.items():
+            current = by_digest.get(ref["digest"])
+            if current is None or ref["last_used"] > current["last_used"]:
+                by_digest[ref["digest"]] = ref
+        total = sum(ref["size"] for ref in by_digest.values())
+
+        for digest, ref in sorted(by_digest.items(), key=lambda item: item[1]["last_used"]):
+            if total <= max_bytes:
+                break
+            with (cache_dir / "locks" / f"{digest}.inuse").open("a") as inuse:
+                try:
+                    fcntl.flock(inuse, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                except BlockingIOError:
+                    continue
+                _remove_object(_object_dir(digest))
+            for key in [k for k, r in refs.items() if r["digest"] == digest]:
+                del refs[key]
+            total -= ref["size"]
+            freed += ref["size"]
+
+    return freed
+
+
+@contextmanager
+def materialise_inputs(
+    inputs: Dict[str, str],
+    base_dir: Optional[Path] = None,
+) -> Iterator[Dict[str, CachedInput]]:
+    """
+    Fetch every declared input and pin it in the cache for the with-block.
+
+    The cache budget is enforced once everything is pinned, so eviction can
+    only reclaim inputs no running job is using.
+    """
+    with ExitStack() as stack:
+        result: Dict[str, CachedInput] = {}
+        for name, source in inputs.items():
+            cached = fetch_input(name, source, base_dir=base_dir)
+            stack.enter_context(
+                _flock(get_input_cache_dir() / "locks" / f"{cached.digest}.inuse", fcntl.LOCK_SH)
+            )
+            if not cached.path.exists():
+                # Evicted between fetch and pin: fetch again now that it is pinned.
+                cached = fetch_input(name, source, base_dir=base_dir)
+            result[name] = cached
+        enforce_budget()
+        yield result
+
+
+def input_env_name(name: str) -> str:
+    safe = "".join(c if c.isalnum() else "_" for c in name.upper())
+    return f"RUNPILOT_INPUT_{safe}"
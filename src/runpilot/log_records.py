@@ -0,0 +1,236 @@
+from __future__ import annotations
+
+import bisect
+import os
+import selectors
+import struct
+import threading
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import BinaryIO, Dict, Iterator, List, Optional, Set, TextIO, Tuple
+
+from .log_store import find_file, open_binary
+
+RECORDS_FILENAME = "logs.records"
+INDEX_FILENAME = "logs.index"
+
+STDOUT = 1
+STDERR = 2
+# Messages from RunPilot itself (limits reached, errors starting the job).
+RUNPILOT = 3
+STREAM_NAMES = {STDOUT: "stdout", STDERR: "stderr", RUNPILOT: "runpilot"}
+
+# Record: timestamp (unix seconds), stream id, payload length, then the
+# payload (one line, without its newline).
+_RECORD = struct.Struct("<dBI")
+# Index entry: timestamp of the first record at or after offset, offset.
+_INDEX = struct.Struct("<dQ")
+# Bytes of records between index entries; a range query reads at most this
+# much before reaching its first matching record.
+INDEX_STRIDE = 64 * 1024
+# How long to keep draining pipes after the job exits. Background processes
+# that inherited the pipes would otherwise keep the reader alive forever.
+DRAIN_SECONDS = 2.0
+_READ_SIZE = 65536
+
+
+@dataclass
+class LogRecord:
+    timestamp: float
+    stream: int
+    text: str
+
+    @property
+    def stream_name(self) -> str:
+        return STREAM_NAMES.get(self.stream, str(self.stream))
+
+
+class LogRecorder:
+    """
+    Capture a job's stdout and stderr through pipes.
+
+    Output is copied to logs.txt as it arrives (so tools that read the
+    merged log keep working) and every complete line is also appended to
+    logs.records with its stream and arrival time. logs.index gets a sparse
+    time -> offset entry every INDEX_STRIDE bytes of records.
+
+    RunPilot's own messages go through message(), which writes them under
+    the same lock as job output and records them too.
+    """
+
+    def __init__(self, run_dir: Path, log_file: TextIO):
+        run_dir = Path(run_dir)
+        self._log = log_file
+        self.log_path = Path(log_file.name)
+        self._lock = threading.Lock()
+        self._line_open = False  # logs.txt does not end with a newline
+        self._records: BinaryIO = (run_dir / RECORDS_FILENAME).open("ab")
+        self._index: BinaryIO = (run_dir / INDEX_FILENAME).open("ab")
+        self._offset = self._records.tell()
+        self._last_indexed: Optional[int] = None
+        self._last_ts = 0.0
+        self._partial: Dict[int, bytes] = {STDOUT: b"", STDERR: b""}
+        self._selector = selectors.DefaultSelector()
+        self._thread: Optional[threading.Thread] = None
+        self._stopping = threading.Event()
+
+    def __enter__(self) -> "LogRecorder":
+        return self
+
+    def __exit__(self, *exc: object) -> None:
+        self.close()
+
+    def open_pipes(self) -> Tuple[int, int]:
+        """
+        Return write ends (stdout_fd, stderr_fd) to hand to the job.
+
+        The caller must close both in the parent once the job has them.
+        """
+        if self._thread is not None:
+            # A previous attempt (e.g. a failed warm start) gave up on its
+            # pipes; let the reader drain them before starting over.
+            self._stopping.set()
+            self._thread.join()
+            self._stopping.clear()
+
+        fds = []
+        for stream in (STDOUT, STDERR):
+            read_fd, write_fd = os.pipe()
+            self._selector.register(read_fd, selectors.EVENT_READ, stream)
+            fds.append(write_fd)
+        self._thread = threading.Thread(target=self._pump, name="runpilot-log-recorder", daemon=True)
+        self._thread.start()
+        return fds[0], fds[1]
+
+    def message(self, text: str) -> None:
+        """Write a RunPilot message to logs.txt on a line of its own, and record it."""
+        with self._lock:
+            data = text.encode("utf-8") + b"\n"
+            # Start a new line rather than finishing a job line that is
+            # still being written.
+            self._write_log(b"\n" + data if self._line_open else data)
+            for line in text.split("\n"):
+                self._append(RUNPILOT, line.encode("utf-8"))
+            self._records.flush()
+            self._index.flush()
+
+    def close(self) -> None:
+        self._stopping.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        for key in list(self._selector.get_map().values()):
+            self._selector.unregister(key.fd)
+            os.close(key.fd)
+        self._selector.close()
+        self._records.close()
+        self._index.close()
+
+    def _pump(self) -> None:
+        deadline: Optional[float] = None
+        while self._selector.get_map():
+            if self._stopping.is_set():
+                deadline = deadline or time.monotonic() + DRAIN_SECONDS
+                if time.monotonic() >= deadline:
+                    break
+            events = self._selector.select(timeout=0.2)
+            if not events and self._stopping.is_set():
+                break
+            for key, _ in events:
+                data = os.read(key.fd, _READ_SIZE)
+                if not data:
+                    self._selector.unregister(key.fd)
+                    os.close(key.fd)
+                    continue
+                self._handle(key.data, data)
+
+        with self._lock:
+            for stream, rest in self._partial.items():
+                if rest:
+                    self._append(stream, rest)
+            self._partial = {STDOUT: b"", STDERR: b""}
+            self._records.flush()
+            self._index.flush()
+
+    def _write_log(self, data: bytes) -> None:
+        buffer = self._log.buffer  # type: ignore[attr-defined]
+        buffer.write(data)
+        buffer.flush()
+        self._line_open = not data.endswith(b"\n")
+
+    def _handle(self, stream: int, data: bytes) -> None:
+        with self._lock:
+            self._write_log(data)
+            lines = (self._partial[stream] + data).split(b"\n")
+            self._partial[stream] = lines.pop()
+            for line in lines:
+                self._append(stream, line[:-1] if line.endswith(b"\r") else line)
+            self._records.flush()
+            self._index.flush()
+
+    def _append(self, stream: int, payload: bytes) -> None:
+        # Stamped on completion and never moving backwards, so records are
+        # in time order across both streams and range scans can stop early.
+        ts = max(time.time(), self._last_ts)
+        self._last_ts = ts
+        if self._last_indexed is None or self._offset - self._last_indexed >= INDEX_STRIDE:
+            self._index.write(_INDEX.pack(ts, self._offset))
+            self._last_indexed = self._offset
+        self._records.write(_RECORD.pack(ts, stream, len(payload)))
+        self._records.write(payload)
+        self._offset += _RECORD.size + len(payload)
+
+
+def has_records(run_dir: Path) -> bool:
+    return find_file(Path(run_dir) / RECORDS_FILENAME) is not None
+
+
+def _load_index(run_dir: Path) -> List[Tuple[float, int]]:
+    try:
+        data = (Path(run_dir) / INDEX_FILENAME).read_bytes()
+    except OSError:
+        return []
+    usable = len(data) - len(data) % _INDEX.size
+    return [_INDEX.unpack_from(data, pos) for pos in range(0, usable, _INDEX.size)]
+
+
+def seek_offset(run_dir: Path, since: Optional[float]) -> int:
+    """Offset of the last index entry at or before `since` (0 if none)."""
+    if since is None:
+        return 0
+    index = _load_index(run_dir)
+    pos = bisect.bisect_right([ts for ts, _ in index], since) - 1
+    return index[pos][1] if pos >= 0 else 0
+
+
+def iter_records(
+    run_dir: Path,
+    since: Optional[float] = None,
+    until: Optional[float] = None,
+    streams: Optional[Set[int]] = None,
+) -> Iterator[LogRecord]:
+    """
+    Yield records with since <= timestamp <= until, in time order.
+
+    Seeks via the sparse index, so only about INDEX_STRIDE bytes before the
+    first match are read, and stops at the first record past `until`.
+    """
+    path = Path(run_dir) / RECORDS_FILENAME
+    with open_binary(path) as f:
+        f.seek(seek_offset(run_dir, since))
+        while True:
+            header = f.read(_RECORD.size)
+            if len(header) < _RECORD.size:
+                return
+            ts, stream, length = _RECORD.unpack(header)
+            payload = f.read(length)
+            if len(payload) < length:
+                return  # record still being written
+            if until is not None and ts > until:
+                return
+            if since is not None and ts < since:
+                continue
+            if streams is not None and stream not in streams:
+                continue
+            yield LogRecord(ts, stream, payload.decode("utf-8", errors="replace"))
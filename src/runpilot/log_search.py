@@ -0,0 +1,187 @@
+from __future__ import annotations
+
+import mmap
+import os
+import re
+from concurrent.futures import Future, ProcessPoolExecutor
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from .log_store import LOG_FILENAME, find_file, iter_chunks
+
+# Decompressed bytes searched at a time in compressed logs.
+_CHUNK = 4 * 1024 * 1024
+
+# Compiled patterns, per worker process.
+_patterns: Dict[Tuple[str, int], "re.Pattern[bytes]"] = {}
+
+
+@dataclass
+class LogMatch:
+    run_id: str
+    line_number: int
+    line: str
+
+
+@dataclass
+class RunMatches:
+    run_id: str
+    matches: List[LogMatch]
+    error: Optional[str] = None
+
+
+def compile_pattern(pattern: str, ignore_case: bool = False, fixed: bool = False) -> "re.Pattern[bytes]":
+    """
+    Compile a search pattern to a bytes regex (logs are searched undecoded).
+
+    Raises re.error for an invalid pattern.
+    """
+    source = re.escape(pattern) if fixed else pattern
+    flags = re.MULTILINE | (re.IGNORECASE if ignore_case else 0)
+    return re.compile(source.encode("utf-8"), flags)
+
+
+def _scan(
+    regex: "re.Pattern[bytes]",
+    buffer,
+    end: int,
+    line_number: int,
+    run_id: str,
+    out: List[LogMatch],
+    max_count: Optional[int],
+) -> int:
+    """
+    Append matching lines in buffer[:end] to out, at most one per line.
+
+    buffer is an mmap or bytes starting at a line boundary; line_number is
+    the number of its first line. Returns the line number after buffer[:end].
+    """
+    counted = 0  # newlines are counted up to here
+    pos = 0
+    while pos < end:
+        if max_count is not None and len(out) >= max_count:
+            return line_number
+        found = regex.search(buffer, pos, end)
+        if found is None:
+            break
+        start = buffer.rfind(b"\n", 0, found.start()) + 1
+        stop = buffer.find(b"\n", found.start(), end)
+        if stop < 0:
+            stop = end
+        line_number += buffer[counted:start].count(b"\n")
+        counted = start
+        line = buffer[start:stop]
+        if line.endswith(b"\r"):
+            line = line[:-1]
+        out.append(LogMatch(run_id, line_number, line.decode("utf-8", errors="replace")))
+        pos = stop + 1
+    return line_number + buffer[counted:end].count(b"\n")
+
+
+def search_file(
+    run_id: str,
+    path: str,
+    pattern: str,
+    ignore_case: bool = False,
+    fixed: bool = False,
+    max_count: Optional[int] = None,
+) -> RunMatches:
+    """
+    Search one log file, plain or compressed, for lines matching pattern.
+
+    Plain files are mmapped, so the regex runs over the page cache without
+    copying the file; compressed logs are decompressed a chunk at a time.
+    Stops after max_count matching lines.
+    """
+    key = (pattern, int(ignore_case) | int(fixed) << 1)
+    regex = _patterns.get(key)
+    if regex is None:
+        regex = _patterns[key] = compile_pattern(pattern, ignore_case, fixed)
+
+    matches: List[LogMatch] = []
+    try:
+        found = find_file(Path(path))
+        if found is None:
+            return RunMatches(run_id, matches)
+        if found.suffix not in (".gz", ".zst"):
+            with found.open("rb") as f:
+                size = os.fstat(f.fileno()).st_size
+                if size:
+                    with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as view:
+                        _scan(regex, view, size, 1, run_id, matches, max_count)
+            return RunMatches(run_id, matches)
+
+        line_number = 1
+        carry = b""
+        for chunk in iter_chunks(found, _CHUNK):
+            data = carry + chunk
+            cut = data.rfind(b"\n") + 1  # complete lines only; the rest carries over
+            line_number = _scan(regex, data, cut, line_number, run_id, matches, max_count)
+            carry = data[cut:]
+            if max_count is not None and len(matches) >= max_count:
+                return RunMatches(run_id, matches)
+        if carry:
+            _scan(regex, carry, len(carry), line_number, run_id, matches, max_count)
+        return RunMatches(run_id, matches)
+    except (OSError, RuntimeError) as exc:
+        return RunMatches(run_id, matches, error=str(exc))
+
+
+def search_runs(
+    runs: List[Tuple[str, str]],
+    pattern: str,
+    ignore_case: bool = False,
+    fixed: bool = False,
+    max_count: Optional[int] = None,
+    jobs: Optional[int] = None,
+    max_per_run: Optional[int] = None,
+) -> Iterator[RunMatches]:
+    """
+    Search the logs of (run_id, run_dir) pairs across a process pool.
+
+    Results are yielded in the order of runs, each as soon as it and every
+    run before it are done. max_count caps the matching lines in total:
+    each worker stops at it, and once it is reached the remaining searches
+    are cancelled. max_per_run caps the lines reported for each run.
+    """
+    compile_pattern(pattern, ignore_case, fixed)  # fail early, in this process
+    jobs = jobs or os.cpu_count() or 1
+    tasks = [(run_id, os.path.join(run_dir, LOG_FILENAME)) for run_id, run_dir in runs]
+    remaining = max_count
+    caps = [c for c in (max_count, max_per_run) if c is not None]
+    per_run = min(caps) if caps else None
+
+    if jobs == 1 or len(tasks) <= 1:
+        for run_id, path in tasks:
+            cap = per_run if remaining is None else min(per_run or remaining, remaining)
+            result = search_file(run_id, path, pattern, ignore_case, fixed, cap)
+            yield _trim(result, remaining)
+            if remaining is not None:
+                remaining -= len(result.matches)
+                if remaining <= 0:
+                    return
+        return
+
+    pool = ProcessPoolExecutor(max_workers=min(jobs, len(tasks)))
+    futures: List[Future] = [
+        pool.submit(search_file, run_id, path, pattern, ignore_case, fixed, per_run)
+        for run_id, path in tasks
+    ]
+    try:
+        for future in futures:
+            result = _trim(future.result(), remaining)
+            yield result
+            if remaining is not None:
+                remaining -= len(result.matches)
+                if remaining <= 0:
+                    return
+    finally:
+        # On early exit only the searches already running finish.
+        pool.shutdown(wait=False, cancel_futures=True)
+
+
+def _trim(result: RunMatches, remaining: Optional[int]) -> RunMatches:
+    if remaining is not None and len(result.matches) > remaining:
+        result.matches = result.matches[:remaining]
+    return result
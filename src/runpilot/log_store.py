@@ -0,0 +1,384 @@
+from __future__ import annotations
+
+import bisect
+import gzip
+import io
+import mmap
+import os
+import struct
+import zlib
+from dataclasses import dataclass
+from pathlib import Path
+from typing import BinaryIO, Callable, Dict, Iterator, List, Optional, Tuple
+
+LOG_FILENAME = "logs.txt"
+# Uncompressed bytes per block. Each block is an independent gzip member
+# (or zstd frame), so the file is still a valid .gz / .zst, and a read at
+# any offset decompresses at most one block.
+BLOCK_SIZE = 256 * 1024
+INDEX_SUFFIX = ".idx"
+# Index entry: uncompressed offset, compressed offset of a block. A final
+# entry holds the total sizes.
+_ENTRY = struct.Struct("<QQ")
+
+
+@dataclass
+class Codec:
+    name: str
+    suffix: str
+    compress: Callable[[bytes], bytes]
+    decompress: Callable[[bytes], bytes]
+
+
+def _gzip_codec() -> Codec:
+    return Codec(
+        "gzip",
+        ".gz",
+        lambda data: gzip.compress(data, compresslevel=6, mtime=0),
+        lambda data: zlib.decompress(data, wbits=31),
+    )
+
+
+def _zstd_codec() -> Optional[Codec]:
+    try:
+        import zstandard  # optional dependency
+    except ImportError:
+        return None
+    compressor = zstandard.ZstdCompressor(level=3)
+    decompressor = zstandard.ZstdDecompressor()
+    return Codec("zstd", ".zst", compressor.compress, decompressor.decompress)
+
+
+def available_codecs() -> Dict[str, Codec]:
+    codecs = {"gzip": _gzip_codec()}
+    zstd = _zstd_codec()
+    if zstd is not None:
+        codecs["zstd"] = zstd
+    return codecs
+
+
+def _codec_for_suffix(suffix: str) -> Codec:
+    for codec in available_codecs().values():
+        if codec.suffix == suffix:
+            return codec
+    raise RuntimeError(f"Log compressed with {suffix} but the codec is not installed (pip install zstandard)")
+
+
+_SUFFIXES = (".gz", ".zst")
+
+
+def find_file(path: Path) -> Optional[Path]:
+    """Return path, or its compressed form, whichever exists."""
+    path = Path(path)
+    if path.is_file():
+        return path
+    for suffix in _SUFFIXES:
+        candidate = path.with_name(path.name + suffix)
+        if candidate.is_file():
+            return candidate
+    return None
+
+
+def find_log(run_dir: Path) -> Optional[Path]:
+    return find_file(Path(run_dir) / LOG_FILENAME)
+
+
+def _load_index(path: Path) -> List[Tuple[int, int]]:
+    try:
+        data = path.with_name(path.name + INDEX_SUFFIX).read_bytes()
+    except OSError:
+        return []
+    usable = len(data) - len(data) % _ENTRY.size
+    return [_ENTRY.unpack_from(data, pos) for pos in range(0, usable, _ENTRY.size)]
+
+
+class BlockReader(io.RawIOBase):
+    """
+    Seekable reader over a block-compressed file, using its block index.
+
+    Only the block containing the current position is decompressed (and
+    kept until the position leaves it).
+    """
+
+    def __init__(self, path: Path, codec: Codec, index: List[Tuple[int, int]]):
+        super().__init__()
+        self._file = Path(path).open("rb")
+        self._codec = codec
+        self._index = index
+        self._starts = [entry[0] for entry in index]
+        self._size = index[-1][0]
+        self._pos = 0
+        self._block_start = -1
+        self._block = b""
+
+    @property
+    def size(self) -> int:
+        return self._size
+
+    def readable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return True
+
+    def tell(self) -> int:
+        return self._pos
+
+    def seek(self, offset: int, whence: int = io.SEEK_SET) -> int:
+        if whence == io.SEEK_CUR:
+            offset += self._pos
+        elif whence == io.SEEK_END:
+            offset += self._size
+        self._pos = max(0, offset)
+        return self._pos
+
+    def _load(self, block: int) -> None:
+        start, compressed_start = self._index[block]
+        compressed_end = self._index[block + 1][1]
+        self._file.seek(compressed_start)
+        self._block = self._codec.decompress(self._file.read(compressed_end - compressed_start))
+        self._block_start = start
+
+    def readinto(self, buffer) -> int:  # type: ignore[override]
+        if self._pos >= self._size:
+            return 0
+        if not (self._block_start <= self._pos < self._block_start + len(self._block)):
+            self._load(bisect.bisect_right(self._starts, self._pos) - 1)
+        offset = self._pos - self._block_start
+        chunk = self._block[offset : offset + len(buffer)]
+        buffer[: len(chunk)] = chunk
+        self._pos += len(chunk)
+        return len(chunk)
+
+    def close(self) -> None:
+        self._file.close()
+        super().close()
+
+
+def open_binary(path: Path) -> BinaryIO:
+    """
+    Open a log file (or its compressed form) for seekable binary reading.
+
+    Raises FileNotFoundError if neither exists.
+    """
+    found = find_file(path)
+    if found is None:
+        raise FileNotFoundError(f"No such log file: {path}")
+    if found.suffix not in _SUFFIXES:
+        return found.open("rb")
+    codec = _codec_for_suffix(found.suffix)
+    index = _load_index(found)
+    if not index:
+        # Compressed elsewhere without our index: still readable, just not
+        # cheaply seekable.
+        if codec.name == "gzip":
+            return gzip.open(found, "rb")  # type: ignore[return-value]
+        return io.BytesIO(codec.decompress(found.read_bytes()))
+    return io.BufferedReader(BlockReader(found, codec, index), buffer_size=64 * 1024)
+
+
+def open_text(path: Path, errors: str = "strict") -> io.TextIOWrapper:
+    """Text-mode counterpart of open_binary (UTF-8, universal newlines)."""
+    return io.TextIOWrapper(open_binary(path), encoding="utf-8", errors=errors)
+
+
+def file_size(path: Path) -> int:
+    """Uncompressed size of a log file in either form."""
+    found = find_file(path)
+    if found is None:
+        raise FileNotFoundError(f"No such log file: {path}")
+    if found.suffix not in _SUFFIXES:
+        return found.stat().st_size
+    index = _load_index(found)
+    if index:
+        return index[-1][0]
+    with open_binary(found) as f:
+        return f.seek(0, io.SEEK_END)
+
+
+def iter_chunks(path: Path, chunk_size: int = 1024 * 1024) -> Iterator[bytes]:
+    """Yield the uncompressed contents of a log file in chunks."""
+    with open_binary(path) as f:
+        while True:
+            chunk = f.read(chunk_size)
+            if not chunk:
+                return
+            yield chunk
+
+
+def _count_back(rfind: Callable[..., int], start: int, end: int, lines: int) -> Tuple[int, int]:
+    """
+    Step back over up to `lines` newlines in [start, end) using rfind.
+
+    Returns (newlines still wanted, position of the last newline found or end).
+    """
+    pos = end
+    while lines:
+        found = rfind(b"\n", start, pos)
+        if found < 0:
+            break
+        lines -= 1
+        pos = found
+    return lines, pos
+
+
+def tail_offset(path: Path, lines: int) -> int:
+    """
+    Offset where the last `lines` lines of a log file start.
+
+    Plain files are mmapped and searched backwards, so only the tail is
+    touched however large the file is. Compressed files are read backwards
+    a block at a time through the block index.
+    """
+    found = find_file(path)
+    if found is None:
+        raise FileNotFoundError(f"No such log file: {path}")
+    with open_binary(found) as f:
+        size = f.seek(0, io.SEEK_END)
+        if size == 0 or lines <= 0:
+            return size
+        f.seek(size - 1)
+        # A trailing newline ends the last line rather than starting a new one.
+        end = size - 1 if f.read(1) == b"\n" else size
+
+        if found.suffix not in _SUFFIXES:
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as view:
+                remaining, pos = _count_back(view.rfind, 0, end, lines)
+            return 0 if remaining else pos + 1
+
+        remaining = lines
+        chunk_end = end
+        while chunk_end > 0:
+            chunk_start = max(0, chunk_end - BLOCK_SIZE)
+            f.seek(chunk_start)
+            data = f.read(chunk_end - chunk_start)
+            remaining, pos = _count_back(data.rfind, 0, len(data), remaining)
+            if not remaining:
+                return chunk_start + pos + 1
+            chunk_end = chunk_start
+        return 0
+
+
+@dataclass
+class CompressResult:
+    path: Path
+    bytes_before: int
+    bytes_after: int
+
+    @property
+    def bytes_saved(self) -> int:
+        return self.bytes_before - self.bytes_after
+
+
+def compress_file(path: Path, codec: str = "gzip") -> Optional[CompressResult]:
+    """
+    Replace a plain file with its block-compressed form plus block index.
+
+    The compressed file and index are written under temporary names and
+    renamed into place before the original is removed, so readers always
+    find one complete form. Returns None if there is no plain file.
+    """
+    path = Path(path)
+    if not path.is_file():
+        return None
+    codecs = available_codecs()
+    if codec not in codecs:
+        raise ValueError(f"Unknown or unavailable codec {codec!r} (available: {', '.join(codecs)})")
+    chosen = codecs[codec]
+
+    target = path.with_name(path.name + chosen.suffix)
+    index_path = target.with_name(target.name + INDEX_SUFFIX)
+    tmp_target = target.with_name(target.name + ".tmp")
+    tmp_index = index_path.with_name(index_path.name + ".tmp")
+
+    entries: List[Tuple[int, int]] = []
+    raw_offset = compressed_offset = 0
+    with path.open("rb") as src, tmp_target.open("wb") as out:
+        while True:
+            block = src.read(BLOCK_SIZE)
+            if not block:
+                break
+            data = chosen.compress(block)
+            entries.append((raw_offset, compressed_offset))
+            out.write(data)
+            raw_offset += len(block)
+            compressed_offset += len(data)
+        out.flush()
+        os.fsync(out.fileno())
+    entries.append((raw_offset, compressed_offset))
+    tmp_index.write_bytes(b"".join(_ENTRY.pack(*entry) for entry in entries))
+
+    os.replace(tmp_index, index_path)
+    os.replace(tmp_target, target)
+    path.unlink()
+    return CompressResult(target, raw_offset, compressed_offset + index_path.stat().st_size)
+
+
+def stored_forms(name: str) -> List[str]:
+    """File names a log file may be stored under: plain, compressed, index."""
+    forms = [name]
+    for suffix in _SUFFIXES:
+        forms += [name + suffix, name + suffix + INDEX_SUFFIX]
+    return forms
+
+
+def compact_run(run_dir: Path, codec: str = "gzip") -> Optional[List[CompressResult]]:
+    """
+    Compress a finished run's logs (logs.txt and logs.records) in place and
+    note it in run.json.
+
+    Returns None without touching anything if the run is still pending or
+    running: its logs are being written.
+    """
+    from .log_records import RECORDS_FILENAME
+    from .storage import TERMINAL_STATUSES, read_run_metadata, update_run_metadata
+
+    run_dir = Path(run_dir)
+    if read_run_metadata(run_dir).get("status") not in TERMINAL_STATUSES:
+        return None
+    results = []
+    for name in (LOG_FILENAME, RECORDS_FILENAME):
+        result = compress_file(run_dir / name, codec)
+        if result is not None:
+            results.append(result)
+    if results:
+        update_run_metadata(
+            run_dir,
+            {
+                "logs_compressed": {
+                    "codec": codec,
+                    "bytes_before": sum(r.bytes_before for r in results),
+                    "bytes_after": sum(r.bytes_after for r in results),
+                }
+            },
+        )
+    return results
+
+
+def compact_runs(codec: str = "gzip", min_bytes: int = 0) -> Dict[str, int]:
+    """
+    Compress the logs of every finished run that still has plain logs.
+
+    Logs smaller than min_bytes are left alone, and runs that are pending or
+    running are skipped. Returns counts of runs compacted and skipped and of
+    bytes before and after.
+    """
+    from .log_records import RECORDS_FILENAME
+    from .paths import iter_run_dirs
+    from .storage import get_runs_dir
+
+    totals = {"runs": 0, "skipped": 0, "bytes_before": 0, "bytes_after": 0}
+    for entry in iter_run_dirs(get_runs_dir()):
+        run_dir = Path(entry.path)
+        plain = [run_dir / name for name in (LOG_FILENAME, RECORDS_FILENAME)]
+        size = sum(p.stat().st_size for p in plain if p.is_file())
+        if size == 0 or size < min_bytes:
+            continue
+        results = compact_run(run_dir, codec)
+        if results is None:
+            totals["skipped"] += 1
+            continue
+        totals["runs"] += 1
+        totals["bytes_before"] += sum(r.bytes_before for r in results)
+        totals["bytes_after"] += sum(r.bytes_after for r in results)
+    return totals
@@ -0,0 +1,270 @@
+from __future__ import annotations
+
+import json
+import mmap
+import os
+from array import array
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from .log_store import find_file, iter_chunks
+from .metric_series import SeriesBuilder
+
+try:
+    import orjson  # optional: faster JSON decoding of METRIC payloads
+except ImportError:  # pragma: no cover - exercised when orjson is absent
+    orjson = None
+
+_MARKER = b"METRIC "
+# Plain logs at least this big are split into pieces parsed across processes.
+PARALLEL_MIN_BYTES = 64 * 1024 * 1024
+_PIECE = 32 * 1024 * 1024
+# Decompressed bytes parsed at a time in compressed logs.
+_CHUNK = 4 * 1024 * 1024
+
+Point = Tuple[str, int, float]
+
+
+def _orjson_loads(text: str) -> Any:
+    try:
+        return orjson.loads(text)
+    except orjson.JSONDecodeError:
+        # json accepts a few things orjson rejects (NaN, Infinity, integers
+        # beyond 64 bits, lone surrogates); keep parsing them the same way.
+        return json.loads(text)
+
+
+loads: Callable[[str], Any] = _orjson_loads if orjson is not None else json.loads
+
+
+class MetricLineParser:
+    """
+    Turns METRIC lines into (name, step, value) points.
+
+    Keeps the synthetic step counter (for lines without a step) between
+    calls, so a log can be parsed in pieces. See
+    metrics.parse_metrics_from_log for the accepted formats.
+    """
+
+    def __init__(self, global_step: int = 0, loads: Callable[[str], Any] = json.loads):
+        self.global_step = global_step
+        self._loads = loads
+
+    def parse_line(self, line: str) -> List[Point]:
+        line = line.strip()
+        if not line.startswith("METRIC "):
+            return []
+
+        metric_part = line[len("METRIC ") :].strip()
+        if not metric_part:
+            return []
+
+        # Case 1: JSON payload
+        if metric_part.startswith("{"):
+            try:
+                payload = self._loads(metric_part)
+                if not isinstance(payload, dict):
+                    return []
+
+                step_val = payload.get("step")
+                try:
+                    step = int(step_val)
+                except (TypeError, ValueError):
+                    self.global_step += 1
+                    step = self.global_step
+
+                points = []
+                for key, value in payload.items():
+                    if key == "step":
+                        continue
+                    try:
+                        val_f = float(value)
+                    except (TypeError, ValueError):
+                        continue
+                    points.append((key, step, val_f))
+                return points
+            except Exception:
+                # Fall back to other parsing below
+                pass
+
+        # Case 2: key=value format
+        if "=" in metric_part:
+            name, value_str = metric_part.split("=", 1)
+            name = name.strip()
+            value_str = value_str.strip()
+            if not name:
+                return []
+
+            try:
+                val_f = float(value_str)
+            except ValueError:
+                return []
+
+            self.global_step += 1
+            return [(name, self.global_step, val_f)]
+        return []
+
+    def points(self, lines: Iterable[str]) -> Iterator[Point]:
+        for line in lines:
+            yield from self.parse_line(line)
+
+
+def scan_bytes(
+    buf: Any,
+    start: int,
+    end: int,
+    parser: MetricLineParser,
+    series: Dict[str, SeriesBuilder],
+    synthetic: Optional[Dict[str, array]] = None,
+) -> None:
+    """
+    Parse the METRIC lines in buf[start:end] (bytes or an mmap) into series.
+
+    Only lines containing the marker are located and decoded; lines split
+    like open_text does (on \\n, \\r\\n and \\r), so the points are the same as
+    feeding every line to the parser. The range must start at a line start.
+    With synthetic, the positions of points numbered by the parser's step
+    counter are recorded per metric, so a later piece can be renumbered.
+    Points whose step does not fit in int64 are dropped.
+    """
+    find = buf.find
+    rfind = buf.rfind
+    parse_line = parser.parse_line
+    # Most logs have no bare \r at all; one pass saves two searches a line.
+    has_cr = find(b"\r", start, end) >= 0
+    next_nl = -2
+    pos = start
+    while pos < end:
+        at = find(_MARKER, pos, end)
+        if at < 0:
+            return
+        line_start = rfind(b"\n", pos, at)
+        if has_cr:
+            line_start = max(line_start, rfind(b"\r", pos, at))
+        line_start = max(line_start, pos - 1) + 1
+        if next_nl != -1 and next_nl < at:
+            next_nl = find(b"\n", at, end)
+        line_end = end if next_nl == -1 else next_nl
+        if has_cr:
+            cr = find(b"\r", at, line_end)
+            if cr >= 0:
+                line_end = cr
+        pos = line_end + 1
+
+        before = parser.global_step
+        points = parse_line(buf[line_start:line_end].decode("utf-8", errors="replace"))
+        counted = synthetic is not None and parser.global_step != before
+        for name, step, value in points:
+            builder = series.get(name)
+            fresh = builder is None
+            if fresh:
+                builder = SeriesBuilder()
+            try:
+                builder.steps.append(step)
+            except OverflowError:
+                continue
+            builder.values.append(value)
+            if fresh:
+                series[name] = builder
+            if counted:
+                marks = synthetic.get(name)
+                if marks is None:
+                    marks = synthetic[name] = array("q")
+                marks.append(len(builder.steps) - 1)
+
+
+def _parse_piece(path: str, start: int, end: int) -> Tuple[Dict[str, SeriesBuilder], Dict[str, array], int]:
+    parser = MetricLineParser(loads=loads)
+    series: Dict[str, SeriesBuilder] = {}
+    synthetic: Dict[str, array] = {}
+    with open(path, "rb") as f:
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as view:
+            scan_bytes(view, start, end, parser, series, synthetic)
+    return series, synthetic, parser.global_step
+
+
+def _split(view: Any, size: int, count: int) -> List[Tuple[int, int]]:
+    bounds = [0]
+    for k in range(1, count):
+        target = max(size * k // count, bounds[-1])
+        newline = view.find(b"\n", target)
+        if newline < 0:
+            break
+        if newline + 1 > bounds[-1]:
+            bounds.append(newline + 1)
+    if bounds[-1] < size:
+        bounds.append(size)
+    return list(zip(bounds, bounds[1:]))
+
+
+def _merge(pieces: Iterable[Tuple[Dict[str, SeriesBuilder], Dict[str, array], int]]) -> Dict[str, SeriesBuilder]:
+    # Pieces after the first numbered their step-less lines from 0; shift
+    # them by the count of such lines in the pieces before.
+    series: Dict[str, SeriesBuilder] = {}
+    base = 0
+    for piece, synthetic, counted in pieces:
+        for name, builder in piece.items():
+            if base:
+                steps = builder.steps
+                for index in synthetic.get(name, ()):
+                    steps[index] += base
+            merged = series.get(name)
+            if merged is None:
+                series[name] = builder
+            else:
+                merged.steps.extend(builder.steps)
+                merged.values.extend(builder.values)
+        base += counted
+    return series
+
+
+def scan_metric_log(log_path: Path, jobs: Optional[int] = None) -> Tuple[Dict[str, SeriesBuilder], int]:
+    """
+    Parse the METRIC lines of a log (plain or compressed) into series.
+
+    Plain logs are mmapped and scanned for the METRIC marker; from
+    PARALLEL_MIN_BYTES up they are split at line boundaries and the pieces
+    parsed across up to jobs processes (default: all CPUs). Compressed logs
+    are decompressed and scanned a chunk at a time. Payloads are decoded
+    with orjson when it is installed.
+
+    Returns (series, number of lines numbered by the step counter), or
+    ({}, 0) if the log is missing; raises OSError if it cannot be read.
+    """
+    found = find_file(Path(log_path))
+    if found is None:
+        return {}, 0
+
+    if found.suffix in (".gz", ".zst"):
+        parser = MetricLineParser(loads=loads)
+        series: Dict[str, SeriesBuilder] = {}
+        carry = b""
+        for chunk in iter_chunks(found, _CHUNK):
+            data = carry + chunk
+            cut = data.rfind(b"\n") + 1  # complete lines only; the rest carries over
+            scan_bytes(data, 0, cut, parser, series)
+            carry = data[cut:]
+        scan_bytes(carry, 0, len(carry), parser, series)
+        return series, parser.global_step
+
+    size = found.stat().st_size
+    if not size:
+        return {}, 0
+    jobs = jobs or os.cpu_count() or 1
+    if jobs == 1 or size < PARALLEL_MIN_BYTES:
+        series, _synthetic, counted = _parse_piece(str(found), 0, size)
+        return series, counted
+
+    with found.open("rb") as f:
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as view:
+            ranges = _split(view, size, max(jobs, size // _PIECE))
+    with ProcessPoolExecutor(max_workers=min(jobs, len(ranges))) as pool:
+        futures = [pool.submit(_parse_piece, str(found), start, end) for start, end in ranges]
+        pieces = [future.result() for future in futures]
+    return _merge(pieces), sum(counted for _, _, counted in pieces)
+
+
+def parse_metric_log(log_path: Path, jobs: Optional[int] = None) -> Dict[str, SeriesBuilder]:
+    """Series of scan_metric_log: {} if the log is missing; OSError if unreadable."""
+    return scan_metric_log(log_path, jobs)[0]
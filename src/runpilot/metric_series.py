@@ -0,0 +1,281 @@
+from __future__ import annotations
+
+import bisect
+import mmap
+import os
+import struct
+import sys
+from array import array
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+try:
+    import numpy  # optional: zero-copy columns over the mmap
+except ImportError:  # pragma: no cover - exercised when numpy is absent
+    numpy = None
+
+SERIES_FILENAME = "metrics.series"
+SERIES_FORMAT = "runpilot-series/1"
+_MAGIC = b"RPSERIES"
+# Block header: tag, name length, flags (unused), point count. The name
+# follows, padded to 8 bytes, then the int64 step column and the float64
+# value column, both little-endian. A metric may span several blocks (one
+# per append); readers concatenate them in file order.
+_BLOCK = struct.Struct("<4sHHQ")
+_TAG = b"BLK1"
+_BIG_ENDIAN = sys.byteorder == "big"
+
+
+def _pad(n: int) -> int:
+    return (8 - n % 8) % 8
+
+
+class SeriesBuilder:
+    """Growable step/value columns (16 bytes per point) for one metric."""
+
+    __slots__ = ("steps", "values")
+
+    def __init__(self) -> None:
+        self.steps = array("q")
+        self.values = array("d")
+
+    def append(self, step: int, value: float) -> None:
+        self.steps.append(step)
+        self.values.append(value)
+
+    def __len__(self) -> int:
+        return len(self.steps)
+
+
+class MetricSeries:
+    """
+    Step and value columns of one metric.
+
+    Columns are NumPy arrays (views over the mmapped sidecar where possible)
+    if NumPy is installed, otherwise array.array copies.
+    """
+
+    def __init__(self, name: str, steps: Any, values: Any):
+        self.name = name
+        self.steps = steps
+        self.values = values
+
+    def __len__(self) -> int:
+        return len(self.steps)
+
+    def _is_sorted(self) -> bool:
+        if numpy is not None and isinstance(self.steps, numpy.ndarray):
+            return bool(len(self.steps) < 2 or (numpy.diff(self.steps) >= 0).all())
+        return all(a <= b for a, b in zip(self.steps, self.steps[1:]))
+
+    def slice(self, start: Optional[int] = None, stop: Optional[int] = None) -> "MetricSeries":
+        """Points with start <= step < stop (binary search when steps are sorted)."""
+        if start is None and stop is None:
+            return self
+        if self._is_sorted():
+            lo = 0 if start is None else bisect.bisect_left(self.steps, start)
+            hi = len(self.steps) if stop is None else bisect.bisect_left(self.steps, stop)
+            return MetricSeries(self.name, self.steps[lo:hi], self.values[lo:hi])
+        keep = [
+            i
+            for i, step in enumerate(self.steps)
+            if (start is None or step >= start) and (stop is None or step < stop)
+        ]
+        if numpy is not None and isinstance(self.steps, numpy.ndarray):
+            return MetricSeries(self.name, self.steps[keep], self.values[keep])
+        return MetricSeries(
+            self.name,
+            array("q", (self.steps[i] for i in keep)),
+            array("d", (self.values[i] for i in keep)),
+        )
+
+    def points(self) -> List[Dict[str, float]]:
+        """The series as [{"step": ..., "value": ...}] (the metrics.json shape)."""
+        return [{"step": int(s), "value": float(v)} for s, v in zip(self.steps, self.values)]
+
+
+def _column_bytes(values: Any, typecode: str) -> bytes:
+    if numpy is not None and isinstance(values, numpy.ndarray):
+        return numpy.ascontiguousarray(values, dtype="<i8" if typecode == "q" else "<f8").tobytes()
+    column = values if isinstance(values, array) and values.typecode == typecode else array(typecode, values)
+    if _BIG_ENDIAN:
+        column = array(typecode, column)
+        column.byteswap()
+    return column.tobytes()
+
+
+def _encode_block(name: str, steps: Any, values: Any) -> bytes:
+    encoded = name.encode("utf-8")
+    count = len(steps)
+    if len(values) != count:
+        raise ValueError(f"Series {name!r} has {count} steps but {len(values)} values")
+    return b"".join(
+        [
+            _BLOCK.pack(_TAG, len(encoded), 0, count),
+            encoded,
+            b"\0" * _pad(len(encoded)),
+            _column_bytes(steps, "q"),
+            _column_bytes(values, "d"),
+        ]
+    )
+
+
+def _as_columns(series: Any) -> Tuple[Any, Any]:
+    if isinstance(series, (SeriesBuilder, MetricSeries)):
+        return series.steps, series.values
+    steps, values = series
+    return steps, values
+
+
+def write_series(path: Path, series: Dict[str, Any], append: bool = False) -> None:
+    """
+    Write metric series to a sidecar file.
+
+    series maps metric names to a SeriesBuilder, a MetricSeries or a
+    (steps, values) pair. Without append the file is replaced atomically;
+    with append the points are added after the ones already stored.
+    """
+    path = Path(path)
+    blocks = [_encode_block(name, *_as_columns(s)) for name, s in series.items() if len(_as_columns(s)[0])]
+    if append and path.exists() and path.stat().st_size >= len(_MAGIC):
+        with path.open("ab") as f:
+            f.write(b"".join(blocks))
+        return
+    tmp_path = path.with_name(path.name + ".tmp")
+    with tmp_path.open("wb") as f:
+        f.write(_MAGIC)
+        f.write(b"".join(blocks))
+    os.replace(tmp_path, path)
+
+
+def _scan(buffer: Any, size: int) -> Dict[str, List[Tuple[int, int]]]:
+    """(count, offset of the step column) of each block, per metric, in file order."""
+    blocks: Dict[str, List[Tuple[int, int]]] = {}
+    if size < len(_MAGIC) or buffer[: len(_MAGIC)] != _MAGIC:
+        return blocks
+    pos = len(_MAGIC)
+    while pos + _BLOCK.size <= size:
+        tag, name_len, _flags, count = _BLOCK.unpack_from(buffer, pos)
+        if tag != _TAG:
+            break
+        data = pos + _BLOCK.size + name_len + _pad(name_len)
+        end = data + 16 * count
+        if end > size:
+            break  # torn append: ignore the partial block
+        name = bytes(buffer[pos + _BLOCK.size : pos + _BLOCK.size + name_len]).decode("utf-8", "replace")
+        blocks.setdefault(name, []).append((count, data))
+        pos = end
+    return blocks
+
+
+def _column(buffer: Any, parts: List[Tuple[int, int]], values: bool) -> Any:
+    if numpy is not None:
+        dtype = "<f8" if values else "<i8"
+        pieces = [
+            numpy.frombuffer(buffer, dtype=dtype, count=count, offset=data + (8 * count if values else 0))
+            for count, data in parts
+        ]
+        return pieces[0] if len(pieces) == 1 else numpy.concatenate(pieces)
+    column = array("d" if values else "q")
+    for count, data in parts:
+        start = data + (8 * count if values else 0)
+        column.frombytes(buffer[start : start + 8 * count])
+    if _BIG_ENDIAN:
+        column.byteswap()
+    return column
+
+
+def read_series(
+    path: Path,
+    names: Optional[Iterable[str]] = None,
+    start: Optional[int] = None,
+    stop: Optional[int] = None,
+) -> Dict[str, MetricSeries]:
+    """
+    Read metric series from a sidecar file, optionally only some metrics and
+    only steps in [start, stop).
+
+    The file is mmapped: only block headers and the requested columns are
+    touched, and with NumPy single-block columns are views, not copies.
+    Returns {} if the file is missing or not a series file.
+    """
+    wanted = set(names) if names is not None else None
+    try:
+        with Path(path).open("rb") as f:
+            size = os.fstat(f.fileno()).st_size
+            if size < len(_MAGIC):
+                return {}
+            buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    except OSError:
+        return {}
+
+    result: Dict[str, MetricSeries] = {}
+    for name, parts in _scan(buffer, size).items():
+        if wanted is not None and name not in wanted:
+            continue
+        series = MetricSeries(name, _column(buffer, parts, False), _column(buffer, parts, True))
+        result[name] = series.slice(start, stop)
+    if numpy is None:
+        buffer.close()  # array columns are copies; NumPy views keep the map alive
+    return result
+
+
+def describe_file(path: Path) -> Dict[str, Dict[str, Any]]:
+    """
+    Per-metric point counts and step ranges of a sidecar, for the
+    metrics.json pointer. Only block headers and two steps per metric are read.
+    """
+    try:
+        with Path(path).open("rb") as f:
+            data = f.read(len(_MAGIC))
+            if data != _MAGIC:
+                return {}
+            buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    except (OSError, ValueError):
+        return {}
+    with buffer:
+        info = {}
+        for name, parts in _scan(buffer, len(buffer)).items():
+            parts = [(count, data) for count, data in parts if count]
+            if not parts:
+                continue
+            first_count, first_data = parts[0]
+            last_count, last_data = parts[-1]
+            info[name] = {
+                "points": sum(count for count, _ in parts),
+                "first_step": struct.unpack_from("<q", buffer, first_data)[0],
+                "last_step": struct.unpack_from("<q", buffer, last_data + 8 * (last_count - 1))[0],
+            }
+    return info
+
+
+def compact_series(path: Path) -> bool:
+    """
+    Rewrite a sidecar with one block per metric if appends split any metric
+    into several, so readers get contiguous (zero-copy) columns again.
+    Returns True if the file was rewritten.
+    """
+    try:
+        with Path(path).open("rb") as f:
+            if f.read(len(_MAGIC)) != _MAGIC:
+                return False
+            buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    except (OSError, ValueError):
+        return False
+    with buffer:
+        blocks = _scan(buffer, len(buffer))
+        if all(len(parts) <= 1 for parts in blocks.values()):
+            return False
+        series = {
+            name: (_copy(_column(buffer, parts, False), "q"), _copy(_column(buffer, parts, True), "d"))
+            for name, parts in blocks.items()
+        }
+    write_series(path, series)
+    return True
+
+
+def _copy(column: Any, typecode: str) -> Any:
+    # NumPy columns may be views over the map, which is closed before writing.
+    if numpy is not None and isinstance(column, numpy.ndarray):
+        return column.copy()
+    return column
@@ -1,13 +1,35 @@
 from __future__ import annotations
 
+import base64
+import fcntl
 import json
-from dataclasses import dataclass, asdict
+import os
+from dataclasses import dataclass, asdict, field
 from datetime import datetime, timezone
 from pathlib import Path
-from typing import Any, Dict, List, Optional
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from .log_store import LOG_FILENAME, file_size, find_file, open_binary, open_text
+from .metric_parse import MetricLineParser, loads, parse_metric_log, scan_bytes, scan_metric_log
+from .metric_series import (
+    SERIES_FILENAME,
+    SERIES_FORMAT,
+    MetricSeries,
+    SeriesBuilder,
+    compact_series,
+    describe_file,
+    read_series,
+    write_series,
+)
 
 
 METRICS_FILENAME = "metrics.json"
+# Checkpoint of the incremental log parser (see refresh_metrics).
+STATE_FILENAME = "metrics.state.json"
+_READ_SIZE = 1024 * 1024
+DOWNSAMPLE_METHODS = ("lttb", "minmax")
+# Points per series sent to the cloud (RUNPILOT_METRIC_POINTS; 0 = all).
+DEFAULT_METRIC_POINTS = 2000
 
 
 @dataclass
@@ -17,6 +39,8 @@ class Metrics:
     time_series: Dict[str, List[float]] | None = None
     tags: List[str] | None = None
     recorded_at: str | None = None
+    # Pointer to the columnar sidecar holding the full series (see metric_series).
+    series: Dict[str, Any] | None = None
 
     def to_dict(self) -> Dict[str, Any]:
         data = asdict(self)
@@ -35,22 +59,44 @@ def write_metrics(
     summary: Dict[str, float],
     time_series: Dict[str, List[float]] | None = None,
     tags: List[str] | None = None,
+    series: Dict[str, Any] | None = None,
+    append_series: bool = False,
 ) -> Path:
-    """Write metrics.json into the run directory."""
+    """
+    Write metrics.json into the run directory.
+
+    series (metric name -> SeriesBuilder, MetricSeries or (steps, values))
+    is stored in the columnar sidecar, replacing it or, with append_series,
+    extending it, and metrics.json records a pointer to it with per-metric
+    point counts. Without series, an existing pointer is kept so rewriting
+    the summary does not orphan the sidecar.
+    """
     run_dir = Path(run_dir)
     run_dir.mkdir(parents=True, exist_ok=True)
 
+    if series is not None:
+        sidecar = run_dir / SERIES_FILENAME
+        write_series(sidecar, series, append=append_series)
+        pointer = {"file": SERIES_FILENAME, "format": SERIES_FORMAT, "metrics": describe_file(sidecar)}
+    else:
+        pointer = (read_metrics(run_dir) or {}).get("series")
+
     metrics = Metrics(
         run_id=run_id,
         summary=summary,
         time_series=time_series,
         tags=tags,
+        series=pointer,
     )
 
     path = metrics_path(run_dir)
     with path.open("w", encoding="utf-8") as f:
         json.dump(metrics.to_dict(), f, indent=2, sort_keys=True)
 
+    # Keep the run index's copy of the summary current (for `runpilot query`).
+    from .run_index import index_run_dir
+
+    index_run_dir(run_dir)
     return path
 
 
@@ -67,6 +113,309 @@ def read_metrics(run_dir: Path) -> Optional[Dict[str, Any]]:
         return None
 
 
+def load_metric_series(
+    run_dir: Path,
+    names: Optional[Iterable[str]] = None,
+    start: Optional[int] = None,
+    stop: Optional[int] = None,
+) -> Dict[str, MetricSeries]:
+    """
+    Read a run's metric series from its sidecar, optionally only some
+    metrics and only steps in [start, stop). Returns {} if there is none.
+    """
+    run_dir = Path(run_dir)
+    pointer = (read_metrics(run_dir) or {}).get("series") or {}
+    return read_series(run_dir / pointer.get("file", SERIES_FILENAME), names, start, stop)
+
+
+def _lttb(steps: Any, values: Any, target: int) -> List[int]:
+    # Largest-Triangle-Three-Buckets: keep the first and last points, and
+    # from each of target - 2 buckets the point forming the largest triangle
+    # with the point kept before it and the average of the next bucket.
+    n = len(values)
+    every = (n - 2) / (target - 2)
+    kept = [0]
+    a = 0
+    for i in range(target - 2):
+        next_start = int((i + 1) * every) + 1
+        next_end = min(int((i + 2) * every) + 1, n)
+        if next_start >= next_end:
+            next_start, next_end = n - 1, n
+        count = next_end - next_start
+        avg_x = sum(steps[next_start:next_end]) / count
+        avg_y = sum(values[next_start:next_end]) / count
+
+        ax, ay = steps[a], values[a]
+        best, best_area = -1, -1.0
+        for j in range(int(i * every) + 1, int((i + 1) * every) + 1):
+            area = abs((ax - avg_x) * (values[j] - ay) - (ax - steps[j]) * (avg_y - ay))
+            if area > best_area or best < 0:
+                best, best_area = j, area
+        kept.append(best)
+        a = best
+    kept.append(n - 1)
+    return kept
+
+
+def _minmax(values: Any, target: int) -> List[int]:
+    # The lowest and highest point of each of target / 2 buckets, in order.
+    n = len(values)
+    buckets = target // 2
+    if not buckets:
+        return [n - 1]
+    kept: List[int] = []
+    for b in range(buckets):
+        start, end = n * b // buckets, n * (b + 1) // buckets
+        if start >= end:
+            continue
+        low = min(range(start, end), key=values.__getitem__)
+        high = max(range(start, end), key=values.__getitem__)
+        kept.extend(sorted({low, high}))
+    return kept
+
+
+def downsample(
+    steps: Any,
+    values: Any,
+    target: int,
+    method: str = "lttb",
+) -> Tuple[List[int], List[float]]:
+    """
+    Reduce a series to at most target points for charts and uploads.
+
+    "lttb" (Largest-Triangle-Three-Buckets) keeps the points that preserve
+    the curve's visual shape; "minmax" keeps each bucket's lowest and
+    highest value, so spikes survive. Both keep points in order and return
+    existing points, never interpolated ones. A target of 0 (or at least the
+    series length) returns the series unchanged.
+    """
+    if method not in DOWNSAMPLE_METHODS:
+        raise ValueError(f"Unknown downsampling method {method!r} (expected {', '.join(DOWNSAMPLE_METHODS)})")
+    n = len(values)
+    if target <= 0 or n <= target:
+        return [int(s) for s in steps], [float(v) for v in values]
+    steps = [int(s) for s in steps]
+    values = [float(v) for v in values]
+    if method == "minmax":
+        kept = _minmax(values, target)
+    elif target < 3:
+        kept = [0, n - 1][-target:]
+    else:
+        kept = _lttb(steps, values, target)
+    return [steps[i] for i in kept], [values[i] for i in kept]
+
+
+def downsample_series(series: MetricSeries, target: int, method: str = "lttb") -> MetricSeries:
+    """A MetricSeries reduced with downsample (the full series stays on disk)."""
+    steps, values = downsample(series.steps, series.values, target, method)
+    return MetricSeries(series.name, steps, values)
+
+
+def metric_points_from_env() -> int:
+    """Target points per uploaded series: RUNPILOT_METRIC_POINTS, else the default."""
+    value = os.environ.get("RUNPILOT_METRIC_POINTS", "").strip()
+    try:
+        return max(0, int(value)) if value else DEFAULT_METRIC_POINTS
+    except ValueError:
+        return DEFAULT_METRIC_POINTS
+
+
+def metrics_payload(
+    run_dir: Path,
+    target: Optional[int] = None,
+    method: str = "lttb",
+) -> Optional[Dict[str, Any]]:
+    """
+    The {"summary", "time_series"} body uploaded to the cloud for a run.
+
+    time_series maps each metric to [{"step", "value"}] downsampled to
+    target points (default metric_points_from_env(); 0 sends every point),
+    read from the series sidecar; runs without one send the time_series
+    stored in metrics.json. Returns None if metrics.json is missing or
+    invalid.
+    """
+    data = read_metrics(run_dir)
+    if not isinstance(data, dict):
+        return None
+    target = metric_points_from_env() if target is None else target
+    time_series: Any = data.get("time_series")
+    stored = load_metric_series(run_dir)
+    if stored:
+        time_series = {name: downsample_series(s, target, method).points() for name, s in stored.items()}
+    return {"summary": data.get("summary", data) or {}, "time_series": time_series or []}
+
+
+def iter_metric_points(lines: Iterable[str]) -> Iterator[Tuple[str, int, float]]:
+    """
+    Yield (name, step, value) for every METRIC point in lines, in order.
+
+    The line-at-a-time reference for parse_metric_log, which finds the same
+    points by scanning the log's bytes.
+    """
+    return MetricLineParser().points(lines)
+
+
+def parse_metric_series(log_path: Path, jobs: Optional[int] = None) -> Dict[str, SeriesBuilder]:
+    """
+    Parse METRIC lines from a log into columnar series (16 bytes a point).
+
+    Large logs are parsed in parallel (see metric_parse.parse_metric_log).
+    Returns {} if the log is missing or unreadable.
+    """
+    try:
+        return parse_metric_log(Path(log_path), jobs)
+    except OSError:
+        return {}
+
+
+@dataclass
+class ParseState:
+    """
+    Where the incremental parser stopped: bytes of the (uncompressed) log
+    consumed, the trailing incomplete line, the synthetic step counter, the
+    sidecar size that matches, and each metric's last value.
+    """
+
+    offset: int = 0
+    partial: bytes = b""
+    global_step: int = 0
+    series_bytes: int = 0
+    last: Dict[str, float] = field(default_factory=dict)
+
+    def to_dict(self) -> Dict[str, Any]:
+        data = asdict(self)
+        data["partial"] = base64.b64encode(self.partial).decode("ascii")
+        return data
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "ParseState":
+        return cls(
+            offset=int(data["offset"]),
+            partial=base64.b64decode(data.get("partial") or ""),
+            global_step=int(data.get("global_step") or 0),
+            series_bytes=int(data.get("series_bytes") or 0),
+            last={str(k): float(v) for k, v in (data.get("last") or {}).items()},
+        )
+
+
+def load_parse_state(run_dir: Path) -> Optional[ParseState]:
+    try:
+        data = json.loads((Path(run_dir) / STATE_FILENAME).read_text(encoding="utf-8"))
+        return ParseState.from_dict(data)
+    except (OSError, ValueError, KeyError, TypeError, AttributeError):
+        return None
+
+
+def _save_parse_state(run_dir: Path, state: ParseState) -> None:
+    path = Path(run_dir) / STATE_FILENAME
+    tmp_path = path.with_name(path.name + ".tmp")
+    tmp_path.write_text(json.dumps(state.to_dict(), sort_keys=True), encoding="utf-8")
+    os.replace(tmp_path, path)
+
+
+def refresh_metrics(
+    run_dir: Path,
+    final: bool = False,
+    extra_summary: Dict[str, float] | None = None,
+) -> Optional[Path]:
+    """
+    Bring metrics.json and the series sidecar up to date with logs.txt.
+
+    Only the bytes added since the last call are read: the parser's byte
+    offset, trailing partial line and step counter are checkpointed in
+    metrics.state.json, and new points are appended to the sidecar. A
+    sidecar longer than the checkpoint (a refresh that died half way) is cut
+    back; a log shorter than the checkpoint (replaced) or a missing or
+    shorter sidecar starts the parse over. With final (the run has ended)
+    the last line is parsed even without a newline and the sidecar is
+    compacted. extra_summary (e.g. the exit code) is merged into the summary.
+
+    Returns the metrics.json path, or None if there was nothing to record.
+    """
+    run_dir = Path(run_dir)
+    with (run_dir / (STATE_FILENAME + ".lock")).open("a") as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        return _refresh_metrics(run_dir, final, extra_summary)
+
+
+def refresh_live_metrics(run_dir: Path) -> None:
+    """Refresh metrics of a run that is still pending or running (no-op otherwise)."""
+    from .storage import read_run_metadata
+
+    if read_run_metadata(Path(run_dir)).get("status") in ("pending", "running"):
+        refresh_metrics(run_dir)
+
+
+def _refresh_metrics(run_dir: Path, final: bool, extra_summary: Dict[str, float] | None) -> Optional[Path]:
+    log_path = run_dir / LOG_FILENAME
+    sidecar = run_dir / SERIES_FILENAME
+    try:
+        log_size = file_size(log_path)
+    except FileNotFoundError:
+        log_size = None
+
+    state = load_parse_state(run_dir)
+    if state is not None:
+        stored = sidecar.stat().st_size if sidecar.exists() else 0
+        if log_size is None or log_size < state.offset or stored < state.series_bytes:
+            state = None
+        elif stored > state.series_bytes:
+            os.truncate(sidecar, state.series_bytes)
+    append = state is not None
+    if state is None:
+        state = ParseState()
+
+    parser = MetricLineParser(state.global_step, loads)
+    new: Dict[str, SeriesBuilder] = {}
+    if log_size and not append and final:
+        # The whole log at once (e.g. a run nobody refreshed while it ran):
+        # large logs are parsed in parallel.
+        try:
+            new, parser.global_step = scan_metric_log(log_path)
+        except OSError:
+            return None
+        state.offset = log_size
+    elif log_size is not None and (log_size > state.offset or (final and state.partial)):
+        try:
+            with open_binary(log_path) as f:
+                f.seek(state.offset)
+                while True:
+                    chunk = f.read(_READ_SIZE)
+                    if not chunk:
+                        break
+                    state.offset += len(chunk)
+                    data = state.partial + chunk
+                    # Lines end at \r too (as in scan_bytes): progress bars
+                    # rewrite one line with \r and may not print \n for an
+                    # epoch, which must not all pile up in the checkpoint.
+                    # A \r\n split across chunks only adds an empty line.
+                    cut = max(data.rfind(b"\n"), data.rfind(b"\r")) + 1
+                    state.partial = data[cut:]
+                    scan_bytes(data, 0, cut, parser, new)
+        except OSError:
+            return None
+        if final and state.partial:
+            scan_bytes(state.partial, 0, len(state.partial), parser, new)
+            state.partial = b""
+    state.global_step = parser.global_step
+    for name, builder in new.items():
+        if len(builder):
+            state.last[name] = builder.values[-1]
+
+    summary: Dict[str, float] = dict(state.last)
+    summary.update(extra_summary or {})
+    path: Optional[Path] = None
+    if summary and (new or final or not append or not metrics_path(run_dir).exists()):
+        path = write_metrics(run_dir, run_dir.name, summary, series=new, append_series=append)
+        if final:
+            compact_series(sidecar)  # same points, so the pointer stays valid
+    elif metrics_path(run_dir).exists():
+        path = metrics_path(run_dir)
+    state.series_bytes = sidecar.stat().st_size if sidecar.exists() else 0
+    _save_parse_state(run_dir, state)
+    return path
+
+
 def parse_metrics_from_log(log_path: Path) -> Dict[str, Any]:
     """
     Parse metrics from a log file.
@@ -100,71 +449,16 @@ def parse_metrics_from_log(log_path: Path) -> Dict[str, Any]:
 
     In that case, synthetic step numbers are assigned in order of appearance.
     """
+    # Line by line into dicts rather than through the int64 columns, so
+    # steps of any size are kept. Compressed logs read the same as plain ones.
+    series: Dict[str, List[Dict[str, float]]] = {}
     log_path = Path(log_path)
-    if not log_path.exists():
+    if find_file(log_path) is None:
         return {}
-
-    series: Dict[str, List[Dict[str, float]]] = {}
-    global_step = 0
-
     try:
-        with log_path.open("r", encoding="utf-8") as f:
-            for line in f:
-                line = line.strip()
-                if not line.startswith("METRIC "):
-                    continue
-
-                metric_part = line[len("METRIC ") :].strip()
-                if not metric_part:
-                    continue
-
-                # Case 1: JSON payload
-                if metric_part.startswith("{"):
-                    try:
-                        import json as _json
-
-                        payload = _json.loads(metric_part)
-                        if not isinstance(payload, dict):
-                            continue
-
-                        step_val = payload.get("step")
-                        try:
-                            step = int(step_val)
-                        except (TypeError, ValueError):
-                            global_step += 1
-                            step = global_step
-
-                        for key, value in payload.items():
-                            if key == "step":
-                                continue
-                            try:
-                                val_f = float(value)
-                            except (TypeError, ValueError):
-                                continue
-                            metric_series = series.setdefault(key, [])
-                            metric_series.append({"step": step, "value": val_f})
-
-                        continue
-                    except Exception:
-                        # Fall back to other parsing below
-                        pass
-
-                # Case 2: key=value format
-                if "=" in metric_part:
-                    name, value_str = metric_part.split("=", 1)
-                    name = name.strip()
-                    value_str = value_str.strip()
-                    if not name:
-                        continue
-
-                    try:
-                        val_f = float(value_str)
-                    except ValueError:
-                        continue
-
-                    global_step += 1
-                    metric_series = series.setdefault(name, [])
-                    metric_series.append({"step": global_step, "value": val_f})
+        with open_text(log_path) as f:
+            for name, step, value in iter_metric_points(f):
+                series.setdefault(name, []).append({"step": step, "value": value})
     except OSError:
         return {}
 
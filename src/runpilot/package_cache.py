@@ -0,0 +1,256 @@
+from __future__ import annotations
+
+import fcntl
+import hashlib
+import json
+import os
+import subprocess
+from contextlib import contextmanager
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterator, List, Optional
+
+from .storage import get_root_dir
+
+INDEX_FILENAME = "package_caches.json"
+DEFAULT_MAX_BYTES = 50 * 1024**3
+VOLUME_PREFIX = "runpilot-cache"
+CONTAINER_ROOT = "/runpilot-cache"
+
+# kind -> env var pointing the tool at its cache directory inside the container.
+CACHE_KINDS = {
+    "pip": "PIP_CACHE_DIR",
+    "huggingface": "HF_HOME",
+    "torch": "TORCH_HOME",
+}
+
+
+@dataclass
+class CacheVolume:
+    kind: str
+    name: str
+    image: str
+
+    @property
+    def container_path(self) -> str:
+        return f"{CONTAINER_ROOT}/{self.kind}"
+
+    @property
+    def env_var(self) -> str:
+        return CACHE_KINDS[self.kind]
+
+
+def max_cache_bytes() -> int:
+    """Size budget across all cache volumes, from RUNPILOT_PACKAGE_CACHE_MAX_BYTES."""
+    value = os.environ.get("RUNPILOT_PACKAGE_CACHE_MAX_BYTES")
+    try:
+        return int(value) if value else DEFAULT_MAX_BYTES
+    except ValueError:
+        return DEFAULT_MAX_BYTES
+
+
+def volume_name(image: str, kind: str) -> str:
+    # Volumes are per image: wheels and weights built for one base image
+    # (Python version, CUDA, libc) are not safe to share with another.
+    digest = hashlib.sha1(image.encode("utf-8")).hexdigest()[:12]
+    return f"{VOLUME_PREFIX}-{kind}-{digest}"
+
+
+def cache_volumes(image: str, kinds: List[str], key: Optional[str] = None) -> List[CacheVolume]:
+    """
+    Cache volumes of the given kinds for a job running image.
+
+    Volumes are named after key (default: the image). Built images pass
+    their stable repository, so a rebuild with a new content tag keeps its
+    caches.
+    """
+    unknown = [k for k in kinds if k not in CACHE_KINDS]
+    if unknown:
+        raise ValueError(
+            f"Unknown cache kind(s): {', '.join(unknown)} "
+            f"(expected {', '.join(sorted(CACHE_KINDS))})"
+        )
+    return [CacheVolume(kind, volume_name(key or image, kind), image) for kind in kinds]
+
+
+def _docker(args: List[str], timeout: float = 120) -> subprocess.CompletedProcess:
+    return subprocess.run(
+        ["docker", *args], capture_output=True, text=True, timeout=timeout
+    )
+
+
+def docker_args(volumes: List[CacheVolume], env_vars: Dict[str, str]) -> List[str]:
+    """
+    `docker run` arguments mounting each volume and pointing its tool at it.
+
+    Env vars the job already sets win, so a config can still redirect a
+    cache somewhere else.
+    """
+    args: List[str] = []
+    for vol in volumes:
+        args.extend(["-v", f"{vol.name}:{vol.container_path}"])
+        if vol.env_var not in env_vars:
+            args.extend(["-e", f"{vol.env_var}={vol.container_path}"])
+    return args
+
+
+def ensure_volumes(volumes: List[CacheVolume]) -> None:
+    """
+    Create the labelled volumes. Failures (including a hung docker) are
+    ignored: `docker run -v` still creates a missing volume, just unlabelled.
+    """
+    for vol in volumes:
+        try:
+            _docker(
+                [
+                    "volume",
+                    "create",
+                    "--label",
+                    "runpilot.cache=1",
+                    "--label",
+                    f"runpilot.cache.kind={vol.kind}",
+                    vol.name,
+                ]
+            )
+        except (OSError, subprocess.SubprocessError):
+            continue
+
+
+def measure(volumes: List[CacheVolume]) -> Dict[str, Optional[int]]:
+    """
+    Return bytes used by each volume, or None where it could not be measured.
+
+    Uses one short-lived container of the job's own image, so no extra
+    image has to be pulled. Images without `du` simply go unmeasured.
+    """
+    if not volumes:
+        return {}
+    sizes: Dict[str, Optional[int]] = {vol.name: None for vol in volumes}
+    cmd = ["run", "--rm", "--entrypoint", "du"]
+    for vol in volumes:
+        cmd.extend(["-v", f"{vol.name}:{vol.container_path}:ro"])
+    cmd.append(volumes[0].image)
+    cmd.extend(["-sk", *(vol.container_path for vol in volumes)])
+
+    try:
+        result = _docker(cmd)
+    except (OSError, subprocess.SubprocessError):
+        return sizes
+
+    by_path = {vol.container_path: vol.name for vol in volumes}
+    for line in result.stdout.splitlines():
+        parts = line.split(None, 1)
+        if len(parts) == 2 and parts[0].isdigit() and parts[1].strip() in by_path:
+            sizes[by_path[parts[1].strip()]] = int(parts[0]) * 1024
+    return sizes
+
+
+@contextmanager
+def _locked_index() -> Iterator[Dict[str, Any]]:
+    root = get_root_dir()
+    root.mkdir(parents=True, exist_ok=True)
+    path = root / INDEX_FILENAME
+    with (root / (INDEX_FILENAME + ".lock")).open("w") as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        try:
+            index: Dict[str, Any] = json.loads(path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            index = {}
+        index.setdefault("volumes", {})
+
+        yield index
+
+        tmp_path = path.with_suffix(".tmp")
+        tmp_path.write_text(json.dumps(index, indent=2, sort_keys=True), encoding="utf-8")
+        os.replace(tmp_path, path)
+
+
+def record_usage(
+    volumes: List[CacheVolume],
+    before: Dict[str, Optional[int]],
+    after: Dict[str, Optional[int]],
+) -> Dict[str, Dict[str, Any]]:
+    """
+    Update the volume index and return the per-run report for run.json.
+
+    Docker does not expose read accounting for volumes, so bytes served is
+    estimated as the warm cache content the run started with; bytes added
+    is what the run downloaded into the cache.
+    """
+    now = datetime.now(timezone.utc).isoformat()
+    report: Dict[str, Dict[str, Any]] = {}
+
+    with _locked_index() as index:
+        for vol in volumes:
+            size_before = before.get(vol.name)
+            size_after = after.get(vol.name)
+            served = size_before or 0
+            added = max(0, (size_after or 0) - (size_before or 0))
+
+            entry = index["volumes"].setdefault(
+                vol.name,
+                {"kind": vol.kind, "image": vol.image, "runs": 0, "bytes_served": 0},
+            )
+            entry["image"] = vol.image
+            entry["runs"] += 1
+            entry["bytes_served"] += served
+            entry["last_used"] = now
+            if size_after is not None:
+                entry["bytes"] = size_after
+
+            report[vol.kind] = {
+                "volume": vol.name,
+                "bytes_before": size_before,
+                "bytes_after": size_after,
+                "bytes_served": served,
+                "bytes_added": added,
+            }
+
+    return report
+
+
+def enforce_budget(max_bytes: Optional[int] = None, keep: Optional[List[str]] = None) -> List[str]:
+    """
+    Remove least recently used cache volumes until the total fits the budget.
+
+    Volumes in `keep` and volumes mounted by a running container (docker
+    refuses to remove those) survive. Returns the names removed.
+    """
+    max_bytes = max_cache_bytes() if max_bytes is None else max_bytes
+    keep_set = set(keep or [])
+    removed: List[str] = []
+
+    with _locked_index() as index:
+        volumes = index["volumes"]
+        total = sum(int(v.get("bytes") or 0) for v in volumes.values())
+        for name, entry in sorted(volumes.items(), key=lambda item: item[1].get("last_used", "")):
+            if total <= max_bytes:
+                break
+            if name in keep_set:
+                continue
+            try:
+                result = _docker(["volume", "rm", name])
+            except (OSError, subprocess.SubprocessError):
+                continue
+            if result.returncode != 0 and "no such volume" not in result.stderr.lower():
+                continue
+            total -= int(entry.get("bytes") or 0)
+            removed.append(name)
+        for name in removed:
+            del volumes[name]
+
+    return removed
+
+
+def cache_report() -> Dict[str, Any]:
+    """Totals across all known cache volumes, for `runpilot show`."""
+    try:
+        index = json.loads((get_root_dir() / INDEX_FILENAME).read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        index = {}
+    volumes = index.get("volumes") or {}
+    return {
+        "volumes": len(volumes),
+        "bytes": sum(int(v.get("bytes") or 0) for v in volumes.values()),
+        "bytes_served": sum(int(v.get("bytes_served") or 0) for v in volumes.values()),
+    }
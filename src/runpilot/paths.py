@@ -1,7 +1,15 @@
 from __future__ import annotations
 
 import os
+import re
 from pathlib import Path
+from typing import Iterator, Optional
+
+# Marker in the runs dir recording its layout; absent means "flat".
+LAYOUT_FILENAME = ".layout"
+LAYOUTS = ("flat", "sharded")
+# Run ids start with their UTC creation time; the date is the shard.
+_SHARD_RE = re.compile(r"^(\d{8})T\d{6}Z")
 
 
 def get_base_dir() -> Path:
@@ -21,8 +29,78 @@ def get_runs_dir() -> Path:
     return get_base_dir() / "runs"
 
 
+def get_layout(runs_dir: Path) -> str:
+    """
+    Return the layout of a runs dir: "flat" (runs/<id>) or "sharded"
+    (runs/<YYYYMMDD>/<id>).
+    """
+    try:
+        layout = (runs_dir / LAYOUT_FILENAME).read_text(encoding="utf-8").strip()
+    except OSError:
+        return "flat"
+    return layout if layout in LAYOUTS else "flat"
+
+
+def set_layout(runs_dir: Path, layout: str) -> None:
+    if layout not in LAYOUTS:
+        raise ValueError(f"Unknown runs layout {layout!r} (expected {', '.join(LAYOUTS)})")
+    runs_dir.mkdir(parents=True, exist_ok=True)
+    (runs_dir / LAYOUT_FILENAME).write_text(layout + "\n", encoding="utf-8")
+
+
+def shard_for(run_id: str) -> Optional[str]:
+    """Shard directory name for a run id, or None for ids without a date prefix."""
+    match = _SHARD_RE.match(run_id)
+    return match.group(1) if match else None
+
+
+def is_shard_name(name: str) -> bool:
+    return len(name) == 8 and name.isdigit()
+
+
+def run_dir_in(runs_dir: Path, run_id: str) -> Path:
+    """
+    Return where run_id lives under runs_dir.
+
+    Existing runs are found in either layout, so flat IDs keep resolving
+    after the store is sharded (and half-migrated stores work). A run that
+    does not exist yet maps to its place in the current layout.
+    """
+    flat = runs_dir / run_id
+    shard = shard_for(run_id)
+    if shard is None:
+        return flat
+    sharded = runs_dir / shard / run_id
+    if sharded.exists():
+        return sharded
+    if flat.exists():
+        return flat
+    return sharded if get_layout(runs_dir) == "sharded" else flat
+
+
+def iter_run_dirs(runs_dir: Path) -> Iterator[os.DirEntry]:
+    """Yield the directory entry of every run, in either layout."""
+    with os.scandir(runs_dir) as entries:
+        for entry in entries:
+            if not entry.is_dir():
+                continue
+            if not is_shard_name(entry.name):
+                yield entry
+                continue
+            with os.scandir(entry.path) as shard_entries:
+                for run_entry in shard_entries:
+                    if run_entry.is_dir():
+                        yield run_entry
+
+
+def is_run_location(runs_dir: Path, run_dir: Path) -> bool:
+    """True if run_dir sits where a run of either layout would."""
+    parent = run_dir.parent
+    return parent == runs_dir or (parent.parent == runs_dir and is_shard_name(parent.name))
+
+
 def get_run_dir(run_id: str) -> Path:
     """
     Return the directory path for a specific run id.
     """
-    return get_runs_dir() / run_id
+    return run_dir_in(get_runs_dir(), run_id)
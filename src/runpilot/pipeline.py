@@ -0,0 +1,398 @@
+from __future__ import annotations
+
+import dataclasses
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import yaml
+
+from .config import RunConfig, load_config, resolve_config_path
+from .run_manager import execute_run
+from .storage import create_run_dir, update_run_metadata, write_run_metadata
+
+PROJECT_CONFIG_FILENAME = "runpilot.yaml"
+OUTPUTS_DIR_NAME = "outputs"
+
+
+@dataclass
+class PipelineStep:
+    """One step of a `pipeline:` section in runpilot.yaml."""
+
+    name: str
+    config: str
+    depends_on: List[str] = field(default_factory=list)
+    # env suffix -> "<step>/<relative path inside that step's outputs/>"
+    inputs: Dict[str, str] = field(default_factory=dict)
+    outputs: List[str] = field(default_factory=list)
+
+    def input_sources(self) -> List[Tuple[str, str, str]]:
+        """Return (env suffix, producing step, relative path) for each input."""
+        sources = []
+        for key, ref in self.inputs.items():
+            step_name, _, rel_path = str(ref).partition("/")
+            sources.append((key, step_name, rel_path))
+        return sources
+
+    def all_dependencies(self) -> List[str]:
+        """Explicit depends_on plus every step referenced by an input."""
+        deps = list(self.depends_on)
+        for _, step_name, _ in self.input_sources():
+            if step_name not in deps:
+                deps.append(step_name)
+        return deps
+
+
+@dataclass
+class StepResult:
+    name: str
+    status: str  # finished, failed, skipped
+    run_dir: Optional[Path] = None
+    exit_code: Optional[int] = None
+    started: float = 0.0
+    ended: float = 0.0
+    message: str = ""
+
+    @property
+    def duration(self) -> float:
+        return max(0.0, self.ended - self.started)
+
+
+@dataclass
+class PipelineResult:
+    pipeline_id: str
+    steps: List[PipelineStep]
+    results: Dict[str, StepResult]
+    started: float
+    ended: float
+
+    @property
+    def ok(self) -> bool:
+        return all(r.status == "finished" for r in self.results.values())
+
+    @property
+    def wall_seconds(self) -> float:
+        return max(0.0, self.ended - self.started)
+
+
+def load_pipeline(cwd: Optional[Path] = None) -> List[PipelineStep]:
+    """
+    Load and validate the `pipeline:` section of runpilot.yaml.
+
+    Example:
+
+        pipeline:
+          steps:
+            - name: prepare
+              config: prepare.yaml
+              outputs: [data.csv]
+            - name: train
+              config: train          # file path or `runs:` alias
+              inputs:
+                DATA: prepare/data.csv
+
+    Raises FileNotFoundError if runpilot.yaml is missing and ValueError if the
+    pipeline is malformed (unknown dependencies, duplicate names, cycles).
+    """
+    cwd = Path.cwd() if cwd is None else Path(cwd)
+    project_config = cwd / PROJECT_CONFIG_FILENAME
+    if not project_config.is_file():
+        raise FileNotFoundError(f"No {PROJECT_CONFIG_FILENAME} found in {cwd}")
+
+    data: Any = yaml.safe_load(project_config.read_text(encoding="utf-8")) or {}
+    pipeline = data.get("pipeline") if isinstance(data, dict) else None
+    if not isinstance(pipeline, dict):
+        raise ValueError(f"{project_config} has no 'pipeline:' section")
+
+    raw_steps = pipeline.get("steps") or []
+    if not isinstance(raw_steps, list) or not raw_steps:
+        raise ValueError("pipeline.steps must be a non-empty list")
+
+    steps: List[PipelineStep] = []
+    for raw in raw_steps:
+        if not isinstance(raw, dict) or "name" not in raw or "config" not in raw:
+            raise ValueError("Each pipeline step needs at least 'name' and 'config'")
+        inputs = raw.get("inputs") or {}
+        if not isinstance(inputs, dict):
+            raise ValueError(f"Step '{raw['name']}': inputs must be a mapping")
+        steps.append(
+            PipelineStep(
+                name=str(raw["name"]),
+                config=str(raw["config"]),
+                depends_on=[str(d) for d in raw.get("depends_on") or []],
+                inputs={str(k): str(v) for k, v in inputs.items()},
+                outputs=[str(o) for o in raw.get("outputs") or []],
+            )
+        )
+
+    topological_order(steps)
+    return steps
+
+
+def topological_order(steps: List[PipelineStep]) -> List[str]:
+    """
+    Return step names in dependency order, raising ValueError on bad graphs.
+    """
+    by_name: Dict[str, PipelineStep] = {}
+    for step in steps:
+        if step.name in by_name:
+            raise ValueError(f"Duplicate pipeline step name: {step.name}")
+        by_name[step.name] = step
+
+    for step in steps:
+        for dep in step.all_dependencies():
+            if dep not in by_name:
+                raise ValueError(f"Step '{step.name}' depends on unknown step '{dep}'")
+        for key, producer, rel_path in step.input_sources():
+            if not rel_path:
+                raise ValueError(
+                    f"Step '{step.name}': input {key} must look like '<step>/<path>'"
+                )
+            if rel_path not in by_name[producer].outputs:
+                raise ValueError(
+                    f"Step '{step.name}': input {key} refers to '{rel_path}', "
+                    f"which step '{producer}' does not declare as an output"
+                )
+
+    order: List[str] = []
+    state: Dict[str, int] = {}  # 1 = visiting, 2 = done
+
+    def visit(name: str, trail: List[str]) -> None:
+        if state.get(name) == 2:
+            return
+        if state.get(name) == 1:
+            cycle = " -> ".join(trail + [name])
+            raise ValueError(f"Pipeline has a dependency cycle: {cycle}")
+        state[name] = 1
+        for dep in by_name[name].all_dependencies():
+            visit(dep, trail + [name])
+        state[name] = 2
+        order.append(name)
+
+    for step in steps:
+        visit(step.name, [])
+    return order
+
+
+def _prepare_step_config(
+    step: PipelineStep,
+    cfg: RunConfig,
+    run_dir: Path,
+    results: Dict[str, StepResult],
+) -> RunConfig:
+    """
+    Wire a step's run dir, outputs dir and dependency inputs into its config.
+
+    Paths are exposed through env vars and bind-mounted at the same location
+    for docker runs, so jobs see identical paths either way.
+    """
+    outputs_dir = run_dir / OUTPUTS_DIR_NAME
+    outputs_dir.mkdir(parents=True, exist_ok=True)
+
+    env = dict(cfg.env_vars)
+    env["RUNPILOT_RUN_DIR"] = str(run_dir)
+    env["RUNPILOT_OUTPUT_DIR"] = str(outputs_dir)
+    mounts = list(cfg.mounts) + [f"{run_dir}:{run_dir}"]
+
+    for key, producer, rel_path in step.input_sources():
+        producer_dir = results[producer].run_dir
+        if producer_dir is None:
+            continue
+        producer_outputs = producer_dir / OUTPUTS_DIR_NAME
+        env[f"RUNPILOT_INPUT_{key}"] = str(producer_outputs / rel_path)
+        mount = f"{producer_outputs}:{producer_outputs}:ro"
+        if mount not in mounts:
+            mounts.append(mount)
+
+    return dataclasses.replace(cfg, env_vars=env, mounts=mounts)
+
+
+def _run_step(
+    step: PipelineStep,
+    pipeline_id: str,
+    cwd: Path,
+    results: Dict[str, StepResult],
+    execute: Callable[[RunConfig, Path, Path], int],
+) -> StepResult:
+    started = time.monotonic()
+    try:
+        cfg = load_config(resolve_config_path(step.config, cwd=cwd))
+    except (FileNotFoundError, ValueError) as exc:
+        return StepResult(
+            name=step.name,
+            status="failed",
+            started=started,
+            ended=time.monotonic(),
+            message=str(exc),
+        )
+
+    run_dir = create_run_dir(cfg.name)
+    step_cfg = _prepare_step_config(step, cfg, run_dir, results)
+    write_run_metadata(run_dir, step_cfg, status="pending")
+    update_run_metadata(
+        run_dir,
+        {
+            "pipeline": {
+                "id": pipeline_id,
+                "step": step.name,
+                "depends_on": step.all_dependencies(),
+            }
+        },
+    )
+
+    exit_code = execute(step_cfg, run_dir, cwd)
+    status = "finished" if exit_code == 0 else "failed"
+    message = ""
+
+    if status == "finished":
+        outputs_dir = run_dir / OUTPUTS_DIR_NAME
+        missing = [o for o in step.outputs if not (outputs_dir / o).exists()]
+        if missing:
+            status = "failed"
+            message = f"missing declared outputs: {', '.join(missing)}"
+            write_run_metadata(run_dir, step_cfg, status="failed", exit_code=exit_code)
+
+    return StepResult(
+        name=step.name,
+        status=status,
+        run_dir=run_dir,
+        exit_code=exit_code,
+        started=started,
+        ended=time.monotonic(),
+        message=message,
+    )
+
+
+def run_pipeline(
+    steps: List[PipelineStep],
+    cwd: Optional[Path] = None,
+    max_parallel: Optional[int] = None,
+    execute: Optional[Callable[[RunConfig, Path, Path], int]] = None,
+) -> PipelineResult:
+    """
+    Run pipeline steps, executing independent steps in parallel.
+
+    A step starts as soon as all of its dependencies have finished. After the
+    first failure no new steps are started; running steps are allowed to
+    complete and everything not yet started is reported as skipped.
+    """
+    cwd = Path.cwd() if cwd is None else Path(cwd)
+    if execute is None:
+
+        def execute(cfg: RunConfig, run_dir: Path, work_dir: Path) -> int:
+            return execute_run(cfg, run_dir, working_dir=work_dir)
+
+    topological_order(steps)
+    by_name = {s.name: s for s in steps}
+    pending = [s.name for s in steps]
+    results: Dict[str, StepResult] = {}
+    running: Dict[Future, str] = {}
+    failed = False
+
+    pipeline_id = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+    started = time.monotonic()
+    workers = max_parallel or len(steps)
+
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        while pending or running:
+            if not failed:
+                for name in list(pending):
+                    deps = by_name[name].all_dependencies()
+                    if all(d in results and results[d].status == "finished" for d in deps):
+                        pending.remove(name)
+                        future = pool.submit(
+                            _run_step, by_name[name], pipeline_id, cwd, results, execute
+                        )
+                        running[future] = name
+
+            if not running:
+                break
+
+            done, _ = wait(list(running), return_when=FIRST_COMPLETED)
+            for future in done:
+                name = running.pop(future)
+                try:
+                    result = future.result()
+                except Exception as exc:
+                    now = time.monotonic()
+                    result = StepResult(
+                        name=name, status="failed", started=now, ended=now, message=str(exc)
+                    )
+                results[name] = result
+                if result.status != "finished":
+                    failed = True
+
+    ended = time.monotonic()
+    for name in pending:
+        results[name] = StepResult(
+            name=name, status="skipped", started=ended, ended=ended, message="not started"
+        )
+
+    return PipelineResult(
+        pipeline_id=pipeline_id,
+        steps=steps,
+        results=results,
+        started=started,
+        ended=ended,
+    )
+
+
+def critical_path(result: PipelineResult) -> Tuple[List[str], float]:
+    """
+    Return the chain of dependent steps with the largest summed duration.
+
+    This is the lower bound on wall time no amount of parallelism can beat.
+    """
+    by_name = {s.name: s for s in result.steps}
+    finish: Dict[str, float] = {}
+    parent: Dict[str, Optional[str]] = {}
+
+    for name in topological_order(result.steps):
+        best_dep: Optional[str] = None
+        best = 0.0
+        for dep in by_name[name].all_dependencies():
+            if finish[dep] > best or best_dep is None:
+                best, best_dep = finish[dep], dep
+        finish[name] = best + result.results[name].duration
+        parent[name] = best_dep
+
+    if not finish:
+        return [], 0.0
+
+    tail = max(finish, key=lambda n: finish[n])
+    path: List[str] = []
+    node: Optional[str] = tail
+    while node is not None:
+        path.append(node)
+        node = parent[node]
+    path.reverse()
+    return path, finish[tail]
+
+
+def format_timing_report(result: PipelineResult) -> str:
+    """Render per-step timings and the critical path as a plain-text table."""
+    path, path_seconds = critical_path(result)
+    on_path = set(path)
+
+    header = f"{'STEP':<24} {'STATUS':<9} {'START':>8} {'DURATION':>9}  RUN_ID"
+    lines = [header, "-" * len(header)]
+    for step in result.steps:
+        r = result.results[step.name]
+        offset = r.started - result.started
+        marker = "*" if step.name in on_path else " "
+        run_id = r.run_dir.name if r.run_dir else ""
+        lines.append(
+            f"{marker}{step.name[:23]:<23} {r.status:<9} {offset:>7.1f}s {r.duration:>8.1f}s  {run_id}"
+        )
+        if r.message:
+            lines.append(f"  {r.message}")
+
+    lines.append("")
+    lines.append(
+        f"Critical path (*): {' -> '.join(path)} "
+        f"({path_seconds:.1f}s of {result.wall_seconds:.1f}s wall time)"
+    )
+    return "\n".join(lines)
@@ -0,0 +1,220 @@
+from __future__ import annotations
+
+import os
+import pstats
+import shlex
+import shutil
+from collections import defaultdict
+from dataclasses import replace
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+from .config import RunConfig
+
+PROFILE_MODES = ("auto", "cprofile", "py-spy")
+PSTATS_FILENAME = "profile.pstats"
+FLAMEGRAPH_FILENAME = "profile.folded"
+TOP_HOTSPOTS = 10
+# Paths below this share of total time are dropped from the pstats flamegraph.
+_MIN_PATH_FRACTION = 0.001
+_MAX_DEPTH = 64
+
+FuncKey = Tuple[str, int, str]
+
+
+def _split(entrypoint: str) -> List[str]:
+    try:
+        return shlex.split(entrypoint)
+    except ValueError:
+        return entrypoint.split()
+
+
+def _is_python(executable: str) -> bool:
+    name = os.path.basename(executable)
+    return name.startswith("python") and not name.endswith("-config")
+
+
+# Interpreter options that take a value (attached, "-Xdev", or separate).
+_VALUE_OPTIONS = "WX"
+# Interpreter options without a value; they may be combined, as in "-uB".
+_FLAG_OPTIONS = "bBdEiIOPqRsSuv"
+
+
+def _interpreter_options(args: List[str]) -> Tuple[List[str], List[str]]:
+    """
+    Split `python [options] script args...` after the interpreter into its
+    options and the script with its arguments.
+
+    Raises ValueError for -c/-m and anything else that does not run a script.
+    """
+    options: List[str] = []
+    rest = list(args)
+    while rest and rest[0].startswith("-") and rest[0] != "-":
+        arg = rest.pop(0)
+        if arg == "--":
+            break
+        options.append(arg)
+        for i, letter in enumerate(arg[1:], start=1):
+            if letter in "cm":
+                raise ValueError(f"cProfile can only wrap a script, not `python -{letter}`")
+            if letter in _VALUE_OPTIONS:
+                if i == len(arg) - 1:
+                    if not rest:
+                        raise ValueError(f"Missing value for interpreter option {arg}")
+                    options.append(rest.pop(0))
+                break
+            if letter not in _FLAG_OPTIONS:
+                raise ValueError(f"Unsupported interpreter option {arg}")
+    if not rest or rest[0] == "-":
+        raise ValueError("cProfile needs a script to run")
+    return options, rest
+
+
+def choose_tool(mode: str, in_docker: bool) -> str:
+    """
+    Resolve a profile mode to the tool actually used.
+
+    py-spy samples from outside the process, so it has to be installed on
+    the host and can only attach to local jobs; anything else uses cProfile,
+    which ships with every Python.
+    """
+    if mode not in PROFILE_MODES:
+        raise ValueError(f"Unknown profile mode {mode!r} (expected {', '.join(PROFILE_MODES)})")
+    if mode in ("auto", "py-spy") and not in_docker and shutil.which("py-spy"):
+        return "py-spy"
+    return "cprofile"
+
+
+def wrap_entrypoint(cfg: RunConfig, run_dir: Path, in_docker: bool) -> Optional[RunConfig]:
+    """
+    Return cfg with its Python entrypoint wrapped in a profiler, or None if
+    the entrypoint is not a `python ...` command. Raises ValueError if
+    cProfile cannot wrap it (`python -c`/`python -m`).
+
+    Profiles are written straight into the run dir; docker jobs get the run
+    dir mounted at the same path so the paths work inside the container.
+    """
+    args = _split(cfg.entrypoint)
+    if not args or not _is_python(args[0]):
+        return None
+
+    tool = choose_tool(cfg.profile or "auto", in_docker)
+    if tool == "py-spy":
+        wrapped = [
+            "py-spy", "record", "--format", "raw", "--subprocesses",
+            "-o", str(run_dir / FLAMEGRAPH_FILENAME), "--",
+        ] + args
+    else:
+        # Interpreter options such as -u must come before -m cProfile, which
+        # would otherwise take them as its own and reject them.
+        options, script = _interpreter_options(args[1:])
+        wrapped = [args[0], *options, "-m", "cProfile", "-o", str(run_dir / PSTATS_FILENAME), *script]
+
+    mounts = list(cfg.mounts)
+    if in_docker:
+        mounts.append(f"{run_dir}:{run_dir}")
+    return replace(cfg, entrypoint=shlex.join(wrapped), mounts=mounts, profile=tool)
+
+
+def _label(func: FuncKey) -> str:
+    filename, line, name = func
+    if filename == "~":
+        return name  # builtins, e.g. <built-in method time.sleep>
+    return f"{name} ({os.path.basename(filename)}:{line})"
+
+
+def pstats_to_collapsed(stats_path: Path, out_path: Path) -> None:
+    """
+    Write a collapsed-stack flamegraph (one `frame;frame;... weight` line
+    per path, weights in microseconds) reconstructed from a cProfile dump.
+
+    cProfile only records caller -> callee edges, so each edge's share of
+    the callee's time is propagated down every path. Recursion is cut at the
+    first repeated frame and negligible paths are dropped.
+    """
+    raw: Dict[FuncKey, Any] = pstats.Stats(str(stats_path)).stats  # type: ignore[attr-defined]
+    callees: Dict[FuncKey, Dict[FuncKey, float]] = defaultdict(dict)
+    for func, (_cc, _nc, _tt, _ct, callers) in raw.items():
+        for caller, edge in callers.items():
+            callees[caller][func] = edge[3]
+
+    roots = [func for func, entry in raw.items() if not entry[4]]
+    total = sum(raw[f][3] for f in roots) or 1.0
+    folded: Dict[str, float] = defaultdict(float)
+
+    def walk(func: FuncKey, path: List[FuncKey], share: float) -> None:
+        cum = raw[func][3]
+        if share * cum < _MIN_PATH_FRACTION * total or len(path) >= _MAX_DEPTH:
+            return
+        path = path + [func]
+        self_time = raw[func][2] * share
+        if self_time > 0:
+            folded[";".join(_label(f) for f in path)] += self_time
+        for callee, edge_cum in callees.get(func, {}).items():
+            if callee in path:
+                continue
+            callee_cum = raw[callee][3] or 1.0
+            walk(callee, path, share * min(1.0, edge_cum / callee_cum) if cum else 0.0)
+
+    for root in roots:
+        walk(root, [], 1.0)
+
+    with out_path.open("w", encoding="utf-8") as f:
+        for stack, seconds in sorted(folded.items()):
+            weight = int(round(seconds * 1_000_000))
+            if weight > 0:
+                f.write(f"{stack} {weight}\n")
+
+
+def hotspots_from_pstats(stats_path: Path, limit: int = TOP_HOTSPOTS) -> List[Dict[str, Any]]:
+    raw: Dict[FuncKey, Any] = pstats.Stats(str(stats_path)).stats  # type: ignore[attr-defined]
+    ranked = sorted(raw.items(), key=lambda item: item[1][2], reverse=True)[:limit]
+    return [
+        {
+            "function": _label(func),
+            "self_seconds": round(tt, 6),
+            "cumulative_seconds": round(ct, 6),
+            "calls": nc,
+        }
+        for func, (_cc, nc, tt, ct, _callers) in ranked
+    ]
+
+
+def hotspots_from_collapsed(path: Path, limit: int = TOP_HOTSPOTS) -> List[Dict[str, Any]]:
+    """Rank leaf frames of a collapsed-stack file by their share of samples."""
+    self_weight: Dict[str, int] = defaultdict(int)
+    total = 0
+    with path.open("r", encoding="utf-8", errors="replace") as f:
+        for line in f:
+            stack, _, weight = line.rstrip("\n").rpartition(" ")
+            if not stack or not weight.isdigit():
+                continue
+            self_weight[stack.rsplit(";", 1)[-1]] += int(weight)
+            total += int(weight)
+    ranked = sorted(self_weight.items(), key=lambda item: item[1], reverse=True)[:limit]
+    return [
+        {"function": name, "samples": weight, "share": round(weight / total, 4) if total else 0.0}
+        for name, weight in ranked
+    ]
+
+
+def summarise_profile(run_dir: Path, tool: str) -> Optional[Dict[str, Any]]:
+    """
+    Produce the flamegraph file (for cProfile) and the `profile` record for
+    run.json, or None if the job left no profile behind.
+    """
+    flamegraph = run_dir / FLAMEGRAPH_FILENAME
+    record: Dict[str, Any] = {"tool": tool, "flamegraph": str(flamegraph)}
+
+    if tool == "cprofile":
+        stats_path = run_dir / PSTATS_FILENAME
+        if not stats_path.is_file():
+            return None
+        pstats_to_collapsed(stats_path, flamegraph)
+        record["pstats"] = str(stats_path)
+        record["hotspots"] = hotspots_from_pstats(stats_path)
+    else:
+        if not flamegraph.is_file():
+            return None
+        record["hotspots"] = hotspots_from_collapsed(flamegraph)
+    return record
@@ -0,0 +1,350 @@
+from __future__ import annotations
+
+import json
+import re
+import sqlite3
+import time
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Tuple
+
+from .config import parse_duration
+
+# Columns of the runs table that can be filtered and sorted on directly.
+RUN_FIELDS = ("id", "name", "status", "image", "exit_code", "created_at", "finished_at")
+_DATE_FIELDS = ("created_at", "finished_at")
+_PREFIXES = {"metrics": "metric", "metric": "metric", "params": "param", "param": "param"}
+
+_TOKEN_RE = re.compile(
+    r"""
+    \s*(?:
+        (?P<string>'(?:[^'\\]|\\.)*'|"(?:[^"\\]|\\.)*")
+      | (?P<op><=|>=|!=|==|=|<|>|~)
+      | (?P<paren>[(),])
+      | (?P<word>[^\s()<>=!~,'"]+)
+    )
+    """,
+    re.VERBOSE,
+)
+
+
+class QueryError(ValueError):
+    pass
+
+
+@dataclass
+class Query:
+    """A parsed query: SQL WHERE clause plus ordering and limit."""
+
+    where: str
+    params: List[Any]
+    # (kind, key, descending): kind is "metric"/"param", or None for a run column.
+    order_by: List[Tuple[Optional[str], str, bool]] = field(default_factory=list)
+    limit: Optional[int] = None
+    # metrics.* / params.* fields mentioned, for output columns.
+    fields: List[str] = field(default_factory=list)
+
+
+@dataclass
+class _Token:
+    kind: str
+    text: str
+
+
+def _tokenize(expr: str) -> List[_Token]:
+    tokens: List[_Token] = []
+    pos = 0
+    expr = expr.strip()
+    while pos < len(expr):
+        match = _TOKEN_RE.match(expr, pos)
+        if match is None or match.end() == pos:
+            raise QueryError(f"Unexpected character at position {pos}: {expr[pos:pos + 10]!r}")
+        pos = match.end()
+        kind = match.lastgroup or "word"
+        text = match.group(kind)
+        if kind == "string":
+            text = re.sub(r"\\(.)", r"\1", text[1:-1])
+        elif kind == "op" and text == "==":
+            text = "="
+        tokens.append(_Token(kind, text))
+    return tokens
+
+
+class _Parser:
+    """
+    Recursive-descent parser for:
+
+        query    := [expr] [ORDER BY key [ASC|DESC] {, key [ASC|DESC]}] [LIMIT n]
+        expr     := term {OR term}
+        term     := factor {AND factor}
+        factor   := NOT factor | ( expr ) | field op value | TAG = value
+    """
+
+    def __init__(self, expr: str, now: float):
+        self.tokens = _tokenize(expr)
+        self.pos = 0
+        self.now = now
+        self.fields: List[str] = []
+
+    # --- token helpers ---
+
+    def _peek(self) -> Optional[_Token]:
+        return self.tokens[self.pos] if self.pos < len(self.tokens) else None
+
+    def _keyword(self, *words: str) -> bool:
+        tok = self._peek()
+        if tok is not None and tok.kind == "word" and tok.text.lower() == words[0]:
+            rest = self.tokens[self.pos + 1 : self.pos + len(words)]
+            if len(rest) == len(words) - 1 and all(
+                t.kind == "word" and t.text.lower() == w for t, w in zip(rest, words[1:])
+            ):
+                self.pos += len(words)
+                return True
+        return False
+
+    def _next(self, what: str) -> _Token:
+        tok = self._peek()
+        if tok is None:
+            raise QueryError(f"Expected {what} at end of query")
+        self.pos += 1
+        return tok
+
+    # --- grammar ---
+
+    def parse(self) -> Query:
+        where, params = "1", []
+        if self._peek() is not None and not self._at_clause():
+            where, params = self._expr()
+
+        order_by: List[Tuple[Optional[str], str, bool]] = []
+        if self._keyword("order", "by") or self._keyword("sort", "by"):
+            while True:
+                kind, key = self._sort_key(self._next("a sort field").text)
+                descending = False
+                if self._keyword("desc"):
+                    descending = True
+                else:
+                    self._keyword("asc")
+                order_by.append((kind, key, descending))
+                tok = self._peek()
+                if tok is not None and tok.kind == "paren" and tok.text == ",":
+                    self.pos += 1
+                    continue
+                break
+
+        limit = None
+        if self._keyword("limit"):
+            text = self._next("a number after LIMIT").text
+            if not text.isdigit():
+                raise QueryError(f"LIMIT needs a whole number, got {text!r}")
+            limit = int(text)
+
+        tok = self._peek()
+        if tok is not None:
+            raise QueryError(f"Unexpected {tok.text!r}")
+        return Query(where, params, order_by, limit, self.fields)
+
+    def _at_clause(self) -> bool:
+        tok = self._peek()
+        if tok is None or tok.kind != "word":
+            return False
+        word = tok.text.lower()
+        if word == "limit":
+            return True
+        nxt = self.tokens[self.pos + 1] if self.pos + 1 < len(self.tokens) else None
+        return word in ("order", "sort") and nxt is not None and nxt.text.lower() == "by"
+
+    def _expr(self) -> Tuple[str, List[Any]]:
+        sql, params = self._term()
+        while self._keyword("or"):
+            rhs, rhs_params = self._term()
+            sql, params = f"({sql} OR {rhs})", params + rhs_params
+        return sql, params
+
+    def _term(self) -> Tuple[str, List[Any]]:
+        sql, params = self._factor()
+        while self._keyword("and"):
+            rhs, rhs_params = self._factor()
+            sql, params = f"({sql} AND {rhs})", params + rhs_params
+        return sql, params
+
+    def _factor(self) -> Tuple[str, List[Any]]:
+        if self._keyword("not"):
+            sql, params = self._factor()
+            return f"(NOT {sql})", params
+
+        tok = self._next("a condition")
+        if tok.kind == "paren" and tok.text == "(":
+            sql, params = self._expr()
+            close = self._next("')'")
+            if close.text != ")":
+                raise QueryError(f"Expected ')', got {close.text!r}")
+            return sql, params
+        if tok.kind != "word":
+            raise QueryError(f"Expected a field name, got {tok.text!r}")
+
+        op = self._next("an operator")
+        if op.kind != "op":
+            raise QueryError(f"Expected an operator after {tok.text!r}, got {op.text!r}")
+        value_tok = self._next("a value")
+        if value_tok.kind not in ("word", "string"):
+            raise QueryError(f"Expected a value after {tok.text} {op.text}")
+        return self._condition(tok.text, op.text, value_tok)
+
+    # --- SQL generation ---
+
+    def _condition(self, name: str, op: str, value_tok: _Token) -> Tuple[str, List[Any]]:
+        lowered = name.lower()
+        value = value_tok.text
+
+        if lowered in ("tag", "tags"):
+            if op not in ("=", "!=", "~"):
+                raise QueryError("Tags support =, != and ~ (glob)")
+            match = "tag GLOB ?" if op == "~" else "tag = ?"
+            sql = f"id IN (SELECT run_id FROM run_tags WHERE {match})"
+            return (f"(NOT {sql})" if op == "!=" else sql), [value]
+
+        kind, key = self._split_field(name)
+        if kind is None:
+            column = lowered
+            if op == "~":
+                return f"{column} GLOB ?", [value]
+            if column in _DATE_FIELDS and value_tok.kind == "word":
+                value = self._date_value(value)
+            elif column == "exit_code":
+                value = self._number(value, name)
+            return f"{column} {op} ?", [value]
+
+        self.fields.append(f"{'metrics' if kind == 'metric' else 'params'}.{key}")
+        if op == "~":
+            match, arg = "text GLOB ?", value
+        else:
+            number = self._maybe_number(value) if value_tok.kind == "word" else None
+            if number is not None:
+                match, arg = f"num {op} ?", number
+            elif op in ("=", "!="):
+                match, arg = f"text {op} ?", value
+            else:
+                raise QueryError(f"{name} {op} needs a number, got {value!r}")
+        sql = f"id IN (SELECT run_id FROM run_values WHERE kind = ? AND key = ? AND {match})"
+        return sql, [kind, key, arg]
+
+    def _sort_key(self, name: str) -> Tuple[Optional[str], str]:
+        """(kind, key) for metrics/params, (None, column) for run fields."""
+        kind, key = self._split_field(name)
+        if kind is None:
+            return None, name.lower()
+        self.fields.append(f"{'metrics' if kind == 'metric' else 'params'}.{key}")
+        return kind, key
+
+    def _split_field(self, name: str) -> Tuple[Optional[str], str]:
+        if "." in name:
+            prefix, key = name.split(".", 1)
+            kind = _PREFIXES.get(prefix.lower())
+            if kind is None or not key:
+                raise QueryError(f"Unknown field {name!r} (use metrics.<name> or params.<name>)")
+            return kind, key
+        if name.lower() not in RUN_FIELDS:
+            raise QueryError(
+                f"Unknown field {name!r} (expected {', '.join(RUN_FIELDS)}, tag, metrics.* or params.*)"
+            )
+        return None, name
+
+    @staticmethod
+    def _maybe_number(value: str) -> Optional[float]:
+        try:
+            return float(value)
+        except ValueError:
+            return None
+
+    def _number(self, value: str, name: str) -> float:
+        number = self._maybe_number(value)
+        if number is None:
+            raise QueryError(f"{name} needs a number, got {value!r}")
+        return number
+
+    def _date_value(self, value: str) -> str:
+        # "-7d" means seven days ago; anything else is taken as an ISO date.
+        if value.startswith("-"):
+            try:
+                seconds = parse_duration(value[1:]) or 0.0
+            except ValueError as exc:
+                raise QueryError(str(exc))
+            moment = datetime.fromtimestamp(self.now - seconds, tz=timezone.utc)
+            return moment.isoformat()
+        return value
+
+
+def parse_query(expr: str, now: Optional[float] = None) -> Query:
+    """Parse a query expression; raises QueryError with a readable message."""
+    return _Parser(expr, time.time() if now is None else now).parse()
+
+
+def run_query(expr: str, now: Optional[float] = None) -> Tuple[List[Dict[str, Any]], Query]:
+    """
+    Execute a query against the run index.
+
+    Returns (runs, parsed query). Each run is its run.json plus "metrics",
+    the metrics.json summary as indexed.
+    """
+    from .run_index import connect, ensure_index
+
+    query = parse_query(expr, now)
+    joins: List[str] = []
+    join_params: List[Any] = []
+    order_terms: List[str] = []
+    for i, (kind, key, descending) in enumerate(query.order_by):
+        direction = "DESC" if descending else "ASC"
+        if kind is None:
+            order_terms.append(f"runs.{key} {direction}")
+            continue
+        # A join rather than a correlated subquery: one lookup per run.
+        alias = f"s{i}"
+        joins.append(
+            f"LEFT JOIN run_values {alias} ON {alias}.run_id = runs.id "
+            f"AND {alias}.kind = ? AND {alias}.key = ?"
+        )
+        join_params.extend([kind, key])
+        # Runs missing the sort key go last in either direction.
+        order_terms.append(f"{alias}.run_id IS NULL")
+        order_terms.append(f"coalesce({alias}.num, {alias}.text) {direction}")
+    order_terms.append("runs.id ASC" if query.order_by else "runs.created_at DESC")
+
+    sql = f"SELECT runs.id, runs.data FROM runs {' '.join(joins)} WHERE {query.where}"
+    sql += " ORDER BY " + ", ".join(order_terms)
+    params = join_params + list(query.params)
+    if query.limit is not None:
+        sql += " LIMIT ?"
+        params.append(query.limit)
+
+    ensure_index()
+    with connect() as conn:
+        try:
+            rows = conn.execute(sql, params).fetchall()
+        except sqlite3.OperationalError as exc:
+            raise QueryError(str(exc))
+        runs = {run_id: json.loads(data) for run_id, data in rows}
+        for run in runs.values():
+            run["metrics"] = {}
+
+        ids = list(runs)
+        for start in range(0, len(ids), 500):
+            chunk = ids[start : start + 500]
+            marks = ",".join("?" * len(chunk))
+            for run_id, key, num, text in conn.execute(
+                "SELECT run_id, key, num, text FROM run_values "
+                f"WHERE kind = 'metric' AND run_id IN ({marks})",
+                chunk,
+            ):
+                runs[run_id]["metrics"][key] = num if num is not None else text
+
+    return list(runs.values()), query
+
+
+def field_value(run: Dict[str, Any], name: str) -> Any:
+    """Value of a query field (e.g. status, metrics.loss, params.lr) for a run."""
+    if "." in name:
+        prefix, key = name.split(".", 1)
+        group = run.get("metrics" if _PREFIXES.get(prefix) == "metric" else "params")
+        return group.get(key) if isinstance(group, dict) else None
+    return run.get(name)
@@ -0,0 +1,328 @@
+from __future__ import annotations
+
+import json
+import os
+import posixpath
+import shutil
+import time
+from dataclasses import dataclass, field
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Set
+
+from .config import parse_size
+from .paths import is_run_location, run_dir_in
+from .storage import TERMINAL_STATUSES, get_runs_dir, update_run_metadata
+
+SOURCE_BUNDLE = "source.tar.gz"
+# Never treated as extracted source, even if a bundle contains them.
+RESERVED_NAMES = frozenset(
+    {
+        "run.json",
+        "events.jsonl",
+        "events.jsonl.lock",
+        "logs.txt",
+        "metrics.json",
+        "metrics.series",
+        "metrics.state.json",
+        "metrics.state.json.lock",
+        "outputs",
+        "artifacts",
+        SOURCE_BUNDLE,
+    }
+)
+
+
+@dataclass
+class RetentionPolicy:
+    """
+    What `runpilot gc` (and the agent, after each job) keeps.
+
+    A finished run survives if it is among the keep_last newest runs or was
+    created within keep_days; with neither set, no run is deleted for age.
+    Tagged runs (if keep_tagged) and pending/running runs are never deleted.
+    max_bytes then removes the oldest unprotected runs until the runs dir
+    fits. drop_sources removes agent code bundles and their extracted files
+    from the runs that are kept, leaving logs, metrics and outputs.
+    """
+
+    keep_last: Optional[int] = None
+    keep_days: Optional[float] = None
+    keep_tagged: bool = True
+    drop_sources: bool = False
+    max_bytes: Optional[int] = None
+
+    @property
+    def empty(self) -> bool:
+        return (
+            self.keep_last is None
+            and self.keep_days is None
+            and self.max_bytes is None
+            and not self.drop_sources
+        )
+
+
+@dataclass
+class GcItem:
+    run_id: str
+    run_dir: str
+    bytes: int
+    reason: str
+
+
+@dataclass
+class GcReport:
+    deleted: List[GcItem] = field(default_factory=list)
+    sources_dropped: List[GcItem] = field(default_factory=list)
+    kept: int = 0
+    protected: int = 0
+    bytes_before: Optional[int] = None  # only measured for a disk budget
+    dry_run: bool = False
+
+    @property
+    def bytes_freed(self) -> int:
+        return sum(item.bytes for item in self.deleted + self.sources_dropped)
+
+
+def policy_from_env() -> Optional[RetentionPolicy]:
+    """
+    Agent-side policy from RUNPILOT_GC_KEEP_LAST, RUNPILOT_GC_KEEP_DAYS,
+    RUNPILOT_GC_MAX_BYTES (e.g. 200G), RUNPILOT_GC_DROP_SOURCES and
+    RUNPILOT_GC_KEEP_TAGGED. Returns None if no rule is set.
+    """
+    env = os.environ
+    policy = RetentionPolicy(
+        keep_last=int(env["RUNPILOT_GC_KEEP_LAST"]) if env.get("RUNPILOT_GC_KEEP_LAST") else None,
+        keep_days=float(env["RUNPILOT_GC_KEEP_DAYS"]) if env.get("RUNPILOT_GC_KEEP_DAYS") else None,
+        keep_tagged=env.get("RUNPILOT_GC_KEEP_TAGGED", "1").lower() not in ("0", "false", "no"),
+        drop_sources=env.get("RUNPILOT_GC_DROP_SOURCES", "").lower() in ("1", "true", "yes"),
+        max_bytes=parse_size(env.get("RUNPILOT_GC_MAX_BYTES")),
+    )
+    return None if policy.empty else policy
+
+
+def _tree_size(path: str) -> int:
+    total = 0
+    try:
+        with os.scandir(path) as entries:
+            for entry in entries:
+                try:
+                    if entry.is_dir(follow_symlinks=False):
+                        total += _tree_size(entry.path)
+                    else:
+                        total += entry.stat(follow_symlinks=False).st_size
+                except OSError:
+                    continue
+    except OSError:
+        pass
+    return total
+
+
+def _entry_size(path: Path) -> int:
+    try:
+        if path.is_dir() and not path.is_symlink():
+            return _tree_size(str(path))
+        return path.lstat().st_size
+    except OSError:
+        return 0
+
+
+def _run_sizes(run_dirs: Dict[str, str], active: Set[str]) -> Dict[str, int]:
+    """
+    Bytes used by each run dir.
+
+    Sizes of finished runs are cached in the index keyed by the dir's
+    mtime, so repeated gc passes only walk runs that changed.
+    """
+    from .run_index import connect
+
+    with connect() as conn:
+        cached = {
+            run_id: (stamp, size)
+            for run_id, stamp, size in conn.execute("SELECT run_id, stamp, bytes FROM run_sizes")
+        }
+    sizes: Dict[str, int] = {}
+    fresh = []
+    for run_id, run_dir in run_dirs.items():
+        try:
+            stamp = os.stat(run_dir).st_mtime_ns
+        except OSError:
+            continue
+        hit = cached.get(run_id)
+        if hit is not None and hit[0] == stamp and run_id not in active:
+            sizes[run_id] = hit[1]
+            continue
+        sizes[run_id] = _tree_size(run_dir)
+        if run_id not in active:
+            fresh.append((run_id, stamp, sizes[run_id]))
+    if fresh:
+        with connect() as conn:
+            conn.executemany("INSERT OR REPLACE INTO run_sizes VALUES (?, ?, ?)", fresh)
+    return sizes
+
+
+def _is_entry_name(name: str) -> bool:
+    """True for a single path component naming a child (not ".", "..", "a/b" or "/a")."""
+    return bool(name) and name not in (".", "..") and "/" not in name and os.sep not in name
+
+
+def source_entries(names: Iterable[str]) -> List[str]:
+    """
+    Top-level entries a source bundle with these member names extracts into
+    the run dir, for run.json "source.entries". Members outside the bundle
+    root (".", "..", absolute paths) and reserved run files are left out.
+    """
+    entries = set()
+    for name in names:
+        name = posixpath.normpath(name.replace("\\", "/"))
+        if name.startswith("/") or name == ".." or name.startswith("../"):
+            continue
+        first = name.split("/", 1)[0]
+        if _is_entry_name(first) and first not in RESERVED_NAMES:
+            entries.add(first)
+    return sorted(entries)
+
+
+def _local_run_dir(runs_dir: Path, run_id: str) -> Optional[Path]:
+    # Where run_id lives under runs_dir, never the run_dir recorded in
+    # run.json (imported runs keep the exporting host's path).
+    if not _is_entry_name(run_id):
+        return None
+    run_dir = run_dir_in(runs_dir, run_id)
+    return run_dir if is_run_location(runs_dir, run_dir) else None
+
+
+def _source_entries(run_dir: str, recorded: Optional[str]) -> List[Path]:
+    """Paths an agent bundle put in the run dir (bundle included)."""
+    names: List[str] = []
+    if recorded:
+        try:
+            source = json.loads(recorded)
+        except ValueError:
+            source = None
+        if isinstance(source, dict) and not source.get("dropped"):
+            names = [str(n) for n in source.get("entries") or [] if str(n) not in RESERVED_NAMES]
+    # Plain string paths: this runs once per kept run. Only direct children
+    # of the run dir are ever removed, whatever run.json claims.
+    root = os.path.abspath(run_dir)
+    paths = [
+        os.path.join(root, name)
+        for name in names
+        if _is_entry_name(name) and os.path.dirname(os.path.abspath(os.path.join(root, name))) == root
+    ]
+    paths = [p for p in paths if os.path.lexists(p)]
+    bundle = os.path.join(run_dir, SOURCE_BUNDLE)
+    if os.path.isfile(bundle):
+        paths.append(bundle)
+    return [Path(p) for p in paths]
+
+
+def _remove(path: Path) -> None:
+    if path.is_dir() and not path.is_symlink():
+        shutil.rmtree(path, ignore_errors=True)
+    else:
+        try:
+            path.unlink()
+        except FileNotFoundError:
+            pass
+
+
+def collect(policy: RetentionPolicy, dry_run: bool = False, now: Optional[float] = None) -> GcReport:
+    """
+    Apply a retention policy to the local runs dir.
+
+    Works from the run index rather than reading every run.json (run
+    `runpilot reindex` first if run dirs were changed by hand). Sizes come
+    from a cache keyed by each dir's mtime, so only new or changed runs are
+    walked. With dry_run nothing is removed and the report lists what would
+    be.
+    """
+    from .run_index import connect, ensure_index, forget_runs
+
+    now = time.time() if now is None else now
+    report = GcReport(dry_run=dry_run)
+    ensure_index()
+
+    with connect() as conn:
+        rows = conn.execute(
+            "SELECT id, status, created_at, run_dir, json_extract(data, '$.source') FROM runs "
+            "ORDER BY created_at DESC, id DESC"
+        ).fetchall()
+        tagged = {run_id for (run_id,) in conn.execute("SELECT DISTINCT run_id FROM run_tags")}
+
+    cutoff = now - policy.keep_days * 86400 if policy.keep_days is not None else None
+    age_rules = policy.keep_last is not None or cutoff is not None
+    active = {run_id for run_id, status, *_ in rows if status not in TERMINAL_STATUSES}
+
+    runs_dir = get_runs_dir()
+    kept = []  # (run_id, run_dir, source, protected), newest first
+    expired = []
+    for position, (run_id, status, created_at, _recorded_dir, source) in enumerate(rows):
+        local_dir = _local_run_dir(runs_dir, run_id)
+        if local_dir is None:
+            continue  # not a run under the runs dir: never deleted
+        run_dir = str(local_dir)
+        protected = run_id in active or (policy.keep_tagged and run_id in tagged)
+        retained = not age_rules
+        if policy.keep_last is not None and position < policy.keep_last:
+            retained = True
+        if cutoff is not None and _created_ts(created_at, now) >= cutoff:
+            retained = True
+        if protected:
+            report.protected += 1
+        if protected or retained:
+            kept.append((run_id, run_dir, source, protected))
+        else:
+            expired.append((run_id, run_dir))
+
+    measured = dict(expired)
+    if policy.max_bytes is not None:
+        measured.update((run_id, run_dir) for run_id, run_dir, *_ in kept)
+        report.bytes_before = 0
+    sizes = _run_sizes(measured, active)
+    if report.bytes_before is not None:
+        report.bytes_before = sum(sizes.values())
+    for run_id, run_dir in expired:
+        report.deleted.append(GcItem(run_id, run_dir, sizes.get(run_id, 0), "expired"))
+
+    if policy.drop_sources:
+        for run_id, run_dir, source, _protected in kept:
+            if run_id in active:
+                continue
+            paths = _source_entries(run_dir, source)
+            if paths:
+                freed = sum(_entry_size(p) for p in paths)
+                report.sources_dropped.append(GcItem(run_id, run_dir, freed, "source"))
+                if run_id in sizes:
+                    sizes[run_id] -= freed
+                if not dry_run:
+                    for path in paths:
+                        _remove(path)
+                    update_run_metadata(Path(run_dir), {"source": {"dropped": True}})
+
+    if policy.max_bytes is not None:
+        total = sum(sizes.get(run_id, 0) for run_id, *_ in kept)
+        survivors = 0
+        for run_id, run_dir, _source, protected in reversed(kept):  # oldest first
+            if total > policy.max_bytes and not protected:
+                report.deleted.append(GcItem(run_id, run_dir, sizes.get(run_id, 0), "budget"))
+                total -= sizes.get(run_id, 0)
+            else:
+                survivors += 1
+        report.kept = survivors
+    else:
+        report.kept = len(kept)
+
+    if not dry_run and report.deleted:
+        for item in report.deleted:
+            shutil.rmtree(item.run_dir, ignore_errors=True)
+        forget_runs([item.run_id for item in report.deleted])
+    return report
+
+
+def _created_ts(created_at: Optional[str], default: float) -> float:
+    # Runs without a parseable created_at count as new: never deleted for age.
+    try:
+        return datetime.fromisoformat(str(created_at)).timestamp()
+    except ValueError:
+        return default
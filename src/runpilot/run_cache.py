@@ -0,0 +1,336 @@
+from __future__ import annotations
+
+import fcntl
+import hashlib
+import json
+import os
+import shutil
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+from .config import RunConfig
+from .log_store import stored_forms
+from .paths import run_dir_in
+from .storage import get_root_dir, get_runs_dir, update_run_metadata, write_run_metadata
+
+CACHE_DIR_NAME = "cache"
+INDEX_FILENAME = "run_cache.json"
+STAT_CACHE_FILENAME = "source_hashes.json"
+
+# Directories and suffixes never considered part of a job's source tree.
+IGNORED_DIRS = {".git", "__pycache__", ".venv", "venv", ".runpilot", ".pytest_cache"}
+IGNORED_SUFFIXES = (".pyc",)
+
+# Env vars RunPilot itself sets per run; their values are run dir paths and
+# must not perturb the fingerprint. Declared inputs are hashed by content.
+_PER_RUN_ENV = {"RUNPILOT_RUN_DIR", "RUNPILOT_OUTPUT_DIR"}
+_INPUT_ENV_PREFIX = "RUNPILOT_INPUT_"
+
+# Files copied or linked from the cached run into the new run record.
+_REUSED_FILES = ("logs.txt", "logs.records", "logs.index", "metrics.series")
+
+
+def get_cache_dir() -> Path:
+    cache_dir = get_root_dir() / CACHE_DIR_NAME
+    cache_dir.mkdir(parents=True, exist_ok=True)
+    return cache_dir
+
+
+@contextmanager
+def _locked_index() -> Iterator[Dict[str, Any]]:
+    """
+    Yield the cache index under an exclusive lock and write it back on exit.
+    """
+    cache_dir = get_cache_dir()
+    index_path = cache_dir / INDEX_FILENAME
+    with (cache_dir / (INDEX_FILENAME + ".lock")).open("w") as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        index: Dict[str, Any] = {}
+        if index_path.is_file():
+            try:
+                index = json.loads(index_path.read_text(encoding="utf-8"))
+            except (OSError, ValueError):
+                index = {}
+        index.setdefault("entries", {})
+        index.setdefault("latest", {})
+        index.setdefault("stats", {"hits": 0, "misses": 0})
+
+        yield index
+
+        tmp_path = index_path.with_suffix(".tmp")
+        tmp_path.write_text(json.dumps(index, indent=2, sort_keys=True), encoding="utf-8")
+        os.replace(tmp_path, index_path)
+
+
+def _hash_file(path: Path) -> str:
+    h = hashlib.sha256()
+    with path.open("rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def hash_tree(root: Path, exclude: Optional[Callable[[str, bool], bool]] = None) -> str:
+    """
+    Content hash of a file or directory tree.
+
+    exclude(path, is_dir), given a path relative to root ("/"-separated),
+    leaves further entries out; an excluded directory is not walked.
+    Per-file digests are memoised by (size, mtime) in the cache dir, so
+    re-hashing an unchanged tree only costs a stat per file.
+    """
+    root = Path(root).resolve()
+    if root.is_file():
+        return _hash_file(root)
+
+    stat_cache_path = get_cache_dir() / STAT_CACHE_FILENAME
+    try:
+        stat_cache: Dict[str, List[Any]] = json.loads(stat_cache_path.read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        stat_cache = {}
+    dirty = False
+
+    h = hashlib.sha256()
+    for dirpath, dirnames, filenames in os.walk(root):
+        rel_dir = Path(dirpath).relative_to(root).as_posix()
+        prefix = "" if rel_dir == "." else rel_dir + "/"
+        dirnames[:] = sorted(
+            d
+            for d in dirnames
+            if d not in IGNORED_DIRS and not (exclude is not None and exclude(prefix + d, True))
+        )
+        for filename in sorted(filenames):
+            if filename.endswith(IGNORED_SUFFIXES):
+                continue
+            if exclude is not None and exclude(prefix + filename, False):
+                continue
+            path = Path(dirpath) / filename
+            try:
+                st = path.stat()
+            except OSError:
+                continue
+            key = str(path)
+            cached = stat_cache.get(key)
+            if cached and cached[0] == st.st_size and cached[1] == st.st_mtime_ns:
+                digest = cached[2]
+            else:
+                digest = _hash_file(path)
+                stat_cache[key] = [st.st_size, st.st_mtime_ns, digest]
+                dirty = True
+            h.update(path.relative_to(root).as_posix().encode("utf-8"))
+            h.update(b"\0")
+            h.update(digest.encode("ascii"))
+
+    if dirty:
+        tmp_path = stat_cache_path.with_suffix(f".{os.getpid()}.tmp")
+        tmp_path.write_text(json.dumps(stat_cache), encoding="utf-8")
+        os.replace(tmp_path, stat_cache_path)
+
+    return h.hexdigest()
+
+
+def compute_fingerprint(cfg: RunConfig, source_dir: Path) -> Tuple[str, Dict[str, str]]:
+    """
+    Return (fingerprint, components) for a config run from source_dir.
+
+    Components:
+      config  image (or the content-hash tag of its build), entrypoint,
+              gpu flag and user env vars
+      source  content hash of the source tree
+      inputs  content hash of every RUNPILOT_INPUT_* path (pipeline inputs)
+              and of every local declared input; URL inputs are identified
+              by their URL, which is part of the config component
+    """
+    from .input_cache import local_source_path
+
+    env = {k: v for k, v in cfg.env_vars.items() if k not in _PER_RUN_ENV}
+    input_paths = {k: env.pop(k) for k in sorted(env) if k.startswith(_INPUT_ENV_PREFIX)}
+
+    image = cfg.image
+    if cfg.build is not None:
+        from .image_build import image_tag
+
+        image = image_tag(cfg.name, cfg.build, Path(source_dir))
+
+    config_doc = {
+        "image": image,
+        "entrypoint": cfg.entrypoint,
+        "use_gpu": cfg.use_gpu,
+        "env_vars": env,
+        "inputs": cfg.inputs,
+    }
+    if cfg.profile:
+        # A cache hit would skip the profiled run the user asked for.
+        config_doc["profile"] = cfg.profile
+    config_hash = hashlib.sha256(
+        json.dumps(config_doc, sort_keys=True).encode("utf-8")
+    ).hexdigest()
+
+    inputs_h = hashlib.sha256()
+    for key, value in input_paths.items():
+        path = Path(value)
+        digest = hash_tree(path) if path.exists() else "missing"
+        inputs_h.update(f"{key}={digest}\n".encode("utf-8"))
+    for name, source in sorted(cfg.inputs.items()):
+        local = local_source_path(source, Path(source_dir))
+        if local is not None:
+            digest = hash_tree(local) if local.exists() else "missing"
+            inputs_h.update(f"input:{name}={digest}\n".encode("utf-8"))
+
+    components = {
+        "config": config_hash,
+        "source": hash_tree(source_dir),
+        "inputs": inputs_h.hexdigest(),
+    }
+    fingerprint = hashlib.sha256(
+        "|".join(components[k] for k in sorted(components)).encode("utf-8")
+    ).hexdigest()
+    return fingerprint, components
+
+
+def _link_or_copy_file(src: Path, dst: Path) -> None:
+    try:
+        os.link(src, dst)
+    except OSError:
+        shutil.copy2(src, dst)
+
+
+def _link_or_copy_tree(src: Path, dst: Path) -> int:
+    """Hard-link every file under src into dst, copying across filesystems."""
+    count = 0
+    for path in src.rglob("*"):
+        target = dst / path.relative_to(src)
+        if path.is_dir():
+            target.mkdir(parents=True, exist_ok=True)
+            continue
+        target.parent.mkdir(parents=True, exist_ok=True)
+        _link_or_copy_file(path, target)
+        count += 1
+    return count
+
+
+def _materialise_hit(run_dir: Path, source_run_dir: Path) -> None:
+    """Populate run_dir from a previous successful run with the same fingerprint."""
+    for name in _REUSED_FILES:
+        # Older runs may have had their logs compacted.
+        for stored in stored_forms(name):
+            src = source_run_dir / stored
+            if src.is_file():
+                _link_or_copy_file(src, run_dir / stored)
+
+    outputs = source_run_dir / "outputs"
+    if outputs.is_dir():
+        _link_or_copy_tree(outputs, run_dir / "outputs")
+
+    metrics_src = source_run_dir / "metrics.json"
+    if metrics_src.is_file():
+        try:
+            data = json.loads(metrics_src.read_text(encoding="utf-8"))
+            data["run_id"] = run_dir.name
+            (run_dir / "metrics.json").write_text(
+                json.dumps(data, indent=2, sort_keys=True), encoding="utf-8"
+            )
+        except (OSError, ValueError):
+            pass
+
+
+def _miss_reasons(
+    index: Dict[str, Any], name: str, fingerprint: str, components: Dict[str, str]
+) -> List[str]:
+    entry = index["entries"].get(fingerprint)
+    if entry is not None:
+        return ["cached run no longer on disk"]
+
+    previous = index["latest"].get(name)
+    if previous is None:
+        return ["no previous successful run"]
+
+    changed = [
+        f"{key} changed"
+        for key, value in sorted(components.items())
+        if previous.get("components", {}).get(key) != value
+    ]
+    return changed or ["no previous successful run"]
+
+
+def execute_with_cache(
+    cfg: RunConfig,
+    run_dir: Path,
+    working_dir: Optional[Path] = None,
+) -> int:
+    """
+    Run a config, or reuse a previous successful run with the same fingerprint.
+
+    On a hit the new run record links the earlier run's logs, outputs and
+    metrics instead of executing anything. On a miss the job runs normally
+    and, if it succeeds, becomes the cache entry for its fingerprint.
+    """
+    from .run_manager import execute_run
+
+    run_dir = Path(run_dir)
+    source_dir = Path(working_dir) if working_dir else Path.cwd()
+    try:
+        fingerprint, components = compute_fingerprint(cfg, source_dir)
+    except OSError as e:
+        # E.g. build: names a missing Dockerfile. Run uncached, so the run
+        # fails (or falls back to local) exactly as it would without --cache.
+        write_run_metadata(run_dir, cfg, status="pending")
+        update_run_metadata(run_dir, {"cache": {"hit": False, "error": str(e)}})
+        return execute_run(cfg, run_dir, working_dir=working_dir)
+
+    with _locked_index() as index:
+        entry = index["entries"].get(fingerprint)
+        source_run_dir = run_dir_in(get_runs_dir(), entry["run_id"]) if entry else None
+        hit = source_run_dir is not None and (source_run_dir / "run.json").is_file()
+        if hit:
+            index["stats"]["hits"] += 1
+            reasons: List[str] = []
+        else:
+            index["stats"]["misses"] += 1
+            reasons = _miss_reasons(index, cfg.name, fingerprint, components)
+
+    cache_info: Dict[str, Any] = {
+        "fingerprint": fingerprint,
+        "components": components,
+        "hit": hit,
+    }
+
+    if hit and source_run_dir is not None:
+        _materialise_hit(run_dir, source_run_dir)
+        cache_info["source_run"] = source_run_dir.name
+        write_run_metadata(run_dir, cfg, status="finished", exit_code=0)
+        update_run_metadata(run_dir, {"cache": cache_info})
+        return 0
+
+    cache_info["invalidated_by"] = reasons
+    write_run_metadata(run_dir, cfg, status="pending")
+    update_run_metadata(run_dir, {"cache": cache_info})
+
+    exit_code = execute_run(cfg, run_dir, working_dir=working_dir)
+
+    if exit_code == 0:
+        with _locked_index() as index:
+            record = {
+                "run_id": run_dir.name,
+                "components": components,
+                "recorded_at": datetime.now(timezone.utc).isoformat(),
+            }
+            index["entries"][fingerprint] = record
+            index["latest"][cfg.name] = {"fingerprint": fingerprint, "components": components}
+
+    return exit_code
+
+
+def cache_stats() -> Dict[str, int]:
+    """Return global hit/miss counters and the number of cached fingerprints."""
+    index_path = get_cache_dir() / INDEX_FILENAME
+    try:
+        index = json.loads(index_path.read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        index = {}
+    stats = {"hits": 0, "misses": 0}
+    stats.update(index.get("stats") or {})
+    stats["entries"] = len(index.get("entries") or {})
+    return stats
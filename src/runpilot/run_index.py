@@ -0,0 +1,382 @@
+from __future__ import annotations
+
+import json
+import os
+import sqlite3
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional
+
+from .metrics import METRICS_FILENAME, read_metrics
+from .paths import is_run_location, iter_run_dirs
+from .storage import get_root_dir, get_runs_dir
+
+INDEX_FILENAME = "index.db"
+SCHEMA_VERSION = 4
+
+# Columns `list` can sort by; anything else would be an injection vector.
+SORT_COLUMNS = ("created_at", "finished_at", "name", "status", "id", "exit_code")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    id          TEXT PRIMARY KEY,
+    name        TEXT,
+    status      TEXT,
+    image       TEXT,
+    exit_code   INTEGER,
+    created_at  TEXT,
+    finished_at TEXT,
+    run_dir     TEXT,
+    mtime_ns    INTEGER,
+    data        TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS runs_created_at ON runs (created_at);
+CREATE INDEX IF NOT EXISTS runs_name ON runs (name, created_at);
+CREATE INDEX IF NOT EXISTS runs_status ON runs (status, created_at);
+CREATE TABLE IF NOT EXISTS state (
+    key   TEXT PRIMARY KEY,
+    value TEXT
+);
+-- Queryable per-run values: kind is 'param' or 'metric' (metrics.json summary).
+CREATE TABLE IF NOT EXISTS run_values (
+    run_id TEXT NOT NULL,
+    kind   TEXT NOT NULL,
+    key    TEXT NOT NULL,
+    num    REAL,
+    text   TEXT,
+    PRIMARY KEY (run_id, kind, key)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS run_values_num ON run_values (kind, key, num);
+CREATE INDEX IF NOT EXISTS run_values_text ON run_values (kind, key, text);
+CREATE TABLE IF NOT EXISTS run_tags (
+    run_id TEXT NOT NULL,
+    tag    TEXT NOT NULL,
+    PRIMARY KEY (run_id, tag)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS run_tags_tag ON run_tags (tag);
+-- Disk usage per run dir, valid while the dir's mtime is unchanged (gc).
+CREATE TABLE IF NOT EXISTS run_sizes (
+    run_id TEXT PRIMARY KEY,
+    stamp  INTEGER NOT NULL,
+    bytes  INTEGER NOT NULL
+) WITHOUT ROWID;
+-- Runs listed by RunPilot Cloud, mirrored for `runpilot stats`.
+CREATE TABLE IF NOT EXISTS remote_runs (
+    id          TEXT PRIMARY KEY,
+    name        TEXT,
+    status      TEXT,
+    image       TEXT,
+    created_at  TEXT,
+    claimed_at  TEXT,
+    finished_at TEXT,
+    data        TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS remote_runs_created_at ON remote_runs (created_at);
+"""
+
+
+# Tables with per-run rows, and their run id column.
+_RUN_TABLES = (("runs", "id"), ("run_values", "run_id"), ("run_tags", "run_id"), ("run_sizes", "run_id"))
+
+
+@dataclass
+class ReindexReport:
+    added: List[str] = field(default_factory=list)
+    updated: List[str] = field(default_factory=list)
+    removed: List[str] = field(default_factory=list)
+    unchanged: int = 0
+
+    @property
+    def drift(self) -> bool:
+        return bool(self.added or self.updated or self.removed)
+
+
+def index_path() -> Path:
+    return get_root_dir() / INDEX_FILENAME
+
+
+@contextmanager
+def connect() -> Iterator[sqlite3.Connection]:
+    """
+    Open the run index, creating its schema on first use.
+
+    WAL mode lets `list` read while runs are writing, and the busy timeout
+    covers concurrent writers (parallel pipeline steps, agents).
+    """
+    path = index_path()
+    path.parent.mkdir(parents=True, exist_ok=True)
+    conn = sqlite3.connect(str(path), timeout=30)
+    try:
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        version = conn.execute("PRAGMA user_version").fetchone()[0]
+        if version < SCHEMA_VERSION:
+            conn.executescript(_SCHEMA)
+            if version:
+                # Rows written by an older version may be stale or shaped
+                # differently; rebuild everything from disk on next read
+                # (and from the Cloud on the next `stats --refresh`).
+                for table, _ in _RUN_TABLES:
+                    conn.execute(f"DELETE FROM {table}")
+                conn.execute("DELETE FROM remote_runs")
+                conn.execute("DELETE FROM state")
+            conn.execute(f"PRAGMA user_version={SCHEMA_VERSION}")
+        yield conn
+        conn.commit()
+    finally:
+        conn.close()
+
+
+def _row(meta: Dict[str, Any], mtime_ns: int) -> tuple:
+    exit_code = meta.get("exit_code")
+    return (
+        str(meta.get("id")),
+        meta.get("name"),
+        meta.get("status"),
+        meta.get("image"),
+        exit_code if isinstance(exit_code, int) else None,
+        meta.get("created_at"),
+        meta.get("finished_at"),
+        meta.get("run_dir"),
+        mtime_ns,
+        json.dumps(meta, sort_keys=True, default=str),
+    )
+
+
+def _value(kind: str, run_id: str, key: str, value: Any) -> tuple:
+    # Numbers (and numeric strings) get `num` for range queries; everything
+    # keeps a text form for equality and glob matches.
+    if isinstance(value, bool):
+        value = int(value)
+    try:
+        return (run_id, kind, key, float(value), str(value))
+    except (TypeError, ValueError):
+        text = value if isinstance(value, str) else json.dumps(value, sort_keys=True, default=str)
+        return (run_id, kind, key, None, text)
+
+
+def _upsert(
+    conn: sqlite3.Connection,
+    meta: Dict[str, Any],
+    mtime_ns: int,
+    summary: Dict[str, Any],
+) -> None:
+    row = _row(meta, mtime_ns)
+    run_id = row[0]
+    conn.execute(
+        "INSERT OR REPLACE INTO runs "
+        "(id, name, status, image, exit_code, created_at, finished_at, run_dir, mtime_ns, data) "
+        "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+        row,
+    )
+    conn.execute("DELETE FROM run_values WHERE run_id = ?", (run_id,))
+    conn.execute("DELETE FROM run_tags WHERE run_id = ?", (run_id,))
+
+    params = meta.get("params") if isinstance(meta.get("params"), dict) else {}
+    values = [_value("param", run_id, str(k), v) for k, v in params.items()]
+    values += [_value("metric", run_id, str(k), v) for k, v in summary.items()]
+    conn.executemany("INSERT OR REPLACE INTO run_values VALUES (?, ?, ?, ?, ?)", values)
+
+    tags = meta.get("tags") if isinstance(meta.get("tags"), list) else []
+    conn.executemany(
+        "INSERT OR REPLACE INTO run_tags VALUES (?, ?)", [(run_id, str(tag)) for tag in tags]
+    )
+
+
+def _stamp(run_dir: str) -> Optional[int]:
+    """Change stamp for a run: newest mtime of run.json and metrics.json."""
+    try:
+        stamp = os.stat(os.path.join(run_dir, "run.json")).st_mtime_ns
+    except OSError:
+        return None
+    try:
+        stamp = max(stamp, os.stat(os.path.join(run_dir, METRICS_FILENAME)).st_mtime_ns)
+    except OSError:
+        pass
+    return stamp
+
+
+def _read_run(run_dir: Path) -> Optional[tuple[Dict[str, Any], int, Dict[str, Any]]]:
+    """Return (run.json, change stamp, metrics summary) for a run dir."""
+    stamp = _stamp(str(run_dir))
+    try:
+        data = json.loads((run_dir / "run.json").read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return None
+    if stamp is None or not isinstance(data, dict):
+        return None
+    data.setdefault("id", run_dir.name)
+    data.setdefault("run_dir", str(run_dir))
+
+    metrics = read_metrics(run_dir) or {}
+    summary = metrics.get("summary") if isinstance(metrics.get("summary"), dict) else {}
+    return data, stamp, summary
+
+
+def index_run_dir(run_dir: Path) -> None:
+    """
+    Bring the index entry for one run in line with its run.json and
+    metrics.json.
+
+    Called after every metadata or metrics write. Failures are swallowed: the index is
+    a cache of run.json, and `runpilot reindex` repairs it.
+    """
+    run_dir = Path(run_dir).resolve()
+    if not is_run_location(get_runs_dir().resolve(), run_dir):
+        return  # scratch dirs (tests, exports) are not runs
+    loaded = _read_run(run_dir)
+    if loaded is None:
+        return
+    try:
+        with connect() as conn:
+            _upsert(conn, *loaded)
+    except sqlite3.Error:
+        pass
+
+
+def ensure_index() -> None:
+    """
+    Build the index from disk the first time it is read.
+
+    Metadata writes may create the database before that (indexing only
+    their own run), so completeness is tracked separately from existence.
+    """
+    with connect() as conn:
+        built = conn.execute("SELECT value FROM state WHERE key = 'built'").fetchone()
+    if built is None:
+        reindex()
+
+
+def query_runs(
+    status: Optional[str] = None,
+    name: Optional[str] = None,
+    image: Optional[str] = None,
+    sort: str = "created_at",
+    descending: bool = True,
+    limit: Optional[int] = None,
+    offset: int = 0,
+) -> List[Dict[str, Any]]:
+    """
+    Return run metadata from the index, filtered, sorted and paginated in SQL.
+
+    name and image accept shell-style globs (`resnet*`).
+    """
+    if sort not in SORT_COLUMNS:
+        raise ValueError(f"Cannot sort by {sort!r} (expected one of {', '.join(SORT_COLUMNS)})")
+    ensure_index()
+
+    clauses: List[str] = []
+    params: List[Any] = []
+    if status:
+        clauses.append("status = ?")
+        params.append(status)
+    if name:
+        clauses.append("name GLOB ?")
+        params.append(name)
+    if image:
+        clauses.append("image GLOB ?")
+        params.append(image)
+
+    sql = "SELECT data FROM runs"
+    if clauses:
+        sql += " WHERE " + " AND ".join(clauses)
+    # id breaks ties so pages are stable.
+    direction = "DESC" if descending else "ASC"
+    sql += f" ORDER BY {sort} {direction}, id {direction}"
+    if limit is not None or offset:
+        sql += " LIMIT ? OFFSET ?"
+        params.extend([-1 if limit is None else limit, offset])
+
+    with connect() as conn:
+        return [json.loads(row[0]) for row in conn.execute(sql, params)]
+
+
+def get_run(run_id: str) -> Optional[Dict[str, Any]]:
+    ensure_index()
+    with connect() as conn:
+        row = conn.execute("SELECT data FROM runs WHERE id = ?", (run_id,)).fetchone()
+    return json.loads(row[0]) if row else None
+
+
+def forget_runs(run_ids: List[str]) -> None:
+    """Drop deleted runs from the index."""
+    with connect() as conn:
+        for table, column in _RUN_TABLES:
+            conn.executemany(f"DELETE FROM {table} WHERE {column} = ?", [(r,) for r in run_ids])
+
+
+def mirror_remote_runs(runs: List[Dict[str, Any]]) -> int:
+    """
+    Upsert runs as returned by the cloud API into the remote_runs table.
+
+    Field names vary between API versions, so the common spellings are
+    accepted. Returns the number of runs stored.
+    """
+    rows = []
+    for run in runs:
+        run_id = run.get("cloud_run_id") or run.get("id") or run.get("run_id")
+        if not run_id:
+            continue
+        config = run.get("config") if isinstance(run.get("config"), dict) else {}
+        rows.append(
+            (
+                str(run_id),
+                run.get("name") or config.get("name") or run.get("run_id"),
+                run.get("status"),
+                run.get("image") or config.get("image"),
+                run.get("created_at") or run.get("queued_at"),
+                run.get("claimed_at") or run.get("started_at"),
+                run.get("ended_at") or run.get("finished_at"),
+                json.dumps(run, sort_keys=True, default=str),
+            )
+        )
+    with connect() as conn:
+        conn.executemany("INSERT OR REPLACE INTO remote_runs VALUES (?, ?, ?, ?, ?, ?, ?, ?)", rows)
+    return len(rows)
+
+
+def reindex(check_only: bool = False) -> ReindexReport:
+    """
+    Rebuild the index from the run directories on disk.
+
+    Entries are compared by run.json / metrics.json mtimes, so an unchanged
+    tree costs two stats per run. The report lists runs that were missing from the index,
+    out of date, or indexed without a run directory; with check_only the
+    index is left untouched.
+    """
+    report = ReindexReport()
+    runs_dir = get_runs_dir()
+
+    with connect() as conn:
+        indexed = dict(conn.execute("SELECT id, mtime_ns FROM runs").fetchall())
+        seen = set()
+
+        for entry in iter_run_dirs(runs_dir):
+            stamp = _stamp(entry.path)
+            if stamp is None:
+                continue
+            run_id = entry.name
+            seen.add(run_id)
+            if indexed.get(run_id) == stamp:
+                report.unchanged += 1
+                continue
+
+            (report.updated if run_id in indexed else report.added).append(run_id)
+            if check_only:
+                continue
+            loaded = _read_run(Path(entry.path))
+            if loaded is not None:
+                _upsert(conn, *loaded)
+
+        report.removed = sorted(set(indexed) - seen)
+        if not check_only:
+            for table, column in _RUN_TABLES:
+                conn.executemany(
+                    f"DELETE FROM {table} WHERE {column} = ?", [(r,) for r in report.removed]
+                )
+            conn.execute("INSERT OR REPLACE INTO state (key, value) VALUES ('built', '1')")
+
+    report.added.sort()
+    report.updated.sort()
+    return report
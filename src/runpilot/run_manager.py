@@ -3,9 +3,55 @@ from __future__ import annotations
 import json
 from datetime import datetime
 from pathlib import Path
-from typing import Any, Dict
+from typing import Any, Dict, Optional
 
-from .metrics import write_metrics
+from .config import RunConfig
+from .metrics import refresh_metrics, write_metrics
+from .run_store import publish_run
+from .runner import final_status, run_local_container
+from .storage import write_run_metadata
+
+
+def execute_run(
+    cfg: RunConfig,
+    run_dir: Path,
+    working_dir: Optional[Path] = None,
+) -> int:
+    """
+    Execute a config inside an already created run directory.
+
+    Writes pending and final metadata around the runner, then parses METRIC
+    lines from logs.txt into metrics.json, and queues the run for upload if
+    a storage backend is configured. Returns the job exit code.
+    """
+    run_dir = Path(run_dir)
+    write_run_metadata(run_dir, cfg, status="pending")
+
+    exit_code = run_local_container(cfg, run_dir, working_dir=working_dir)
+
+    status = final_status(run_dir, exit_code)
+    write_run_metadata(run_dir, cfg, status=status, exit_code=exit_code)
+
+    write_log_metrics(run_dir, exit_code)
+    publish_run(run_dir)
+    return exit_code
+
+
+def write_log_metrics(run_dir: Path, exit_code: int) -> Optional[Path]:
+    """
+    Build metrics.json from the METRIC lines in logs.txt plus the exit code.
+
+    The summary holds each metric's last value; the full series go to the
+    columnar sidecar next to metrics.json. Lines already parsed by live
+    refreshes are not read again. Returns the metrics.json path, or None if
+    there was nothing to record.
+    """
+    extra: Dict[str, float] = {}
+    try:
+        extra["exit_code"] = float(exit_code)
+    except (TypeError, ValueError):
+        pass
+    return refresh_metrics(Path(run_dir), final=True, extra_summary=extra)
 
 
 def finalise_run(run_dir: Path, run_record: Dict[str, Any]) -> None:
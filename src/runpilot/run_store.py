@@ -0,0 +1,581 @@
+from __future__ import annotations
+
+import abc
+import atexit
+import fcntl
+import hashlib
+import hmac
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+import xml.etree.ElementTree as ET
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+from urllib.parse import quote, unquote, urlparse
+
+import requests
+
+from .config import parse_size
+from .storage import TERMINAL_STATUSES, get_root_dir
+
+STORE_CACHE_DIR_NAME = "store-cache"
+QUEUE_FILENAME = "upload-queue.json"
+DEFAULT_CACHE_MAX_BYTES = 20 * 1024**3
+# How long a CLI process waits at exit for queued uploads; whatever is left
+# stays in the persisted queue for the next process (or the agent).
+DEFAULT_FLUSH_TIMEOUT = 120.0
+# Never uploaded: lock files and half-written temporaries.
+_SKIP_SUFFIXES = (".lock", ".tmp")
+_CHUNK = 1024 * 1024
+
+
+class StorageError(RuntimeError):
+    pass
+
+
+class StorageBackend(abc.ABC):
+    """
+    Object storage for run data, addressed by "/"-separated keys.
+
+    Runs are stored under runs/<run_id>/<path in the run dir>, so metadata
+    (run.json, events.jsonl), logs, metrics and artifacts all go through the
+    same few operations.
+    """
+
+    name = "backend"
+
+    @abc.abstractmethod
+    def put_file(self, key: str, path: Path) -> None:
+        """Upload the file at path as key, replacing any existing object."""
+
+    @abc.abstractmethod
+    def get_file(self, key: str, dest: Path) -> None:
+        """Download key to dest. Raises FileNotFoundError if it does not exist."""
+
+    @abc.abstractmethod
+    def list_keys(self, prefix: str) -> List[str]:
+        """All keys starting with prefix."""
+
+    @abc.abstractmethod
+    def delete(self, key: str) -> None:
+        """Remove key; deleting a missing key is not an error."""
+
+    def put_bytes(self, key: str, data: bytes) -> None:
+        with tempfile.NamedTemporaryFile(delete=False) as tmp:
+            tmp.write(data)
+        try:
+            self.put_file(key, Path(tmp.name))
+        finally:
+            os.unlink(tmp.name)
+
+    def get_bytes(self, key: str) -> bytes:
+        with tempfile.TemporaryDirectory() as tmp:
+            dest = Path(tmp) / "object"
+            self.get_file(key, dest)
+            return dest.read_bytes()
+
+
+class LocalBackend(StorageBackend):
+    """Keys as files under a root directory (a local disk or an NFS mount)."""
+
+    name = "file"
+
+    def __init__(self, root: Path):
+        self.root = Path(root)
+
+    def _path(self, key: str) -> Path:
+        parts = [p for p in key.split("/") if p]
+        if any(p == ".." for p in parts):
+            raise StorageError(f"Invalid storage key: {key!r}")
+        return self.root.joinpath(*parts)
+
+    def put_file(self, key: str, path: Path) -> None:
+        target = self._path(key)
+        target.parent.mkdir(parents=True, exist_ok=True)
+        tmp = target.with_name(f".{target.name}.{os.getpid()}.part")
+        shutil.copyfile(path, tmp)
+        os.replace(tmp, target)
+
+    def get_file(self, key: str, dest: Path) -> None:
+        source = self._path(key)
+        if not source.is_file():
+            raise FileNotFoundError(f"No such object: {key}")
+        shutil.copyfile(source, dest)
+
+    def list_keys(self, prefix: str) -> List[str]:
+        base = self._path(prefix.rsplit("/", 1)[0]) if "/" in prefix else self.root
+        if not base.is_dir():
+            return []
+        keys = []
+        for dirpath, _dirnames, filenames in os.walk(base):
+            for filename in filenames:
+                if filename.endswith(".part"):
+                    continue
+                key = Path(dirpath, filename).relative_to(self.root).as_posix()
+                if key.startswith(prefix):
+                    keys.append(key)
+        return sorted(keys)
+
+    def delete(self, key: str) -> None:
+        try:
+            self._path(key).unlink()
+        except FileNotFoundError:
+            pass
+
+
+class S3Backend(StorageBackend):
+    """
+    An S3-compatible bucket (AWS S3, MinIO, R2, ...) over plain HTTP.
+
+    Requests are signed with AWS Signature V4 and use path-style URLs
+    (endpoint/bucket/key), which every S3-compatible server accepts.
+    Bodies are sent as UNSIGNED-PAYLOAD so uploads stream from disk.
+    """
+
+    name = "s3"
+
+    def __init__(
+        self,
+        bucket: str,
+        prefix: str = "",
+        endpoint: Optional[str] = None,
+        region: str = "us-east-1",
+        access_key: Optional[str] = None,
+        secret_key: Optional[str] = None,
+        session_token: Optional[str] = None,
+    ):
+        self.bucket = bucket
+        self.prefix = prefix.strip("/")
+        self.region = region
+        self.endpoint = (endpoint or f"https://s3.{region}.amazonaws.com").rstrip("/")
+        self.access_key = access_key
+        self.secret_key = secret_key
+        self.session_token = session_token
+        self._session = requests.Session()
+
+    def _key(self, key: str) -> str:
+        return f"{self.prefix}/{key}" if self.prefix else key
+
+    def _headers(self, method: str, path: str, canonical_query: str) -> Dict[str, str]:
+        now = datetime.now(timezone.utc)
+        amz_date = now.strftime("%Y%m%dT%H%M%SZ")
+        headers = {"x-amz-content-sha256": "UNSIGNED-PAYLOAD", "x-amz-date": amz_date}
+        if self.session_token:
+            headers["x-amz-security-token"] = self.session_token
+        if not (self.access_key and self.secret_key):
+            return headers  # anonymous access (e.g. a public test bucket)
+
+        signed = dict(headers, host=urlparse(self.endpoint).netloc)
+        names = sorted(signed)
+        canonical = "\n".join(
+            [
+                method,
+                quote(path, safe="/-_.~"),
+                canonical_query,
+                "".join(f"{name}:{signed[name]}\n" for name in names),
+                ";".join(names),
+                "UNSIGNED-PAYLOAD",
+            ]
+        )
+        scope = f"{amz_date[:8]}/{self.region}/s3/aws4_request"
+        to_sign = "\n".join(
+            ["AWS4-HMAC-SHA256", amz_date, scope, hashlib.sha256(canonical.encode()).hexdigest()]
+        )
+        key = ("AWS4" + self.secret_key).encode()
+        for part in (amz_date[:8], self.region, "s3", "aws4_request"):
+            key = hmac.new(key, part.encode(), hashlib.sha256).digest()
+        signature = hmac.new(key, to_sign.encode(), hashlib.sha256).hexdigest()
+        headers["Authorization"] = (
+            f"AWS4-HMAC-SHA256 Credential={self.access_key}/{scope}, "
+            f"SignedHeaders={';'.join(names)}, Signature={signature}"
+        )
+        return headers
+
+    def _request(
+        self,
+        method: str,
+        key: Optional[str] = None,
+        query: Optional[Dict[str, str]] = None,
+        **kwargs: Any,
+    ) -> requests.Response:
+        path = f"/{self.bucket}" + (f"/{self._key(key)}" if key is not None else "")
+        # Encoded once, identically for the URL and the signature.
+        canonical_query = "&".join(
+            f"{quote(k, safe='-_.~')}={quote(v, safe='-_.~')}" for k, v in sorted((query or {}).items())
+        )
+        headers = self._headers(method, path, canonical_query)
+        url = self.endpoint + quote(path, safe="/-_.~")
+        if canonical_query:
+            url += "?" + canonical_query
+        try:
+            resp = self._session.request(method, url, headers=headers, timeout=60, **kwargs)
+        except requests.RequestException as exc:
+            raise StorageError(f"{method} {url} failed: {exc}")
+        if resp.status_code == 404 and method == "GET" and key is not None:
+            raise FileNotFoundError(f"No such object: {key}")
+        if resp.status_code >= 300:
+            raise StorageError(f"{method} {url} failed: HTTP {resp.status_code} {resp.text[:200]}")
+        return resp
+
+    def put_file(self, key: str, path: Path) -> None:
+        with Path(path).open("rb") as f:
+            self._request("PUT", key, data=f)
+
+    def get_file(self, key: str, dest: Path) -> None:
+        resp = self._request("GET", key, stream=True)
+        with Path(dest).open("wb") as f:
+            for chunk in resp.iter_content(_CHUNK):
+                f.write(chunk)
+
+    def list_keys(self, prefix: str) -> List[str]:
+        full_prefix = self._key(prefix)
+        strip = len(self._key(""))
+        keys: List[str] = []
+        token: Optional[str] = None
+        while True:
+            query = {"list-type": "2", "prefix": full_prefix}
+            if token:
+                query["continuation-token"] = token
+            root = ET.fromstring(self._request("GET", query=query).content)
+            token = None
+            truncated = False
+            for element in root:
+                tag = element.tag.rsplit("}", 1)[-1]
+                if tag == "Contents":
+                    for child in element:
+                        if child.tag.rsplit("}", 1)[-1] == "Key" and child.text:
+                            keys.append(child.text[strip:])
+                elif tag == "IsTruncated":
+                    truncated = (element.text or "").lower() == "true"
+                elif tag == "NextContinuationToken":
+                    token = element.text
+            if not (truncated and token):
+                return keys
+
+    def delete(self, key: str) -> None:
+        self._request("DELETE", key)
+
+
+def backend_from_url(url: str) -> StorageBackend:
+    """
+    Build a backend from a storage URL.
+
+    file:///path (or a plain path) stores under that directory; s3://bucket/prefix
+    uses RUNPILOT_S3_ENDPOINT (for MinIO and other S3-compatible servers),
+    AWS_REGION and the usual AWS_ACCESS_KEY_ID / AWS_SECRET_ACCESS_KEY /
+    AWS_SESSION_TOKEN variables.
+    """
+    parsed = urlparse(url)
+    if parsed.scheme in ("", "file"):
+        return LocalBackend(Path(unquote(parsed.path if parsed.scheme else url)).expanduser())
+    if parsed.scheme == "s3":
+        if not parsed.netloc:
+            raise StorageError(f"Storage URL {url!r} has no bucket")
+        env = os.environ
+        return S3Backend(
+            bucket=parsed.netloc,
+            prefix=parsed.path,
+            endpoint=env.get("RUNPILOT_S3_ENDPOINT") or None,
+            region=env.get("AWS_REGION") or env.get("AWS_DEFAULT_REGION") or "us-east-1",
+            access_key=env.get("AWS_ACCESS_KEY_ID"),
+            secret_key=env.get("AWS_SECRET_ACCESS_KEY"),
+            session_token=env.get("AWS_SESSION_TOKEN"),
+        )
+    raise StorageError(f"Unsupported storage URL {url!r} (expected file:// or s3://)")
+
+
+_backends: Dict[str, StorageBackend] = {}
+
+
+def get_backend() -> Optional[StorageBackend]:
+    """
+    The backend configured by RUNPILOT_STORAGE_URL, or None.
+
+    Without one, runs live only in the local runs dir, as before.
+    """
+    url = os.environ.get("RUNPILOT_STORAGE_URL")
+    if not url:
+        return None
+    if url not in _backends:
+        _backends[url] = backend_from_url(url)
+    return _backends[url]
+
+
+def run_key(run_id: str, relpath: str = "") -> str:
+    return f"runs/{run_id}/{relpath}"
+
+
+def _store_dir() -> Path:
+    path = get_root_dir() / STORE_CACHE_DIR_NAME
+    for sub in ("runs", "tmp"):
+        (path / sub).mkdir(parents=True, exist_ok=True)
+    return path
+
+
+@contextmanager
+def _locked_json(name: str) -> Iterator[Dict[str, Any]]:
+    store_dir = _store_dir()
+    path = store_dir / name
+    with (store_dir / (name + ".lock")).open("a") as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        try:
+            state: Dict[str, Any] = json.loads(path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            state = {}
+        yield state
+        tmp_path = path.with_suffix(".tmp")
+        tmp_path.write_text(json.dumps(state, indent=2, sort_keys=True), encoding="utf-8")
+        os.replace(tmp_path, path)
+
+
+class UploadQueue:
+    """
+    Write-behind uploads to a backend.
+
+    enqueue() returns at once; a background thread uploads in order. The
+    pending list is persisted in upload-queue.json (keyed by storage key,
+    so re-queuing a file that changed just uploads its latest contents),
+    which lets a restarted agent or the next CLI process finish uploads an
+    earlier one was killed before completing. Failed uploads are retried
+    with backoff.
+    """
+
+    def __init__(self, backend: StorageBackend, state_name: str = QUEUE_FILENAME):
+        self.backend = backend
+        self._state_name = state_name
+        self._pending: Dict[str, str] = {}
+        self._cond = threading.Condition()
+        self._busy = False
+        self._thread: Optional[threading.Thread] = None
+        self.errors: List[Tuple[str, str]] = []
+        self._pending.update(self._load())
+
+    def _load(self) -> Dict[str, str]:
+        with _locked_json(self._state_name) as state:
+            return dict(state)
+
+    def enqueue(self, items: List[Tuple[str, Path]]) -> None:
+        if not items:
+            return
+        with _locked_json(self._state_name) as state:
+            state.update((key, str(path)) for key, path in items)
+        with self._cond:
+            self._pending.update((key, str(path)) for key, path in items)
+            self._start()
+            self._cond.notify_all()
+
+    def resume(self) -> int:
+        """Start uploading anything left pending by earlier processes."""
+        with self._cond:
+            self._pending.update(self._load())
+            if self._pending:
+                self._start()
+                self._cond.notify_all()
+            return len(self._pending)
+
+    def pending(self) -> int:
+        with self._cond:
+            return len(self._pending) + (1 if self._busy else 0)
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """Wait for the queue to drain; False if timeout passed first."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._cond:
+            if self._pending:
+                self._start()
+            while self._pending or self._busy:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._cond.wait(remaining)
+        return True
+
+    def _start(self) -> None:
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._worker, name="runpilot-uploads", daemon=True)
+            self._thread.start()
+
+    def _worker(self) -> None:
+        failures = 0
+        while True:
+            with self._cond:
+                if not self._pending:
+                    self._cond.notify_all()
+                    return
+                key = next(iter(self._pending))
+                path = self._pending.pop(key)
+                self._busy = True
+            done = True
+            failed = False
+            try:
+                if os.path.isfile(path):
+                    self.backend.put_file(key, Path(path))
+                failures = 0
+            except (OSError, StorageError) as exc:
+                failures += 1
+                done = failed = failures > 5
+                if failed:
+                    # Stays in the persisted queue for the next process.
+                    self.errors.append((key, str(exc)))
+                    failures = 0
+            if done and not failed:
+                self._forget(key, path)
+            with self._cond:
+                if not done:
+                    # Retry later, after anything queued behind it.
+                    self._pending.setdefault(key, path)
+                self._busy = False
+                self._cond.notify_all()
+            if not done:
+                time.sleep(min(30.0, 0.5 * 2**failures))
+
+    def _forget(self, key: str, path: str) -> None:
+        with _locked_json(self._state_name) as state:
+            # A newer enqueue of the same key (from any process) stays.
+            if state.get(key) == path and key not in self._pending:
+                del state[key]
+
+
+_queue: Optional[UploadQueue] = None
+_queue_lock = threading.Lock()
+
+
+def get_upload_queue() -> Optional[UploadQueue]:
+    """The process-wide upload queue for the configured backend (None if none)."""
+    global _queue
+    backend = get_backend()
+    if backend is None:
+        return None
+    with _queue_lock:
+        if _queue is None or _queue.backend is not backend:
+            _queue = UploadQueue(backend)
+            atexit.register(_flush_at_exit, _queue)
+        return _queue
+
+
+def _flush_at_exit(queue: UploadQueue) -> None:
+    try:
+        timeout = float(os.environ.get("RUNPILOT_UPLOAD_FLUSH_TIMEOUT", DEFAULT_FLUSH_TIMEOUT))
+    except ValueError:
+        timeout = DEFAULT_FLUSH_TIMEOUT
+    queue.flush(timeout)
+
+
+def run_files(run_dir: Path) -> List[Tuple[str, Path]]:
+    """(path relative to the run dir, path) of every file worth storing."""
+    run_dir = Path(run_dir)
+    files = []
+    for dirpath, _dirnames, filenames in os.walk(run_dir):
+        for filename in filenames:
+            if filename.endswith(_SKIP_SUFFIXES):
+                continue
+            path = Path(dirpath, filename)
+            files.append((path.relative_to(run_dir).as_posix(), path))
+    # run.json last: a run whose metadata is stored has (almost) all its files.
+    files.sort(key=lambda item: (item[0] == "run.json", item[0]))
+    return files
+
+
+def publish_run(run_dir: Path) -> int:
+    """
+    Queue a run dir's files for upload to the configured backend.
+
+    The local run dir stays the working copy; this returns as soon as the
+    files are queued. Returns the number of files queued (0 without a
+    backend).
+    """
+    queue = get_upload_queue()
+    if queue is None:
+        return 0
+    run_dir = Path(run_dir)
+    items = [(run_key(run_dir.name, rel), path) for rel, path in run_files(run_dir)]
+    queue.enqueue(items)
+    return len(items)
+
+
+def cache_max_bytes() -> int:
+    """Size budget for fetched runs, from RUNPILOT_STORE_CACHE_MAX_BYTES (e.g. 20G)."""
+    try:
+        value = parse_size(os.environ.get("RUNPILOT_STORE_CACHE_MAX_BYTES"))
+    except ValueError:
+        value = None
+    return DEFAULT_CACHE_MAX_BYTES if value is None else value
+
+
+def _tree_bytes(path: Path) -> int:
+    return sum(
+        os.path.getsize(os.path.join(dirpath, name))
+        for dirpath, _dirnames, filenames in os.walk(path)
+        for name in filenames
+    )
+
+
+def _cached_status(run_dir: Path) -> Optional[str]:
+    try:
+        return json.loads((run_dir / "run.json").read_text(encoding="utf-8")).get("status")
+    except (OSError, ValueError, AttributeError):
+        return None
+
+
+def fetch_run(run_id: str, backend: Optional[StorageBackend] = None) -> Optional[Path]:
+    """
+    Local copy of a stored run, downloading it into the read cache if needed.
+
+    Cached runs that had finished are served without touching the backend;
+    runs that were still in progress are fetched again. The cache is kept
+    under RUNPILOT_STORE_CACHE_MAX_BYTES by evicting the least recently
+    used runs. Returns None if no backend is configured, the run is not
+    stored, or the backend cannot be reached.
+    """
+    backend = backend or get_backend()
+    if backend is None or not run_id or "/" in run_id or run_id.startswith("."):
+        return None
+    store_dir = _store_dir()
+    dest = store_dir / "runs" / run_id
+    now = datetime.now(timezone.utc).isoformat()
+
+    if _cached_status(dest) in TERMINAL_STATUSES:
+        with _locked_json("cache.json") as entries:
+            entry = entries.setdefault(run_id, {"bytes": _tree_bytes(dest)})
+            entry["last_used"] = now
+        return dest
+
+    staging = Path(tempfile.mkdtemp(dir=store_dir / "tmp"))
+    try:
+        prefix = run_key(run_id)
+        keys = backend.list_keys(prefix)
+        if not keys:
+            return dest if dest.is_dir() else None
+        for key in keys:
+            target = staging.joinpath(*[p for p in key[len(prefix):].split("/") if p not in ("", "..")])
+            target.parent.mkdir(parents=True, exist_ok=True)
+            backend.get_file(key, target)
+        size = _tree_bytes(staging)
+        with _locked_json("cache.json") as entries:
+            if dest.exists():
+                shutil.rmtree(dest, ignore_errors=True)
+            os.replace(staging, dest)
+            entries[run_id] = {"bytes": size, "last_used": now}
+            _evict(entries, store_dir, keep=run_id)
+        return dest
+    except (OSError, StorageError):
+        return dest if dest.is_dir() else None
+    finally:
+        shutil.rmtree(staging, ignore_errors=True)
+
+
+def _evict(entries: Dict[str, Any], store_dir: Path, keep: str) -> None:
+    budget = cache_max_bytes()
+    total = sum(int(e.get("bytes", 0)) for e in entries.values())
+    for run_id in sorted(entries, key=lambda r: str(entries[r].get("last_used", ""))):
+        if total <= budget:
+            break
+        if run_id == keep:
+            continue
+        shutil.rmtree(store_dir / "runs" / run_id, ignore_errors=True)
+        total -= int(entries.pop(run_id).get("bytes", 0))
@@ -3,15 +3,40 @@ from __future__ import annotations
 
 import os
 import shlex
+import signal
 import subprocess
+import time
+from contextlib import ExitStack
+from dataclasses import replace
 from pathlib import Path
+from typing import Any, Callable, Optional
 
 from rich.console import Console
 
+from . import package_cache, profiling, warm
+from .affinity import CpuSet, cpu_reservation
 from .config import RunConfig
+from .log_records import LogRecorder
+from .input_cache import CachedInput, input_env_name, materialise_inputs
+from .image_build import build_image, image_repository
+from .storage import read_run_metadata, record_phase, update_run_metadata
 
 console = Console()
 
+# How often the supervisor wakes up to check limits.
+POLL_INTERVAL = 1.0
+# Minimum gap between CPU/GPU utilisation probes while the log is quiet.
+PROBE_INTERVAL = 10.0
+# Time a job gets between SIGTERM and SIGKILL when RunPilot stops it.
+KILL_GRACE_SECONDS = 10
+
+# reason -> (status recorded in run.json, exit code). 124 mirrors timeout(1).
+TERMINATIONS = {
+    "timeout": ("timed_out", 124),
+    "idle": ("idle_timeout", 123),
+    "budget": ("over_budget", 122),
+}
+
 
 def run_local_container(cfg: RunConfig, run_dir: Path, working_dir: Path | None = None) -> int:
     """
@@ -28,12 +53,131 @@ def run_local_container(cfg: RunConfig, run_dir: Path, working_dir: Path | None
     # 1. Check Docker
     docker_avail = _check_docker()
 
-    if cfg.image and docker_avail:
-        return _run_in_docker(cfg, run_dir, exec_dir)
-    else:
-        if cfg.image:
-            console.print("[yellow]⚠ Docker not found. Falling back to local.[/yellow]")
-        return _run_locally(cfg, run_dir, exec_dir)
+    with ExitStack() as stack:
+        # 2. Fetch declared inputs into the shared cache (pinned while running)
+        if cfg.inputs:
+            try:
+                inputs = stack.enter_context(materialise_inputs(cfg.inputs, base_dir=exec_dir))
+            except Exception as e:
+                console.print(f"[red]Input fetch error:[/red] {e}")
+                (run_dir / "logs.txt").write_text(f"Input fetch error: {e}\n", encoding="utf-8")
+                return 1
+            cfg = _with_inputs(cfg, run_dir, inputs)
+
+        # 3. Build the image from its Dockerfile (skipped if the tag exists)
+        if cfg.build is not None and docker_avail:
+            try:
+                result = build_image(cfg.name, cfg.build, exec_dir, run_dir / "build.log")
+            except Exception as e:
+                console.print(f"[red]Image build error:[/red] {e}")
+                (run_dir / "logs.txt").write_text(f"Image build error: {e}\n", encoding="utf-8")
+                return 1
+            state = "built" if result.built else "up to date"
+            console.print(f"[blue]🔨 Image {result.tag} {state} ({result.seconds:.1f}s)[/blue]")
+            record_phase(run_dir, "build", result.seconds)
+            update_run_metadata(
+                run_dir, {"image": result.tag, "build": {"tag": result.tag, "built": result.built}}
+            )
+            cfg = replace(cfg, image=result.tag)
+
+        # 4. Reserve CPUs if the config asks for pinning
+        cpuset = stack.enter_context(cpu_reservation(run_dir.name, cfg.cpus))
+        if cpuset is not None:
+            console.print(f"[blue]📌 Pinned to CPUs {cpuset.cpus_str} (NUMA {cpuset.mems_str})[/blue]")
+            update_run_metadata(
+                run_dir, {"cpuset": {"cpus": cpuset.cpus_str, "mems": cpuset.mems_str}}
+            )
+        elif cfg.cpus:
+            console.print(f"[yellow]⚠ {cfg.cpus} free CPUs not available; running unpinned.[/yellow]")
+
+        in_docker = bool(cfg.image and docker_avail)
+
+        # 5. Wrap Python entrypoints in a profiler if asked
+        if cfg.profile:
+            profiled = _with_profiler(cfg, run_dir, in_docker)
+            if profiled is not None:
+                cfg = profiled
+
+        # 6. Pull the image up front so pull time is not counted as execute time
+        if in_docker and cfg.build is None:
+            _pull_image(cfg.image, run_dir)
+
+        started = time.monotonic()
+        if in_docker:
+            exit_code = _run_in_docker(cfg, run_dir, exec_dir, cpuset)
+        else:
+            if cfg.image or cfg.build:
+                console.print("[yellow]⚠ Docker not found. Falling back to local.[/yellow]")
+            exit_code = _run_locally(cfg, run_dir, exec_dir, cpuset)
+        record_phase(run_dir, "execute", time.monotonic() - started)
+
+        if cfg.profile:
+            _record_profile(run_dir, cfg.profile)
+        return exit_code
+
+
+def _with_profiler(cfg: RunConfig, run_dir: Path, in_docker: bool) -> Optional[RunConfig]:
+    try:
+        profiled = profiling.wrap_entrypoint(cfg, run_dir, in_docker)
+    except ValueError as e:
+        console.print(f"[yellow]⚠ Profiling disabled: {e}[/yellow]")
+        return replace(cfg, profile=None)
+    if profiled is None:
+        console.print("[yellow]⚠ Profiling needs a `python ...` entrypoint; running unprofiled.[/yellow]")
+        return replace(cfg, profile=None)
+    console.print(f"[blue]🔬 Profiling with {profiled.profile}[/blue]")
+    return profiled
+
+
+def _record_profile(run_dir: Path, tool: str) -> None:
+    try:
+        record = profiling.summarise_profile(run_dir, tool)
+    except Exception as e:
+        console.print(f"[yellow]⚠ Could not read profile: {e}[/yellow]")
+        return
+    if record is None:
+        console.print("[yellow]⚠ The job exited without writing a profile.[/yellow]")
+        return
+    update_run_metadata(run_dir, {"profile": record})
+    console.print(f"[blue]🔥 Flamegraph written to {record['flamegraph']}[/blue]")
+
+
+def _with_inputs(cfg: RunConfig, run_dir: Path, inputs: dict[str, CachedInput]) -> RunConfig:
+    """
+    Expose cached inputs to the job as RUNPILOT_INPUT_<NAME> env vars.
+
+    Docker jobs get each cache entry bind-mounted read-only at the same path.
+    """
+    env = dict(cfg.env_vars)
+    mounts = list(cfg.mounts)
+    record = {}
+    for name, cached in inputs.items():
+        env[input_env_name(name)] = str(cached.path)
+        mounts.append(f"{cached.path}:{cached.path}:ro")
+        record[name] = {
+            "source": cached.source,
+            "sha256": cached.digest,
+            "bytes": cached.size,
+            "cache": "miss" if cached.fetched else "hit",
+        }
+        state = "fetched" if cached.fetched else "cached"
+        console.print(f"[blue]📦 Input {name}: {state} ({cached.size} bytes)[/blue]")
+
+    update_run_metadata(run_dir, {"inputs": record})
+    return replace(cfg, env_vars=env, mounts=mounts)
+
+
+def final_status(run_dir: Path, exit_code: int) -> str:
+    """
+    Status to record once a job has exited.
+
+    Jobs stopped by RunPilot keep the status of the limit they hit, so they
+    are distinguishable from jobs that failed on their own.
+    """
+    termination = read_run_metadata(run_dir).get("termination")
+    if isinstance(termination, dict) and termination.get("status"):
+        return str(termination["status"])
+    return "finished" if exit_code == 0 else "failed"
 
 
 def _check_docker() -> bool:
@@ -44,7 +188,31 @@ def _check_docker() -> bool:
         return False
 
 
-def _run_in_docker(cfg: RunConfig, run_dir: Path, exec_dir: Path) -> int:
+def _pull_image(image: str, run_dir: Path) -> None:
+    """Pull image if it is not present locally, recording the "pull" phase."""
+    inspect = subprocess.run(["docker", "image", "inspect", image], capture_output=True)
+    if inspect.returncode == 0:
+        return
+    console.print(f"[blue]⬇ Pulling {image}...[/blue]")
+    start = time.monotonic()
+    result = subprocess.run(["docker", "pull", image], capture_output=True, text=True)
+    record_phase(run_dir, "pull", time.monotonic() - start)
+    if result.returncode != 0:
+        # docker run will fail with the same error and log it.
+        console.print(f"[yellow]⚠ Pull failed: {result.stderr.strip()}[/yellow]")
+
+
+def _container_name(run_dir: Path) -> str:
+    safe = "".join(c if c.isalnum() or c in "_.-" else "-" for c in run_dir.name)
+    return f"runpilot-{safe}"
+
+
+def _run_in_docker(
+    cfg: RunConfig,
+    run_dir: Path,
+    exec_dir: Path,
+    cpuset: Optional[CpuSet] = None,
+) -> int:
     console.print(f"[blue]🐳 Starting Docker ({cfg.image})...[/blue]")
     log_path = run_dir / "logs.txt"
 
@@ -53,11 +221,25 @@ def _run_in_docker(cfg: RunConfig, run_dir: Path, exec_dir: Path) -> int:
     except Exception:
         cmd_args = cfg.entrypoint.split()
 
+    container = _container_name(run_dir)
+
+    try:
+        # Built images get a new tag for every change to the build context;
+        # their caches follow the config's repository instead.
+        cache_key = image_repository(cfg.name) if cfg.build is not None else None
+        volumes = package_cache.cache_volumes(cfg.image, cfg.caches, key=cache_key)
+    except ValueError as e:
+        console.print(f"[red]Config error:[/red] {e}")
+        log_path.write_text(f"Config error: {e}\n", encoding="utf-8")
+        return 1
+
     # Docker command construction
     docker_cmd = [
         "docker",
         "run",
         "--rm",
+        "--name",
+        container,
         "-v",
         f"{str(exec_dir)}:/app",
         "-w",
@@ -70,6 +252,19 @@ def _run_in_docker(cfg: RunConfig, run_dir: Path, exec_dir: Path) -> int:
         docker_cmd.extend(["--gpus", "all"])
     # -------------------
 
+    if cpuset is not None:
+        docker_cmd.extend(["--cpuset-cpus", cpuset.cpus_str, "--cpuset-mems", cpuset.mems_str])
+
+    # Extra bind mounts (pipeline outputs, dependency inputs)
+    for mount in cfg.mounts:
+        docker_cmd.extend(["-v", mount])
+
+    # Persistent pip / HuggingFace / torch hub caches
+    if volumes:
+        package_cache.ensure_volumes(volumes)
+        docker_cmd.extend(package_cache.docker_args(volumes, cfg.env_vars))
+        cache_before = package_cache.measure(volumes)
+
     # Inject secrets
     if cfg.env_vars:
         for key, val in cfg.env_vars.items():
@@ -78,26 +273,62 @@ def _run_in_docker(cfg: RunConfig, run_dir: Path, exec_dir: Path) -> int:
     docker_cmd.append(cfg.image)
     docker_cmd.extend(cmd_args)
 
-    with log_path.open("w", encoding="utf-8") as f:
+    def stop() -> None:
+        subprocess.run(
+            ["docker", "stop", "-t", str(KILL_GRACE_SECONDS), container],
+            capture_output=True,
+        )
+
+    with log_path.open("w", encoding="utf-8") as f, LogRecorder(run_dir, f) as recorder:
         try:
-            proc = subprocess.run(
-                docker_cmd,
-                stdout=f,
-                stderr=subprocess.STDOUT,
-                text=True,
+            proc = _popen_recorded(recorder, docker_cmd)
+            exit_code = _supervise(
+                proc,
+                cfg,
+                run_dir,
+                recorder,
+                stop=stop,
+                cpu_active=lambda: _docker_cpu_active(container),
             )
 
-            if proc.returncode != 0:
-                console.print(f"[red]Docker exited with code {proc.returncode}. Check logs.[/red]")
+            if exit_code != 0:
+                console.print(f"[red]Docker exited with code {exit_code}. Check logs.[/red]")
+
+            if volumes:
+                _record_package_caches(run_dir, volumes, cache_before)
 
-            return proc.returncode
+            return exit_code
         except Exception as e:
             console.print(f"[red]Docker execution error:[/red] {e}")
-            f.write(f"\nDocker execution error: {e}\n")
+            recorder.message(f"Docker execution error: {e}")
             return 1
 
 
-def _run_locally(cfg: RunConfig, run_dir: Path, exec_dir: Path) -> int:
+def _record_package_caches(
+    run_dir: Path,
+    volumes: list[package_cache.CacheVolume],
+    before: dict[str, Optional[int]],
+) -> None:
+    try:
+        after = package_cache.measure(volumes)
+        report = package_cache.record_usage(volumes, before, after)
+        package_cache.enforce_budget(keep=[vol.name for vol in volumes])
+    except Exception as e:
+        console.print(f"[yellow]⚠ Package cache accounting failed: {e}[/yellow]")
+        return
+
+    update_run_metadata(run_dir, {"package_caches": report})
+    served = sum(entry["bytes_served"] for entry in report.values())
+    added = sum(entry["bytes_added"] for entry in report.values())
+    console.print(f"[blue]📦 Package caches: {served} bytes reused, {added} bytes added[/blue]")
+
+
+def _run_locally(
+    cfg: RunConfig,
+    run_dir: Path,
+    exec_dir: Path,
+    cpuset: Optional[CpuSet] = None,
+) -> int:
     console.print("[blue]⚡ Starting Local Process...[/blue]")
     log_path = run_dir / "logs.txt"
 
@@ -111,19 +342,270 @@ def _run_locally(cfg: RunConfig, run_dir: Path, exec_dir: Path) -> int:
     if cfg.env_vars:
         env.update(cfg.env_vars)
 
-    with log_path.open("w", encoding="utf-8") as f:
+    with log_path.open("w", encoding="utf-8") as f, LogRecorder(run_dir, f) as recorder:
+        # The mask is set in the child before it execs or runs the job, so
+        # every thread and process it starts inherits it.
+        cpus = list(cpuset.cpus) if cpuset is not None else None
         try:
-            proc = subprocess.run(
-                cmd_args,
-                stdout=f,
-                stderr=subprocess.STDOUT,
-                text=True,
-                check=False,
-                cwd=str(exec_dir),
-                env=env,
+            proc = _spawn_warm(cfg, run_dir, cmd_args, exec_dir, env, recorder, cpus) if cfg.preload else None
+            if proc is None:
+                # Own session so the whole process tree can be signalled at once.
+                proc = _popen_recorded(
+                    recorder,
+                    cmd_args,
+                    cwd=str(exec_dir),
+                    env=env,
+                    start_new_session=True,
+                    preexec_fn=(lambda: os.sched_setaffinity(0, cpus)) if cpus else None,
+                )
+            return _supervise(
+                proc,
+                cfg,
+                run_dir,
+                recorder,
+                stop=lambda: _stop_process_group(proc),
+                cpu_active=_process_group_cpu_probe(proc.pid),
             )
-            return proc.returncode
         except Exception as e:
             console.print(f"[red]Local error:[/red] {e}")
-            f.write(f"\nLocal error: {e}\n")
+            recorder.message(f"Local error: {e}")
             return 1
+
+
+def _popen_recorded(recorder: LogRecorder, cmd: list[str], **kwargs: Any) -> subprocess.Popen:
+    """Start cmd with stdout and stderr captured separately by the recorder."""
+    out_fd, err_fd = recorder.open_pipes()
+    try:
+        return subprocess.Popen(cmd, stdin=subprocess.DEVNULL, stdout=out_fd, stderr=err_fd, **kwargs)
+    finally:
+        os.close(out_fd)
+        os.close(err_fd)
+
+
+def _spawn_warm(
+    cfg: RunConfig,
+    run_dir: Path,
+    cmd_args: list[str],
+    exec_dir: Path,
+    env: dict[str, str],
+    recorder: LogRecorder,
+    cpus: Optional[list[int]] = None,
+) -> Optional[warm.WarmProcess]:
+    """
+    Fork the job from a warm server that has cfg.preload imported, pinned
+    to cpus if given.
+
+    Returns None (so the caller spawns a fresh interpreter) if the entrypoint
+    is not a plain Python script/module for this interpreter or the server
+    cannot be reached.
+    """
+    entry = warm.parse_python_entrypoint(cmd_args, env)
+    if entry is None:
+        console.print("[yellow]⚠ preload needs a `python script.py` or `python -m` entrypoint; starting cold.[/yellow]")
+        return None
+
+    try:
+        out_fd, err_fd = recorder.open_pipes()
+        try:
+            proc = warm.spawn(cfg.preload, entry, exec_dir, env, out_fd, err_fd, cpus=cpus)
+        finally:
+            os.close(out_fd)
+            os.close(err_fd)
+    except Exception as e:
+        console.print(f"[yellow]⚠ Warm start unavailable ({e}); starting cold.[/yellow]")
+        return None
+
+    saved = 0.0 if proc.cold_start else proc.preload_seconds
+    console.print(f"[blue]🔥 Warm start: forked from preloaded server ({saved:.2f}s of imports saved)[/blue]")
+    update_run_metadata(
+        run_dir,
+        {
+            "warm_start": {
+                "modules": list(cfg.preload),
+                "server_started": proc.cold_start,
+                "import_seconds_saved": round(saved, 3),
+            }
+        },
+    )
+    return proc
+
+
+def _budget_seconds(cfg: RunConfig) -> Optional[float]:
+    if cfg.budget is None:
+        return None
+    if not cfg.cost_per_hour or cfg.cost_per_hour <= 0:
+        console.print("[yellow]⚠ budget is set without cost_per_hour; ignoring it.[/yellow]")
+        return None
+    return cfg.budget / cfg.cost_per_hour * 3600.0
+
+
+def _supervise(
+    proc: subprocess.Popen,
+    cfg: RunConfig,
+    run_dir: Path,
+    recorder: LogRecorder,
+    stop: Callable[[], None],
+    cpu_active: Callable[[], bool],
+) -> int:
+    """
+    Wait for a job while enforcing timeout, max_idle and budget.
+
+    A job counts as active while its log grows. Once the log goes quiet, CPU
+    (and GPU, for gpu jobs) utilisation is probed every PROBE_INTERVAL; the
+    job is idle only if neither moved for max_idle seconds.
+    """
+    budget_seconds = _budget_seconds(cfg)
+    if cfg.timeout is None and cfg.max_idle is None and budget_seconds is None:
+        return proc.wait()
+
+    log_path = recorder.log_path
+    if cfg.max_idle is not None:
+        cpu_active()  # establish the utilisation baseline
+
+    start = time.monotonic()
+    last_activity = start
+    last_probe = start
+    last_size = -1
+
+    while True:
+        try:
+            return proc.wait(timeout=POLL_INTERVAL)
+        except subprocess.TimeoutExpired:
+            pass
+
+        now = time.monotonic()
+        elapsed = now - start
+        reason: Optional[str] = None
+        limit: Optional[float] = None
+
+        if cfg.timeout is not None and elapsed >= cfg.timeout:
+            reason, limit = "timeout", cfg.timeout
+        elif budget_seconds is not None and elapsed >= budget_seconds:
+            reason, limit = "budget", cfg.budget
+        elif cfg.max_idle is not None:
+            try:
+                size = log_path.stat().st_size
+            except OSError:
+                size = last_size
+            if size != last_size:
+                last_size = size
+                last_activity = now
+            elif now - last_probe >= PROBE_INTERVAL:
+                last_probe = now
+                if cpu_active() or (cfg.use_gpu and _gpu_active()):
+                    last_activity = now
+            if now - last_activity >= cfg.max_idle:
+                reason, limit = "idle", cfg.max_idle
+
+        if reason is not None:
+            return _terminate(proc, run_dir, recorder, stop, reason, limit, elapsed)
+
+
+def _terminate(
+    proc: subprocess.Popen,
+    run_dir: Path,
+    recorder: LogRecorder,
+    stop: Callable[[], None],
+    reason: str,
+    limit: Optional[float],
+    elapsed: float,
+) -> int:
+    status, exit_code = TERMINATIONS[reason]
+    message = f"[RunPilot] Stopping job: {reason} limit {limit} reached after {elapsed:.0f}s"
+    console.print(f"[red]{message}[/red]")
+    recorder.message(message)
+
+    stop()
+    try:
+        proc.wait(timeout=KILL_GRACE_SECONDS + 5)
+    except subprocess.TimeoutExpired:
+        proc.kill()
+        proc.wait()
+
+    update_run_metadata(
+        run_dir,
+        {
+            "termination": {
+                "reason": reason,
+                "status": status,
+                "limit": limit,
+                "elapsed_seconds": round(elapsed, 3),
+                "process_exit_code": proc.returncode,
+            }
+        },
+    )
+    return exit_code
+
+
+def _stop_process_group(proc: subprocess.Popen) -> None:
+    try:
+        os.killpg(proc.pid, signal.SIGTERM)
+        proc.wait(timeout=KILL_GRACE_SECONDS)
+    except ProcessLookupError:
+        return
+    except subprocess.TimeoutExpired:
+        try:
+            os.killpg(proc.pid, signal.SIGKILL)
+        except ProcessLookupError:
+            pass
+
+
+def _process_group_cpu_probe(pgid: int) -> Callable[[], bool]:
+    """
+    Return a probe reporting whether the process group used CPU since the
+    previous call, based on utime + stime from /proc.
+    """
+    last_ticks = [-1]
+
+    def probe() -> bool:
+        ticks = 0
+        proc_root = Path("/proc")
+        if not proc_root.is_dir():
+            return False
+        for entry in proc_root.iterdir():
+            if not entry.name.isdigit():
+                continue
+            try:
+                stat = (entry / "stat").read_text()
+            except OSError:
+                continue
+            # Fields after the parenthesised command name; pgrp is field 5,
+            # utime/stime are fields 14/15 (1-based) of the full line.
+            fields = stat[stat.rfind(")") + 2 :].split()
+            if len(fields) < 13 or int(fields[2]) != pgid:
+                continue
+            ticks += int(fields[11]) + int(fields[12])
+        active = last_ticks[0] >= 0 and ticks > last_ticks[0]
+        last_ticks[0] = ticks
+        return active
+
+    return probe
+
+
+def _docker_cpu_active(container: str) -> bool:
+    try:
+        result = subprocess.run(
+            ["docker", "stats", "--no-stream", "--format", "{{.CPUPerc}}", container],
+            capture_output=True,
+            text=True,
+            timeout=30,
+        )
+        if result.returncode != 0:
+            return True
+        return float(result.stdout.strip().rstrip("%") or 0) > 0.5
+    except Exception:
+        # If we cannot tell, do not kill the job on that basis.
+        return True
+
+
+def _gpu_active() -> bool:
+    try:
+        out = subprocess.run(
+            ["nvidia-smi", "--query-gpu=utilization.gpu", "--format=csv,noheader,nounits"],
+            capture_output=True,
+            text=True,
+            timeout=30,
+        ).stdout
+        return any(float(v) > 0 for v in out.split() if v.strip())
+    except Exception:
+        return False
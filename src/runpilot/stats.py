@@ -0,0 +1,263 @@
+from __future__ import annotations
+
+import json
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Tuple
+
+# Phases recorded in run.json "phases" (seconds), in pipeline order.
+PHASES = ("download", "pull", "build", "execute", "upload")
+GROUP_FIELDS = ("name", "image", "status", "source")
+BUCKETS = ("hour", "day", "week", "month")
+# Local runs end "finished"; cloud runs are reported as "success"/"succeeded".
+SUCCESS_STATUSES = {"finished", "success", "succeeded", "completed"}
+FAILURE_STATUSES = {"failed", "timed_out", "idle_timeout", "over_budget", "error", "cancelled"}
+PERCENTILES = (50, 90, 99)
+
+
+@dataclass
+class RunSample:
+    id: str
+    source: str  # "local" or "remote"
+    name: str
+    image: str
+    status: str
+    created: Optional[datetime]
+    duration: Optional[float]
+    queue_wait: Optional[float]
+    phases: Dict[str, float] = field(default_factory=dict)
+
+
+@dataclass
+class GroupStats:
+    key: Tuple[str, ...]
+    runs: int = 0
+    succeeded: int = 0
+    failed: int = 0
+    durations: List[float] = field(default_factory=list)
+    queue_waits: List[float] = field(default_factory=list)
+    phases: Dict[str, float] = field(default_factory=dict)
+
+    @property
+    def failure_rate(self) -> Optional[float]:
+        done = self.succeeded + self.failed
+        return self.failed / done if done else None
+
+    def to_dict(self, columns: List[str]) -> Dict[str, Any]:
+        return {
+            **dict(zip(columns, self.key)),
+            "runs": self.runs,
+            "succeeded": self.succeeded,
+            "failed": self.failed,
+            "failure_rate": self.failure_rate,
+            "duration": summarize(self.durations),
+            "queue_wait": summarize(self.queue_waits),
+            "phases": {phase: round(secs, 3) for phase, secs in self.phases.items()},
+        }
+
+
+def _parse_ts(value: Any) -> Optional[datetime]:
+    if not value:
+        return None
+    try:
+        parsed = datetime.fromisoformat(str(value).replace("Z", "+00:00"))
+    except ValueError:
+        return None
+    return parsed if parsed.tzinfo else parsed.replace(tzinfo=timezone.utc)
+
+
+def _seconds(start: Optional[datetime], end: Optional[datetime]) -> Optional[float]:
+    if start is None or end is None:
+        return None
+    seconds = (end - start).total_seconds()
+    return seconds if seconds >= 0 else None
+
+
+def _phases(value: Any) -> Dict[str, float]:
+    if isinstance(value, str):
+        try:
+            value = json.loads(value)
+        except ValueError:
+            return {}
+    if not isinstance(value, dict):
+        return {}
+    phases = {}
+    for phase, secs in value.items():
+        try:
+            phases[str(phase)] = float(secs)
+        except (TypeError, ValueError):
+            continue
+    return phases
+
+
+def load_samples(
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    name: Optional[str] = None,
+    image: Optional[str] = None,
+    include_remote: bool = True,
+) -> List[RunSample]:
+    """
+    Runs from the index (local runs plus mirrored cloud runs) as samples.
+
+    Only the columns stats need are read, with phases and timestamps pulled
+    out of the stored metadata by SQLite. A cloud run that also exists
+    locally (run by an agent here, or synced) is counted once, as the local
+    run, which has the phase timings.
+    """
+    from .run_index import connect, ensure_index
+
+    clauses: List[str] = []
+    params: List[Any] = []
+    if since is not None:
+        clauses.append("created_at >= ?")
+        params.append(since.isoformat())
+    if until is not None:
+        clauses.append("created_at < ?")
+        params.append(until.isoformat())
+    if name:
+        clauses.append("name GLOB ?")
+        params.append(name)
+    if image:
+        clauses.append("image GLOB ?")
+        params.append(image)
+    where = (" WHERE " + " AND ".join(clauses)) if clauses else ""
+
+    ensure_index()
+    samples: List[RunSample] = []
+    with connect() as conn:
+        local_cloud_ids = set()
+        for row in conn.execute(
+            "SELECT id, name, image, status, created_at, finished_at, "
+            "json_extract(data, '$.started_at'), json_extract(data, '$.queued_at'), "
+            "json_extract(data, '$.claimed_at'), json_extract(data, '$.phases'), "
+            "json_extract(data, '$.cloud_run_id') "
+            f"FROM runs{where}",
+            params,
+        ):
+            run_id, run_name, run_image, status, created_at, finished_at = row[:6]
+            started_at, queued_at, claimed_at, phases, cloud_id = row[6:]
+            created = _parse_ts(created_at)
+            if cloud_id:
+                local_cloud_ids.add(str(cloud_id))
+            samples.append(
+                RunSample(
+                    id=run_id,
+                    source="local",
+                    name=run_name or "",
+                    image=run_image or "",
+                    status=status or "",
+                    created=created,
+                    duration=_seconds(_parse_ts(started_at) or created, _parse_ts(finished_at)),
+                    queue_wait=_seconds(_parse_ts(queued_at), _parse_ts(claimed_at)),
+                    phases=_phases(phases),
+                )
+            )
+
+        if include_remote:
+            for run_id, run_name, run_image, status, created_at, claimed_at, finished_at, data in conn.execute(
+                "SELECT id, name, image, status, created_at, claimed_at, finished_at, data "
+                f"FROM remote_runs{where}",
+                params,
+            ):
+                if run_id in local_cloud_ids:
+                    continue
+                created = _parse_ts(created_at)
+                claimed = _parse_ts(claimed_at)
+                try:
+                    phases = _phases(json.loads(data).get("phases"))
+                except (ValueError, AttributeError):
+                    phases = {}
+                samples.append(
+                    RunSample(
+                        id=run_id,
+                        source="remote",
+                        name=run_name or "",
+                        image=run_image or "",
+                        status=status or "",
+                        created=created,
+                        duration=_seconds(claimed or created, _parse_ts(finished_at)),
+                        queue_wait=_seconds(created, claimed),
+                        phases=phases,
+                    )
+                )
+    return samples
+
+
+def percentile(values: List[float], pct: float) -> Optional[float]:
+    """Linear-interpolated percentile of values (pct in 0..100)."""
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = (len(ordered) - 1) * pct / 100
+    low = int(rank)
+    high = min(low + 1, len(ordered) - 1)
+    return ordered[low] + (ordered[high] - ordered[low]) * (rank - low)
+
+
+def summarize(values: List[float]) -> Dict[str, Optional[float]]:
+    summary: Dict[str, Optional[float]] = {f"p{p}": percentile(values, p) for p in PERCENTILES}
+    summary["mean"] = sum(values) / len(values) if values else None
+    summary["max"] = max(values) if values else None
+    summary["count"] = len(values)
+    return summary
+
+
+def bucket_label(moment: Optional[datetime], bucket: str) -> str:
+    """Time bucket a run falls in, in UTC (weeks are ISO weeks)."""
+    if moment is None:
+        return "unknown"
+    moment = moment.astimezone(timezone.utc)
+    if bucket == "hour":
+        return moment.strftime("%Y-%m-%d %H:00")
+    if bucket == "day":
+        return moment.strftime("%Y-%m-%d")
+    if bucket == "week":
+        return moment.strftime("%G-W%V")
+    if bucket == "month":
+        return moment.strftime("%Y-%m")
+    raise ValueError(f"Unknown time bucket {bucket!r} (expected {', '.join(BUCKETS)})")
+
+
+def compute_stats(
+    samples: List[RunSample],
+    group_by: Optional[List[str]] = None,
+    bucket: Optional[str] = None,
+) -> Tuple[List[str], List[GroupStats]]:
+    """
+    Aggregate samples into groups.
+
+    Returns (key columns, groups sorted by key). With no group_by or bucket
+    everything is one group. Failure rates count finished runs only (a
+    success or failure status); durations come from finished runs, queue
+    waits from runs that record when they were queued and claimed.
+    """
+    group_by = list(group_by or [])
+    for name in group_by:
+        if name not in GROUP_FIELDS:
+            raise ValueError(f"Cannot group by {name!r} (expected {', '.join(GROUP_FIELDS)})")
+    if bucket is not None and bucket not in BUCKETS:
+        raise ValueError(f"Unknown time bucket {bucket!r} (expected {', '.join(BUCKETS)})")
+    columns = (["bucket"] if bucket else []) + group_by
+
+    groups: Dict[Tuple[str, ...], GroupStats] = {}
+    for sample in samples:
+        key = tuple(
+            ([bucket_label(sample.created, bucket)] if bucket else [])
+            + [str(getattr(sample, name)) for name in group_by]
+        )
+        group = groups.get(key)
+        if group is None:
+            group = groups[key] = GroupStats(key)
+        group.runs += 1
+        if sample.status in SUCCESS_STATUSES:
+            group.succeeded += 1
+        elif sample.status in FAILURE_STATUSES:
+            group.failed += 1
+        if sample.duration is not None:
+            group.durations.append(sample.duration)
+        if sample.queue_wait is not None:
+            group.queue_waits.append(sample.queue_wait)
+        for phase, secs in sample.phases.items():
+            group.phases[phase] = group.phases.get(phase, 0.0) + secs
+    return columns, [groups[key] for key in sorted(groups)]
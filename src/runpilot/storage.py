@@ -1,15 +1,26 @@
 from __future__ import annotations
 
+from contextlib import contextmanager
 from datetime import datetime, timezone
 from pathlib import Path
-from typing import Dict, Any, Optional
+from typing import Any, Callable, Dict, Iterator, Optional
 
+import fcntl
 import json
+import os
+import secrets
+import threading
+import time
 
 from .config import RunConfig
+from .paths import is_shard_name, iter_run_dirs, run_dir_in, set_layout, shard_for
 
 _ROOT_DIR_NAME = ".runpilot"
 _RUNS_DIR_NAME = "runs"
+EVENTS_FILENAME = "events.jsonl"
+
+# Statuses after which a run will not change again.
+TERMINAL_STATUSES = {"finished", "failed", "timed_out", "idle_timeout", "over_budget"}
 
 
 def get_root_dir() -> Path:
@@ -31,31 +42,100 @@ def get_runs_dir() -> Path:
     return runs_dir
 
 
+# Crockford base32: sorts in the same order as the numbers it encodes.
+_ID_ALPHABET = "0123456789ABCDEFGHJKMNPQRSTVWXYZ"
+_ID_RANDOM_BITS = 40
+_id_lock = threading.Lock()
+_id_last_ms = 0
+_id_last_random = 0
+
+
+def _reset_id_state() -> None:
+    # A forked child must not continue the parent's sequence, or both would
+    # hand out the same next ID within the same millisecond.
+    global _id_last_ms, _id_last_random, _id_lock
+    _id_lock = threading.Lock()
+    _id_last_ms = 0
+    _id_last_random = 0
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reset_id_state)
+
+
+def _next_id_stamp() -> tuple[int, int]:
+    """
+    Return (milliseconds since epoch, random part) for a new run id.
+
+    ULID-style monotonic generation: within one millisecond the random part
+    is incremented rather than redrawn, so IDs from one process are strictly
+    increasing, and the clock never appears to run backwards. Other processes
+    draw independent 40-bit random parts.
+    """
+    global _id_last_ms, _id_last_random
+    with _id_lock:
+        ms = max(time.time_ns() // 1_000_000, _id_last_ms)
+        if ms == _id_last_ms:
+            random_part = _id_last_random + 1
+            if random_part >= 1 << _ID_RANDOM_BITS:
+                ms += 1
+                random_part = secrets.randbits(_ID_RANDOM_BITS - 1)
+        else:
+            # Leave headroom so increments rarely overflow into the next ms.
+            random_part = secrets.randbits(_ID_RANDOM_BITS - 1)
+        _id_last_ms, _id_last_random = ms, random_part
+        return ms, random_part
+
+
+def _encode(value: int, length: int) -> str:
+    chars = []
+    for _ in range(length):
+        value, digit = divmod(value, 32)
+        chars.append(_ID_ALPHABET[digit])
+    return "".join(reversed(chars))
+
+
 def _generate_run_id(name: str) -> str:
     """
-    Generate a simple run id from timestamp and a slug of the run name.
-    Example: 20251119T142355Z-hello-run
+    Generate a run id from a timestamp, a slug of the run name and a
+    ULID-style suffix.
+    Example: 20251119T142355Z-hello-run-E9K3Q7ZC4M
+
+    The suffix encodes the milliseconds within the second (10 bits) and a
+    monotonic random part (40 bits), so IDs for the same name sort in
+    creation order and runs started in the same second do not collide.
     """
-    timestamp = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+    ms, random_part = _next_id_stamp()
+    seconds, millis = divmod(ms, 1000)
+    timestamp = datetime.fromtimestamp(seconds, timezone.utc).strftime("%Y%m%dT%H%M%SZ")
     safe = "".join(
         c if c.isalnum() or c in "-_" else "-"
         for c in name.lower()
     )
     safe = safe.strip("-_") or "run"
     safe = safe[:40]
-    return f"{timestamp}-{safe}"
+    suffix = _encode((millis << _ID_RANDOM_BITS) | random_part, 10)
+    return f"{timestamp}-{safe}-{suffix}"
 
 
 def create_run_dir(name: str) -> Path:
     """
     Create a new run directory and return its path.
-    Example: ~/.runpilot/runs/20251119T142355Z-hello-run
+    Example: ~/.runpilot/runs/20251119T142355Z-hello-run-E9K3Q7ZC4M
     """
     runs_dir = get_runs_dir()
-    run_id = _generate_run_id(name)
-    run_dir = runs_dir / run_id
-    run_dir.mkdir(parents=False, exist_ok=False)
-    return run_dir
+    for _ in range(8):
+        run_dir = run_dir_in(runs_dir, _generate_run_id(name))
+        if run_dir.parent != runs_dir:
+            run_dir.parent.mkdir(exist_ok=True)  # date shard
+        try:
+            run_dir.mkdir(parents=False, exist_ok=False)
+        except FileExistsError:
+            # Only possible if another process drew the same 40 random bits
+            # in the same millisecond; draw again.
+            continue
+        return run_dir
+    raise FileExistsError(f"Could not allocate a unique run directory for {name!r}")
 
 
 def _now_iso() -> str:
@@ -76,6 +156,86 @@ def _load_existing_metadata(meta_path: Path) -> Dict[str, Any]:
         return {}
 
 
+def read_events(run_dir: Path) -> list[Dict[str, Any]]:
+    """
+    Return the run's metadata events in the order they were written.
+
+    Each event is {"ts": ..., "event": "status" | "update" | "snapshot",
+    "fields": {...}}. A line torn by a crash mid-append is skipped.
+    """
+    path = Path(run_dir) / EVENTS_FILENAME
+    events: list[Dict[str, Any]] = []
+    try:
+        with path.open("r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    event = json.loads(line)
+                except ValueError:
+                    continue
+                if isinstance(event, dict) and isinstance(event.get("fields"), dict):
+                    events.append(event)
+    except OSError:
+        pass
+    return events
+
+
+def fold_events(events: list[Dict[str, Any]]) -> Dict[str, Any]:
+    """Replay events into the current metadata: later fields win."""
+    meta: Dict[str, Any] = {}
+    for event in events:
+        meta.update(event["fields"])
+    return meta
+
+
+@contextmanager
+def _journal(run_dir: Path) -> Iterator[tuple[Dict[str, Any], Callable[[str, Dict[str, Any]], None]]]:
+    """
+    Yield (current metadata, append) with the run's journal locked.
+
+    append(event, fields) adds one line to events.jsonl. On exit the folded
+    state is written to run.json via a temp file and atomic rename, so
+    readers of run.json never see a partial file. Runs created before the
+    journal existed are seeded with a snapshot of their run.json.
+    """
+    run_dir = Path(run_dir)
+    events_path = run_dir / EVENTS_FILENAME
+    with (run_dir / (EVENTS_FILENAME + ".lock")).open("a") as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+
+        if events_path.exists():
+            meta = fold_events(read_events(run_dir))
+            pending: list[Dict[str, Any]] = []
+        else:
+            meta = _load_existing_metadata(run_dir / "run.json")
+            pending = [{"ts": _now_iso(), "event": "snapshot", "fields": dict(meta)}] if meta else []
+
+        def append(event: str, fields: Dict[str, Any]) -> None:
+            pending.append({"ts": _now_iso(), "event": event, "fields": fields})
+            meta.update(fields)
+
+        yield meta, append
+
+        if not pending:
+            return
+        data = "".join(json.dumps(e, default=str) + "\n" for e in pending).encode("utf-8")
+        fd = os.open(events_path, os.O_RDWR | os.O_CREAT | os.O_APPEND, 0o644)
+        try:
+            # A crash mid-append leaves a torn last line; start a fresh line
+            # so this event is not glued onto it (and dropped with it).
+            size = os.fstat(fd).st_size
+            if size and os.pread(fd, 1, size - 1) != b"\n":
+                data = b"\n" + data
+            os.write(fd, data)
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+
+        tmp_path = run_dir / "run.json.tmp"
+        with tmp_path.open("w", encoding="utf-8") as f:
+            json.dump(meta, f, indent=2, default=str)
+        os.replace(tmp_path, run_dir / "run.json")
+
+
 def write_run_metadata(
     run_dir: Path,
     cfg: RunConfig,
@@ -83,98 +243,151 @@ def write_run_metadata(
     exit_code: Optional[int] = None,
 ) -> None:
     """
-    Create or update the metadata file for a run.
+    Record a status change for a run.
 
-    Fields:
+    Appends a "status" event to the run's events.jsonl journal and refreshes
+    the run.json snapshot. Fields:
       id          run directory name
       run_dir     absolute path to the run directory
       name        run name from config
       image       container image
       entrypoint  command to run inside the container
-      status      pending, finished, failed
+      status      pending, running, or one of TERMINAL_STATUSES
       created_at  first time metadata was written
-      finished_at set when status is finished or failed
+      finished_at set when status is terminal
       exit_code   numeric exit code if known
+      tags        labels from the config (if any)
+      params      hyperparameters from the config (if any)
     """
-    meta_path = run_dir / "run.json"
-    meta = _load_existing_metadata(meta_path)
+    with _journal(run_dir) as (meta, append):
+        fields: Dict[str, Any] = {
+            # Core identity
+            "id": run_dir.name,
+            "run_dir": str(run_dir),
+            # Config fields
+            "name": cfg.name,
+            # Built images are recorded by the runner; keep that tag.
+            "image": cfg.image or meta.get("image", ""),
+            "entrypoint": cfg.entrypoint,
+            "status": status,
+        }
+        if cfg.tags:
+            fields["tags"] = list(cfg.tags)
+        if cfg.params:
+            fields["params"] = dict(cfg.params)
+
+        # Timestamps
+        if "created_at" not in meta:
+            fields["created_at"] = _now_iso()
+
+        if exit_code is not None:
+            fields["exit_code"] = exit_code
+
+        if status in TERMINAL_STATUSES:
+            fields["finished_at"] = _now_iso()
+
+        append("status", fields)
+
+    _reindex_run(run_dir)
+
+
+def read_run_metadata(run_dir: Path) -> Dict[str, Any]:
+    """
+    Return the current metadata for a run directory, or an empty dict.
+
+    Folds the event journal when there is one; older runs only have run.json.
+    """
+    run_dir = Path(run_dir)
+    if (run_dir / EVENTS_FILENAME).exists():
+        return fold_events(read_events(run_dir))
+    return _load_existing_metadata(run_dir / "run.json")
 
-    # Core identity
-    meta["id"] = run_dir.name
-    meta["run_dir"] = str(run_dir)
 
-    # Config fields
-    meta["name"] = cfg.name
-    meta["image"] = cfg.image
-    meta["entrypoint"] = cfg.entrypoint
+def update_run_metadata(run_dir: Path, fields: Dict[str, Any]) -> None:
+    """
+    Merge extra fields into a run's metadata without touching status.
 
-    # Status
-    meta["status"] = status
+    Used by orchestration layers (pipelines, caching) to attach their own
+    bookkeeping to a run record. Recorded as an "update" event.
+    """
+    with _journal(Path(run_dir)) as (_meta, append):
+        append("update", dict(fields))
 
-    # Timestamps
-    if "created_at" not in meta:
-        meta["created_at"] = _now_iso()
+    _reindex_run(run_dir)
 
-    if exit_code is not None:
-        meta["exit_code"] = exit_code
 
-    if status in {"finished", "failed"}:
-        meta["finished_at"] = _now_iso()
+def _reindex_run(run_dir: Path) -> None:
+    from .run_index import index_run_dir
 
-    with meta_path.open("w", encoding="utf-8") as f:
-        json.dump(meta, f, indent=2)
+    index_run_dir(Path(run_dir))
 
 
-def load_all_runs() -> list[Dict[str, Any]]:
+def record_phase(run_dir: Path, phase: str, seconds: float) -> None:
     """
-    Load metadata for all runs under the runs directory.
+    Record how long one phase of a run took (e.g. build, pull, execute).
 
-    Returns a list of dicts sorted by created_at descending if present,
-    otherwise sorted by id descending.
+    Phases accumulate in run.json under "phases" as seconds.
     """
-    runs_dir = get_runs_dir()
-    results: list[Dict[str, Any]] = []
-
-    if not runs_dir.is_dir():
-        return results
-
-    for child in runs_dir.iterdir():
-        if not child.is_dir():
-            continue
-        meta_path = child / "run.json"
-        if not meta_path.is_file():
-            continue
-        try:
-            with meta_path.open("r", encoding="utf-8") as f:
-                data = json.load(f)
-            if not isinstance(data, dict):
-                continue
-        except Exception:
-            continue
-
-        # Ensure id and run_dir are always present
-        data.setdefault("id", child.name)
-        data.setdefault("run_dir", str(child))
-        results.append(data)
-
-    def sort_key(item: Dict[str, Any]) -> str:
-        return str(item.get("created_at") or item.get("id") or "")
+    meta = read_run_metadata(run_dir)
+    phases = meta.get("phases") if isinstance(meta.get("phases"), dict) else {}
+    phases[phase] = round(float(seconds), 3)
+    update_run_metadata(run_dir, {"phases": phases})
+
+
+def load_all_runs(
+    status: Optional[str] = None,
+    name: Optional[str] = None,
+    sort: str = "created_at",
+    descending: bool = True,
+    limit: Optional[int] = None,
+    offset: int = 0,
+) -> list[Dict[str, Any]]:
+    """
+    Load metadata for runs under the runs directory.
 
-    results.sort(key=sort_key, reverse=True)
-    return results
+    Served from the SQLite run index (built from disk on first use), so
+    filtering, sorting and pagination happen in SQL instead of parsing every
+    run.json. Defaults return all runs, newest first.
+    """
+    from .run_index import query_runs
+
+    return query_runs(
+        status=status,
+        name=name,
+        sort=sort,
+        descending=descending,
+        limit=limit,
+        offset=offset,
+    )
 
 
 def load_run(run_id: str) -> Dict[str, Any]:
     """
     Load metadata for a single run by id.
 
-    Raises FileNotFoundError if the run or metadata file does not exist.
+    Runs missing locally are fetched from the storage backend, if one is
+    configured. Raises FileNotFoundError if the run or metadata file does
+    not exist.
     """
-    run_dir = get_runs_dir() / run_id
+    run_dir = run_dir_in(get_runs_dir(), run_id)
     meta_path = run_dir / "run.json"
 
     if not meta_path.is_file():
-        raise FileNotFoundError(f"Run '{run_id}' not found")
+        from .run_store import fetch_run
+
+        fetched = fetch_run(run_id)
+        if fetched is None or not (fetched / "run.json").is_file():
+            raise FileNotFoundError(f"Run '{run_id}' not found")
+        data = read_run_metadata(fetched)
+        data.setdefault("id", run_id)
+        data["run_dir"] = str(fetched)
+        return data
+
+    from .run_index import get_run
+
+    indexed = get_run(run_id)
+    if indexed is not None:
+        return indexed
 
     with meta_path.open("r", encoding="utf-8") as f:
         data = json.load(f)
@@ -185,3 +398,51 @@ def load_run(run_id: str) -> Dict[str, Any]:
     data.setdefault("id", run_id)
     data.setdefault("run_dir", str(run_dir))
     return data
+
+
+def migrate_runs_layout(layout: str) -> Dict[str, Any]:
+    """
+    Move every run in place into `layout` ("flat" or "sharded").
+
+    Runs are renamed within the runs dir (no copying), their run_dir field
+    is updated, and the index is refreshed once at the end. Runs that are
+    still pending or running are left where they are, since their runner
+    holds the old path; run the migration again once they finish.
+    """
+    runs_dir = get_runs_dir()
+    set_layout(runs_dir, layout)
+    report: Dict[str, Any] = {"moved": 0, "unchanged": 0, "active": [], "conflicts": []}
+
+    for entry in list(iter_run_dirs(runs_dir)):
+        source = Path(entry.path)
+        shard = shard_for(entry.name)
+        target = runs_dir / shard / entry.name if layout == "sharded" and shard else runs_dir / entry.name
+        if source == target:
+            report["unchanged"] += 1
+            continue
+        if read_run_metadata(source).get("status") in ("pending", "running"):
+            report["active"].append(entry.name)
+            continue
+        if target.exists():
+            report["conflicts"].append(entry.name)
+            continue
+
+        target.parent.mkdir(exist_ok=True)
+        os.rename(source, target)
+        if (target / "run.json").is_file():
+            with _journal(target) as (_meta, append):
+                append("update", {"run_dir": str(target)})
+        report["moved"] += 1
+
+    if layout == "flat":
+        for entry in os.scandir(runs_dir):
+            if entry.is_dir() and is_shard_name(entry.name):
+                try:
+                    os.rmdir(entry.path)
+                except OSError:
+                    pass  # still holds active runs
+
+    from .run_index import reindex
+
+    reindex()
+    return report
@@ -0,0 +1,407 @@
+# src/runpilot/warm.py
+#
+# Warm forkserver for image-less Python jobs: a server imports the configured
+# modules once and forks a child per job, so heavy imports such as torch are
+# paid once per server instead of once per run.
+from __future__ import annotations
+
+import argparse
+import fcntl
+import hashlib
+import json
+import os
+import selectors
+import shutil
+import signal
+import socket
+import stat
+import struct
+import subprocess
+import sys
+import tempfile
+import time
+import traceback
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from .storage import get_root_dir
+
+WARM_DIR_NAME = "warm"
+IDLE_SHUTDOWN_SECONDS = 900
+STARTUP_TIMEOUT_SECONDS = 300
+_HEADER = struct.Struct("!I")
+# sun_path is limited to ~104-108 bytes depending on the platform.
+_MAX_SOCKET_PATH = 100
+
+
+# --- Entrypoint handling ---
+
+
+def parse_python_entrypoint(cmd_args: List[str], env: Dict[str, str]) -> Optional[Dict[str, Any]]:
+    """
+    Return {"script": path} or {"module": name} plus "argv" if cmd_args is a
+    plain `python script.py ...` / `python -m module ...` command that this
+    interpreter can run, otherwise None.
+
+    The entrypoint's python must resolve to the same interpreter as RunPilot
+    itself, since the job inherits the server's already-imported modules.
+    """
+    if len(cmd_args) < 2:
+        return None
+
+    exe = shutil.which(cmd_args[0], path=env.get("PATH"))
+    if exe is None or os.path.realpath(exe) != os.path.realpath(sys.executable):
+        return None
+
+    rest = list(cmd_args[1:])
+    while rest and rest[0] == "-u":
+        rest.pop(0)
+    if not rest:
+        return None
+
+    if rest[0] == "-m" and len(rest) >= 2:
+        return {"module": rest[1], "argv": rest[2:]}
+    if rest[0].startswith("-"):
+        return None
+    return {"script": rest[0], "argv": rest[1:]}
+
+
+def _socket_path(modules: List[str]) -> Path:
+    key = hashlib.sha1(
+        (os.path.realpath(sys.executable) + "\0" + ",".join(modules)).encode("utf-8")
+    ).hexdigest()[:12]
+    path = get_root_dir() / WARM_DIR_NAME / f"{key}.sock"
+    if len(str(path)) > _MAX_SOCKET_PATH:
+        path = Path(tempfile.gettempdir()) / f"runpilot-warm-{os.getuid()}" / f"{key}.sock"
+    return path
+
+
+def _private_dir(path: Path) -> None:
+    """
+    Create path (mode 0700) or check an existing one before trusting it.
+
+    Whoever controls the directory controls the socket, and a job sends its
+    environment and log descriptors through it. So the directory must be a
+    real directory owned by this user that nobody else can access. One that
+    only others cannot write to is tightened to 0700, since nothing could
+    have been planted in it. Raises RuntimeError otherwise.
+    """
+    path.parent.mkdir(parents=True, exist_ok=True)
+    try:
+        path.mkdir(mode=0o700)
+    except FileExistsError:
+        pass
+    st = os.lstat(path)
+    if not stat.S_ISDIR(st.st_mode) or st.st_uid != os.getuid():
+        raise RuntimeError(f"{path} is not a directory owned by this user; not using it")
+    if st.st_mode & 0o022:
+        raise RuntimeError(f"{path} is writable by other users; not using it")
+    if st.st_mode & 0o077:
+        os.chmod(path, 0o700)
+
+
+# --- Client side ---
+
+
+class WarmProcess:
+    """
+    Popen-like handle for a job forked by the warm server.
+
+    Supports the subset of the Popen API the runner's supervisor uses:
+    pid, returncode, poll(), wait(timeout) and kill().
+    """
+
+    def __init__(self, sock: socket.socket, pid: int, preload_seconds: float, cold_start: bool):
+        self._sock = sock
+        self._buffer = b""
+        self.pid = pid
+        self.returncode: Optional[int] = None
+        self.preload_seconds = preload_seconds
+        self.cold_start = cold_start
+
+    def poll(self) -> Optional[int]:
+        try:
+            return self.wait(timeout=0)
+        except subprocess.TimeoutExpired:
+            return None
+
+    def wait(self, timeout: Optional[float] = None) -> int:
+        if self.returncode is not None:
+            return self.returncode
+        message = self._read_message(timeout)
+        if message is None:
+            raise subprocess.TimeoutExpired(f"warm job {self.pid}", timeout or 0)
+        self.returncode = int(message.get("exit_code", 1))
+        self._sock.close()
+        return self.returncode
+
+    def kill(self) -> None:
+        try:
+            os.kill(self.pid, signal.SIGKILL)
+        except ProcessLookupError:
+            pass
+
+    def _read_message(self, timeout: Optional[float]) -> Optional[Dict[str, Any]]:
+        """Read one newline-delimited JSON message, or None on timeout."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while b"\n" not in self._buffer:
+            remaining = None if deadline is None else max(0.0, deadline - time.monotonic())
+            self._sock.settimeout(remaining)
+            try:
+                chunk = self._sock.recv(65536)
+            except (socket.timeout, BlockingIOError):
+                return None
+            if not chunk:
+                # Server went away: report the job as failed rather than hang.
+                return {"exit_code": 1}
+            self._buffer += chunk
+        line, self._buffer = self._buffer.split(b"\n", 1)
+        return json.loads(line)
+
+
+def _connect(path: Path) -> Optional[socket.socket]:
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        sock.connect(str(path))
+        return sock
+    except OSError:
+        sock.close()
+        return None
+
+
+def _ensure_server(modules: List[str]) -> tuple[socket.socket, bool]:
+    """Connect to the server for this module list, starting it if needed."""
+    path = _socket_path(modules)
+    _private_dir(path.parent)
+
+    sock = _connect(path)
+    if sock is not None:
+        return sock, False
+
+    with (path.parent / (path.name + ".lock")).open("w") as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        sock = _connect(path)
+        if sock is not None:
+            return sock, False
+
+        log = (path.parent / (path.name + ".log")).open("ab")
+        subprocess.Popen(
+            [sys.executable, "-m", "runpilot.warm", "--socket", str(path), "--modules", ",".join(modules)],
+            stdin=subprocess.DEVNULL,
+            stdout=log,
+            stderr=subprocess.STDOUT,
+            start_new_session=True,
+        )
+        log.close()
+
+        deadline = time.monotonic() + STARTUP_TIMEOUT_SECONDS
+        while time.monotonic() < deadline:
+            sock = _connect(path)
+            if sock is not None:
+                return sock, True
+            time.sleep(0.05)
+
+    raise RuntimeError(f"Warm server for {modules} did not start")
+
+
+def spawn(
+    modules: List[str],
+    entry: Dict[str, Any],
+    cwd: Path,
+    env: Dict[str, str],
+    stdout_fd: int,
+    stderr_fd: int,
+    cpus: Optional[List[int]] = None,
+) -> WarmProcess:
+    """
+    Ask the warm server to fork a job and return a handle to it.
+
+    stdout_fd and stderr_fd are passed to the server over the socket, so
+    the child writes straight into the run's log files. With cpus, the
+    child pins itself to those CPUs before running the job.
+    """
+    sock, cold_start = _ensure_server(modules)
+    request = dict(entry)
+    request["cwd"] = str(cwd)
+    request["env"] = env
+    if cpus:
+        request["cpus"] = list(cpus)
+    payload = json.dumps(request).encode("utf-8")
+    socket.send_fds(sock, [_HEADER.pack(len(payload)) + payload], [stdout_fd, stderr_fd])
+
+    handle = WarmProcess(sock, pid=0, preload_seconds=0.0, cold_start=cold_start)
+    started = handle._read_message(timeout=30)
+    if started is None or "pid" not in started:
+        sock.close()
+        raise RuntimeError(f"Warm server rejected job: {started}")
+    handle.pid = int(started["pid"])
+    handle.preload_seconds = float(started.get("preload_seconds", 0.0))
+    return handle
+
+
+# --- Server side ---
+
+
+def _run_child(request: Dict[str, Any], fds: List[int]) -> None:
+    """Body of a forked job. Never returns."""
+    code = 1
+    try:
+        os.setsid()
+        os.dup2(fds[0], 1)
+        os.dup2(fds[1], 2)
+        devnull = os.open(os.devnull, os.O_RDONLY)
+        os.dup2(devnull, 0)
+        for fd in fds + [devnull]:
+            os.close(fd)
+        sys.stdin = open(0, closefd=False)
+        sys.stdout = open(1, "w", closefd=False, buffering=1)
+        sys.stderr = open(2, "w", closefd=False, buffering=1)
+
+        if request.get("cpus"):
+            os.sched_setaffinity(0, request["cpus"])
+        os.chdir(request["cwd"])
+        os.environ.clear()
+        os.environ.update(request.get("env") or {})
+        signal.signal(signal.SIGTERM, signal.SIG_DFL)
+        signal.signal(signal.SIGCHLD, signal.SIG_DFL)
+
+        import runpy
+
+        try:
+            if "module" in request:
+                sys.argv = [request["module"]] + list(request.get("argv") or [])
+                sys.path.insert(0, os.getcwd())
+                runpy.run_module(request["module"], run_name="__main__", alter_sys=True)
+            else:
+                script = request["script"]
+                sys.argv = [script] + list(request.get("argv") or [])
+                sys.path.insert(0, os.path.dirname(os.path.abspath(script)))
+                runpy.run_path(script, run_name="__main__")
+            code = 0
+        except SystemExit as exc:
+            if exc.code is None:
+                code = 0
+            elif isinstance(exc.code, int):
+                code = exc.code
+            else:
+                print(exc.code, file=sys.stderr)
+                code = 1
+        except BaseException:
+            traceback.print_exc()
+            code = 1
+    finally:
+        try:
+            sys.stdout.flush()
+            sys.stderr.flush()
+        finally:
+            os._exit(code)
+
+
+def _recv_request(conn: socket.socket) -> tuple[Dict[str, Any], List[int]]:
+    data, fds, _, _ = socket.recv_fds(conn, 65536, 2)
+    if len(data) < _HEADER.size:
+        raise ValueError("short request")
+    (length,) = _HEADER.unpack(data[: _HEADER.size])
+    body = data[_HEADER.size :]
+    while len(body) < length:
+        chunk = conn.recv(length - len(body))
+        if not chunk:
+            raise ValueError("truncated request")
+        body += chunk
+    return json.loads(body), list(fds)
+
+
+def serve(socket_path: Path, modules: List[str]) -> None:
+    """
+    Import modules, then fork a child per request until idle for too long.
+
+    Single-threaded on purpose: forking from a multi-threaded process can
+    leave the child holding locks owned by threads that no longer exist.
+    """
+    started = time.monotonic()
+    for name in modules:
+        try:
+            __import__(name)
+        except Exception as exc:
+            print(f"[RunPilot] warm: failed to preload {name}: {exc}", flush=True)
+    preload_seconds = time.monotonic() - started
+    print(f"[RunPilot] warm: preloaded {modules} in {preload_seconds:.2f}s", flush=True)
+
+    if socket_path.exists():
+        socket_path.unlink()
+    listener = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    listener.bind(str(socket_path))
+    listener.listen(64)
+    pid_path = socket_path.with_suffix(".pid")
+    pid_path.write_text(str(os.getpid()), encoding="utf-8")
+
+    selector = selectors.DefaultSelector()
+    selector.register(listener, selectors.EVENT_READ)
+    children: Dict[int, socket.socket] = {}
+    last_active = time.monotonic()
+
+    try:
+        while children or time.monotonic() - last_active < IDLE_SHUTDOWN_SECONDS:
+            for _key, _ in selector.select(timeout=0.2):
+                conn, _ = listener.accept()
+                last_active = time.monotonic()
+                try:
+                    request, fds = _recv_request(conn)
+                except (OSError, ValueError) as exc:
+                    conn.sendall(json.dumps({"error": str(exc)}).encode("utf-8") + b"\n")
+                    conn.close()
+                    continue
+
+                pid = os.fork()
+                if pid == 0:
+                    listener.close()
+                    conn.close()
+                    _run_child(request, fds)
+
+                for fd in fds:
+                    os.close(fd)
+                children[pid] = conn
+                conn.sendall(
+                    json.dumps({"pid": pid, "preload_seconds": preload_seconds}).encode("utf-8")
+                    + b"\n"
+                )
+
+            while children:
+                try:
+                    pid, status = os.waitpid(-1, os.WNOHANG)
+                except ChildProcessError:
+                    break
+                if pid == 0:
+                    break
+                conn = children.pop(pid, None)
+                if conn is None:
+                    continue
+                try:
+                    exit_code = os.waitstatus_to_exitcode(status)
+                    conn.sendall(json.dumps({"exit_code": exit_code}).encode("utf-8") + b"\n")
+                except OSError:
+                    pass
+                finally:
+                    conn.close()
+                last_active = time.monotonic()
+    finally:
+        listener.close()
+        for path in (socket_path, pid_path):
+            try:
+                path.unlink()
+            except FileNotFoundError:
+                pass
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(prog="runpilot.warm")
+    parser.add_argument("--socket", required=True)
+    parser.add_argument("--modules", default="")
+    args = parser.parse_args(argv)
+    modules = [m for m in args.modules.split(",") if m]
+    serve(Path(args.socket), modules)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,89 @@
+from __future__ import annotations
+
+import json
+import os
+import signal
+import sys
+from pathlib import Path
+
+from runpilot import affinity, runner, warm
+from runpilot.affinity import allocate, format_cpulist, parse_cpulist, release
+from runpilot.config import RunConfig
+
+
+def test_cpulist_roundtrip() -> None:
+    assert parse_cpulist("0-3,8,10-11\n") == [0, 1, 2, 3, 8, 10, 11]
+    assert format_cpulist([11, 0, 1, 2, 3, 8, 10]) == "0-3,8,10-11"
+
+
+def test_allocations_are_disjoint_and_numa_local(tmp_path: Path, monkeypatch) -> None:
+    monkeypatch.setenv("HOME", str(tmp_path))
+    monkeypatch.setattr(affinity, "read_topology", lambda: {0: [0, 1, 2, 3], 1: [4, 5, 6, 7]})
+
+    a = allocate("run-a", 3)
+    b = allocate("run-b", 2)
+    c = allocate("run-c", 3)
+
+    assert a is not None and b is not None and c is not None
+    assert a.mems == [0] and b.mems == [1]
+    # Only 1 + 2 CPUs remain on the two nodes, so c has to span both.
+    assert c.mems == [0, 1]
+    assert not set(a.cpus) & set(b.cpus)
+    assert not set(c.cpus) & (set(a.cpus) | set(b.cpus))
+    assert allocate("run-d", 1) is None
+
+    release("run-a")
+    assert allocate("run-d", 3).cpus == a.cpus
+
+
+def test_stale_allocations_are_reclaimed(tmp_path: Path, monkeypatch) -> None:
+    monkeypatch.setenv("HOME", str(tmp_path))
+    monkeypatch.setattr(affinity, "read_topology", lambda: {0: [0, 1]})
+
+    root = tmp_path / ".runpilot"
+    root.mkdir()
+    # A pid that cannot be alive: the owning process crashed long ago.
+    (root / "cpusets.json").write_text(
+        json.dumps({"dead": {"pid": 2**22 + 1, "cpus": [0, 1], "mems": [0]}}),
+        encoding="utf-8",
+    )
+
+    assert allocate("fresh", 2).cpus == [0, 1]
+
+
+def test_local_job_is_pinned(tmp_path: Path, monkeypatch) -> None:
+    monkeypatch.setenv("HOME", str(tmp_path))
+    monkeypatch.setattr("runpilot.runner._check_docker", lambda: False)
+    first_cpu = sorted(os.sched_getaffinity(0))[0]
+    monkeypatch.setattr(affinity, "read_topology", lambda: {0: [first_cpu]})
+
+    cfg = RunConfig(
+        name="pinned",
+        image="",
+        entrypoint=f"{sys.executable} -c 'import os; print(sorted(os.sched_getaffinity(0)))'",
+        cpus=1,
+    )
+    run_dir = tmp_path / "run"
+
+    assert runner.run_local_container(cfg, run_dir) == 0
+    assert f"[{first_cpu}]" in (run_dir / "logs.txt").read_text(encoding="utf-8")
+    assert json.loads((run_dir / "run.json").read_text())["cpuset"]["cpus"] == str(first_cpu)
+
+
+def test_warm_job_is_pinned(tmp_path: Path, monkeypatch) -> None:
+    monkeypatch.setenv("HOME", str(tmp_path))
+    monkeypatch.setattr("runpilot.runner._check_docker", lambda: False)
+    first_cpu = sorted(os.sched_getaffinity(0))[0]
+    monkeypatch.setattr(affinity, "read_topology", lambda: {0: [first_cpu]})
+    (tmp_path / "job.py").write_text("import os\nprint(sorted(os.sched_getaffinity(0)))\n", encoding="utf-8")
+
+    cfg = RunConfig(name="pinned", image="", entrypoint=f"{sys.executable} job.py", cpus=1, preload=["json"])
+    run_dir = tmp_path / "run"
+    try:
+        assert runner.run_local_container(cfg, run_dir, working_dir=tmp_path) == 0
+        assert "warm_start" in json.loads((run_dir / "run.json").read_text())
+        assert f"[{first_cpu}]" in (run_dir / "logs.txt").read_text(encoding="utf-8")
+    finally:
+        pid_file = warm._socket_path(["json"]).with_suffix(".pid")
+        if pid_file.exists():
+            os.kill(int(pid_file.read_text()), signal.SIGTERM)
@@ -3,7 +3,7 @@ from textwrap import dedent
 
 import pytest
 
-from runpilot.config import load_config
+from runpilot.config import load_config, parse_duration
 from runpilot.config import RunConfig
 from runpilot.storage import (
     create_run_dir,
@@ -81,4 +81,25 @@ def test_load_run_missing_raises(monkeypatch, tmp_path: Path) -> None:
     except FileNotFoundError:
         pass
     else:
-        raise AssertionError("Expected FileNotFoundError for missing run")
\ No newline at end of file
+        raise AssertionError("Expected FileNotFoundError for missing run")
+
+
+def test_parse_duration_and_limits(tmp_path: Path) -> None:
+    assert parse_duration(None) is None
+    assert parse_duration(90) == 90.0
+    assert parse_duration("30m") == 1800.0
+    assert parse_duration("1h30m") == 5400.0
+    with pytest.raises(ValueError):
+        parse_duration("soon")
+
+    cfg_path = tmp_path / "config.yaml"
+    cfg_path.write_text(
+        "name: t\nimage: i\nentrypoint: e\ntimeout: 2h\nmax_idle: 15m\n"
+        "budget: 10\ncost_per_hour: 2.5\n",
+        encoding="utf-8",
+    )
+    cfg = load_config(cfg_path)
+    assert cfg.timeout == 7200.0
+    assert cfg.max_idle == 900.0
+    assert cfg.budget == 10.0
+    assert cfg.cost_per_hour == 2.5
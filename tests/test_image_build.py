@@ -0,0 +1,92 @@
+from __future__ import annotations
+
+import subprocess
+from pathlib import Path
+
+from runpilot import image_build
+from runpilot.config import BuildConfig, load_config
+
+
+def _project(tmp_path: Path) -> Path:
+    project = tmp_path / "project"
+    project.mkdir()
+    (project / "Dockerfile").write_text("FROM python:3.11-slim\nCOPY . /app\n", encoding="utf-8")
+    (project / "train.py").write_text("print('hi')\n", encoding="utf-8")
+    return project
+
+
+def test_config_with_build_needs_no_image(tmp_path: Path) -> None:
+    cfg_path = tmp_path / "run.yaml"
+    cfg_path.write_text(
+        "name: built\n"
+        "entrypoint: python train.py\n"
+        "build:\n"
+        "  context: .\n"
+        "  args: {TORCH: '2.3'}\n",
+        encoding="utf-8",
+    )
+
+    cfg = load_config(cfg_path)
+
+    assert cfg.image == ""
+    assert cfg.build == BuildConfig(context=".", dockerfile="Dockerfile", args={"TORCH": "2.3"})
+
+
+def test_tag_tracks_dockerfile_context_and_args(tmp_path: Path, monkeypatch) -> None:
+    monkeypatch.setenv("HOME", str(tmp_path / "home"))
+    project = _project(tmp_path)
+    build = BuildConfig()
+
+    tag = image_build.image_tag("My Run", build, project)
+    assert tag.startswith("runpilot/my-run:")
+    assert image_build.image_tag("My Run", build, project) == tag
+
+    assert image_build.image_tag("My Run", BuildConfig(args={"X": "1"}), project) != tag
+    (project / "train.py").write_text("print('changed')\n", encoding="utf-8")
+    assert image_build.image_tag("My Run", build, project) != tag
+
+
+def test_tag_ignores_what_dockerignore_leaves_out(tmp_path: Path, monkeypatch) -> None:
+    monkeypatch.setenv("HOME", str(tmp_path / "home"))
+    project = _project(tmp_path)
+    (project / "data").mkdir()
+    (project / "data" / "train.csv").write_text("1,2\n", encoding="utf-8")
+    (project / "data" / "schema.json").write_text("{}", encoding="utf-8")
+    (project / "notes.ipynb").write_text("{}", encoding="utf-8")
+    (project / ".dockerignore").write_text("# local only\ndata\n!data/schema.json\n**/*.ipynb\n", encoding="utf-8")
+    build = BuildConfig()
+    tag = image_build.image_tag("demo", build, project)
+
+    (project / "data" / "train.csv").write_text("3,4\n", encoding="utf-8")
+    (project / "notes.ipynb").write_text('{"cells": []}', encoding="utf-8")
+    (project / "data" / "more.csv").write_text("5\n", encoding="utf-8")
+    assert image_build.image_tag("demo", build, project) == tag
+
+    (project / "data" / "schema.json").write_text('{"v": 2}', encoding="utf-8")
+    assert image_build.image_tag("demo", build, project) != tag
+
+
+def test_build_is_skipped_when_tag_exists(tmp_path: Path, monkeypatch) -> None:
+    monkeypatch.setenv("HOME", str(tmp_path / "home"))
+    project = _project(tmp_path)
+    calls = []
+    existing = set()
+
+    def fake_run(cmd, **kwargs):
+        calls.append(cmd)
+        if cmd[:3] == ["docker", "image", "inspect"]:
+            return subprocess.CompletedProcess(cmd, 0 if cmd[3] in existing else 1)
+        if cmd[:2] == ["docker", "build"]:
+            assert kwargs["env"]["DOCKER_BUILDKIT"] == "1"
+            existing.add(cmd[cmd.index("-t") + 1])
+        return subprocess.CompletedProcess(cmd, 0)
+
+    monkeypatch.setattr(image_build.subprocess, "run", fake_run)
+    log = tmp_path / "build.log"
+
+    first = image_build.build_image("demo", BuildConfig(), project, log)
+    second = image_build.build_image("demo", BuildConfig(), project, log)
+
+    assert first.built and not second.built
+    assert first.tag == second.tag
+    assert sum(1 for c in calls if c[:2] == ["docker", "build"]) == 1
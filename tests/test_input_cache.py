@@ -0,0 +1,94 @@
+from __future__ import annotations
+
+import http.server
+import os
+import sys
+import threading
+from pathlib import Path
+
+from runpilot import runner
+from runpilot.config import RunConfig
+from runpilot.input_cache import enforce_budget, fetch_input, materialise_inputs
+
+
+def test_local_input_is_cached_read_only_and_exposed(tmp_path: Path, monkeypatch) -> None:
+    monkeypatch.setenv("HOME", str(tmp_path / "home"))
+    monkeypatch.setattr("runpilot.runner._check_docker", lambda: False)
+
+    work = tmp_path / "work"
+    work.mkdir()
+    (work / "vocab.txt").write_text("a b c", encoding="utf-8")
+
+    first = fetch_input("vocab", "vocab.txt", base_dir=work)
+    second = fetch_input("vocab", "vocab.txt", base_dir=work)
+    assert first.fetched and not second.fetched
+    assert second.path == first.path
+    assert not os.access(first.path, os.W_OK) or os.geteuid() == 0
+
+    cfg = RunConfig(
+        name="reader",
+        image="",
+        entrypoint=f"{sys.executable} -c \"import os; print(open(os.environ['RUNPILOT_INPUT_VOCAB']).read())\"",
+        inputs={"vocab": "vocab.txt"},
+    )
+    run_dir = tmp_path / "run"
+    assert runner.run_local_container(cfg, run_dir, working_dir=work) == 0
+    assert "a b c" in (run_dir / "logs.txt").read_text(encoding="utf-8")
+
+
+def test_concurrent_url_fetches_download_once(tmp_path: Path, monkeypatch) -> None:
+    monkeypatch.setenv("HOME", str(tmp_path))
+    hits = []
+
+    class Handler(http.server.BaseHTTPRequestHandler):
+        def do_GET(self) -> None:
+            hits.append(self.path)
+            body = b"x" * 100_000
+            self.send_response(200)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args) -> None:
+            pass
+
+    server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = f"http://127.0.0.1:{server.server_port}/data.bin"
+
+    results = []
+    threads = [
+        threading.Thread(target=lambda: results.append(fetch_input("d", url)))
+        for _ in range(6)
+    ]
+    try:
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+    finally:
+        server.shutdown()
+
+    assert len(hits) == 1
+    assert len({r.path for r in results}) == 1
+    assert sum(r.fetched for r in results) == 1
+
+
+def test_budget_evicts_lru_but_not_pinned_inputs(tmp_path: Path, monkeypatch) -> None:
+    monkeypatch.setenv("HOME", str(tmp_path))
+    for name in ("old", "new"):
+        (tmp_path / f"{name}.bin").write_bytes(os.urandom(1000))
+
+    old = fetch_input("old", str(tmp_path / "old.bin"))
+    monkeypatch.setenv("RUNPILOT_INPUT_CACHE_MAX_BYTES", "1500")
+
+    with materialise_inputs({"new": str(tmp_path / "new.bin")}) as pinned:
+        new_path = pinned["new"].path
+        assert not old.path.exists()
+        assert new_path.exists()
+        # Pinned by the running job, so even a zero budget keeps it.
+        assert enforce_budget(max_bytes=0) == 0
+        assert new_path.exists()
+
+    assert enforce_budget(max_bytes=0) == 1000
+    assert not new_path.exists()
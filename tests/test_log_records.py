@@ -0,0 +1,201 @@
+from __future__ import annotations
+
+import json
+import os
+import sys
+import time
+from pathlib import Path
+
+from runpilot import cli_logs, log_records, log_store, runner
+from runpilot.cli_logs import logs_command, parse_time_bound
+from runpilot.cloud_config import CloudConfig
+from runpilot.config import RunConfig
+from runpilot.log_records import STDERR, STDOUT, LogRecorder, iter_records
+from runpilot.log_store import compress_file, tail_offset
+from runpilot.storage import update_run_metadata, write_run_metadata
+
+
+def test_local_run_records_streams_separately(tmp_path: Path, monkeypatch) -> None:
+    monkeypatch.setattr("runpilot.runner._check_docker", lambda: False)
+
+    script = "import sys; print('to out'); sys.stdout.flush(); print('to err', file=sys.stderr)"
+    cfg = RunConfig(name="streams", image="", entrypoint=f'{sys.executable} -c "{script}"')
+    run_dir = tmp_path / "run"
+
+    assert runner.run_local_container(cfg, run_dir) == 0
+
+    merged = (run_dir / "logs.txt").read_text(encoding="utf-8")
+    assert "to out" in merged and "to err" in merged
+    records = list(iter_records(run_dir))
+    assert [(r.stream, r.text) for r in records] == [(STDOUT, "to out"), (STDERR, "to err")]
+    assert records[0].timestamp <= records[1].timestamp
+
+
+def test_range_query_seeks_via_index(tmp_path: Path, monkeypatch) -> None:
+    monkeypatch.setattr(log_records, "INDEX_STRIDE", 256)
+    clock = iter(float(t) for t in range(1000, 3000))
+    monkeypatch.setattr(log_records.time, "time", lambda: next(clock))
+
+    with (tmp_path / "logs.txt").open("w", encoding="utf-8") as f, LogRecorder(tmp_path, f) as rec:
+        out_fd, err_fd = rec.open_pipes()
+        os.write(out_fd, b"".join(b"line %d\n" % i for i in range(1000)))
+        os.write(err_fd, b"partial")
+        os.close(out_fd)
+        os.close(err_fd)
+
+    # Line i was stamped at 1000 + i; the trailing partial line comes last.
+    index = log_records._load_index(tmp_path)
+    assert len(index) > 10
+    assert log_records.seek_offset(tmp_path, 1500.5) > 0
+
+    texts = [r.text for r in iter_records(tmp_path, since=1500, until=1502)]
+    assert texts == ["line 500", "line 501", "line 502"]
+    assert [r.text for r in iter_records(tmp_path, streams={STDERR})] == ["partial"]
+
+
+def test_runpilot_messages_get_their_own_line_and_record(tmp_path: Path) -> None:
+    log_path = tmp_path / "logs.txt"
+    with log_path.open("w", encoding="utf-8") as f, LogRecorder(tmp_path, f) as rec:
+        out_fd, err_fd = rec.open_pipes()
+        os.write(out_fd, b"epoch 1 loss")
+        deadline = time.monotonic() + 5
+        while log_path.stat().st_size < 12 and time.monotonic() < deadline:
+            time.sleep(0.01)
+        rec.message("[RunPilot] Stopping job")
+        os.write(out_fd, b" 0.5\n")
+        os.close(out_fd)
+        os.close(err_fd)
+
+    assert log_path.read_text(encoding="utf-8") == "epoch 1 loss\n[RunPilot] Stopping job\n 0.5\n"
+    records = [(r.stream_name, r.text) for r in iter_records(tmp_path)]
+    assert records == [("runpilot", "[RunPilot] Stopping job"), ("stdout", "epoch 1 loss 0.5")]
+
+
+def test_logs_command_filters_by_time(tmp_path: Path, monkeypatch, capsys) -> None:
+    monkeypatch.setenv("HOME", str(tmp_path))
+    monkeypatch.setattr("runpilot.runner._check_docker", lambda: False)
+    run_dir = tmp_path / ".runpilot" / "runs" / "r1"
+
+    cfg = RunConfig(name="r1", image="", entrypoint="echo hello")
+    assert runner.run_local_container(cfg, run_dir) == 0
+
+    assert logs_command("r1") == 0
+    assert "out hello" in capsys.readouterr().out
+    assert logs_command("r1", until="2000-01-01T00:00:00Z") == 0
+    assert capsys.readouterr().out == ""
+    # No run.json yet, so there is no start time to be relative to.
+    assert logs_command("r1", since="+1h") == 1
+
+    meta = {"created_at": "2025-11-19T23:58:00+00:00"}
+    start = parse_time_bound("+5m", meta)
+    assert start == parse_time_bound("2025-11-20T00:03:00Z", meta)
+    assert parse_time_bound("10m", meta, now=10_000.0) == 9_400.0
+
+
+def test_logs_tail_range_and_follow(tmp_path: Path, monkeypatch, capsys) -> None:
+    monkeypatch.setenv("HOME", str(tmp_path))
+    monkeypatch.setattr(log_store, "BLOCK_SIZE", 512)
+    monkeypatch.setattr(cli_logs, "FOLLOW_INTERVAL", 0.0)
+    run_dir = tmp_path / ".runpilot" / "runs" / "r1"
+    run_dir.mkdir(parents=True)
+    log_path = run_dir / "logs.txt"
+    text = "".join(f"line {i}\n" for i in range(1000))
+    log_path.write_text(text, encoding="utf-8")
+    cfg = RunConfig(name="r1", image="", entrypoint="true")
+    write_run_metadata(run_dir, cfg, status="finished")
+
+    assert tail_offset(log_path, 2) == text.index("line 998")
+    assert logs_command("r1", tail=3) == 0
+    assert capsys.readouterr().out == "line 997\nline 998\nline 999\n"
+    assert logs_command("r1", byte_range="0:7") == 0
+    assert capsys.readouterr().out == "line 0\n"
+
+    # Compressed logs read the same, seeking block by block from the end.
+    compress_file(log_path)
+    assert tail_offset(log_path, 500) == text.index("line 500")
+    assert logs_command("r1", tail=1) == 0
+    assert capsys.readouterr().out == "line 999\n"
+    assert logs_command("r1", byte_range="-9:") == 0
+    assert capsys.readouterr().out == "line 999\n"
+
+    # --follow prints output appended while the run is live, then stops.
+    live = tmp_path / ".runpilot" / "runs" / "r2"
+    live.mkdir()
+    (live / "logs.txt").write_text("start\n", encoding="utf-8")
+    write_run_metadata(live, cfg, status="running")
+    checks = iter(range(100))
+
+    def fake_read(run_dir):
+        step = next(checks)
+        if step == 2:
+            with (live / "logs.txt").open("a", encoding="utf-8") as f:
+                f.write("more\n")
+            return {"status": "finished"}
+        return {"status": "running"}
+
+    monkeypatch.setattr(cli_logs, "read_run_metadata", fake_read)
+    assert logs_command("r2", follow=True) == 0
+    assert capsys.readouterr().out == "start\nmore\n"
+
+
+class _FakeResponse:
+    def __init__(self, status_code: int, content: bytes, headers: dict) -> None:
+        self.status_code = status_code
+        self.content = content
+        self.headers = headers
+
+    def raise_for_status(self) -> None:
+        pass
+
+    def json(self):
+        return json.loads(self.content)
+
+
+def test_remote_logs_use_range_requests(tmp_path: Path, monkeypatch, capsys) -> None:
+    monkeypatch.setenv("HOME", str(tmp_path))
+    monkeypatch.setattr(cli_logs, "_REMOTE_TAIL_WINDOW", 16)
+    monkeypatch.setattr(
+        "runpilot.cloud_config.load_cloud_config", lambda: CloudConfig("https://cloud.test", "tok")
+    )
+    body = b"".join(b"remote %d\n" % i for i in range(100))
+    seen = []
+    polls = []
+
+    def fake_get(url, headers, timeout=None):
+        assert timeout
+        if not url.endswith("/logs"):
+            polls.append(url)
+            status = "running" if len(polls) < 3 else "finished"
+            return _FakeResponse(200, json.dumps({"status": status}).encode(), {})
+        seen.append((url, headers.get("Range")))
+        spec = headers["Range"].split("=", 1)[1]
+        first, _, last = spec.partition("-")
+        if not first:
+            start, end = max(0, len(body) - int(last)), len(body)
+        else:
+            start, end = int(first), int(last) + 1 if last else len(body)
+        if start >= len(body):
+            return _FakeResponse(416, b"", {"Content-Range": f"bytes */{len(body)}"})
+        return _FakeResponse(206, body[start:end], {"Content-Range": f"bytes {start}-{end - 1}/{len(body)}"})
+
+    monkeypatch.setattr("runpilot.cloud_client.requests.get", fake_get)
+
+    run_dir = tmp_path / ".runpilot" / "runs" / "local-run"
+    run_dir.mkdir(parents=True)
+    update_run_metadata(run_dir, {"cloud_run_id": "cloud-7"})
+
+    assert logs_command("local-run", tail=3, remote=True) == 0
+    assert capsys.readouterr().out == "remote 97\nremote 98\nremote 99\n"
+    assert all(url == "https://cloud.test/v1/runs/cloud-7/logs" for url, _ in seen)
+    # The window grew from the last 16 bytes until it held three lines.
+    assert [r for _, r in seen] == ["bytes=-16", "bytes=-32"]
+
+    assert logs_command("cloud-9", byte_range="10:20", remote=True) == 0
+    assert capsys.readouterr().out == body[10:20].decode()
+    assert seen[-1] == ("https://cloud.test/v1/runs/cloud-9/logs", "bytes=10-19")
+
+    # --follow stops once the Cloud reports the run finished.
+    monkeypatch.setattr(cli_logs, "FOLLOW_INTERVAL", 0)
+    assert logs_command("cloud-9", tail=1, follow=True, remote=True) == 0
+    assert capsys.readouterr().out == "remote 99\n"
+    assert polls == ["https://cloud.test/v1/runs/cloud-9"] * 3
@@ -0,0 +1,53 @@
+from __future__ import annotations
+
+from pathlib import Path
+
+from runpilot import log_search, log_store
+from runpilot.cli_grep import grep_command
+from runpilot.config import RunConfig
+from runpilot.log_search import search_runs
+from runpilot.log_store import compress_file
+from runpilot.storage import create_run_dir, write_run_metadata
+
+
+def _lines(n: int, fail_every: int) -> bytes:
+    return b"".join(
+        b"step %d ERROR: nan loss\r\n" % i if i % fail_every == 0 else b"step %d ok\n" % i
+        for i in range(1, n + 1)
+    )
+
+
+def test_grep_plain_and_compressed_logs_with_line_numbers(tmp_path: Path, monkeypatch, capsys) -> None:
+    monkeypatch.setenv("HOME", str(tmp_path))
+    monkeypatch.setattr(log_store, "BLOCK_SIZE", 1000)
+    monkeypatch.setattr(log_search, "_CHUNK", 777)  # matches straddle chunk boundaries
+    cfg = RunConfig(name="train", image="", entrypoint="true")
+    runs = []
+    for status in ("finished", "failed", "failed"):
+        run_dir = create_run_dir("train")
+        (run_dir / "logs.txt").write_bytes(_lines(2000, 250))
+        write_run_metadata(run_dir, cfg, status=status)
+        runs.append(run_dir)
+    compress_file(runs[1] / "logs.txt")
+    (runs[2] / "logs.txt").write_bytes(b"")
+
+    pairs = [(r.name, str(r)) for r in runs]
+    for jobs in (1, 3):
+        results = list(search_runs(pairs, "error: NAN", ignore_case=True, jobs=jobs))
+        assert [r.run_id for r in results] == [r.name for r in runs]
+        for result in results[:2]:
+            assert [m.line_number for m in result.matches] == list(range(250, 2001, 250))
+            assert result.matches[0].line == "step 250 ERROR: nan loss"
+        assert results[2].matches == []
+
+    # --max-count caps the total and stops early.
+    capped = list(search_runs(pairs, "ERROR", max_count=10, jobs=3))
+    assert [len(r.matches) for r in capped] == [8, 2]
+
+    assert grep_command("ERROR", status="failed", files_only=True) == 0
+    assert capsys.readouterr().out.split() == [runs[1].name]
+    assert grep_command("step 2001 ", fixed=True) == 1
+    assert grep_command("step 2000 ERROR", name="train", max_count=1) == 0
+    out = capsys.readouterr().out.splitlines()
+    assert len(out) == 1 and out[0].endswith(":2000:step 2000 ERROR: nan loss")
+    assert grep_command("(unclosed") == 2
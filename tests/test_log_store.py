@@ -0,0 +1,72 @@
+from __future__ import annotations
+
+import gzip
+import os
+import tarfile
+from pathlib import Path
+
+from runpilot import log_store
+from runpilot.archive import export_run
+from runpilot.config import RunConfig
+from runpilot.log_records import LogRecorder, iter_records
+from runpilot.log_store import compact_run, compact_runs, compress_file, find_log, open_binary
+from runpilot.metrics import parse_metrics_from_log
+from runpilot.storage import create_run_dir, read_run_metadata, write_run_metadata
+
+
+def test_compressed_log_is_seekable_gzip_and_parses_the_same(tmp_path: Path, monkeypatch) -> None:
+    monkeypatch.setattr(log_store, "BLOCK_SIZE", 1024)
+    lines = [
+        f'METRIC {{"step": {i}, "loss": {1 / (i + 1)}}}' if i % 3 == 0 else f"step {i} loading batch"
+        for i in range(2000)
+    ]
+    original = ("\n".join(lines) + "\n").encode("utf-8")
+    log_path = tmp_path / "logs.txt"
+    log_path.write_bytes(original)
+    expected = parse_metrics_from_log(log_path)
+
+    result = compress_file(log_path)
+    assert result is not None and result.bytes_saved > 0
+    assert not log_path.exists() and find_log(tmp_path) == result.path
+    # Still a plain (multi-member) gzip file for external tools.
+    assert gzip.decompress(result.path.read_bytes()) == original
+
+    with open_binary(log_path) as f:
+        for offset in (0, 1023, 1024, 50_000, len(original) - 10):
+            f.seek(offset)
+            assert f.read(300) == original[offset : offset + 300]
+    assert parse_metrics_from_log(log_path) == expected
+
+
+def test_compact_skips_active_runs_and_export_stays_plain(tmp_path: Path, monkeypatch) -> None:
+    monkeypatch.setenv("HOME", str(tmp_path))
+    monkeypatch.setenv("RUNPILOT_HOME", str(tmp_path / ".runpilot"))
+    cfg = RunConfig(name="demo", image="", entrypoint="true")
+
+    done = create_run_dir("demo")
+    with (done / "logs.txt").open("w", encoding="utf-8") as f, LogRecorder(done, f) as rec:
+        out_fd, err_fd = rec.open_pipes()
+        os.write(out_fd, b"".join(b"epoch %d done\n" % i for i in range(5000)))
+        os.close(out_fd)
+        os.close(err_fd)
+    write_run_metadata(done, cfg, status="finished", exit_code=0)
+
+    active = create_run_dir("demo")
+    (active / "logs.txt").write_text("still going\n", encoding="utf-8")
+    write_run_metadata(active, cfg, status="running")
+
+    assert compact_run(active) is None
+    totals = compact_runs()
+    assert totals["runs"] == 1 and totals["bytes_after"] < totals["bytes_before"] / 5
+    assert totals["skipped"] == 1
+    assert (active / "logs.txt").is_file() and not (done / "logs.txt").exists()
+    assert read_run_metadata(done)["logs_compressed"]["codec"] == "gzip"
+    assert [r.text for r in iter_records(done)][-1] == "epoch 4999 done"
+
+    archive = export_run(done.name, tmp_path / "out.tar.gz")
+    with tarfile.open(archive) as tf:
+        names = tf.getnames()
+        assert f"{done.name}/logs.txt" in names
+        assert not any(name.endswith((".gz", ".idx")) for name in names)
+        logs = tf.extractfile(f"{done.name}/logs.txt").read()
+    assert logs.endswith(b"epoch 4999 done\n")
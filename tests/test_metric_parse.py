@@ -0,0 +1,88 @@
+from __future__ import annotations
+
+import json
+from pathlib import Path
+
+from runpilot import metric_parse
+from runpilot.log_store import compress_file, open_text
+from runpilot.metric_parse import parse_metric_log, scan_metric_log
+from runpilot.metrics import iter_metric_points, parse_metrics_from_log
+
+# Lines the parser has to treat exactly like the line-at-a-time reference.
+TRICKY = [
+    "  METRIC loss=1.5  ",
+    "METRIC {\"loss\": 1.25, \"acc\": \"n/a\"}",
+    "METRIC {\"step\": 7.9, \"loss\": 1.0}",
+    "METRIC {\"step\": \"x\", \"loss\": 0.5, \"flag\": true}",
+    "METRIC {\"step\": Infinity, \"loss\": 0.25}",
+    "METRIC {bad=3",
+    "METRIC [1, 2]",
+    "METRIC =4",
+    "METRIC loss=NaN",
+    "METRIC {\"loss\": -Infinity}",
+    "prefix METRIC loss=9",
+    "METRIC",
+    "METRIC ",
+    " METRIC naïve=2 ",
+    "METRIC {\"step\": 123456789012345678901234567890, \"big\": 1}",
+    "METRIC x=1 METRIC y=2",
+]
+
+
+def _reference(path: Path):
+    with open_text(path) as f:
+        points = list(iter_metric_points(f))
+    series = {}
+    for name, step, value in points:
+        series.setdefault(name, []).append((step, repr(value)))
+    return series
+
+
+def _columns(series):
+    return {name: list(zip(b.steps, map(repr, b.values))) for name, b in series.items()}
+
+
+def test_fast_parser_matches_reference_serial_parallel_and_compressed(tmp_path: Path, monkeypatch) -> None:
+    monkeypatch.setattr(metric_parse, "PARALLEL_MIN_BYTES", 0)
+    monkeypatch.setattr(metric_parse, "_PIECE", 4096)
+    monkeypatch.setattr(metric_parse, "_CHUNK", 1000)
+
+    newlines = ["\n", "\r\n", "\r"]
+    parts = []
+    for i in range(3000):
+        if i % 7 == 0:
+            parts.append(TRICKY[(i // 7) % len(TRICKY)])
+        elif i % 3 == 0:
+            parts.append("METRIC " + json.dumps({"step": i, "loss": 1 / i, "lr": 0.01}))
+        elif i % 5 == 0:
+            parts.append(f"METRIC acc={i / 3000}")
+        else:
+            parts.append(f"epoch {i}: nothing to see")
+        parts.append(newlines[i % 3])
+    parts.append("METRIC tail=1")  # no trailing newline
+    log_path = tmp_path / "logs.txt"
+    log_path.write_bytes("".join(parts).encode("utf-8"))
+
+    reference = _reference(log_path)
+    # The dict parser keeps every point; the int64 columns cannot hold a
+    # step beyond 64 bits, so the fast parser drops those points only.
+    parsed = parse_metrics_from_log(log_path)
+    parsed.pop("final")
+    assert {name: [(p["step"], repr(p["value"])) for p in points] for name, points in parsed.items()} == reference
+    assert reference["big"] == [(123456789012345678901234567890, "1.0")] * len(reference["big"])
+    expected = {
+        name: [point for point in points if -(2**63) <= point[0] < 2**63]
+        for name, points in reference.items()
+    }
+    expected = {name: points for name, points in expected.items() if points}
+    assert sum(len(v) for v in expected.values()) > 1500
+
+    serial = parse_metric_log(log_path, jobs=1)
+    assert _columns(serial) == expected
+    assert list(serial) == list(expected)  # first-appearance order
+    parallel, counted = scan_metric_log(log_path, jobs=3)
+    assert _columns(parallel) == expected
+    assert counted == scan_metric_log(log_path, jobs=1)[1] > 0
+
+    compress_file(log_path)
+    assert _columns(parse_metric_log(log_path)) == expected
@@ -1,6 +1,21 @@
+import json
 from pathlib import Path
 
-from runpilot.metrics import parse_metrics_from_log
+from runpilot import metric_series
+from runpilot import metrics as metrics_module
+from runpilot.cli_metrics import metrics_command
+from runpilot.metric_series import SERIES_FILENAME, read_series, write_series
+from runpilot.metrics import (
+    downsample,
+    load_metric_series,
+    load_parse_state,
+    metrics_payload,
+    parse_metrics_from_log,
+    read_metrics,
+    refresh_metrics,
+)
+from runpilot.run_manager import write_log_metrics
+from runpilot.storage import create_run_dir
 
 
 def test_parse_metrics_from_log_simple(tmp_path: Path) -> None:
@@ -53,3 +68,140 @@ def test_parse_metrics_from_log_empty_or_invalid(tmp_path: Path) -> None:
 
     metrics = parse_metrics_from_log(log_path)
     assert metrics == {}
+
+
+def test_metric_series_sidecar_round_trip_and_step_slices(tmp_path: Path, monkeypatch, capsys) -> None:
+    monkeypatch.setenv("HOME", str(tmp_path))
+    run_dir = create_run_dir("train")
+    lines = ["booting", "METRIC loss=2.5"]
+    lines += [json.dumps({"step": i * 10, "loss": 1 / (i + 1), "lr": 0.1}) for i in range(1, 500)]
+    lines = [lines[0], lines[1]] + ["METRIC " + line for line in lines[2:]] + ["METRIC accuracy=0.9"]
+    log_path = run_dir / "logs.txt"
+    log_path.write_text("\n".join(lines), encoding="utf-8")
+
+    assert write_log_metrics(run_dir, 0) is not None
+    data = read_metrics(run_dir)
+    assert data["summary"] == {"loss": 1 / 500, "lr": 0.1, "accuracy": 0.9, "exit_code": 0.0}
+    assert data["series"]["file"] == SERIES_FILENAME
+    assert data["series"]["metrics"]["loss"] == {"points": 500, "first_step": 1, "last_step": 4990}
+
+    # The sidecar holds exactly what the dict parser returns.
+    parsed = parse_metrics_from_log(log_path)
+    stored = load_metric_series(run_dir)
+    assert sorted(stored) == ["accuracy", "loss", "lr"]
+    for name, series in stored.items():
+        assert series.points() == parsed[name]
+
+    window = load_metric_series(run_dir, ["loss"], start=100, stop=150)
+    assert list(window) == ["loss"]
+    assert [int(s) for s in window["loss"].steps] == [100, 110, 120, 130, 140]
+
+    # Appended blocks extend a series; a torn trailing block is ignored.
+    sidecar = run_dir / SERIES_FILENAME
+    write_series(sidecar, {"accuracy": ([501, 502], [0.91, 0.92])}, append=True)
+    with sidecar.open("ab") as f:
+        f.write(b"BLK1\x08\x00")
+    accuracy = read_series(sidecar, ["accuracy"])["accuracy"]
+    assert [float(v) for v in accuracy.values] == [0.9, 0.91, 0.92]
+    assert [int(s) for s in accuracy.slice(start=502).steps] == [502]
+
+    assert metrics_command(run_dir.name, series=["loss"], steps=":3") == 0
+    assert capsys.readouterr().out.splitlines() == ["loss:", "  1  2.5"]
+    assert metrics_command(run_dir.name) == 0
+    assert "  loss      500 points, steps 1..4990" in capsys.readouterr().out
+    assert metrics_command(run_dir.name, series=["missing"]) == 1
+
+
+def test_refresh_metrics_only_parses_new_bytes(tmp_path: Path, monkeypatch) -> None:
+    monkeypatch.setenv("HOME", str(tmp_path))
+    monkeypatch.setattr(metrics_module, "_READ_SIZE", 64)
+    run_dir = create_run_dir("train")
+    log_path = run_dir / "logs.txt"
+    chunks = [
+        'boot\nMETRIC {"step": 5, "loss": 1.0}\nMETRIC loss=0.9\nMETRIC {"loss": 0.',
+        '8}\r\nMETRIC {"step": 9, "loss": 0.7, "acc": 0.5}\n' + "noise line\n" * 20,
+        "METRIC acc=0.75",  # no trailing newline until the run ends
+    ]
+
+    log_path.write_text(chunks[0], encoding="utf-8")
+    refresh_metrics(run_dir)
+    state = load_parse_state(run_dir)
+    assert state.offset == len(chunks[0]) and state.partial == b'METRIC {"loss": 0.'
+    assert state.global_step == 1
+    assert read_metrics(run_dir)["summary"] == {"loss": 0.9}
+
+    with log_path.open("a", encoding="utf-8", newline="") as f:
+        f.write(chunks[1])
+    # A refresh that died after appending to the sidecar is rolled back.
+    with (run_dir / SERIES_FILENAME).open("ab") as f:
+        f.write(b"BLK1" + b"\0" * 60)
+    refresh_metrics(run_dir)
+    assert load_parse_state(run_dir).global_step == 2
+    assert [int(s) for s in load_metric_series(run_dir)["loss"].steps] == [5, 1, 2, 9]
+
+    # Nothing new: the log is not opened again.
+    def fail(path):
+        raise AssertionError("log re-read")
+
+    with monkeypatch.context() as m:
+        m.setattr(metrics_module, "open_binary", fail)
+        refresh_metrics(run_dir)
+
+    with log_path.open("a", encoding="utf-8") as f:
+        f.write(chunks[2])
+    assert write_log_metrics(run_dir, 1) is not None
+    data = read_metrics(run_dir)
+    assert data["summary"] == {"loss": 0.7, "acc": 0.75, "exit_code": 1.0}
+    assert data["series"]["metrics"]["acc"] == {"points": 2, "first_step": 9, "last_step": 3}
+
+    # Same points as a full parse, and compacted to one block per metric.
+    parsed = parse_metrics_from_log(log_path)
+    stored = load_metric_series(run_dir)
+    assert {name: s.points() for name, s in stored.items()} == {k: v for k, v in parsed.items() if k != "final"}
+    assert not metric_series.compact_series(run_dir / SERIES_FILENAME)
+
+
+def test_refresh_checkpoint_ends_at_carriage_returns(tmp_path: Path, monkeypatch) -> None:
+    monkeypatch.setenv("HOME", str(tmp_path))
+    monkeypatch.setattr(metrics_module, "_READ_SIZE", 256)
+    run_dir = create_run_dir("progress")
+    bar = "".join(f"\r{i:3d}%|{'#' * (i // 10):<10}|" for i in range(101))
+    (run_dir / "logs.txt").write_text("METRIC loss=1\n" + bar + "\rMETRIC loss=0.5\r" + bar, encoding="utf-8")
+
+    refresh_metrics(run_dir)
+    state = load_parse_state(run_dir)
+    assert len(state.partial) < 20
+    assert [float(v) for v in load_metric_series(run_dir)["loss"].values] == [1.0, 0.5]
+
+
+def test_downsampled_series_for_display_and_upload(tmp_path: Path, monkeypatch, capsys) -> None:
+    monkeypatch.setenv("HOME", str(tmp_path))
+    steps = list(range(10_000))
+    values = [1.0 / (i + 1) for i in steps]
+    values[7777] = 50.0  # a spike both methods must keep
+
+    for method in ("lttb", "minmax"):
+        kept_steps, kept_values = downsample(steps, values, 200, method)
+        assert len(kept_steps) <= 200 and kept_steps == sorted(kept_steps)
+        assert kept_steps[0] == 0 and 7777 in kept_steps
+        assert all(values[s] == v for s, v in zip(kept_steps, kept_values))
+    assert downsample(steps[:5], values[:5], 0) == (steps[:5], values[:5])
+
+    run_dir = create_run_dir("train")
+    (run_dir / "logs.txt").write_text(
+        "".join(f"METRIC loss={v}\n" for v in values) + "METRIC acc=0.5\n", encoding="utf-8"
+    )
+    write_log_metrics(run_dir, 0)
+
+    monkeypatch.setenv("RUNPILOT_METRIC_POINTS", "100")
+    payload = metrics_payload(run_dir)
+    assert payload["summary"]["acc"] == 0.5
+    assert len(payload["time_series"]["loss"]) == 100
+    assert payload["time_series"]["acc"] == [{"step": 10_001, "value": 0.5}]
+    assert len(metrics_payload(run_dir, target=0)["time_series"]["loss"]) == 10_000
+    assert len(load_metric_series(run_dir)["loss"]) == 10_000  # full resolution kept locally
+
+    assert metrics_command(run_dir.name, series=["loss"], points=50, method="minmax") == 0
+    out = capsys.readouterr().out.splitlines()
+    assert out[0] == "loss (50 of 10000 points, minmax):" and len(out) == 51
+    assert metrics_command(run_dir.name, series=["loss"], method="spline") == 1
@@ -0,0 +1,77 @@
+from __future__ import annotations
+
+import subprocess
+from pathlib import Path
+
+import pytest
+
+from runpilot import package_cache
+from runpilot.package_cache import (
+    cache_volumes,
+    docker_args,
+    enforce_budget,
+    ensure_volumes,
+    measure,
+    record_usage,
+)
+
+
+def test_volumes_are_per_image_and_kind() -> None:
+    a = cache_volumes("python:3.11", ["pip", "torch"])
+    b = cache_volumes("python:3.12", ["pip"])
+
+    assert a[0].name != b[0].name
+    assert a[0].name == cache_volumes("python:3.11", ["pip"])[0].name
+    built = cache_volumes("runpilot/demo:1234", ["pip"], key="runpilot/demo")
+    assert built[0].name == cache_volumes("runpilot/demo:5678", ["pip"], key="runpilot/demo")[0].name
+    assert built[0].image == "runpilot/demo:1234"
+    assert docker_args(a, {"TORCH_HOME": "/weights"}) == [
+        "-v", f"{a[0].name}:/runpilot-cache/pip",
+        "-e", "PIP_CACHE_DIR=/runpilot-cache/pip",
+        "-v", f"{a[1].name}:/runpilot-cache/torch",
+    ]
+    with pytest.raises(ValueError):
+        cache_volumes("python:3.11", ["conda"])
+
+
+def test_usage_accounting_and_lru_eviction(tmp_path: Path, monkeypatch) -> None:
+    monkeypatch.setenv("HOME", str(tmp_path))
+    removed = []
+
+    def fake_docker(args, timeout=120):
+        if args[:2] == ["volume", "rm"]:
+            removed.append(args[2])
+            return subprocess.CompletedProcess(args, 0, "", "")
+        # du -sk output for the measure() helper container
+        paths = args[args.index("-sk") + 1 :]
+        return subprocess.CompletedProcess(args, 0, "".join(f"2048\t{p}\n" for p in paths), "")
+
+    monkeypatch.setattr(package_cache, "_docker", fake_docker)
+
+    old = cache_volumes("old:1", ["pip"])
+    new = cache_volumes("new:1", ["pip", "huggingface"])
+
+    assert measure(new) == {new[0].name: 2 * 1024**2, new[1].name: 2 * 1024**2}
+
+    record_usage(old, {}, measure(old))
+    report = record_usage(new, measure(new), {v.name: 3 * 1024**2 for v in new})
+
+    assert report["pip"]["bytes_served"] == 2 * 1024**2
+    assert report["pip"]["bytes_added"] == 1024**2
+    assert package_cache.cache_report()["bytes_served"] == 4 * 1024**2
+
+    # 8 MiB cached, 7 MiB budget: the least recently used volume goes first.
+    assert enforce_budget(max_bytes=7 * 1024**2, keep=[v.name for v in new]) == [old[0].name]
+    assert removed == [old[0].name]
+    assert package_cache.cache_report()["volumes"] == 2
+
+
+def test_docker_timeouts_do_not_escape(monkeypatch) -> None:
+    def hung_docker(args, timeout=120):
+        raise subprocess.TimeoutExpired(["docker", *args], timeout)
+
+    monkeypatch.setattr(package_cache, "_docker", hung_docker)
+    volumes = cache_volumes("python:3.11", ["pip"])
+
+    ensure_volumes(volumes)
+    assert measure(volumes) == {volumes[0].name: None}
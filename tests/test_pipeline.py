@@ -0,0 +1,131 @@
+from __future__ import annotations
+
+import os
+import sys
+import threading
+import time
+from pathlib import Path
+from textwrap import dedent
+
+import pytest
+import yaml
+
+from runpilot.pipeline import (
+    PipelineStep,
+    critical_path,
+    load_pipeline,
+    run_pipeline,
+    topological_order,
+)
+
+
+def _write_step_config(tmp_path: Path, name: str, entrypoint: str) -> None:
+    (tmp_path / f"{name}.yaml").write_text(
+        yaml.safe_dump({"name": name, "image": "", "entrypoint": entrypoint}),
+        encoding="utf-8",
+    )
+
+
+def test_load_pipeline_and_order(tmp_path: Path) -> None:
+    (tmp_path / "runpilot.yaml").write_text(
+        dedent(
+            """
+            pipeline:
+              steps:
+                - name: train
+                  config: train.yaml
+                  inputs:
+                    DATA: prepare/data.csv
+                - name: prepare
+                  config: prepare.yaml
+                  outputs: [data.csv]
+            """
+        ),
+        encoding="utf-8",
+    )
+
+    steps = load_pipeline(tmp_path)
+
+    assert [s.name for s in steps] == ["train", "prepare"]
+    assert steps[0].all_dependencies() == ["prepare"]
+    assert topological_order(steps) == ["prepare", "train"]
+
+
+def test_cycle_and_undeclared_output_rejected() -> None:
+    with pytest.raises(ValueError, match="cycle"):
+        topological_order(
+            [
+                PipelineStep(name="a", config="a.yaml", depends_on=["b"]),
+                PipelineStep(name="b", config="b.yaml", depends_on=["a"]),
+            ]
+        )
+
+    with pytest.raises(ValueError, match="does not declare"):
+        topological_order(
+            [
+                PipelineStep(name="a", config="a.yaml"),
+                PipelineStep(name="b", config="b.yaml", inputs={"X": "a/missing.bin"}),
+            ]
+        )
+
+
+def test_independent_steps_run_in_parallel_and_failure_stops(
+    tmp_path: Path, monkeypatch
+) -> None:
+    monkeypatch.setenv("HOME", str(tmp_path))
+    for name in ("a", "b", "c", "d"):
+        _write_step_config(tmp_path, name, "true")
+
+    active = 0
+    peak = 0
+    lock = threading.Lock()
+
+    def fake_execute(cfg, run_dir, work_dir) -> int:
+        nonlocal active, peak
+        with lock:
+            active += 1
+            peak = max(peak, active)
+        time.sleep(0.2)
+        with lock:
+            active -= 1
+        return 1 if cfg.name == "c" else 0
+
+    steps = [
+        PipelineStep(name="a", config="a.yaml"),
+        PipelineStep(name="b", config="b.yaml"),
+        PipelineStep(name="c", config="c.yaml", depends_on=["a"]),
+        PipelineStep(name="d", config="d.yaml", depends_on=["c"]),
+    ]
+    result = run_pipeline(steps, cwd=tmp_path, execute=fake_execute)
+
+    assert peak >= 2
+    assert result.results["a"].status == "finished"
+    assert result.results["c"].status == "failed"
+    assert result.results["d"].status == "skipped"
+    assert not result.ok
+
+    path, seconds = critical_path(result)
+    assert path == ["a", "c"]
+    assert seconds >= 0.4
+
+
+def test_outputs_are_passed_between_steps(tmp_path: Path, monkeypatch) -> None:
+    monkeypatch.setenv("HOME", str(tmp_path))
+    monkeypatch.setattr("runpilot.runner._check_docker", lambda: False)
+
+    py = sys.executable
+    produce = f"{py} -c \"import os,pathlib; pathlib.Path(os.environ['RUNPILOT_OUTPUT_DIR'], 'n.txt').write_text('42')\""
+    consume = f"{py} -c \"import os; print('got', open(os.environ['RUNPILOT_INPUT_N']).read())\""
+    _write_step_config(tmp_path, "produce", produce)
+    _write_step_config(tmp_path, "consume", consume)
+
+    steps = [
+        PipelineStep(name="produce", config="produce.yaml", outputs=["n.txt"]),
+        PipelineStep(name="consume", config="consume.yaml", inputs={"N": "produce/n.txt"}),
+    ]
+    result = run_pipeline(steps, cwd=tmp_path)
+
+    assert result.ok, {n: r.message for n, r in result.results.items()}
+    consume_dir = result.results["consume"].run_dir
+    assert "got 42" in (consume_dir / "logs.txt").read_text(encoding="utf-8")
+    assert os.path.isfile(consume_dir / "metrics.json")
@@ -0,0 +1,80 @@
+from __future__ import annotations
+
+import json
+import sys
+from pathlib import Path
+
+from runpilot import runner
+from runpilot.config import RunConfig
+from runpilot.profiling import wrap_entrypoint
+
+
+def test_profiled_run_writes_flamegraph_and_hotspots(tmp_path: Path, monkeypatch) -> None:
+    monkeypatch.setenv("HOME", str(tmp_path / "home"))
+    monkeypatch.setattr("runpilot.runner._check_docker", lambda: False)
+
+    work = tmp_path / "work"
+    work.mkdir()
+    (work / "slow.py").write_text(
+        "def busy():\n"
+        "    return sum(i * i for i in range(300000))\n"
+        "\n"
+        "def main():\n"
+        "    for _ in range(5):\n"
+        "        busy()\n"
+        "\n"
+        "main()\n",
+        encoding="utf-8",
+    )
+
+    cfg = RunConfig(
+        name="profiled",
+        image="",
+        entrypoint=f"{sys.executable} slow.py",
+        profile="cprofile",
+    )
+    run_dir = tmp_path / "run"
+
+    assert runner.run_local_container(cfg, run_dir, working_dir=work) == 0
+
+    folded = (run_dir / "profile.folded").read_text(encoding="utf-8").splitlines()
+    assert any("main (slow.py:4);busy (slow.py:1)" in line for line in folded)
+    assert all(line.rsplit(" ", 1)[1].isdigit() for line in folded)
+
+    profile = json.loads((run_dir / "run.json").read_text())["profile"]
+    assert profile["tool"] == "cprofile"
+    assert any("slow.py" in spot["function"] for spot in profile["hotspots"][:3])
+
+
+def test_non_python_entrypoint_runs_unprofiled(tmp_path: Path, monkeypatch) -> None:
+    monkeypatch.setattr("runpilot.runner._check_docker", lambda: False)
+
+    cfg = RunConfig(name="shell", image="", entrypoint="echo hi", profile="auto")
+    run_dir = tmp_path / "run"
+
+    assert runner.run_local_container(cfg, run_dir) == 0
+    assert not (run_dir / "profile.folded").exists()
+
+
+def test_interpreter_options_stay_before_cprofile(tmp_path: Path, monkeypatch) -> None:
+    monkeypatch.setenv("HOME", str(tmp_path / "home"))
+    monkeypatch.setattr("runpilot.runner._check_docker", lambda: False)
+    (tmp_path / "train.py").write_text("import sys\nprint('unbuffered', sys.stdout.line_buffering)\n", encoding="utf-8")
+    run_dir = tmp_path / "run"
+
+    wrapped = wrap_entrypoint(
+        RunConfig(name="w", image="", entrypoint="python -u -X dev train.py --lr 1", profile="cprofile"),
+        run_dir,
+        in_docker=True,
+    )
+    assert wrapped.entrypoint.startswith("python -u -X dev -m cProfile -o ")
+    assert wrapped.entrypoint.endswith(" train.py --lr 1")
+
+    cfg = RunConfig(name="u", image="", entrypoint=f"{sys.executable} -u train.py", profile="cprofile")
+    assert runner.run_local_container(cfg, run_dir, working_dir=tmp_path) == 0
+    assert (run_dir / "profile.pstats").is_file()
+
+    # cProfile cannot wrap -c/-m; those run unprofiled.
+    cfg = RunConfig(name="c", image="", entrypoint=f"{sys.executable} -c 'print(1)'", profile="cprofile")
+    assert runner.run_local_container(cfg, tmp_path / "run-c") == 0
+    assert "profile" not in json.loads((tmp_path / "run-c" / "run.json").read_text())
@@ -0,0 +1,61 @@
+from __future__ import annotations
+
+import json
+from pathlib import Path
+
+import pytest
+
+from runpilot.cli_query import query_command
+from runpilot.metrics import write_metrics
+from runpilot.query import QueryError, parse_query, run_query
+
+NOW = 1_700_000_000.0  # 2023-11-14T22:13:20Z
+
+
+def _run(runs_dir: Path, run_id: str, loss: float, **meta) -> None:
+    run_dir = runs_dir / run_id
+    run_dir.mkdir(parents=True)
+    meta.setdefault("status", "finished")
+    meta.setdefault("created_at", "2023-11-14T00:00:00+00:00")
+    (run_dir / "run.json").write_text(json.dumps({"id": run_id, **meta}), encoding="utf-8")
+    write_metrics(run_dir, run_id, summary={"loss": loss})
+
+
+@pytest.fixture
+def runs(tmp_path: Path, monkeypatch) -> None:
+    monkeypatch.setenv("HOME", str(tmp_path))
+    runs_dir = tmp_path / ".runpilot" / "runs"
+    _run(runs_dir, "a", 0.10, name="resnet-50", params={"lr": 0.1}, tags=["baseline"])
+    _run(runs_dir, "b", 0.15, name="resnet-18", params={"lr": 0.01})
+    _run(runs_dir, "c", 0.30, name="resnet-18", params={"lr": 0.01})
+    _run(runs_dir, "d", 0.05, name="bert", status="failed")
+    _run(runs_dir, "e", 0.01, name="resnet-old", created_at="2023-10-01T00:00:00+00:00")
+
+
+def _ids(expr: str) -> list:
+    return [run["id"] for run in run_query(expr, now=NOW)[0]]
+
+
+def test_filters_over_fields_params_tags_and_metrics(runs) -> None:
+    assert _ids(
+        "status = finished and name ~ 'resnet*' and metrics.loss < 0.2 "
+        "and created_at > -7d order by metrics.loss"
+    ) == ["a", "b"]
+    assert _ids("params.lr = 0.01 order by metrics.loss desc") == ["c", "b"]
+    assert _ids("tag = baseline") == ["a"]
+    assert _ids("not (status = finished) or name = bert") == ["d"]
+    assert _ids("order by metrics.loss limit 2") == ["e", "d"]
+
+
+def test_bad_queries_raise_readable_errors() -> None:
+    for expr in ("loss < 1", "status =", "metrics.loss < high", "status = x limit many"):
+        with pytest.raises(QueryError):
+            parse_query(expr)
+
+
+def test_query_command_outputs_csv(runs, capsys) -> None:
+    assert query_command("metrics.loss >= 0.3", output="csv") == 0
+    assert capsys.readouterr().out.splitlines() == [
+        "id,status,name,created_at,metrics.loss",
+        "c,finished,resnet-18,2023-11-14T00:00:00+00:00,0.3",
+    ]
@@ -0,0 +1,88 @@
+from __future__ import annotations
+
+from pathlib import Path
+
+from runpilot.config import parse_size
+from runpilot.retention import RetentionPolicy, collect, source_entries
+from runpilot.storage import get_runs_dir, load_all_runs, read_run_metadata, update_run_metadata
+
+NOW = 1_750_000_000.0  # 2025-06-15
+DAY = 86400
+
+
+def _run(run_id: str, days_old: float, status: str = "finished", tags=None, size: int = 100) -> Path:
+    from datetime import datetime, timezone
+
+    run_dir = get_runs_dir() / run_id
+    run_dir.mkdir()
+    (run_dir / "logs.txt").write_bytes(b"x" * size)
+    created = datetime.fromtimestamp(NOW - days_old * DAY, tz=timezone.utc).isoformat()
+    fields = {"id": run_id, "status": status, "created_at": created}
+    if tags:
+        fields["tags"] = tags
+    update_run_metadata(run_dir, fields)
+    return run_dir
+
+
+def test_keep_last_days_tags_and_active_runs(tmp_path: Path, monkeypatch) -> None:
+    monkeypatch.setenv("HOME", str(tmp_path))
+    for i in range(6):
+        _run(f"run-{i}", days_old=10 - i)  # run-5 is newest
+    _run("tagged", days_old=30, tags=["baseline"])
+    _run("live", days_old=40, status="running")
+
+    policy = RetentionPolicy(keep_last=2, keep_days=7.5)
+    plan = collect(policy, dry_run=True, now=NOW)
+    assert sorted(item.run_id for item in plan.deleted) == ["run-0", "run-1", "run-2"]
+    assert (plan.kept, plan.protected) == (5, 2)
+    assert (get_runs_dir() / "run-0").is_dir()  # dry run changed nothing
+
+    report = collect(policy, now=NOW)
+    assert report.bytes_freed > 300
+    assert not (get_runs_dir() / "run-0").exists()
+    assert sorted(r["id"] for r in load_all_runs()) == ["live", "run-3", "run-4", "run-5", "tagged"]
+
+
+def test_drop_sources_then_enforce_disk_budget(tmp_path: Path, monkeypatch) -> None:
+    monkeypatch.setenv("HOME", str(tmp_path))
+    old = _run("old", days_old=3, size=5000)
+    mid = _run("mid", days_old=2, size=5000)
+    new = _run("new", days_old=1, size=5000)
+    (new / "source.tar.gz").write_bytes(b"s" * 4000)
+    (new / "src").mkdir()
+    (new / "src" / "train.py").write_bytes(b"p" * 4000)
+    (new / "metrics.json").write_text("{}", encoding="utf-8")
+    update_run_metadata(new, {"source": {"bundle": "source.tar.gz", "entries": ["src", "metrics.json"]}})
+
+    report = collect(RetentionPolicy(drop_sources=True, max_bytes=parse_size("12K")), now=NOW)
+    assert [item.run_id for item in report.sources_dropped] == ["new"]
+    assert not (new / "src").exists() and not (new / "source.tar.gz").exists()
+    assert (new / "logs.txt").is_file() and (new / "metrics.json").is_file()
+    assert read_run_metadata(new)["source"] == {"dropped": True}
+    # Oldest runs go first until the rest fits the budget.
+    assert [(item.run_id, item.reason) for item in report.deleted] == [("old", "budget")]
+    assert not old.exists() and mid.is_dir()
+
+
+def test_gc_only_removes_paths_inside_the_run(tmp_path: Path, monkeypatch) -> None:
+    monkeypatch.setenv("HOME", str(tmp_path))
+    # Bundles built with tar.add(dir, arcname=".") start with a "." member.
+    assert source_entries([".", "./src", "./src/a.py", "./train.py", "../x", "/etc", "logs.txt"]) == [
+        "src",
+        "train.py",
+    ]
+
+    agent = _run("agent", days_old=1)
+    (agent / "src").mkdir()
+    (agent / "source.tar.gz").write_bytes(b"s")
+    update_run_metadata(agent, {"source": {"bundle": "source.tar.gz", "entries": [".", "..", "src", "a/b"]}})
+
+    outside = tmp_path / "precious"
+    outside.mkdir()
+    imported = _run("imported", days_old=30)
+    update_run_metadata(imported, {"run_dir": str(outside)})  # exporting host's path
+
+    report = collect(RetentionPolicy(keep_last=1, drop_sources=True), now=NOW)
+    assert [item.run_id for item in report.deleted] == ["imported"]
+    assert not imported.exists() and outside.is_dir()
+    assert (agent / "logs.txt").is_file() and not (agent / "src").exists()
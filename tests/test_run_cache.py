@@ -0,0 +1,72 @@
+from __future__ import annotations
+
+import sys
+from pathlib import Path
+
+from runpilot.config import BuildConfig, RunConfig
+from runpilot.run_cache import cache_stats, execute_with_cache
+from runpilot.storage import create_run_dir, load_run
+
+
+def _cfg(run_dir: Path) -> RunConfig:
+    # RUNPILOT_OUTPUT_DIR differs per run but is excluded from the fingerprint.
+    return RunConfig(
+        name="cached",
+        image="",
+        entrypoint=f"{sys.executable} train.py",
+        env_vars={"RUNPILOT_OUTPUT_DIR": str(run_dir / "outputs")},
+    )
+
+
+def test_second_identical_run_is_a_cache_hit(tmp_path: Path, monkeypatch) -> None:
+    monkeypatch.setenv("HOME", str(tmp_path / "home"))
+    monkeypatch.setattr("runpilot.runner._check_docker", lambda: False)
+
+    src = tmp_path / "src"
+    src.mkdir()
+    (src / "train.py").write_text(
+        "import os, pathlib\n"
+        "print('METRIC loss=0.5')\n"
+        "out = pathlib.Path(os.environ['RUNPILOT_OUTPUT_DIR'])\n"
+        "out.mkdir(parents=True, exist_ok=True)\n"
+        "(out / 'model.bin').write_text('weights')\n",
+        encoding="utf-8",
+    )
+
+    first_dir = create_run_dir("cached-a")
+    assert execute_with_cache(_cfg(first_dir), first_dir, working_dir=src) == 0
+    assert load_run(first_dir.name)["cache"]["hit"] is False
+
+    second_dir = create_run_dir("cached-b")
+    assert execute_with_cache(_cfg(second_dir), second_dir, working_dir=src) == 0
+
+    meta = load_run(second_dir.name)
+    assert meta["status"] == "finished"
+    assert meta["cache"]["hit"] is True
+    assert meta["cache"]["source_run"] == first_dir.name
+    assert (second_dir / "outputs" / "model.bin").read_text() == "weights"
+    assert (second_dir / "metrics.json").is_file()
+
+    (src / "train.py").write_text("print('changed')\n", encoding="utf-8")
+    third_dir = create_run_dir("cached-c")
+    assert execute_with_cache(_cfg(third_dir), third_dir, working_dir=src) == 0
+    assert load_run(third_dir.name)["cache"]["invalidated_by"] == ["source changed"]
+
+    stats = cache_stats()
+    assert stats["hits"] == 1
+    assert stats["misses"] == 2
+    assert stats["entries"] == 2
+
+
+def test_missing_dockerfile_fails_the_run_instead_of_crashing(tmp_path: Path, monkeypatch) -> None:
+    monkeypatch.setenv("HOME", str(tmp_path / "home"))
+    monkeypatch.setattr("runpilot.runner._check_docker", lambda: True)
+
+    cfg = RunConfig(name="built", image="", entrypoint="python train.py", build=BuildConfig(dockerfile="Nope"))
+    run_dir = create_run_dir("built")
+
+    assert execute_with_cache(cfg, run_dir, working_dir=tmp_path) == 1
+    meta = load_run(run_dir.name)
+    assert meta["status"] == "failed"
+    assert "Dockerfile not found" in meta["cache"]["error"]
+    assert "Image build error" in (run_dir / "logs.txt").read_text(encoding="utf-8")
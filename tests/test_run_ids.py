@@ -0,0 +1,46 @@
+from __future__ import annotations
+
+import multiprocessing
+import re
+import threading
+from pathlib import Path
+
+from runpilot.storage import _generate_run_id, create_run_dir, get_runs_dir
+
+
+def test_ids_keep_prefix_and_are_monotonic_across_threads() -> None:
+    run_id = _generate_run_id("My Sweep")
+    assert re.fullmatch(r"\d{8}T\d{6}Z-my-sweep-[0-9A-HJKMNP-TV-Z]{10}", run_id)
+
+    ids: list[str] = []
+    lock = threading.Lock()
+
+    def worker() -> None:
+        mine = [_generate_run_id("sweep") for _ in range(2000)]
+        assert mine == sorted(mine)
+        with lock:
+            ids.extend(mine)
+
+    threads = [threading.Thread(target=worker) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert len(set(ids)) == len(ids) == 16000
+
+
+def _create_many(count: int) -> None:
+    for _ in range(count):
+        create_run_dir("sweep")
+
+
+def test_concurrent_processes_never_collide(tmp_path: Path, monkeypatch) -> None:
+    monkeypatch.setenv("HOME", str(tmp_path))
+    ctx = multiprocessing.get_context("fork")
+    procs = [ctx.Process(target=_create_many, args=(200,)) for _ in range(4)]
+    for p in procs:
+        p.start()
+    for p in procs:
+        p.join()
+    assert [p.exitcode for p in procs] == [0, 0, 0, 0]
+    assert len(list(get_runs_dir().iterdir())) == 800
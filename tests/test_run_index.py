@@ -0,0 +1,111 @@
+from __future__ import annotations
+
+import json
+import shutil
+from pathlib import Path
+
+from runpilot import run_index
+from runpilot.config import RunConfig
+from runpilot.paths import get_run_dir
+from runpilot.storage import (
+    create_run_dir,
+    load_all_runs,
+    load_run,
+    migrate_runs_layout,
+    write_run_metadata,
+)
+
+
+def _write(run_id: str, name: str, status: str, created_at: str, runs_dir: Path) -> Path:
+    run_dir = runs_dir / run_id
+    run_dir.mkdir(parents=True)
+    (run_dir / "run.json").write_text(
+        json.dumps({"id": run_id, "name": name, "status": status, "created_at": created_at}),
+        encoding="utf-8",
+    )
+    return run_dir
+
+
+def test_list_is_served_from_index_with_filters_and_pages(tmp_path: Path, monkeypatch) -> None:
+    monkeypatch.setenv("HOME", str(tmp_path))
+    runs_dir = tmp_path / ".runpilot" / "runs"
+    for i in range(5):
+        status = "failed" if i == 2 else "finished"
+        _write(f"run-{i}", f"resnet-{i}" if i % 2 else f"bert-{i}", status, f"2025-01-0{i + 1}", runs_dir)
+
+    # First read builds the index from disk.
+    assert [r["id"] for r in load_all_runs()] == ["run-4", "run-3", "run-2", "run-1", "run-0"]
+    assert [r["id"] for r in load_all_runs(limit=2, offset=2)] == ["run-2", "run-1"]
+    assert [r["id"] for r in load_all_runs(name="resnet*", descending=False)] == ["run-1", "run-3"]
+    assert [r["id"] for r in load_all_runs(status="failed")] == ["run-2"]
+
+    # Later writes keep the index current without a rescan.
+    run_dir = create_run_dir("fresh")
+    write_run_metadata(run_dir, RunConfig(name="fresh", image="", entrypoint="true"), status="running")
+    assert load_run(run_dir.name)["status"] == "running"
+    assert load_all_runs(limit=1)[0]["id"] == run_dir.name
+
+
+def test_reindex_detects_and_repairs_drift(tmp_path: Path, monkeypatch) -> None:
+    monkeypatch.setenv("HOME", str(tmp_path))
+    runs_dir = tmp_path / ".runpilot" / "runs"
+    _write("kept", "a", "finished", "2025-01-01", runs_dir)
+    gone = _write("gone", "b", "finished", "2025-01-02", runs_dir)
+    assert len(load_all_runs()) == 2
+
+    # Changes made behind RunPilot's back.
+    shutil.rmtree(gone)
+    _write("added", "c", "finished", "2025-01-03", runs_dir)
+
+    report = run_index.reindex(check_only=True)
+    assert (report.added, report.removed, report.unchanged) == (["added"], ["gone"], 1)
+    assert [r["id"] for r in load_all_runs()] == ["gone", "kept"]
+
+    assert run_index.reindex().drift
+    assert not run_index.reindex(check_only=True).drift
+    assert [r["id"] for r in load_all_runs()] == ["added", "kept"]
+
+
+def test_migrate_to_sharded_layout_keeps_runs_resolvable(tmp_path: Path, monkeypatch) -> None:
+    monkeypatch.setenv("HOME", str(tmp_path))
+    monkeypatch.setenv("RUNPILOT_HOME", str(tmp_path / ".runpilot"))
+    runs_dir = tmp_path / ".runpilot" / "runs"
+    old = _write("20250103T101010Z-old", "old", "finished", "2025-01-03", runs_dir)
+    _write("legacy-id", "legacy", "finished", "2025-01-02", runs_dir)
+
+    report = migrate_runs_layout("sharded")
+    assert (report["moved"], report["unchanged"]) == (1, 1)
+    moved = runs_dir / "20250103" / old.name
+    assert not old.exists() and (moved / "run.json").is_file()
+    assert get_run_dir(old.name) == moved
+    assert get_run_dir("legacy-id") == runs_dir / "legacy-id"
+    assert load_run(old.name)["run_dir"] == str(moved)
+
+    # New runs land in their date shard; the index covers both layouts.
+    fresh = create_run_dir("fresh")
+    assert fresh.parent.name == fresh.name[:8]
+    write_run_metadata(fresh, RunConfig(name="fresh", image="", entrypoint="true"), status="finished")
+    assert not run_index.reindex(check_only=True).drift
+    assert {r["id"] for r in load_all_runs()} == {old.name, "legacy-id", fresh.name}
+
+    migrate_runs_layout("flat")
+    assert get_run_dir(old.name) == old and old.is_dir()
+    assert not (runs_dir / "20250103").exists()
+
+
+def test_schema_upgrade_clears_every_run_table(tmp_path: Path, monkeypatch) -> None:
+    monkeypatch.setenv("HOME", str(tmp_path))
+    runs_dir = tmp_path / ".runpilot" / "runs"
+    _write("kept", "a", "finished", "2025-01-01", runs_dir)
+    assert len(load_all_runs()) == 1
+
+    with run_index.connect() as conn:
+        conn.execute("INSERT INTO run_values VALUES ('ghost', 'param', 'lr', 0.1, NULL)")
+        conn.execute("INSERT INTO run_tags VALUES ('ghost', 'best')")
+        conn.execute("INSERT INTO run_sizes VALUES ('ghost', 1, 100)")
+        conn.execute(f"PRAGMA user_version={run_index.SCHEMA_VERSION - 1}")
+
+    with run_index.connect() as conn:
+        for table, column in run_index._RUN_TABLES:
+            assert conn.execute(f"SELECT COUNT(*) FROM {table} WHERE {column} = 'ghost'").fetchone()[0] == 0
+    assert [r["id"] for r in load_all_runs()] == ["kept"]
@@ -0,0 +1,179 @@
+from __future__ import annotations
+
+import hashlib
+import hmac
+import shutil
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Dict
+from urllib.parse import parse_qsl, unquote, urlsplit
+from xml.sax.saxutils import escape
+
+import pytest
+
+from runpilot import run_store
+from runpilot.storage import create_run_dir, get_runs_dir, load_run, update_run_metadata
+
+ACCESS_KEY = "minio"
+SECRET_KEY = "minio-secret"
+
+
+class _S3StandIn(BaseHTTPRequestHandler):
+    """In-memory, path-style S3 subset: PUT/GET/DELETE objects, ListObjectsV2."""
+
+    objects: Dict[str, bytes] = {}
+    page_size = 2
+
+    def log_message(self, *args) -> None:
+        pass
+
+    def _authorized(self) -> bool:
+        # Recompute the SigV4 signature from the request as received.
+        auth = self.headers.get("Authorization", "")
+        if not auth.startswith("AWS4-HMAC-SHA256 "):
+            return False
+        fields = dict(part.strip().split("=", 1) for part in auth[17:].split(","))
+        _access, scope = fields["Credential"].split("/", 1)
+        names = fields["SignedHeaders"].split(";")
+        url = urlsplit(self.path)
+        query = "&".join(sorted(url.query.split("&"))) if url.query else ""
+        canonical = "\n".join(
+            [
+                self.command,
+                url.path,
+                query,
+                "".join(f"{n}:{self.headers[n].strip()}\n" for n in names),
+                fields["SignedHeaders"],
+                self.headers["x-amz-content-sha256"],
+            ]
+        )
+        amz_date = self.headers["x-amz-date"]
+        to_sign = "\n".join(
+            ["AWS4-HMAC-SHA256", amz_date, scope, hashlib.sha256(canonical.encode()).hexdigest()]
+        )
+        key = ("AWS4" + SECRET_KEY).encode()
+        for part in scope.split("/"):
+            key = hmac.new(key, part.encode(), hashlib.sha256).digest()
+        expected = hmac.new(key, to_sign.encode(), hashlib.sha256).hexdigest()
+        return hmac.compare_digest(expected, fields["Signature"])
+
+    def _reply(self, status: int, body: bytes = b"") -> None:
+        self.send_response(status)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _key(self) -> str:
+        return unquote(urlsplit(self.path).path).split("/", 2)[2]
+
+    def do_PUT(self) -> None:
+        body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        if not self._authorized():
+            return self._reply(403)
+        self.objects[self._key()] = body
+        self._reply(200)
+
+    def do_DELETE(self) -> None:
+        if not self._authorized():
+            return self._reply(403)
+        self.objects.pop(self._key(), None)
+        self._reply(204)
+
+    def do_GET(self) -> None:
+        if not self._authorized():
+            return self._reply(403)
+        url = urlsplit(self.path)
+        if url.path.count("/") > 1:
+            body = self.objects.get(self._key())
+            return self._reply(200, body) if body is not None else self._reply(404)
+
+        query = dict(parse_qsl(url.query))
+        keys = sorted(k for k in self.objects if k.startswith(query.get("prefix", "")))
+        start = int(query.get("continuation-token", 0))
+        page = keys[start : start + self.page_size]
+        more = start + self.page_size < len(keys)
+        xml = '<ListBucketResult xmlns="http://s3.amazonaws.com/doc/2006-03-01/">'
+        xml += "".join(f"<Contents><Key>{escape(k)}</Key></Contents>" for k in page)
+        xml += f"<IsTruncated>{'true' if more else 'false'}</IsTruncated>"
+        if more:
+            xml += f"<NextContinuationToken>{start + self.page_size}</NextContinuationToken>"
+        self._reply(200, (xml + "</ListBucketResult>").encode())
+
+
+@pytest.fixture
+def s3(tmp_path: Path, monkeypatch):
+    monkeypatch.setenv("HOME", str(tmp_path))
+    _S3StandIn.objects = {}
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _S3StandIn)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    monkeypatch.setenv("RUNPILOT_STORAGE_URL", "s3://runs-bucket/team a")
+    monkeypatch.setenv("RUNPILOT_S3_ENDPOINT", f"http://127.0.0.1:{server.server_address[1]}")
+    monkeypatch.setenv("AWS_ACCESS_KEY_ID", ACCESS_KEY)
+    monkeypatch.setenv("AWS_SECRET_ACCESS_KEY", SECRET_KEY)
+    monkeypatch.setattr(run_store, "_backends", {})
+    monkeypatch.setattr(run_store, "_queue", None)
+    yield _S3StandIn.objects
+    server.shutdown()
+
+
+def _finished_run(name: str, payload: bytes) -> Path:
+    run_dir = create_run_dir(name)
+    (run_dir / "logs.txt").write_bytes(payload)
+    (run_dir / "artifacts").mkdir()
+    (run_dir / "artifacts" / "model.bin").write_bytes(payload[::-1])
+    update_run_metadata(run_dir, {"id": run_dir.name, "name": name, "status": "succeeded"})
+    return run_dir
+
+
+def test_publish_then_fetch_from_s3_after_local_loss(s3) -> None:
+    run_dir = _finished_run("train", b"METRIC loss=0.5\n" * 10)
+    run_id = run_dir.name
+    assert run_store.publish_run(run_dir) == 4  # logs, model, journal, run.json
+    assert run_store.get_upload_queue().flush(timeout=10)
+    assert f"team a/runs/{run_id}/artifacts/model.bin" in s3
+
+    # The agent that ran it is gone: reads come through the cache.
+    shutil.rmtree(run_dir)
+    meta = load_run(run_id)
+    assert meta["status"] == "succeeded"
+    cached = Path(meta["run_dir"])
+    assert cached.parent == Path.home() / ".runpilot" / "store-cache" / "runs"
+    assert (cached / "logs.txt").read_bytes() == b"METRIC loss=0.5\n" * 10
+
+    # Finished runs are served from the cache without the backend.
+    s3.clear()
+    assert run_store.fetch_run(run_id) == cached
+    assert run_store.fetch_run("missing-run") is None
+
+
+def test_queue_survives_restart_and_cache_evicts_lru(s3, monkeypatch) -> None:
+    runs = [_finished_run(f"job{i}", bytes([i]) * 1000) for i in range(3)]
+
+    # Queued by a process that exited before uploading anything.
+    stalled = run_store.UploadQueue(run_store.get_backend())
+    monkeypatch.setattr(stalled, "_start", lambda: None)
+    for run_dir in runs:
+        stalled.enqueue([(run_store.run_key(run_dir.name, rel), p) for rel, p in run_store.run_files(run_dir)])
+    assert not s3
+
+    resumed = run_store.get_upload_queue()
+    assert resumed.resume() == 12
+    assert resumed.flush(timeout=10) and not resumed.errors
+    assert len(s3) == 12
+    assert run_store.get_upload_queue().resume() == 0  # nothing left persisted
+
+    for run_dir in runs:
+        shutil.rmtree(run_dir)
+    # Room for two runs: fetching a third evicts the least recently used.
+    monkeypatch.setenv("RUNPILOT_STORE_CACHE_MAX_BYTES", "5000")
+    first, second, third = (run.name for run in runs)
+    assert run_store.fetch_run(first) is not None
+    assert run_store.fetch_run(second) is not None
+    assert run_store.fetch_run(first) is not None  # first is now the most recent
+    assert run_store.fetch_run(third) is not None
+    cache = Path.home() / ".runpilot" / "store-cache" / "runs"
+    assert sorted(p.name for p in cache.iterdir()) == sorted([first, third])
+    assert not any(get_runs_dir().iterdir())
+
@@ -5,11 +5,13 @@ from runpilot import runner
 
 
 def test_runner_fallback_when_docker_missing(tmp_path: Path, monkeypatch) -> None:
-    # Force subprocess.run inside runpilot.runner to simulate missing docker
+    # Force subprocess inside runpilot.runner to simulate missing docker
+    # (and an entrypoint that cannot be started either)
     def fake_run(*args, **kwargs):
         raise FileNotFoundError
 
     monkeypatch.setattr("runpilot.runner.subprocess.run", fake_run)
+    monkeypatch.setattr("runpilot.runner.subprocess.Popen", fake_run)
 
     cfg = RunConfig(
         name="test-run",
@@ -27,4 +29,57 @@ def test_runner_fallback_when_docker_missing(tmp_path: Path, monkeypatch) -> Non
     log_path = run_dir / "logs.txt"
     assert log_path.is_file()
     content = log_path.read_text(encoding="utf-8")
-    assert "Docker is not installed" in content
+    assert "Local error" in content
+
+
+def test_fallback_keeps_the_jobs_exit_code(tmp_path: Path, monkeypatch) -> None:
+    monkeypatch.setattr("runpilot.runner._check_docker", lambda: False)
+
+    ok = RunConfig(name="ok", image="python:3.11-slim", entrypoint="true")
+    bad = RunConfig(name="bad", image="python:3.11-slim", entrypoint="sh -c 'exit 3'")
+
+    assert runner.run_local_container(ok, tmp_path / "ok") == 0
+    assert runner.run_local_container(bad, tmp_path / "bad") == 3
+
+
+def test_timeout_stops_job_with_distinct_status(tmp_path: Path, monkeypatch) -> None:
+    monkeypatch.setattr("runpilot.runner._check_docker", lambda: False)
+    monkeypatch.setattr("runpilot.runner.POLL_INTERVAL", 0.1)
+
+    cfg = RunConfig(name="slow", image="", entrypoint="sleep 30", timeout=0.5)
+    run_dir = tmp_path / "run"
+
+    exit_code = runner.run_local_container(cfg, run_dir)
+
+    assert exit_code == 124
+    assert runner.final_status(run_dir, exit_code) == "timed_out"
+    assert "timeout limit" in (run_dir / "logs.txt").read_text(encoding="utf-8")
+
+
+def test_idle_job_is_stopped(tmp_path: Path, monkeypatch) -> None:
+    monkeypatch.setattr("runpilot.runner._check_docker", lambda: False)
+    monkeypatch.setattr("runpilot.runner.POLL_INTERVAL", 0.1)
+    monkeypatch.setattr("runpilot.runner.PROBE_INTERVAL", 0.2)
+
+    cfg = RunConfig(name="stuck", image="", entrypoint="sleep 30", max_idle=1)
+    run_dir = tmp_path / "run"
+
+    exit_code = runner.run_local_container(cfg, run_dir)
+
+    assert exit_code == 123
+    assert runner.final_status(run_dir, exit_code) == "idle_timeout"
+
+
+def test_job_within_limits_keeps_exit_code(tmp_path: Path, monkeypatch) -> None:
+    monkeypatch.setattr("runpilot.runner._check_docker", lambda: False)
+
+    cfg = RunConfig(
+        name="quick", image="", entrypoint="sh -c 'exit 3'",
+        timeout=30, budget=1.0, cost_per_hour=2.0,
+    )
+    run_dir = tmp_path / "run"
+
+    exit_code = runner.run_local_container(cfg, run_dir)
+
+    assert exit_code == 3
+    assert runner.final_status(run_dir, exit_code) == "failed"
@@ -0,0 +1,80 @@
+from __future__ import annotations
+
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+from runpilot.cli_stats import stats_command
+from runpilot.run_index import mirror_remote_runs
+from runpilot.stats import compute_stats, load_samples, percentile
+from runpilot.storage import get_runs_dir, update_run_metadata
+
+START = datetime(2025, 6, 2, 9, 0, tzinfo=timezone.utc)  # a Monday
+
+
+def _run(run_id: str, day: int, minutes: float, status: str, image: str, **extra) -> None:
+    created = START + timedelta(days=day)
+    run_dir = get_runs_dir() / run_id
+    run_dir.mkdir()
+    fields = {
+        "id": run_id,
+        "name": "train",
+        "image": image,
+        "status": status,
+        "created_at": created.isoformat(),
+        "finished_at": (created + timedelta(minutes=minutes)).isoformat(),
+    }
+    update_run_metadata(run_dir, dict(fields, **extra))
+
+
+def test_stats_group_by_image_and_day_with_remote_mirror(tmp_path: Path, monkeypatch, capsys) -> None:
+    monkeypatch.setenv("HOME", str(tmp_path))
+    for i, minutes in enumerate([10, 20, 30, 40]):
+        _run(f"gpu-{i}", day=0, minutes=minutes, status="finished" if i else "failed", image="torch:gpu")
+    _run(
+        "agent-1",
+        day=1,
+        minutes=5,
+        status="finished",
+        image="torch:cpu",
+        cloud_run_id="c-1",
+        queued_at=(START + timedelta(days=1, seconds=-90)).isoformat(),
+        claimed_at=(START + timedelta(days=1)).isoformat(),
+        phases={"download": 12.0, "execute": 270.0, "upload": 18.0},
+    )
+    mirror_remote_runs(
+        [
+            # Same run as agent-1: counted once, as the local run.
+            {"cloud_run_id": "c-1", "status": "success", "config": {"name": "train", "image": "torch:cpu"}},
+            {
+                "cloud_run_id": "c-2",
+                "status": "failed",
+                "config": {"name": "train", "image": "torch:cpu"},
+                "created_at": (START + timedelta(days=1)).isoformat(),
+                "started_at": (START + timedelta(days=1, minutes=3)).isoformat(),
+                "ended_at": (START + timedelta(days=1, minutes=13)).isoformat(),
+            },
+        ]
+    )
+
+    samples = load_samples()
+    assert sorted(s.id for s in samples) == ["agent-1", "c-2", "gpu-0", "gpu-1", "gpu-2", "gpu-3"]
+
+    columns, groups = compute_stats(samples, ["image"])
+    assert columns == ["image"]
+    cpu, gpu = groups
+    assert (gpu.runs, gpu.failed, gpu.failure_rate) == (4, 1, 0.25)
+    assert percentile(gpu.durations, 50) == 25 * 60 and percentile(gpu.durations, 90) == 37 * 60
+    assert (cpu.runs, cpu.failed, sorted(cpu.queue_waits)) == (2, 1, [90.0, 180.0])
+    assert cpu.phases == {"download": 12.0, "execute": 270.0, "upload": 18.0}
+
+    columns, groups = compute_stats(samples, ["source"], bucket="week")
+    assert [g.key for g in groups] == [("2025-W23", "local"), ("2025-W23", "remote")]
+
+    local = load_samples(include_remote=False, since=START + timedelta(hours=12))
+    assert [s.id for s in local] == ["agent-1"]
+
+    assert stats_command(group_by="image", bucket="day") == 0
+    out = capsys.readouterr().out
+    assert "2025-06-02 torch:gpu" in out and "25.0%" in out
+    assert "DOWNLOAD" in out and "4m30s (90%)" in out
+    assert stats_command(group_by="colour") == 1
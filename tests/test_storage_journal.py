@@ -0,0 +1,61 @@
+from __future__ import annotations
+
+import json
+from pathlib import Path
+
+from runpilot.config import RunConfig
+from runpilot.storage import (
+    EVENTS_FILENAME,
+    read_events,
+    read_run_metadata,
+    update_run_metadata,
+    write_run_metadata,
+)
+
+
+def test_metadata_writes_append_events_and_refresh_snapshot(tmp_path: Path) -> None:
+    run_dir = tmp_path / "run-1"
+    run_dir.mkdir()
+    cfg = RunConfig(name="demo", image="python:3.11-slim", entrypoint="true")
+
+    write_run_metadata(run_dir, cfg, status="running")
+    update_run_metadata(run_dir, {"phases": {"execute": 1.5}})
+    write_run_metadata(run_dir, cfg, status="finished", exit_code=0)
+
+    events = read_events(run_dir)
+    assert [e["event"] for e in events] == ["status", "update", "status"]
+    assert [e["fields"].get("status") for e in events] == ["running", None, "finished"]
+
+    meta = read_run_metadata(run_dir)
+    assert meta["status"] == "finished"
+    assert meta["exit_code"] == 0
+    assert meta["phases"] == {"execute": 1.5}
+    assert meta["created_at"] == events[0]["fields"]["created_at"]
+    # run.json is the folded snapshot, replaced whole.
+    assert json.loads((run_dir / "run.json").read_text(encoding="utf-8")) == meta
+    assert not (run_dir / "run.json.tmp").exists()
+
+
+def test_torn_event_and_legacy_run_json(tmp_path: Path) -> None:
+    run_dir = tmp_path / "old-run"
+    run_dir.mkdir()
+    (run_dir / "run.json").write_text(
+        json.dumps({"id": "old-run", "status": "finished", "created_at": "2025-01-01"}),
+        encoding="utf-8",
+    )
+    assert read_run_metadata(run_dir)["status"] == "finished"
+
+    # The first write seeds the journal with what run.json already held.
+    update_run_metadata(run_dir, {"note": "kept"})
+    assert [e["event"] for e in read_events(run_dir)] == ["snapshot", "update"]
+
+    # A crash mid-append leaves a partial line; readers skip it.
+    with (run_dir / EVENTS_FILENAME).open("a", encoding="utf-8") as f:
+        f.write('{"ts": "2025-01-02", "event": "upd')
+    meta = read_run_metadata(run_dir)
+    assert (meta["created_at"], meta["note"]) == ("2025-01-01", "kept")
+
+    # The next write starts on a fresh line instead of joining the torn one.
+    update_run_metadata(run_dir, {"note": "after crash"})
+    assert read_run_metadata(run_dir)["note"] == "after crash"
+    assert [e["event"] for e in read_events(run_dir)] == ["snapshot", "update", "update"]
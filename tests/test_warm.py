@@ -0,0 +1,91 @@
+from __future__ import annotations
+
+import json
+import os
+import signal
+import sys
+from pathlib import Path
+
+import pytest
+
+from runpilot import runner, warm
+from runpilot.config import RunConfig
+
+
+def test_parse_python_entrypoint() -> None:
+    env = dict(os.environ)
+    py = sys.executable
+
+    assert warm.parse_python_entrypoint([py, "train.py", "--lr", "1"], env) == {
+        "script": "train.py",
+        "argv": ["--lr", "1"],
+    }
+    assert warm.parse_python_entrypoint([py, "-u", "-m", "pkg.main"], env) == {
+        "module": "pkg.main",
+        "argv": [],
+    }
+    assert warm.parse_python_entrypoint([py, "-c", "print(1)"], env) is None
+    assert warm.parse_python_entrypoint(["bash", "run.sh"], env) is None
+
+
+def test_warm_runs_reuse_preloaded_server(tmp_path: Path, monkeypatch) -> None:
+    monkeypatch.setenv("HOME", str(tmp_path))
+    monkeypatch.setattr("runpilot.runner._check_docker", lambda: False)
+
+    work = tmp_path / "work"
+    work.mkdir()
+    (work / "job.py").write_text(
+        "import os, sys\n"
+        "print('argv', sys.argv[1:], 'cwd', os.getcwd(), 'flag', os.environ.get('FLAG'))\n"
+        "sys.exit(int(sys.argv[1]))\n",
+        encoding="utf-8",
+    )
+
+    def run(code: str, name: str) -> tuple[int, Path]:
+        cfg = RunConfig(
+            name=name,
+            image="",
+            entrypoint=f"{sys.executable} job.py {code}",
+            env_vars={"FLAG": name},
+            preload=["json", "decimal"],
+        )
+        run_dir = tmp_path / name
+        return runner.run_local_container(cfg, run_dir, working_dir=work), run_dir
+
+    try:
+        code, first = run("0", "first")
+        assert code == 0
+        assert json.loads((first / "run.json").read_text())["warm_start"]["server_started"] is True
+
+        code, second = run("3", "second")
+        assert code == 3
+        log = (second / "logs.txt").read_text(encoding="utf-8")
+        assert f"argv ['3'] cwd {work} flag second" in log
+        warm_meta = json.loads((second / "run.json").read_text())["warm_start"]
+        assert warm_meta["server_started"] is False
+        assert warm_meta["modules"] == ["json", "decimal"]
+    finally:
+        pid_file = warm._socket_path(["json", "decimal"]).with_suffix(".pid")
+        if pid_file.exists():
+            os.kill(int(pid_file.read_text()), signal.SIGTERM)
+
+
+def test_socket_dir_must_be_private(tmp_path: Path) -> None:
+    fresh = tmp_path / "fresh" / "warm"
+    warm._private_dir(fresh)
+    assert fresh.stat().st_mode & 0o777 == 0o700
+
+    readable = tmp_path / "readable"
+    readable.mkdir(mode=0o755)
+    os.chmod(readable, 0o755)
+    warm._private_dir(readable)
+    assert readable.stat().st_mode & 0o777 == 0o700
+
+    shared = tmp_path / "shared"
+    shared.mkdir()
+    os.chmod(shared, 0o777)
+    link = tmp_path / "link"
+    link.symlink_to(fresh)
+    for path in (shared, link):
+        with pytest.raises(RuntimeError):
+            warm._private_dir(path)